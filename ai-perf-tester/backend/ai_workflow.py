@@ -4,9 +4,13 @@ LangGraph Workflow for Performance Test Analysis and Recommendations
 
 import os
 import sys
-from typing import Dict, List, Any, Annotated, TypedDict
+from typing import Dict, List, Any, Annotated, Optional, TypedDict
 from dotenv import load_dotenv
 
+from models import ThresholdConfig
+from rule_analysis import RuleAnalysis, analyze as analyze_with_rules
+from metrics import invoke_llm, llm_calls_avoided
+
 # Try to load from multiple possible locations, prioritizing root directory
 # 1. Check if we're in the ai-perf-tester directory structure
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -213,7 +217,7 @@ async def _invoke_llm_with_fallback(messages: List[Any], current_provider_name:
     for provider in available_providers:
         if provider["name"] == current_provider_name:
             try:
-                response = provider["instance"].invoke(messages)
+                response = invoke_llm(provider, messages)
                 return response, provider["name"]
             except Exception as e:
                 last_error = e
@@ -229,7 +233,7 @@ async def _invoke_llm_with_fallback(messages: List[Any], current_provider_name:
     next_provider = _get_next_provider(current_provider_name)
     while next_provider:
         try:
-            response = next_provider["instance"].invoke(messages)
+            response = invoke_llm(next_provider, messages)
             return response, next_provider["name"]
         except Exception as e:
             last_error = e
@@ -481,7 +485,7 @@ async def generate_final_report(state: AnalysisState) -> AnalysisState:
     - **Average Response Time**: {state["perf_data"]["summary_metrics"].get("avg_response_time", "N/A")} ms
     - **95th Percentile Response Time**: {state["perf_data"]["summary_metrics"].get("p95_response_time", "N/A")} ms
     - **Error Rate**: {state["perf_data"]["summary_metrics"].get("error_rate", "N/A")}%
-    - **Throughput**: {state["perf_data"]["summary_metrics"].get("throughput", "N/A")} requests/min
+    - **Throughput**: {state["perf_data"]["summary_metrics"].get("throughput", "N/A")} requests/s
     
     ## Analysis
     {analysis}
@@ -525,9 +529,86 @@ def create_performance_analysis_graph() -> "StateGraph":  # type: ignore
     
     return workflow
 
+async def narrate_rule_analysis(perf_data: PerformanceData, rules: RuleAnalysis) -> str:
+    """Have the LLM explain the rule-based findings in a single call"""
+    findings_text = "\n".join(f"- [{f.severity}] {f.category}: {f.message}" for f in rules.findings) or "- none"
+    passed_text = "\n".join(f"- {check}" for check in rules.passed_checks) or "- none"
+
+    prompt = f"""
+    A deterministic analysis of this performance test produced the findings below.
+
+    Test Name: {perf_data['test_name']}
+    Test Type: {perf_data['test_type']}
+    URL: {perf_data['url']}
+    Configuration: {perf_data['concurrent_users']} concurrent users, {perf_data['duration']}s duration, {perf_data['ramp_up_time']}s ramp-up
+
+    Findings:
+    {findings_text}
+
+    Passed checks:
+    {passed_text}
+
+    Write a concise analysis of these results for the engineering team: explain what the findings mean,
+    how they relate to each other and which to address first. Do not invent issues that are not listed.
+    """
+
+    messages = [
+        SystemMessage(content="You are a performance testing expert. Explain test findings clearly."),  # type: ignore
+        HumanMessage(content=prompt)  # type: ignore
+    ]
+
+    response, provider_used = await _invoke_llm_with_fallback(messages, "openai")
+    return str(response.content)
+
+async def rule_based_result(perf_data: PerformanceData, rules: RuleAnalysis, analysis: Optional[str] = None) -> Dict[str, Any]:
+    """Build the workflow result from rule-based findings"""
+    state = await generate_final_report({
+        "perf_data": perf_data,
+        "analysis": analysis or rules.summary(),
+        "bottlenecks": rules.bottlenecks or ["No bottlenecks detected"],
+        "recommendations": rules.recommendations or ["No changes required at the tested load"],
+        "next_steps": rules.next_steps,
+        "output_report": ""
+    })
+    return {
+        "analysis": state["analysis"],
+        "bottlenecks": state["bottlenecks"],
+        "recommendations": state["recommendations"],
+        "next_steps": state["next_steps"],
+        "report": state["output_report"]
+    }
+
+def run_rule_analysis(perf_data: PerformanceData, thresholds: Optional[ThresholdConfig] = None) -> RuleAnalysis:
+    return analyze_with_rules(
+        perf_data["summary_metrics"],
+        perf_data["time_series_data"],
+        thresholds,
+        perf_data["concurrent_users"],
+        perf_data["ramp_up_time"]
+    )
+
 # Function to run the analysis
-async def analyze_performance_test(perf_data: PerformanceData) -> Dict[str, Any]:
-    """Run the performance analysis workflow on test data"""
+async def analyze_performance_test(perf_data: PerformanceData, thresholds: Optional[ThresholdConfig] = None) -> Dict[str, Any]:
+    """
+    Analyze performance test data.
+
+    Deterministic rules run first. When they are conclusive the LLM is only asked
+    to narrate their findings (one call instead of the four-stage workflow), and
+    without an LLM the rule-based result is returned as is. The full LLM workflow
+    only runs when the rules are inconclusive.
+    """
+    rules = run_rule_analysis(perf_data, thresholds)
+
+    if rules.conclusive or not llm_available:
+        llm_calls_avoided.inc(("rules_conclusive" if rules.conclusive else "llm_unavailable",))
+        analysis = None
+        if llm_available:
+            try:
+                analysis = await narrate_rule_analysis(perf_data, rules)
+            except Exception as e:
+                print(f"AI narration failed, using rule-based analysis: {str(e)}")
+        return await rule_based_result(perf_data, rules, analysis)
+
     # Initialize the graph
     graph = create_performance_analysis_graph()
     
@@ -555,10 +636,5 @@ async def analyze_performance_test(perf_data: PerformanceData) -> Dict[str, Any]
             "report": result["output_report"]
         }
     except Exception as e:
-        return {
-            "analysis": f"AI analysis workflow failed: {str(e)}",
-            "bottlenecks": [],
-            "recommendations": [],
-            "next_steps": [],
-            "report": f"# Performance Test Analysis Report\n\nAI analysis workflow failed: {str(e)}"
-        }
\ No newline at end of file
+        print(f"AI analysis workflow failed, using rule-based analysis: {str(e)}")
+        return await rule_based_result(perf_data, rules)
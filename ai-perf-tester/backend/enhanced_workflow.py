@@ -74,6 +74,7 @@ if langchain_core_imports_successful:
 from models import PerfTestRequest, ThresholdConfig
 from jmeter_utils import generate_jmeter_template, run_jmeter_test, parse_jmeter_csv, save_run_details_to_db
 from database import PerfTestRun, PerfRunDetail, AIRecommendation
+from metrics import invoke_llm
 
 # Initialize LLM with enhanced error handling and fallback support
 llm = None  # type: ignore
@@ -148,7 +149,7 @@ async def _invoke_llm_with_fallback(messages: List[Any], current_provider_name:
     for provider in available_providers:
         if provider["name"] == current_provider_name:
             try:
-                response = provider["instance"].invoke(messages)
+                response = invoke_llm(provider, messages)
                 return response, provider["name"]
             except Exception as e:
                 last_error = e
@@ -164,7 +165,7 @@ async def _invoke_llm_with_fallback(messages: List[Any], current_provider_name:
     next_provider = _get_next_provider(current_provider_name)
     while next_provider:
         try:
-            response = next_provider["instance"].invoke(messages)
+            response = invoke_llm(next_provider, messages)
             return response, next_provider["name"]
         except Exception as e:
             last_error = e
@@ -15,7 +15,8 @@ from sqlalchemy.orm import Session
 from models import PerfTestRequest
 # Import database models from database instead of main
 from database import PerfRunDetail, PerfTestRun, AIRecommendation
-from ai_workflow import analyze_performance_test
+from ai_workflow import analyze_performance_test, run_rule_analysis, rule_based_result
+from metrics import jmeter_jobs
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -216,7 +217,11 @@ def run_jmeter_test(jmx_file: str, run_id: str) -> Tuple[str, str]:
         ]
         
         logger.info(f"Executing JMeter command: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        jmeter_jobs.inc(("jmeter_running",))
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        finally:
+            jmeter_jobs.dec(("jmeter_running",))
         
         if result.returncode != 0:
             logger.error(f"JMeter failed with return code {result.returncode}")
@@ -234,22 +239,38 @@ def run_jmeter_test(jmx_file: str, run_id: str) -> Tuple[str, str]:
         logger.error(f"Error running JMeter: {str(e)}")
         raise Exception(f"Error running JMeter: {str(e)}")
 
+# Time series bucket sizes in seconds (all divide a minute); the smallest one that keeps
+# a run within MAX_SERIES_POINTS is used, so short runs still have enough points for trend checks
+BUCKET_SIZES = (5, 10, 15, 30, 60)
+MAX_SERIES_POINTS = 120
+
+def _bucket_seconds(span_seconds: float) -> int:
+    for size in BUCKET_SIZES:
+        if span_seconds / size <= MAX_SERIES_POINTS:
+            return size
+    return BUCKET_SIZES[-1]
+
 def parse_jmeter_csv(file_path: str) -> Dict[str, Any]:
-    """Parse JMeter CSV results into time series data"""
+    """
+    Parse JMeter CSV results into time series data. Throughput is expressed in
+    requests per minute whatever the bucket size.
+    """
     logger.info(f"Parsing JMeter CSV file: {file_path}")
     
-    bucket = defaultdict(list)
+    samples: List[Tuple[int, float, bool]] = []
+    error_codes: Dict[str, int] = defaultdict(int)
     
     try:
         with open(file_path, newline='') as csvfile:
             reader = csv.DictReader(csvfile)
             for row in reader:
                 try:
-                    ts = datetime.fromtimestamp(int(row["timeStamp"]) / 1000)
+                    timestamp_ms = int(row["timeStamp"])
                     elapsed = float(row["elapsed"])
                     success = row["success"].lower() == "true"
-                    minute_bucket = ts.replace(second=0, microsecond=0)
-                    bucket[minute_bucket].append((elapsed, success))
+                    samples.append((timestamp_ms, elapsed, success))
+                    if not success:
+                        error_codes[row.get("responseCode") or "unknown"] += 1
                 except (KeyError, ValueError) as e:
                     logger.warning(f"Error parsing row in CSV: {e}")
                     continue
@@ -259,24 +280,66 @@ def parse_jmeter_csv(file_path: str) -> Dict[str, Any]:
             "timestamps": [],
             "response_times": [],
             "error_rate_series": [],
-            "throughput_series": []
+            "throughput_series": [],
+            "error_codes": {},
+            "bucket_seconds": BUCKET_SIZES[-1],
+            "total_requests": 0,
+            "failed_requests": 0,
+            "elapsed_seconds": 0
         }
     
-    data = {"timestamps": [], "response_times": [], "error_rate_series": [], "throughput_series": []}
+    first = min((ts for ts, _, _ in samples), default=0)
+    last = max((ts + elapsed for ts, elapsed, _ in samples), default=0)
+    elapsed_seconds = round((last - first) / 1000, 3)
+    bucket_seconds = _bucket_seconds(elapsed_seconds)
     
-    for ts, samples in sorted(bucket.items()):
-        total = len(samples)
-        if total > 0:
-            errors = sum(1 for _, s in samples if not s)
-            avg_resp = sum(e for e, _ in samples) / total
-            
-            data["timestamps"].append(ts.isoformat())
-            data["response_times"].append(round(avg_resp, 2))
-            data["error_rate_series"].append(round(errors / total * 100, 2))
-            data["throughput_series"].append(total)
+    bucket = defaultdict(list)
+    for timestamp_ms, elapsed, success in samples:
+        bucket[(timestamp_ms - first) // (bucket_seconds * 1000)].append((elapsed, success))
+    
+    data = {
+        "timestamps": [], "response_times": [], "error_rate_series": [], "throughput_series": [],
+        "error_codes": dict(error_codes),
+        "bucket_seconds": bucket_seconds,
+        "total_requests": len(samples),
+        "failed_requests": sum(error_codes.values()),
+        "elapsed_seconds": elapsed_seconds
+    }
+    
+    for index, bucket_samples in sorted(bucket.items()):
+        total = len(bucket_samples)
+        errors = sum(1 for _, s in bucket_samples if not s)
+        avg_resp = sum(e for e, _ in bucket_samples) / total
+        ts = datetime.fromtimestamp((first + index * bucket_seconds * 1000) / 1000)
+        
+        data["timestamps"].append(ts.isoformat())
+        data["response_times"].append(round(avg_resp, 2))
+        data["error_rate_series"].append(round(errors / total * 100, 2))
+        data["throughput_series"].append(total * 60 // bucket_seconds)
     
     return data
 
+def summarize(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summary metrics of a parsed run. Error rate and throughput (requests per
+    second) are taken over the whole run, not from the per-bucket series, whose
+    short or sparse edge buckets would exaggerate them.
+    """
+    response_times = parsed["response_times"]
+    total = parsed["total_requests"]
+    elapsed = parsed["elapsed_seconds"]
+    return {
+        "avg_response_time": round(sum(response_times) / len(response_times), 2) if response_times else 0,
+        "p95_response_time": (
+            round(sorted(response_times)[int(len(response_times) * 0.95) - 1], 2) if len(response_times) > 20 else 0
+        ),
+        "error_rate": round(parsed.get("failed_requests", 0) / total * 100, 2) if total else 0,
+        "throughput": round(total / elapsed, 2) if elapsed else 0,
+        # Kept so the analysis can recompute averages
+        "total_requests": total,
+        "elapsed_seconds": elapsed,
+    }
+
 def save_run_details_to_db(db: Session, run_id: str, parsed_data: Dict[str, Any]) -> None:
     """Save time series data to database"""
     logger.info(f"Saving run details to database for run ID {run_id}")
@@ -384,6 +447,7 @@ async def run_ai_analysis(
     logger.info(f"Running AI analysis for test run {run_id}")
     
     db = None
+    jmeter_jobs.inc(("analysis_running",))
     try:
         # Get previous runs for comparison
         db = next(db_func())
@@ -421,7 +485,7 @@ async def run_ai_analysis(
         
         try:
             # Try primary AI analysis
-            analysis_result = await analyze_performance_test(perf_data)
+            analysis_result = await analyze_performance_test(perf_data, test_request.thresholds)
         except Exception as e:
             last_error = e
             logger.warning(f"Primary AI analysis failed: {str(e)}")
@@ -430,14 +494,10 @@ async def run_ai_analysis(
             if _is_quota_error(e):
                 logger.info("Attempting fallback AI analysis due to quota error")
                 try:
-                    # Try alternative analysis approach or reduced functionality
-                    analysis_result = {
-                        "analysis": f"AI analysis completed with reduced functionality due to quota limitations: {str(e)}",
-                        "bottlenecks": ["Unable to identify specific bottlenecks due to quota limitations"],
-                        "recommendations": ["Check quota limits for your AI provider", "Consider using alternative AI models"],
-                        "next_steps": ["Upgrade your AI provider plan or use alternative models"],
-                        "report": f"# Performance Test Analysis Report\n\nAI analysis completed with reduced functionality due to quota limitations: {str(e)}"
-                    }
+                    # Deterministic analysis needs no AI provider
+                    analysis_result = await rule_based_result(
+                        perf_data, run_rule_analysis(perf_data, test_request.thresholds)
+                    )
                 except Exception as fallback_error:
                     logger.error(f"Fallback AI analysis also failed: {str(fallback_error)}")
                     last_error = fallback_error
@@ -480,9 +540,19 @@ async def run_ai_analysis(
         except Exception as db_error:
             logger.error(f"Error saving AI analysis error to database: {str(db_error)}")
     finally:
+        jmeter_jobs.dec(("analysis_running",))
         if db is not None:
             db.close()
 
+async def _run_queued_ai_analysis(**kwargs) -> None:
+    jmeter_jobs.dec(("analysis_queued",))
+    await run_ai_analysis(**kwargs)
+
+def queue_ai_analysis(background_tasks, **kwargs) -> None:
+    """Schedule run_ai_analysis after the response, counted in the jmeter_jobs queue metric"""
+    jmeter_jobs.inc(("analysis_queued",))
+    background_tasks.add_task(_run_queued_ai_analysis, **kwargs)
+
 # Add typing for PerformanceData to match ai_workflow
 from typing import TypedDict
 
@@ -2,17 +2,20 @@
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, RedirectResponse
 from pydantic import BaseModel, Field
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
-import subprocess, os, uuid, csv, json, shutil
+import asyncio, subprocess, os, uuid, csv, json, shutil
 from datetime import datetime
 from collections import defaultdict
 import aiofiles
 from typing import Dict, List, Any, Optional
 import logging
 
+import metrics
+from storage import artifact_store
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,7 +34,7 @@ except ImportError as e:
     ai_analysis_available = False
     
     # Define a placeholder function when AI analysis is not available
-    async def analyze_performance_test(perf_data):
+    async def analyze_performance_test(perf_data, thresholds=None):
         return {
             "analysis": "AI analysis is not available. LangGraph or OpenAI API dependencies are missing.",
             "bottlenecks": ["AI analysis is not available"],
@@ -51,6 +54,9 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# Expose the connection pool state on /metrics
+metrics.watch_db_pool(engine)
+
 # Initialize FastAPI app
 app = FastAPI(title="AI Performance Tester API")
 
@@ -63,13 +69,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency and in-flight counts for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Create necessary directories
 os.makedirs("jmx_templates", exist_ok=True)
 os.makedirs("results", exist_ok=True)
 os.makedirs("uploads", exist_ok=True)
 
-# Serve static files (JMeter reports)
-app.mount("/reports", StaticFiles(directory="results"), name="reports")
+# Serve JMeter reports, from local disk or from object storage
+if artifact_store is None:
+    app.mount("/reports", StaticFiles(directory="results"), name="reports")
+else:
+    @app.get("/reports/{run_id}/{path:path}")
+    async def get_report_file(run_id: str, path: str):
+        # Pages are small and must stay under /reports for their relative links;
+        # everything else is fetched from the bucket directly
+        if path.endswith((".html", ".htm")):
+            content = await asyncio.to_thread(artifact_store.read, run_id, path)
+            if content is None:
+                raise HTTPException(status_code=404, detail="Report not found")
+            return HTMLResponse(content)
+        return RedirectResponse(artifact_store.presigned_url(run_id, path), status_code=307)
+
+async def publish_run_artifacts(run_id: str):
+    """Upload a finished run's results and report when artifacts are kept in object storage"""
+    if artifact_store is None:
+        return
+    try:
+        await asyncio.to_thread(artifact_store.publish_run, run_id)
+    except Exception as e:
+        logger.error(f"Failed to upload artifacts of run {run_id}: {e}")
 
 # Database dependency
 def get_db():
@@ -87,8 +117,9 @@ from jmeter_utils import (
     generate_jmeter_template,
     run_jmeter_test,
     parse_jmeter_csv,
+    summarize,
     save_run_details_to_db,
-    run_ai_analysis
+    queue_ai_analysis
 )
 
 # Import the enhanced workflow
@@ -141,8 +172,8 @@ async def run_performance_test(
                 
                 # Run AI analysis in background if available
                 if ai_analysis_available:
-                    background_tasks.add_task(
-                        run_ai_analysis,
+                    queue_ai_analysis(
+                        background_tasks,
                         run_id=run_id,
                         parsed_data={"response_times": [], "error_rate_series": [], "throughput_series": []},
                         summary_metrics=enhanced_results.get("summary_metrics", {}),
@@ -215,6 +246,8 @@ async def run_performance_test(
                         with open(dashboard_report_path, "w") as f:
                             f.write("<html><body><h1>JMeter Dashboard</h1><p>Dashboard is being generated or was not created properly.</p></body></html>")
                 
+                await publish_run_artifacts(jmeter_run_id or run_id)
+                
                 return {
                     "run_id": run_id,
                     "summary_metrics": enhanced_results.get("summary_metrics", {}),
@@ -243,24 +276,7 @@ async def run_performance_test(
         parsed = parse_jmeter_csv(results_file)
         
         # Calculate summary metrics
-        summary_metrics = {}
-        
-        if parsed["response_times"]:
-            summary_metrics["avg_response_time"] = round(sum(parsed["response_times"]) / len(parsed["response_times"]), 2)
-            summary_metrics["p95_response_time"] = round(sorted(parsed["response_times"])[int(len(parsed["response_times"]) * 0.95) - 1], 2) if len(parsed["response_times"]) > 20 else 0
-        else:
-            summary_metrics["avg_response_time"] = 0
-            summary_metrics["p95_response_time"] = 0
-            
-        if parsed["error_rate_series"]:
-            summary_metrics["error_rate"] = round(max(parsed["error_rate_series"]), 2)
-        else:
-            summary_metrics["error_rate"] = 0
-            
-        if parsed["throughput_series"]:
-            summary_metrics["throughput"] = max(parsed["throughput_series"])
-        else:
-            summary_metrics["throughput"] = 0
+        summary_metrics = summarize(parsed)
         
         # Create test run record
         run = PerfTestRun(
@@ -282,8 +298,8 @@ async def run_performance_test(
         save_run_details_to_db(db, run_id, parsed)
         
         # Run AI analysis in background
-        background_tasks.add_task(
-            run_ai_analysis,
+        queue_ai_analysis(
+            background_tasks,
             run_id=run_id,
             parsed_data=parsed,
             summary_metrics=summary_metrics,
@@ -305,14 +321,17 @@ async def run_performance_test(
             with open(dashboard_report_path, "w") as f:
                 f.write("<html><body><h1>JMeter Dashboard</h1><p>Dashboard is being generated or was not created properly.</p></body></html>")
         
+        detailed_reports = {
+            "executive_html": f"/reports/{run_id}/report/index.html",
+            "dashboard_html": f"/reports/{run_id}/report/dashboard.html" if os.path.exists(f"results/{run_id}/report/dashboard.html") else f"/reports/{run_id}/report/index.html"
+        }
+        await publish_run_artifacts(run_id)
+        
         # Return response
         return {
             "run_id": run_id,
             "summary_metrics": summary_metrics,
-            "detailed_reports": {
-                "executive_html": f"/reports/{run_id}/report/index.html",
-                "dashboard_html": f"/reports/{run_id}/report/dashboard.html" if os.path.exists(f"results/{run_id}/report/dashboard.html") else f"/reports/{run_id}/report/index.html"
-            }
+            "detailed_reports": detailed_reports
         }
     except Exception as e:
         logger.error(f"Error running performance test: {str(e)}")
@@ -454,8 +473,8 @@ async def request_ai_analysis(
     )
     
     # Run AI analysis in background
-    background_tasks.add_task(
-        run_ai_analysis,
+    queue_ai_analysis(
+        background_tasks,
         run_id=req.run_id,
         parsed_data=parsed_data,
         summary_metrics=summary_metrics,
@@ -469,6 +488,11 @@ async def request_ai_analysis(
         "run_id": req.run_id
     }
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    """Runtime metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Add health check endpoint
 @app.get("/health")
 def health_check() -> Dict[str, Any]:
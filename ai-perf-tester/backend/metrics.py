@@ -0,0 +1,217 @@
+"""
+Runtime metrics for the performance tester, in the Prometheus text format.
+
+Counters and histograms are sharded per thread so recording never takes a
+lock (sync routes and BackgroundTasks run in the threadpool); a scrape sums
+the shards. Pool and job gauges are read by callbacks at scrape time.
+"""
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            self._shards.append(shard)  # list.append is atomic
+            return shard
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"] + self.samples())
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        totals: Dict[Labels, float] = {}
+        for shard in list(self._shards):
+            for labels, value in list(shard.items()):
+                totals[labels] = totals.get(labels, 0.0) + value
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in sorted(totals.items())]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+
+class CallbackGauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Labels, float]],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            entry = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> List[str]:
+        merged: Dict[Labels, list] = {}
+        for shard in list(self._shards):
+            for labels, (counts, total) in list(shard.items()):
+                entry = merged.setdefault(labels, [[0] * len(counts), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+        lines = []
+        for labels, (counts, total) in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+_metrics: List[_Metric] = []
+
+
+def _register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _metrics) + "\n"
+
+
+http_requests_in_flight = _register(Gauge("http_requests_in_flight", "HTTP requests currently being served"))
+http_request_duration = _register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+))
+llm_request_duration = _register(Histogram(
+    "llm_request_duration_seconds", "LLM call latency by provider", ("provider", "outcome"), LLM_LATENCY_BUCKETS
+))
+llm_tokens = _register(Counter("llm_tokens_total", "Tokens used by LLM calls", ("provider", "kind")))
+llm_calls_avoided = _register(Counter(
+    "llm_calls_avoided_total", "Analyses answered without the full LLM workflow", ("reason",)
+))
+jmeter_jobs = _register(Gauge("jmeter_jobs", "JMeter runs and AI analyses queued or running", ("stage",)))
+
+
+def watch_db_pool(engine):
+    """Expose the connection pool state of a SQLAlchemy engine"""
+    def stats() -> Dict[Labels, float]:
+        pool = engine.pool
+        return {
+            (state,): getattr(pool, reader)()
+            for state, reader in (("size", "size"), ("checked_in", "checkedin"),
+                                  ("checked_out", "checkedout"), ("overflow", "overflow"))
+            if hasattr(pool, reader)
+        }
+    _register(CallbackGauge("db_pool_connections", "DB connection pool state", stats, ("state",)))
+
+
+def invoke_llm(provider: Dict[str, Any], messages: List[Any]) -> Any:
+    """Invoke a LangChain chat model, recording latency and token usage"""
+    start = time.perf_counter()
+    try:
+        response = provider["instance"].invoke(messages)
+    except Exception as e:
+        outcome = "quota_error" if "quota" in str(e).lower() or "429" in str(e) else "error"
+        llm_request_duration.observe(time.perf_counter() - start, (provider["name"], outcome))
+        raise
+    llm_request_duration.observe(time.perf_counter() - start, (provider["name"], "success"))
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        llm_tokens.inc((provider["name"], "prompt"), usage["input_tokens"])
+    if usage.get("output_tokens"):
+        llm_tokens.inc((provider["name"], "completion"), usage["output_tokens"])
+    return response
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware counting in-flight requests and latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - start, (scope["method"], route, str(status_code)))
@@ -0,0 +1,341 @@
+"""
+Deterministic rule-based analysis of performance test results
+
+Runs before any LLM call: threshold checks against ThresholdConfig, trend
+detection on the time series, saturation-knee detection and error
+clustering by response code. The result is structured bottlenecks,
+recommendations and next tests that are available instantly and without an
+AI provider; the LLM is only used to narrate them or when the rules are
+inconclusive.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from models import ThresholdConfig
+
+# Minimum number of time buckets needed to judge trends and saturation. The parser
+# sizes buckets to the run (5 s for short runs), so a one-minute run has 12 buckets.
+MIN_TREND_POINTS = 5
+MIN_KNEE_POINTS = 4
+# Bucket size assumed for series without bucket_seconds or timestamps
+DEFAULT_BUCKET_SECONDS = 60
+# Relative response time growth over the run considered a degradation
+TREND_GROWTH_LIMIT = 0.3
+# Response time growth after peak throughput that marks saturation
+KNEE_LATENCY_FACTOR = 1.5
+
+SEVERITY_ORDER = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+
+@dataclass
+class Finding:
+    category: str  # threshold, trend, saturation, errors
+    severity: str  # critical, high, medium, low
+    message: str
+    recommendation: str
+
+
+@dataclass
+class RuleAnalysis:
+    findings: List[Finding] = field(default_factory=list)
+    passed_checks: List[str] = field(default_factory=list)
+    next_steps: List[str] = field(default_factory=list)
+    conclusive: bool = True
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def bottlenecks(self) -> List[str]:
+        return [f"[{f.severity}] {f.message}" for f in self.findings]
+
+    @property
+    def recommendations(self) -> List[str]:
+        # Several findings can share a recommendation
+        return list(dict.fromkeys(f.recommendation for f in self.findings))
+
+    def summary(self) -> str:
+        """Plain-text analysis used when no LLM narration is available"""
+        lines = []
+        if self.findings:
+            worst = self.findings[0].severity
+            lines.append(f"Rule-based analysis found {len(self.findings)} issue(s), highest severity: {worst}.")
+            lines.extend(f"- {f.message}" for f in self.findings)
+        else:
+            lines.append("Rule-based analysis found no performance issues.")
+        if self.passed_checks:
+            lines.append("Passed checks:")
+            lines.extend(f"- {check}" for check in self.passed_checks)
+        lines.extend(self.notes)
+        return "\n".join(lines)
+
+
+def _severity(ratio: float) -> str:
+    """Severity from how far a value exceeds its limit (ratio >= 1)"""
+    if ratio >= 2:
+        return "critical"
+    if ratio >= 1.5:
+        return "high"
+    return "medium"
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def _slope(values: List[float]) -> float:
+    """Least-squares slope per time bucket"""
+    n = len(values)
+    x_mean = (n - 1) / 2
+    y_mean = _mean(values)
+    denominator = sum((x - x_mean) ** 2 for x in range(n))
+    if not denominator:
+        return 0.0
+    return sum((x - x_mean) * (y - y_mean) for x, y in enumerate(values)) / denominator
+
+
+def bucket_seconds(time_series: Dict[str, Any]) -> int:
+    """Resolution of the series: recorded by the parser, else inferred from the timestamps"""
+    if time_series.get("bucket_seconds"):
+        return int(time_series["bucket_seconds"])
+    try:
+        stamps = [datetime.fromisoformat(ts) for ts in time_series.get("timestamps") or []]
+    except (TypeError, ValueError):
+        stamps = []
+    gaps = [(b - a).total_seconds() for a, b in zip(stamps, stamps[1:]) if b > a]
+    return int(min(gaps)) if gaps else DEFAULT_BUCKET_SECONDS
+
+
+def _complete_buckets(time_series: Dict[str, Any], count: int) -> int:
+    """Number of leading buckets that cover a full bucket of the run (the last one is usually partial)"""
+    elapsed = time_series.get("elapsed_seconds")
+    if not elapsed:
+        return count
+    return min(count, int(elapsed // bucket_seconds(time_series)))
+
+
+def average_rps(summary_metrics: Dict[str, Any], time_series: Dict[str, Any]) -> Optional[float]:
+    """
+    Average requests per second: total requests over the elapsed time when
+    recorded, else the mean of the complete buckets of the per-minute series
+    """
+    total = summary_metrics.get("total_requests")
+    elapsed = summary_metrics.get("elapsed_seconds")
+    if total and elapsed:
+        return total / elapsed
+    throughput = _series(time_series, "throughput_series")
+    if not throughput:
+        return None
+    complete = throughput[:_complete_buckets(time_series, len(throughput))] or throughput
+    return _mean(complete) / 60
+
+
+def _series(time_series: Dict[str, List[Any]], key: str) -> List[float]:
+    values = []
+    for value in time_series.get(key) or []:
+        try:
+            values.append(float(value))
+        except (TypeError, ValueError):
+            continue
+    return values
+
+
+def check_thresholds(
+    summary_metrics: Dict[str, Any],
+    time_series: Dict[str, List[Any]],
+    thresholds: ThresholdConfig,
+    result: RuleAnalysis
+):
+    avg_response = summary_metrics.get("avg_response_time")
+    p95_response = summary_metrics.get("p95_response_time")
+    error_rate = summary_metrics.get("error_rate")
+    rps = average_rps(summary_metrics, time_series)
+
+    if thresholds.response_time:
+        limit = thresholds.response_time
+        for label, value in (("Average response time", avg_response), ("95th percentile response time", p95_response)):
+            if not value:
+                continue
+            if value > limit:
+                result.findings.append(Finding(
+                    "threshold", _severity(value / limit),
+                    f"{label} {value:.0f} ms exceeds the {limit:.0f} ms threshold",
+                    "Profile the slowest server-side operations (database queries, external calls) "
+                    "and add caching for repeated reads"
+                ))
+            else:
+                result.passed_checks.append(f"{label} {value:.0f} ms is within {limit:.0f} ms")
+
+    if thresholds.error_rate is not None and error_rate is not None:
+        limit = thresholds.error_rate
+        if error_rate > limit:
+            result.findings.append(Finding(
+                "threshold", _severity(error_rate / limit if limit else 2),
+                f"Error rate {error_rate:.2f}% exceeds the {limit:.2f}% threshold",
+                "Investigate the failing requests by response code before increasing load"
+            ))
+        else:
+            result.passed_checks.append(f"Error rate {error_rate:.2f}% is within {limit:.2f}%")
+
+    if thresholds.throughput and rps is not None:
+        limit = thresholds.throughput
+        if rps < limit:
+            result.findings.append(Finding(
+                "threshold", _severity(limit / rps if rps else 2),
+                f"Average throughput {rps:.1f} req/s is below the {limit:.1f} req/s target",
+                "Check connection pool, worker and thread limits on the server; throughput is capped "
+                "before the target load"
+            ))
+        else:
+            result.passed_checks.append(f"Average throughput {rps:.1f} req/s meets {limit:.1f} req/s")
+
+
+def detect_trends(time_series: Dict[str, List[Any]], result: RuleAnalysis):
+    response_times = _series(time_series, "response_times")
+    error_rates = _series(time_series, "error_rate_series")
+    if len(response_times) < MIN_TREND_POINTS:
+        return
+
+    mean_response = _mean(response_times)
+    if mean_response:
+        growth = _slope(response_times) * (len(response_times) - 1) / mean_response
+        if growth > TREND_GROWTH_LIMIT:
+            result.findings.append(Finding(
+                "trend", "high" if growth > 2 * TREND_GROWTH_LIMIT else "medium",
+                f"Response time rises steadily during the run (+{growth * 100:.0f}% relative to the average)",
+                "Look for resource exhaustion over time: memory growth, unclosed connections, "
+                "growing queues or caches without eviction"
+            ))
+            result.next_steps.append("Run an endurance test at the current load to confirm the degradation over time")
+        else:
+            result.passed_checks.append("Response time is stable over the run")
+
+    if len(error_rates) >= MIN_TREND_POINTS and _slope(error_rates) > 0:
+        half = len(error_rates) // 2
+        early, late = _mean(error_rates[:half]), _mean(error_rates[half:])
+        if late > 1 and late > 2 * early:
+            result.findings.append(Finding(
+                "trend", "high",
+                f"Error rate increases during the run ({early:.1f}% in the first half, {late:.1f}% in the second)",
+                "Check for pools or rate limits that are exhausted as the load is sustained"
+            ))
+
+
+def detect_saturation(
+    time_series: Dict[str, List[Any]],
+    concurrent_users: int,
+    ramp_up_time: int,
+    result: RuleAnalysis
+):
+    """Find the point where throughput stops growing while response time keeps rising"""
+    throughput = _series(time_series, "throughput_series")
+    response_times = _series(time_series, "response_times")
+    # A partial last bucket would look like a throughput drop
+    n = _complete_buckets(time_series, min(len(throughput), len(response_times)))
+    if n < MIN_KNEE_POINTS:
+        return
+
+    peak_index = max(range(n), key=lambda i: throughput[i])
+    if peak_index == 0 or peak_index >= n - 1:
+        # Throughput still growing at the end (or only falling): no knee in this run
+        return
+
+    before = _mean(response_times[:peak_index + 1])
+    after = _mean(response_times[peak_index + 1:n])
+    if not before or after < KNEE_LATENCY_FACTOR * before:
+        return
+
+    # Estimate the concurrency at the knee from the ramp-up
+    knee_seconds = peak_index * bucket_seconds(time_series)
+    if ramp_up_time and knee_seconds < ramp_up_time:
+        users = max(1, round(concurrent_users * knee_seconds / ramp_up_time))
+        where = f"at about {users} concurrent users"
+    else:
+        users = concurrent_users
+        where = f"after {knee_seconds} s at {concurrent_users} users"
+
+    result.findings.append(Finding(
+        "saturation", "high",
+        f"Saturation {where}: throughput peaks at {throughput[peak_index]:.0f} req/min while response time "
+        f"grows from {before:.0f} ms to {after:.0f} ms",
+        "Scale the saturated tier (application workers or database) horizontally, or remove the contended "
+        "resource (locks, single-threaded components)"
+    ))
+    result.next_steps.append(
+        f"Run a step load test between {max(1, users // 2)} and {users * 2} users to pin down the capacity limit"
+    )
+
+
+def _code_class(code: str) -> str:
+    if code.isdigit():
+        if code == "429":
+            return "rate limiting (429)"
+        return f"{code[0]}xx"
+    return "connection errors"
+
+
+ERROR_CLASS_ADVICE = {
+    "5xx": "Server errors under load: check application logs and upstream dependencies at the failing load level",
+    "4xx": "Client errors: verify the test data, authentication tokens and request payloads in the test plan",
+    "rate limiting (429)": "Requests are rate limited: raise the limit for the test client or reduce the request rate",
+    "connection errors": "Connection failures or timeouts: check server accept queues, keep-alive settings, "
+                         "load balancer limits and client timeouts",
+}
+
+
+def cluster_errors(time_series: Dict[str, Any], result: RuleAnalysis):
+    error_codes: Dict[str, int] = time_series.get("error_codes") or {}
+    total = sum(error_codes.values())
+    if not total:
+        return
+
+    clusters: Dict[str, Dict[str, int]] = {}
+    for code, count in error_codes.items():
+        clusters.setdefault(_code_class(str(code)), {})[str(code)] = count
+
+    for name, codes in sorted(clusters.items(), key=lambda item: -sum(item[1].values())):
+        count = sum(codes.values())
+        share = count / total
+        detail = ", ".join(f"{code}: {n}" for code, n in sorted(codes.items(), key=lambda item: -item[1])[:5])
+        result.findings.append(Finding(
+            "errors", "high" if share >= 0.5 else "medium",
+            f"{count} failed requests ({share * 100:.0f}% of errors) are {name} ({detail})",
+            ERROR_CLASS_ADVICE.get(name, ERROR_CLASS_ADVICE["4xx"])
+        ))
+
+
+def analyze(
+    summary_metrics: Dict[str, Any],
+    time_series: Dict[str, Any],
+    thresholds: Optional[ThresholdConfig] = None,
+    concurrent_users: int = 0,
+    ramp_up_time: int = 0
+) -> RuleAnalysis:
+    """Analyze test results with deterministic rules"""
+    result = RuleAnalysis()
+    thresholds = thresholds or ThresholdConfig()
+    summary_metrics = summary_metrics or {}
+    time_series = time_series or {}
+
+    check_thresholds(summary_metrics, time_series, thresholds, result)
+    detect_trends(time_series, result)
+    detect_saturation(time_series, concurrent_users, ramp_up_time, result)
+    cluster_errors(time_series, result)
+
+    result.findings.sort(key=lambda f: SEVERITY_ORDER.get(f.severity, 99))
+
+    points = len(time_series.get("response_times") or [])
+    if not result.findings and points < MIN_TREND_POINTS:
+        # Nothing failed, but too little data to rule out trends or saturation
+        result.conclusive = False
+        result.notes.append(
+            f"Only {points} time bucket(s) of {bucket_seconds(time_series)} s available; "
+            "trend and saturation checks were skipped."
+        )
+
+    if not result.findings:
+        result.next_steps.append(
+            f"Increase the load to {max(1, concurrent_users) * 2} users to find the capacity limit"
+        )
+    elif any(f.category == "threshold" for f in result.findings):
+        result.next_steps.append("Re-run the same test after the fixes to verify the thresholds are met")
+    return result
@@ -0,0 +1,106 @@
+"""
+Storage for JMeter run artifacts: results.csv, jmeter.log and the HTML report.
+
+JMeter always writes a run to results/<run_id> on local disk, and by default
+/reports serves that directory. With ARTIFACT_STORAGE=s3 the run directory
+is uploaded to an S3-compatible bucket (AWS S3, MinIO, ...) once the run has
+finished, then removed locally, so any node can serve any run. /reports then
+returns HTML pages itself, which keeps the report's relative links pointing
+at /reports. Every other file (scripts, CSVs, logs) is redirected to a
+presigned URL.
+"""
+import logging
+import mimetypes
+import os
+import shutil
+from typing import Optional
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.exceptions import ClientError
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+    boto3 = None
+    ClientError = Exception
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = "results"
+# Files above this size are uploaded as parallel multipart uploads
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class S3ArtifactStore:
+    def __init__(self, bucket: str, client=None, prefix: str = "jmeter", presign_expires: int = 3600,
+                 keep_local: bool = False):
+        self.bucket = bucket
+        self.client = client or boto3.client(
+            "s3",
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL"),
+            region_name=os.environ.get("S3_REGION"),
+        )
+        self.prefix = prefix.strip("/")
+        self.presign_expires = presign_expires
+        self.keep_local = keep_local
+
+    def key(self, run_id: str, path: str) -> str:
+        key = f"{run_id}/{path.lstrip('/')}"
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def publish_run(self, run_id: str, results_dir: str = RESULTS_DIR) -> int:
+        """Upload every file of a finished run; returns the number of files uploaded"""
+        run_dir = os.path.join(results_dir, run_id)
+        config = TransferConfig(multipart_threshold=MULTIPART_CHUNK_SIZE, multipart_chunksize=MULTIPART_CHUNK_SIZE)
+        uploaded = 0
+        for root, _, files in os.walk(run_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, run_dir).replace(os.sep, "/")
+                content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                self.client.upload_file(
+                    path, self.bucket, self.key(run_id, relative),
+                    ExtraArgs={"ContentType": content_type}, Config=config
+                )
+                uploaded += 1
+        if not self.keep_local:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        logger.info(f"Uploaded {uploaded} artifacts of run {run_id} to s3://{self.bucket}/{self.key(run_id, '')}")
+        return uploaded
+
+    def read(self, run_id: str, path: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key(run_id, path))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return None
+            raise
+        return response["Body"].read()
+
+    def presigned_url(self, run_id: str, path: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": self.key(run_id, path)}, ExpiresIn=self.presign_expires
+        )
+
+
+def create_artifact_store() -> Optional[S3ArtifactStore]:
+    """Object store selected by ARTIFACT_STORAGE; None keeps artifacts on local disk"""
+    if os.environ.get("ARTIFACT_STORAGE", "local").lower() != "s3":
+        return None
+    if not BOTO3_AVAILABLE:
+        logger.warning("ARTIFACT_STORAGE=s3 but boto3 is not installed; keeping JMeter artifacts on local disk")
+        return None
+    bucket = os.environ.get("S3_BUCKET")
+    if not bucket:
+        logger.warning("ARTIFACT_STORAGE=s3 but S3_BUCKET is not set; keeping JMeter artifacts on local disk")
+        return None
+    return S3ArtifactStore(
+        bucket,
+        prefix=os.environ.get("S3_PREFIX", "jmeter"),
+        presign_expires=int(os.environ.get("S3_PRESIGN_EXPIRES", "3600")),
+        keep_local=os.environ.get("ARTIFACT_KEEP_LOCAL", "false").lower() == "true",
+    )
+
+
+artifact_store = create_artifact_store()
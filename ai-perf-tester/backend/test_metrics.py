@@ -0,0 +1,48 @@
+"""
+Tests for the Prometheus metrics of the performance tester
+"""
+import os
+import sys
+import threading
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import Counter, Histogram
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors", ("message",))
+    counter.inc(('say "hi"\nC:\\tmp',))
+
+    assert counter.samples() == ['errors_total{message="say \\"hi\\"\\nC:\\\\tmp"} 1']
+
+
+def test_counter_sums_thread_shards():
+    counter = Counter("runs_total", "Runs", ("stage",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc(("jmeter",))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.samples() == ['runs_total{stage="jmeter"} 4000']
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+
+    assert histogram.samples() == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 4.25",
+        "latency_seconds_count 4",
+    ]
@@ -0,0 +1,76 @@
+"""
+Tests for the rule-based analysis and the JMeter CSV time series it reads
+"""
+import os
+import sys
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jmeter_utils import parse_jmeter_csv, summarize
+from models import ThresholdConfig
+from rule_analysis import analyze, average_rps, bucket_seconds
+
+
+def write_results(path, samples):
+    """JMeter CSV with (seconds since start, elapsed ms, success) samples"""
+    start = 1_700_000_000_000
+    lines = ["timeStamp,elapsed,success,responseCode"]
+    for offset, elapsed, success in samples:
+        code = "200" if success else "500"
+        lines.append(f"{start + int(offset * 1000)},{elapsed},{str(success).lower()},{code}")
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_one_minute_run_has_enough_points_for_trend_checks(tmp_path):
+    # 10 requests per second for 60 s, response time growing steadily
+    samples = [(i / 10, 100 + i, True) for i in range(600)]
+    parsed = parse_jmeter_csv(write_results(tmp_path / "results.csv", samples))
+
+    assert parsed["bucket_seconds"] == 5
+    assert len(parsed["response_times"]) == 12
+    assert parsed["throughput_series"][0] == 600  # requests per minute
+    assert parsed["total_requests"] == 600
+
+    summary = {"avg_response_time": 400, "error_rate": 0, "total_requests": 600,
+               "elapsed_seconds": parsed["elapsed_seconds"]}
+    result = analyze(summary, parsed, ThresholdConfig(response_time=1000, error_rate=1, throughput=9),
+                     concurrent_users=10)
+
+    assert result.conclusive
+    assert any(f.category == "trend" for f in result.findings)
+    # 600 requests from the first start to the last response (60.6 s)
+    assert "Average throughput 9.9 req/s meets 9.0 req/s" in result.passed_checks
+
+
+def test_throughput_comes_from_total_requests_not_partial_buckets():
+    # 90 s at 10 req/s in per-minute buckets: the second minute is only half full
+    time_series = {"throughput_series": [600, 300], "bucket_seconds": 60, "elapsed_seconds": 90}
+
+    assert average_rps({"total_requests": 900, "elapsed_seconds": 90}, time_series) == 10
+    # Without totals only complete buckets count
+    assert average_rps({}, time_series) == 10
+
+    result = analyze({"total_requests": 900, "elapsed_seconds": 90}, time_series,
+                     ThresholdConfig(response_time=None, error_rate=None, throughput=10))
+    assert not any(f.category == "threshold" for f in result.findings)
+
+
+def test_bucket_size_is_inferred_from_stored_timestamps():
+    assert bucket_seconds({"timestamps": ["2026-10-19T12:00:00", "2026-10-19T12:00:10",
+                                          "2026-10-19T12:00:20"]}) == 10
+    assert bucket_seconds({"timestamps": ["2026-10-19T12:00:00"]}) == 60
+
+
+def test_summary_rates_cover_the_whole_run(tmp_path):
+    # 60 s at 10 req/s without errors, then a lone failed request 5 s later
+    samples = [(i / 10, 100, True) for i in range(600)] + [(65, 100, False)]
+    parsed = parse_jmeter_csv(write_results(tmp_path / "results.csv", samples))
+
+    summary = summarize(parsed)
+
+    # The tail bucket alone is 100% errors; over the run it is 1 in 601
+    assert max(parsed["error_rate_series"]) == 100
+    assert parsed["failed_requests"] == 1 and summary["error_rate"] == 0.17
+    assert summary["throughput"] == round(601 / 65.1, 2)
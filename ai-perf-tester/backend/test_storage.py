@@ -0,0 +1,89 @@
+"""
+Tests for uploading JMeter run artifacts to S3 and reading them back
+"""
+import io
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from storage import ClientError, S3ArtifactStore
+
+
+class StubS3Client:
+    """In-memory stand-in for the boto3 S3 client"""
+
+    def __init__(self):
+        self.objects = {}
+        self.content_types = {}
+
+    def upload_file(self, path, bucket, key, ExtraArgs=None, Config=None):
+        with open(path, "rb") as f:
+            self.objects[(bucket, key)] = f.read()
+        self.content_types[key] = (ExtraArgs or {}).get("ContentType")
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.test/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+def write_run(results_dir, run_id):
+    run_dir = results_dir / run_id
+    (run_dir / "report" / "content").mkdir(parents=True)
+    (run_dir / "results.csv").write_text("timeStamp,elapsed\n1,100\n")
+    (run_dir / "report" / "index.html").write_text("<html></html>")
+    (run_dir / "report" / "content" / "dashboard.js").write_text("// js")
+    return run_dir
+
+
+def test_publish_run_uploads_every_file_and_removes_the_local_copy(tmp_path):
+    client = StubS3Client()
+    store = S3ArtifactStore("perf", client=client, prefix="/jmeter/")
+    run_dir = write_run(tmp_path, "run-1")
+
+    assert store.publish_run("run-1", results_dir=str(tmp_path)) == 3
+
+    assert sorted(key for _, key in client.objects) == [
+        "jmeter/run-1/report/content/dashboard.js",
+        "jmeter/run-1/report/index.html",
+        "jmeter/run-1/results.csv",
+    ]
+    assert client.content_types["jmeter/run-1/report/index.html"] == "text/html"
+    assert client.content_types["jmeter/run-1/results.csv"] == "text/csv"
+    assert not run_dir.exists()
+
+
+def test_keep_local_leaves_the_run_directory(tmp_path):
+    store = S3ArtifactStore("perf", client=StubS3Client(), keep_local=True)
+    run_dir = write_run(tmp_path, "run-2")
+
+    store.publish_run("run-2", results_dir=str(tmp_path))
+
+    assert (run_dir / "results.csv").exists()
+
+
+def test_read_returns_stored_files_and_none_for_missing_ones(tmp_path):
+    client = StubS3Client()
+    store = S3ArtifactStore("perf", client=client, prefix="")
+    write_run(tmp_path, "run-3")
+    store.publish_run("run-3", results_dir=str(tmp_path))
+
+    assert store.read("run-3", "/report/index.html") == b"<html></html>"
+    assert store.read("run-3", "report/missing.html") is None
+    assert store.presigned_url("run-3", "results.csv") == "https://s3.test/perf/run-3/results.csv?expires=3600"
+
+
+def test_read_raises_other_storage_errors():
+    class DeniedClient(StubS3Client):
+        def get_object(self, Bucket, Key):
+            raise ClientError({"Error": {"Code": "AccessDenied"}}, "GetObject")
+
+    with pytest.raises(ClientError):
+        S3ArtifactStore("perf", client=DeniedClient()).read("run-4", "results.csv")
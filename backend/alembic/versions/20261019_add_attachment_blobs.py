@@ -0,0 +1,32 @@
+"""Add reference counts of attachment blobs
+
+Revision ID: 20261019_add_attachment_blobs
+Revises: 20261019_add_test_execution_history_index
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_add_attachment_blobs'
+down_revision = '20261019_add_test_execution_history_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'attachment_blobs',
+        sa.Column('content_hash', sa.String(length=64), primary_key=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    # Blobs stored so far are referenced by the attachment rows pointing at them
+    op.execute(
+        "INSERT INTO attachment_blobs (content_hash, ref_count, created_at) "
+        "SELECT content_hash, COUNT(*), MIN(created_at) FROM attachments "
+        "WHERE content_hash IS NOT NULL GROUP BY content_hash"
+    )
+
+def downgrade():
+    op.drop_table('attachment_blobs')
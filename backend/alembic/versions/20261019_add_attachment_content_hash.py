@@ -0,0 +1,24 @@
+"""Add content hash to attachments
+
+Revision ID: 20261019_add_attachment_content_hash
+Revises: 20250831_add_test_case_fields
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_add_attachment_content_hash'
+down_revision = '20250831_add_test_case_fields'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Attachments uploaded before content addressing keep a NULL hash and their own file
+    op.add_column('attachments', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_attachments_content_hash', 'attachments', ['content_hash'])
+
+def downgrade():
+    op.drop_index('ix_attachments_content_hash', table_name='attachments')
+    op.drop_column('attachments', 'content_hash')
@@ -0,0 +1,22 @@
+"""Index test executions by test case and completion time
+
+Revision ID: 20261019_add_test_execution_history_index
+Revises: 20261019_add_test_execution_requests
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_add_test_execution_history_index'
+down_revision = '20261019_add_test_execution_requests'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # The prioritization reads the latest runs of every case of a project
+    op.create_index('ix_test_executions_case_completed', 'test_executions', ['test_case_id', 'completed_at'])
+
+def downgrade():
+    op.drop_index('ix_test_executions_case_completed', table_name='test_executions')
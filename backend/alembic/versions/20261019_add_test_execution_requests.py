@@ -0,0 +1,46 @@
+"""Add per-request results of automated API runs
+
+Revision ID: 20261019_add_test_execution_requests
+Revises: 20261019_add_attachment_content_hash
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_add_test_execution_requests'
+down_revision = '20261019_add_attachment_content_hash'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'test_execution_requests',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('execution_id', sa.String(), nullable=False),
+        sa.Column('test_case_id', sa.String(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('iteration', sa.Integer(), nullable=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('method', sa.String(length=16), nullable=True),
+        sa.Column('url', sa.Text(), nullable=True),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response_time', sa.Integer(), nullable=True),
+        sa.Column('response_size', sa.Integer(), nullable=True),
+        sa.Column('assertions_total', sa.Integer(), nullable=True),
+        sa.Column('assertions_failed', sa.Integer(), nullable=True),
+        sa.Column('failures', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['execution_id'], ['test_executions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['test_case_id'], ['test_cases.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_test_execution_requests_execution_id', 'test_execution_requests', ['execution_id'])
+    op.create_index('ix_test_execution_requests_case_name', 'test_execution_requests', ['test_case_id', 'name'])
+
+def downgrade():
+    op.drop_index('ix_test_execution_requests_case_name', table_name='test_execution_requests')
+    op.drop_index('ix_test_execution_requests_execution_id', table_name='test_execution_requests')
+    op.drop_table('test_execution_requests')
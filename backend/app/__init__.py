@@ -3,30 +3,29 @@ IntelliTest AI Automation Platform - Main Application Package
 
 This package contains the core functionality of the IntelliTest AI Automation Platform.
 """
+import importlib
 
-# Import key components to make them available at the package level
-from .main import app
-from .db.session import SessionLocal, engine, init_db
-from .models import *
-from .auth.security import (
-    get_current_user,
-    create_access_token,
-    get_password_hash,
-    verify_password,
-    AuthService
-)
+# Key components are available at the package level, but are imported on first
+# access: importing a submodule (app.core.config, a worker, a script) must not
+# build the whole FastAPI application. Run the server with `uvicorn app.main:app`.
+_LAZY_ATTRIBUTES = {
+    'app': 'app.main',
+    'get_current_user': 'app.auth.security',
+    'create_access_token': 'app.auth.security',
+    'get_password_hash': 'app.auth.security',
+    'verify_password': 'app.auth.security',
+    'AuthService': 'app.auth.security',
+}
 
 # Note: Database initialization is now handled in the FastAPI lifespan event
 # This prevents issues with async/await and ensures proper initialization order
 
-__all__ = [
-    'app',
-    'SessionLocal',
-    'engine',
-    'get_current_user',
-    'create_access_token',
-    'get_password_hash',
-    'verify_password',
-    'AuthService',
-    'init_db'
-]
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
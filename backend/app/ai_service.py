@@ -10,6 +10,7 @@ from app.models.db_models import TestCase as DBTestCase, TestStep, TestType, Pri
 from app.schemas.ai import AIAnalysisResult
 from app.llm_chat import LlmChat
 from app.mcp.website_test_generator import website_test_generator
+from app.services.prompt_budget import PromptBuilder, select_log_lines
 
 # Initialize logger
 
@@ -25,7 +26,21 @@ class AIService:
         return LlmChat(
             session_id=str(uuid.uuid4()),
             system_message=system_message
-        ).with_model("openai", os.environ.get("OPENAI_MODEL", "gpt-4o"))
+        ).with_model("openai", self._model())
+
+    def _model(self) -> str:
+        return os.environ.get("OPENAI_MODEL", "gpt-4o")
+
+    def _prompt_builder(self) -> PromptBuilder:
+        """Prompt builder bounded by the token budget of the chat model"""
+        return PromptBuilder(provider="openai", model=self._model())
+
+    def _log_prompt_size(self, name: str, builder: PromptBuilder):
+        if builder.truncated:
+            logger.info(
+                f"{name} prompt fitted to {builder.used_tokens}/{builder.max_tokens} tokens, "
+                f"shortened: {', '.join(builder.truncated)}"
+            )
     
     async def generate_test_cases(self, prompt: str, test_type: TestType, priority: Priority, count: int = 1) -> List[DBTestCase]:
         """Generate test cases using AI"""
@@ -133,21 +148,21 @@ class AIService:
         try:
             chat = self._create_chat_session(system_message)
             
-            debug_prompt = f"""
-            Test Case: {test_case.title}
-            Description: {test_case.description}
-            Test Type: {test_case.test_type}
-            
-            Steps:
-            {json.dumps([step.dict() for step in test_case.steps], indent=2)}
-            
-            Error Message: {error_message}
-            
-            Logs: {logs or "No logs available"}
-            
-            Please analyze this test failure and provide debugging insights.
-            """
-            
+            builder = self._prompt_builder()
+            builder.add(None, (
+                f"Test Case: {test_case.title}\n"
+                f"Description: {test_case.description}\n"
+                f"Test Type: {test_case.test_type}"
+            ), priority=3)
+            builder.add("Error Message", error_message, priority=3)
+            builder.add("Steps", json.dumps([step.dict() for step in test_case.steps], separators=(",", ":")), priority=1)
+            # Logs get half of the budget; the most relevant lines are kept
+            log_excerpt = select_log_lines(logs, builder.max_tokens // 2, builder.provider, builder.model) if logs else ""
+            builder.add("Logs", log_excerpt or "No logs available", priority=2)
+            builder.add(None, "Please analyze this test failure and provide debugging insights.", priority=3)
+            debug_prompt = builder.build()
+            self._log_prompt_size("Debug", builder)
+
             response = await chat.complete_json(debug_prompt)
             
             # Response is already parsed JSON from complete_json
@@ -174,60 +189,20 @@ class AIService:
             )
     
     async def prioritize_test_cases(self, test_cases: List[DBTestCase], context: str) -> List[str]:
-        """Prioritize test cases based on context using AI"""
-        system_message = """You are an expert QA strategist specializing in test prioritization.
-        Analyze the given context and test cases to determine optimal execution order.
-        
-        Your response must be a valid JSON array containing test case IDs in priority order:
-        ["test_case_id_1", "test_case_id_2", "test_case_id_3"]
-        
-        Consider factors like:
-        - Risk assessment
-        - Impact of potential failures
-        - Dependencies between tests
-        - Context-specific requirements
         """
-        
+        Order test cases failure-first from their execution history.
+        Deterministic and without an LLM call (see app.services.prioritization); the context is not used.
+        """
+        from app.db.session import get_session_factory
+        from app.services.prioritization import prioritize
+
         try:
-            chat = self._create_chat_session(system_message)
-            
-            # Prepare test case summaries
-            test_summaries = []
-            for tc in test_cases:
-                test_summaries.append({
-                    "id": tc.id,
-                    "title": tc.title,
-                    "description": tc.description,
-                    "type": tc.test_type,
-                    "priority": tc.priority,
-                    "tags": tc.tags
-                })
-            
-            prioritization_prompt = f"""
-            Context: {context}
-            
-            Test Cases to Prioritize:
-            {json.dumps(test_summaries, indent=2)}
-            
-            Please analyze these test cases and return them in priority order based on the given context.
-            Return only the test case IDs in the optimal execution order.
-            """
-            
-            response = await chat.complete_json(prioritization_prompt)
-            
-            # Response is already parsed JSON from complete_json
-            if isinstance(response, list):
-                prioritized_ids = [str(item) for item in response]
-            elif isinstance(response, dict):
-                prioritized_ids = response.get("prioritized_ids", [])
-            else:
-                prioritized_ids = []
-            
-            return prioritized_ids
-            
+            async with get_session_factory()() as db:
+                ranking = await prioritize(db, [str(tc.id) for tc in test_cases])
+            return [item.test_case_id for item in ranking]
         except Exception as e:
             logger.error(f"Error prioritizing test cases: {str(e)}")
-            # Return original order if AI fails
+            # Keep the original order if the history cannot be read
             return [str(tc.id) for tc in test_cases]
     
     async def generate_test_insights(self, executions: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -254,17 +229,18 @@ class AIService:
         try:
             chat = self._create_chat_session(system_message)
             
-            insights_prompt = f"""
-            Test Execution Data:
-            {json.dumps(executions, indent=2)}
-            
-            Please analyze this test execution data and provide insights about:
-            - Test performance trends
-            - Common failure patterns
-            - Areas needing attention
-            - Recommendations for improvement
-            """
-            
+            builder = self._prompt_builder()
+            builder.add("Test Execution Data", json.dumps(executions, separators=(",", ":"), default=str), priority=1)
+            builder.add(None, (
+                "Please analyze this test execution data and provide insights about:\n"
+                "- Test performance trends\n"
+                "- Common failure patterns\n"
+                "- Areas needing attention\n"
+                "- Recommendations for improvement"
+            ), priority=3)
+            insights_prompt = builder.build()
+            self._log_prompt_size("Insights", builder)
+
             response = await chat.complete_json(insights_prompt)
             
             # Response is already parsed JSON from complete_json
@@ -294,20 +270,18 @@ class AIService:
         try:
             chat = self._create_chat_session(system_message)
             
-            improvement_prompt = f"""
-            Test Case: {test_case.title}
-            Description: {test_case.description}
-            Type: {test_case.test_type}
-            
-            Steps:
-            {json.dumps([step.dict() for step in test_case.steps], indent=2)}
-            
-            Execution History:
-            {json.dumps(execution_history, indent=2)}
-            
-            Please suggest specific improvements for this test case based on its execution history.
-            """
-            
+            builder = self._prompt_builder()
+            builder.add(None, (
+                f"Test Case: {test_case.title}\n"
+                f"Description: {test_case.description}\n"
+                f"Type: {test_case.test_type}"
+            ), priority=3)
+            builder.add("Steps", json.dumps([step.dict() for step in test_case.steps], separators=(",", ":")), priority=2)
+            builder.add("Execution History", json.dumps(execution_history, separators=(",", ":"), default=str), priority=1)
+            builder.add(None, "Please suggest specific improvements for this test case based on its execution history.", priority=3)
+            improvement_prompt = builder.build()
+            self._log_prompt_size("Improvement", builder)
+
             response = await chat.complete_json(improvement_prompt)
             
             # Response is already parsed JSON from complete_json
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone
@@ -10,15 +11,18 @@ from app.schemas.ai import (
     AITestGenerationRequest,
     AIDebugRequest,
     AIPrioritizationRequest,
+    AIPrioritizationResult,
     AIAnalysisResult,
     AIAnalysisStatus
 )
 from app.core.security import get_current_user
+from app.services.prioritization import estimated_makespan, prioritize
+from app.core.tracing import TracedRoute
 
 # TODO: Implement actual AI service integration
 # from app.core.ai import generate_test_cases, debug_test_case, prioritize_test_cases
 
-router = APIRouter(prefix="/ai", tags=["ai"])
+router = APIRouter(prefix="/ai", tags=["ai"], route_class=TracedRoute)
 
 @router.post("/generate-tests", response_model=AIAnalysisResult)
 async def ai_generate_tests(
@@ -119,42 +123,42 @@ async def ai_debug_test(
         }
     }
 
-@router.post("/prioritize", response_model=AIAnalysisResult)
+@router.post("/prioritize", response_model=AIPrioritizationResult)
 async def ai_prioritize_tests(
     request: AIPrioritizationRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Prioritize test cases using AI
+    Order test cases so likely failures run first.
+    Deterministic: based on the execution history of the cases (see app.services.prioritization).
+    No LLM call is made.
     """
-    # Return mock response
-    analysis_id = str(uuid.uuid4())
-    return {
-        "id": analysis_id,
-        "status": AIAnalysisStatus.COMPLETED,
-        "created_at": datetime.now(timezone.utc),
-        "result": {
-            "prioritized_tests": [
-                {
-                    "test_case_id": "sample-test-case-1",
-                    "priority": 1,
-                    "reason": "This test case is prioritized because it covers a critical functionality."
-                },
-                {
-                    "test_case_id": "sample-test-case-2",
-                    "priority": 2,
-                    "reason": "This test case is prioritized because it covers a high-risk functionality."
-                },
-                {
-                    "test_case_id": "sample-test-case-3",
-                    "priority": 3,
-                    "reason": "This test case is prioritized because it covers a medium-risk functionality."
-                }
-            ]
-        }
-    }
+    ranking = await prioritize(db, request.test_case_ids, request.changed_areas, request.parallelism)
+    if not ranking:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="None of the test cases were found"
+        )
+
+    with_history = sum(1 for item in ranking if item.runs)
+    estimated = estimated_makespan(ranking, request.parallelism)
+    tiers = [sum(1 for item in ranking if item.tier == tier) for tier in range(3)]
+    if request.parallelism > 1:
+        packing = f"longest first within each group for {request.parallelism} workers"
+    else:
+        packing = "cheapest likely failures first"
+    reasoning = (
+        f"{tiers[0]} likely failures, {tiers[1]} at risk and {tiers[2]} stable test cases, "
+        f"ranked by recent failures, flakiness, changed areas and priority; {packing}"
+    )
+    return AIPrioritizationResult(
+        prioritized_test_case_ids=[item.test_case_id for item in ranking],
+        prioritization_reasoning=reasoning,
+        confidence_score=round(with_history / len(ranking), 3),
+        ranking=[item.to_dict() for item in ranking],
+        estimated_duration=round(estimated, 1)
+    )
 
 @router.get("/analysis/{analysis_id}", response_model=AIAnalysisResult)
 async def get_analysis_result(
@@ -1,95 +1,128 @@
+import asyncio
 import os
-import shutil
 import uuid
 import mimetypes
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status, UploadFile, File, Form
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
 
 # Import from app modules
 from app import schemas
 from app.models import db_models as models
 from app.db.session import get_db
 from app.auth.security import get_current_user
-from app.core.config import settings
+from app.services.attachment_store import UploadTooLarge, attachment_store
+from app.services.thumbnails import thumbnail_cache
+from app.core.tracing import TracedRoute
 
 router = APIRouter(
     prefix="/attachments",
     tags=["attachments"],
     responses={404: {"description": "Not found"}},
+    route_class=TracedRoute,
 )
 
-def get_upload_dir() -> str:
-    """Get the upload directory, create if it doesn't exist"""
-    upload_dir = os.path.join(settings.BASE_DIR, "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
-    return upload_dir
+# A content-addressed file never changes under its attachment id
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+ENTITY_MODELS = {
+    "test_case": models.TestCase,
+    "test_execution": models.TestExecution,
+    "test_plan": models.TestPlan,
+}
+
+async def _get_entity(db: AsyncSession, entity_type: str, entity_id: str):
+    """Validate the entity type and return the entity, raising 400/404"""
+    model = ENTITY_MODELS.get(entity_type)
+    if model is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid entity_type. Must be one of: test_case, test_execution, test_plan"
+        )
+    
+    result = await db.execute(select(model).where(model.id == entity_id))
+    entity = result.scalars().first()
+    if not entity:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{entity_type.replace('_', ' ').title()} not found"
+        )
+    return entity
+
+async def _get_attachment(db: AsyncSession, attachment_id: str) -> models.Attachment:
+    result = await db.execute(
+        select(models.Attachment).where(models.Attachment.id == attachment_id)
+    )
+    attachment = result.scalars().first()
+    
+    if not attachment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment not found"
+        )
+    return attachment
+
+def _ensure_local_file(path: Optional[str]):
+    if not path or not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found on server"
+        )
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """Whether If-None-Match matches the ETag (weak comparison, as RFC 9110 requires)"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
 
 @router.post("/upload", response_model=schemas.Attachment, status_code=status.HTTP_201_CREATED)
 async def upload_attachment(
+    background_tasks: BackgroundTasks,
     entity_type: str = Form(...),
     entity_id: str = Form(...),
     description: Optional[str] = Form(None),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Upload a file attachment
     """
-    # Validate entity type
-    if entity_type not in ["test_case", "test_execution", "test_plan"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid entity_type. Must be one of: test_case, test_execution, test_plan"
-        )
+    await _get_entity(db, entity_type, entity_id)
     
-    # Check if entity exists and user has access
-    if entity_type == "test_case":
-        entity = db.query(models.TestCase).filter(models.TestCase.id == entity_id).first()
-    elif entity_type == "test_execution":
-        entity = db.query(models.TestExecution).filter(models.TestExecution.id == entity_id).first()
-    elif entity_type == "test_plan":
-        entity = db.query(models.TestPlan).filter(models.TestPlan.id == entity_id).first()
-    
-    if not entity:
+    # Stream the file into the content-addressed store; identical files share one blob.
+    # The blob's reference is committed together with the attachment row
+    try:
+        blob = await attachment_store.save(db, file)
+    except UploadTooLarge as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"{entity_type.replace('_', ' ').title()} not found"
+            status_code=413,
+            detail=str(e)
         )
-    
-    # Generate a unique filename
-    file_ext = os.path.splitext(file.filename)[1]
-    file_id = str(uuid.uuid4())
-    file_name = f"{file_id}{file_ext}"
-    
-    # Create upload directory if it doesn't exist
-    upload_dir = get_upload_dir()
-    file_path = os.path.join(upload_dir, file_name)
-    
-    # Save file
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error saving file: {str(e)}"
         )
     
-    # Get file info
-    file_size = os.path.getsize(file_path)
     file_type = mimetypes.guess_type(file.filename)[0] or "application/octet-stream"
     
     # Create attachment record
     db_attachment = models.Attachment(
-        id=file_id,
+        id=str(uuid.uuid4()),
         file_name=file.filename,
-        file_path=file_path,
-        file_size=file_size,
+        file_path=blob.key,
+        file_size=blob.size,
         file_type=file_type,
+        content_hash=blob.content_hash,
         entity_type=entity_type,
         entity_id=entity_id,
         uploaded_by=current_user["id"],
@@ -98,97 +131,141 @@ async def upload_attachment(
     )
     
     db.add(db_attachment)
-    db.commit()
-    db.refresh(db_attachment)
+    try:
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await attachment_store.remove_unreferenced(db, blob.content_hash)
+        raise
+    
+    # Render gallery previews after the response is sent
+    if not blob.deduplicated and thumbnail_cache.supports(file_type):
+        background_tasks.add_task(attachment_store.render_thumbnails, blob.content_hash)
     
-    return db_attachment
+    result = await db.execute(
+        select(models.Attachment)
+        .options(selectinload(models.Attachment.uploader))
+        .where(models.Attachment.id == db_attachment.id)
+    )
+    return result.scalars().first()
 
-@router.get("/{entity_type}/{entity_id}", response_model=List[schemas.Attachment])
-async def list_attachments(
-    entity_type: str,
-    entity_id: str,
-    db: Session = Depends(get_db),
+@router.get("/download/{attachment_id}")
+async def download_attachment(
+    attachment_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    List all attachments for an entity
-    """
-    # Validate entity type
-    if entity_type not in ["test_case", "test_execution", "test_plan"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid entity_type. Must be one of: test_case, test_execution, test_plan"
-        )
-    
-    # Check if user has access to the entity
-    if entity_type == "test_case":
-        entity = db.query(models.TestCase).filter(models.TestCase.id == entity_id).first()
-    elif entity_type == "test_execution":
-        entity = db.query(models.TestExecution).filter(models.TestExecution.id == entity_id).first()
-    elif entity_type == "test_plan":
-        entity = db.query(models.TestPlan).filter(models.TestPlan.id == entity_id).first()
+    Download an attachment.
     
-    if not entity:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"{entity_type.replace('_', ' ').title()} not found"
-        )
+    With object storage the client is redirected to a presigned URL, so the
+    file bytes never pass through the API. Files served from local storage
+    get a strong ETag from their content hash and a 304 when If-None-Match
+    matches. Range and If-Range requests are served as partial content, so
+    large logs can be paged.
+    """
+    attachment = await _get_attachment(db, attachment_id)
     
-    # Get attachments
-    attachments = db.query(models.Attachment).filter(
-        models.Attachment.entity_type == entity_type,
-        models.Attachment.entity_id == entity_id
-    ).all()
+    headers = {}
+    path = attachment.file_path
+    if attachment.content_hash:
+        url = attachment_store.presigned_url(attachment.content_hash, attachment.file_name, attachment.file_type)
+        if url:
+            return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+        etag = f'"{attachment.content_hash}"'
+        headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        if _not_modified(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        path = attachment_store.local_path(attachment.content_hash)
+    _ensure_local_file(path)
     
-    return attachments
+    return FileResponse(
+        path=path,
+        filename=attachment.file_name,
+        media_type=attachment.file_type,
+        headers=headers
+    )
 
-@router.get("/download/{attachment_id}")
-async def download_attachment(
+@router.get("/download/{attachment_id}/thumbnail")
+async def download_attachment_thumbnail(
     attachment_id: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    size: Optional[int] = Query(None, ge=1, description="Longest edge in pixels; rounded up to a cached size"),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Download an attachment
+    Download a cached WebP preview of an image attachment
     """
-    attachment = db.query(models.Attachment).filter(
-        models.Attachment.id == attachment_id
-    ).first()
-    
-    if not attachment:
+    attachment = await _get_attachment(db, attachment_id)
+    if not thumbnail_cache.supports(attachment.file_type):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Attachment not found"
+            detail="No preview available for this attachment"
         )
     
-    # Check if file exists
-    if not os.path.exists(attachment.file_path):
+    size = thumbnail_cache.fit_size(size)
+    # Attachments stored before content addressing are cached under their id
+    key = attachment.content_hash or f"legacy-{attachment.id}"
+    etag = f'"{key}-{size}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if attachment.content_hash:
+        path = await attachment_store.thumbnail(attachment.content_hash, size)
+    else:
+        _ensure_local_file(attachment.file_path)
+        path = await asyncio.to_thread(thumbnail_cache.get, key, attachment.file_path, size)
+    if path is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="File not found on server"
+            detail="No preview available for this attachment"
         )
+    return FileResponse(path=path, media_type="image/webp", headers=headers)
+
+@router.get("/{entity_type}/{entity_id}", response_model=List[schemas.Attachment])
+async def list_attachments(
+    entity_type: str,
+    entity_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    List all attachments for an entity
+    """
+    await _get_entity(db, entity_type, entity_id)
     
-    # Return file as a streaming response
-    from fastapi.responses import FileResponse
-    return FileResponse(
-        path=attachment.file_path,
-        filename=attachment.file_name,
-        media_type=attachment.file_type
+    # Get attachments
+    result = await db.execute(
+        select(models.Attachment)
+        .options(selectinload(models.Attachment.uploader))
+        .where(
+            models.Attachment.entity_type == entity_type,
+            models.Attachment.entity_id == entity_id
+        )
     )
+    attachments = result.scalars().all()
+    
+    return attachments
 
 @router.delete("/{attachment_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_attachment(
     attachment_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Delete an attachment
     """
-    attachment = db.query(models.Attachment).filter(
-        models.Attachment.id == attachment_id,
-        models.Attachment.uploaded_by == current_user["id"]  # Only allow uploader to delete
-    ).first()
+    result = await db.execute(
+        select(models.Attachment).where(
+            models.Attachment.id == attachment_id,
+            models.Attachment.uploaded_by == current_user["id"]  # Only allow uploader to delete
+        )
+    )
+    attachment = result.scalars().first()
     
     if not attachment:
         raise HTTPException(
@@ -196,16 +273,22 @@ async def delete_attachment(
             detail="Attachment not found or you don't have permission to delete it"
         )
     
-    # Delete file
-    try:
-        if os.path.exists(attachment.file_path):
-            os.remove(attachment.file_path)
-    except Exception as e:
-        # Log error but continue with DB deletion
-        print(f"Error deleting file: {str(e)}")
+    # Delete attachment record, dropping its reference to the blob in the same transaction
+    await db.delete(attachment)
+    if attachment.content_hash:
+        await attachment_store.release(db, attachment.content_hash)
+    await db.commit()
     
-    # Delete attachment record
-    db.delete(attachment)
-    db.commit()
+    # Delete the file once no other attachment shares it
+    if attachment.content_hash:
+        await attachment_store.remove_unreferenced(db, attachment.content_hash)
+    else:
+        try:
+            if os.path.exists(attachment.file_path):
+                os.remove(attachment.file_path)
+            thumbnail_cache.remove(f"legacy-{attachment.id}")
+        except Exception as e:
+            # The record is gone either way
+            print(f"Error deleting file: {str(e)}")
     
     return None
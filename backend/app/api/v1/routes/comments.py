@@ -10,8 +10,9 @@ from app.models.db_models import TestCase as DBTestCase
 from app.models.db_models import User
 from app.schemas.comment import CommentCreate, CommentInDB
 from app.core.security import get_current_user
+from app.core.tracing import TracedRoute
 
-router = APIRouter(prefix="/comments", tags=["comments"])
+router = APIRouter(prefix="/comments", tags=["comments"], route_class=TracedRoute)
 
 @router.post("/", response_model=CommentInDB, status_code=status.HTTP_201_CREATED)
 def create_comment(
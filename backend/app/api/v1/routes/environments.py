@@ -10,11 +10,13 @@ from app import schemas
 from app.models import db_models as models
 from app.db.session import get_db
 from app.auth.security import get_current_user
+from app.core.tracing import TracedRoute
 
 router = APIRouter(
     prefix="/environments",
     tags=["environments"],
     responses={404: {"description": "Not found"}},
+    route_class=TracedRoute,
 )
 
 @router.post("/", response_model=schemas.Environment, status_code=status.HTTP_201_CREATED)
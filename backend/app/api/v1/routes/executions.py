@@ -1,160 +1,258 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from typing import List, Optional
 import uuid
 from datetime import datetime
 
-from app.db.session import get_db
-from app.models.db_models import TestExecution, ExecutionStatus
+from app.db import get_db
+from app.models.db_models import TestExecution, TestExecutionRequest, ExecutionStatus
 from app.models.db_models import TestCase as DBTestCase
-from app.models.db_models import User
-from app.schemas.execution import TestExecutionCreate, TestExecutionInDB
-from app.core.security import get_current_user
+from app.schemas.execution import TestExecutionCreate, TestExecutionInDB, TestExecutionRequestResult
+from app.auth.security import get_current_user
+from app.services.event_pipeline import DomainEvent, event_actor, event_pipeline
+from app.core.tracing import TracedRoute
+
+router = APIRouter(prefix="/executions", tags=["executions"], route_class=TracedRoute)
+
+# Statuses that end an execution
+FINISHED_STATUSES = (ExecutionStatus.COMPLETED, ExecutionStatus.FAILED, ExecutionStatus.CANCELLED)
+
+
+def _publish_execution_event(action: str, execution: TestExecution, test_case: DBTestCase, current_user: dict):
+    user_id, user_name = event_actor(current_user)
+    event_pipeline.publish(DomainEvent(
+        action=action,
+        target_type="test_execution",
+        target_id=execution.id,
+        target_name=test_case.title,
+        user_id=user_id,
+        user_name=user_name,
+        project_id=test_case.project_id,
+        details={
+            "test_case_id": execution.test_case_id,
+            "status": execution.status.value if execution.status else None,
+            "started_at": execution.started_at.isoformat() if execution.started_at else None,
+            "completed_at": execution.completed_at.isoformat() if execution.completed_at else None,
+            "duration": execution.duration
+        }
+    ))
+
+
+async def _get_owned_test_case(db: AsyncSession, test_case_id: str, user_id: Optional[str]) -> Optional[DBTestCase]:
+    result = await db.execute(
+        select(DBTestCase).where(
+            (DBTestCase.id == test_case_id) &
+            (DBTestCase.created_by == user_id)
+        )
+    )
+    return result.scalars().first()
 
-router = APIRouter(prefix="/executions", tags=["executions"])
 
 @router.post("/", response_model=TestExecutionInDB, status_code=status.HTTP_201_CREATED)
-def create_test_execution(
+async def create_test_execution(
     execution_in: TestExecutionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Create a new test execution record
     """
+    user_id, _ = event_actor(current_user)
     # Verify test case exists and user has access
-    test_case = db.query(TestCase).filter(
-        (TestCase.id == execution_in.test_case_id) &
-        (TestCase.created_by == current_user.id)
-    ).first()
-    
+    test_case = await _get_owned_test_case(db, execution_in.test_case_id, user_id)
+
     if not test_case:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Test case not found or access denied"
         )
-    
+
     execution = TestExecution(
         id=str(uuid.uuid4()),
         test_case_id=execution_in.test_case_id,
+        environment_id=execution_in.environment_id,
         status=ExecutionStatus.PENDING,
-        started_by=current_user.id,
+        executed_by=user_id,
         started_at=datetime.utcnow(),
         created_at=datetime.utcnow(),
         updated_at=datetime.utcnow()
     )
-    
-    # Update test case status
-    test_case.status = ExecutionStatus.IN_PROGRESS
-    test_case.updated_at = datetime.utcnow()
-    
+
     db.add(execution)
-    db.add(test_case)
-    db.commit()
-    db.refresh(execution)
-    
+    await db.commit()
+    await db.refresh(execution)
+
+    _publish_execution_event("create", execution, test_case, current_user)
+
     return execution
 
 @router.get("/{execution_id}", response_model=TestExecutionInDB)
-def get_test_execution(
+async def get_test_execution(
     execution_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Get a test execution by ID
     """
-    execution = db.query(TestExecution).join(
-        TestCase,
-        TestExecution.test_case_id == TestCase.id
-    ).filter(
-        (TestExecution.id == execution_id) &
-        (TestCase.created_by == current_user.id)
-    ).first()
-    
+    user_id, _ = event_actor(current_user)
+    result = await db.execute(
+        select(TestExecution).join(
+            DBTestCase,
+            TestExecution.test_case_id == DBTestCase.id
+        ).where(
+            (TestExecution.id == execution_id) &
+            (DBTestCase.created_by == user_id)
+        )
+    )
+    execution = result.scalars().first()
+
     if not execution:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Test execution not found or access denied"
         )
-    
+
     return execution
 
+@router.get("/{execution_id}/requests", response_model=List[TestExecutionRequestResult])
+async def get_execution_requests(
+    execution_id: str,
+    failed_only: bool = False,
+    limit: int = 500,
+    skip: int = 0,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get the per-request results (timings, status codes, assertions) of an automated run
+    """
+    user_id, _ = event_actor(current_user)
+    query = select(TestExecutionRequest).join(
+        DBTestCase,
+        TestExecutionRequest.test_case_id == DBTestCase.id
+    ).where(
+        (TestExecutionRequest.execution_id == execution_id) &
+        (DBTestCase.created_by == user_id)
+    )
+    if failed_only:
+        query = query.where(
+            (TestExecutionRequest.assertions_failed > 0) | TestExecutionRequest.error.is_not(None)
+        )
+    result = await db.execute(
+        query.order_by(TestExecutionRequest.position).offset(skip).limit(limit)
+    )
+
+    return result.scalars().all()
+
 @router.get("/test-case/{test_case_id}", response_model=List[TestExecutionInDB])
-def get_test_case_executions(
+async def get_test_case_executions(
     test_case_id: str,
     limit: int = 100,
     skip: int = 0,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Get all executions for a test case
     """
+    user_id, _ = event_actor(current_user)
     # Verify test case exists and user has access
-    test_case = db.query(TestCase).filter(
-        (TestCase.id == test_case_id) &
-        (TestCase.created_by == current_user.id)
-    ).first()
-    
+    test_case = await _get_owned_test_case(db, test_case_id, user_id)
+
     if not test_case:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Test case not found or access denied"
         )
-    
-    executions = db.query(TestExecution).filter(
-        TestExecution.test_case_id == test_case_id
-    ).order_by(
-        TestExecution.started_at.desc()
-    ).offset(skip).limit(limit).all()
-    
-    return executions
-
-@router.put("/{execution_id}/status/{status}", response_model=TestExecutionInDB)
-def update_execution_status(
+
+    result = await db.execute(
+        select(TestExecution).where(
+            TestExecution.test_case_id == test_case_id
+        ).order_by(
+            TestExecution.started_at.desc()
+        ).offset(skip).limit(limit)
+    )
+
+    return result.scalars().all()
+
+@router.put("/{execution_id}/status/{execution_status}", response_model=TestExecutionInDB)
+async def update_execution_status(
     execution_id: str,
-    status: ExecutionStatus,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    execution_status: ExecutionStatus,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Update the status of a test execution
     """
-    execution = db.query(TestExecution).join(
-        TestCase,
-        TestExecution.test_case_id == TestCase.id
-    ).filter(
-        (TestExecution.id == execution_id) &
-        (TestCase.created_by == current_user.id)
-    ).first()
-    
-    if not execution:
+    user_id, _ = event_actor(current_user)
+    result = await db.execute(
+        select(TestExecution, DBTestCase).join(
+            DBTestCase,
+            TestExecution.test_case_id == DBTestCase.id
+        ).where(
+            (TestExecution.id == execution_id) &
+            (DBTestCase.created_by == user_id)
+        )
+    )
+    row = result.first()
+
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Test execution not found or access denied"
         )
-    
+    execution, test_case = row
+
     # Update execution status
-    execution.status = status
+    execution.status = execution_status
     execution.updated_at = datetime.utcnow()
-    
-    # If execution is completed, update the test case status
-    if status in [ExecutionStatus.PASSED, ExecutionStatus.FAILED, ExecutionStatus.BLOCKED]:
+
+    # Record completion time and duration once the execution has finished
+    if execution_status in FINISHED_STATUSES:
         execution.completed_at = datetime.utcnow()
-        
-        # Update test case status
-        test_case = db.query(TestCase).filter(
-            TestCase.id == execution.test_case_id
-        ).first()
-        
-        if test_case:
-            test_case.status = status
-            test_case.updated_at = datetime.utcnow()
-            db.add(test_case)
-    
+        if execution.started_at:
+            execution.duration = int((execution.completed_at - execution.started_at).total_seconds())
+
     db.add(execution)
-    db.commit()
-    db.refresh(execution)
-    
+    await db.commit()
+    await db.refresh(execution)
+
+    _publish_execution_event("status_change", execution, test_case, current_user)
+
     return execution
+
+@router.get("/test-case/{test_case_id}/requests", response_model=List[TestExecutionRequestResult])
+async def get_test_case_request_history(
+    test_case_id: str,
+    name: Optional[str] = None,
+    limit: int = 500,
+    skip: int = 0,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get request results of a test case across its runs, newest first, optionally for one request name
+    """
+    user_id, _ = event_actor(current_user)
+    test_case = await _get_owned_test_case(db, test_case_id, user_id)
+
+    if not test_case:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test case not found or access denied"
+        )
+
+    query = select(TestExecutionRequest).where(TestExecutionRequest.test_case_id == test_case_id)
+    if name:
+        query = query.where(TestExecutionRequest.name == name)
+    result = await db.execute(
+        query.order_by(
+            TestExecutionRequest.created_at.desc(),
+            TestExecutionRequest.position
+        ).offset(skip).limit(limit)
+    )
+
+    return result.scalars().all()
@@ -7,8 +7,9 @@ from app.models.db_models import Project
 from app.schemas.project import ProjectCreate, ProjectUpdate, ProjectInDB
 from app.core.security import get_current_user
 from app.models.db_models import User
+from app.core.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 @router.get("/", response_model=List[ProjectInDB])
 def read_projects(
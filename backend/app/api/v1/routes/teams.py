@@ -7,6 +7,7 @@ import uuid
 from app.db import get_db
 from app.auth.security import get_current_user
 from app.schemas.websocket import Team, TeamCreate, TeamMember, TeamMemberCreate, TeamDetail
+from app.core.tracing import TracedRoute
 
 # Create a simple namespace for schemas to maintain compatibility
 class SchemaNamespace:
@@ -23,6 +24,7 @@ router = APIRouter(
     prefix="/teams",
     tags=["teams"],
     responses={404: {"description": "Not found"}},
+    route_class=TracedRoute,
 )
 
 @router.post("/", response_model=schemas.Team, status_code=status.HTTP_201_CREATED)
@@ -1,10 +1,15 @@
+import asyncio
+import os
+import tempfile
 import traceback
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List, Optional
 from datetime import datetime
+from starlette.background import BackgroundTask
 import uuid
 
 from app.db import get_db
@@ -14,16 +19,39 @@ from app.schemas.test_case import (
     TestType, Status, Priority, EnvironmentType, AutomationStatus,
     TestStep, TestStepCreate,
     TestCaseCreate, TestCaseUpdate, TestCaseResponse,
-    URLGenerationRequest, URLGenerationResponse
+    URLGenerationRequest, URLGenerationResponse,
+    URLBatchGenerationRequest, URLBatchJobResponse,
+    ExportJobRequest, ExportJobResponse
 )
 from app.mcp.website_test_generator import website_test_generator
+from app.mcp.batch_generator import batch_test_generator
+from app.services.event_pipeline import DomainEvent, event_actor, event_pipeline
+from app.services.export_jobs import ExportJobStatus, export_job_manager, iter_test_case_chunks
+from app.core.tracing import TracedRoute
 
 router = APIRouter(
     prefix="",  # Prefix is handled in main.py
     tags=["test-cases"],
     responses={404: {"description": "Not found"}},
+    route_class=TracedRoute,
 )
 
+def _publish_test_case_event(
+    action: str, test_case_id: str, title: str, project_id: str, current_user: dict, details: dict = None
+):
+    """Queue an activity log entry and real-time update for a test case change"""
+    user_id, user_name = event_actor(current_user)
+    event_pipeline.publish(DomainEvent(
+        action=action,
+        target_type="test_case",
+        target_id=test_case_id,
+        target_name=title,
+        user_id=user_id,
+        user_name=user_name,
+        project_id=project_id,
+        details=details or {}
+    ))
+
 @router.post("/", response_model=TestCaseResponse, status_code=status.HTTP_201_CREATED)
 async def create_test_case(
     test_case: TestCaseCreate,
@@ -69,9 +97,7 @@ async def create_test_case(
     await db.commit()
     await db.refresh(db_test_case)
     
-    # TODO: Add activity log
-    # TODO: Broadcast WebSocket update
-    
+    _publish_test_case_event("create", db_test_case.id, db_test_case.title, db_test_case.project_id, current_user)
     
     return db_test_case
 
@@ -192,6 +218,11 @@ async def update_test_case(
     await db.commit()
     await db.refresh(db_test_case)
     
+    _publish_test_case_event(
+        "update", db_test_case.id, db_test_case.title, db_test_case.project_id, current_user,
+        details={"fields": sorted(update_data)}
+    )
+    
     return db_test_case
 
 @router.delete("/{test_case_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -214,11 +245,11 @@ async def delete_test_case(
             detail=f"Test case with id {test_case_id} not found"
         )
     
+    title, project_id = db_test_case.title, db_test_case.project_id
     await db.delete(db_test_case)
     await db.commit()
     
-    # TODO: Add activity log
-    # TODO: Broadcast WebSocket update
+    _publish_test_case_event("delete", test_case_id, title, project_id, current_user)
     
     return None
 
@@ -233,7 +264,7 @@ async def generate_test_cases_from_url(
     """
     try:
         # Import AI Generator user functions
-        from app.db.session import ensure_ai_generator_user_exists, get_ai_generator_user_id
+        from app.db.crud import ensure_ai_generator_user_exists
         
         # Ensure AI Generator system user exists (best practice for AI-generated content)
         ai_generator_user_id = await ensure_ai_generator_user_exists()
@@ -353,4 +384,214 @@ async def generate_test_cases_from_url(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate test cases from URL: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/generate-from-urls", response_model=URLBatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def generate_test_cases_from_urls(
+    request: URLBatchGenerationRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Start a background job generating test cases for many URLs or a whole sitemap.
+    Progress is pushed over WebSocket as `url_batch_progress` messages.
+    """
+    result = await db.execute(
+        select(models.Project).where(models.Project.id == request.project_id)
+    )
+    if not result.scalars().first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Project with id {request.project_id} not found"
+        )
+    
+    invalid = [url for url in request.urls if not url.startswith(('http://', 'https://'))]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid URL format: {', '.join(invalid[:5])}. URLs must start with http:// or https://"
+        )
+    
+    try:
+        urls = await batch_test_generator.resolve_urls(request.urls, request.sitemap_url)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if not urls:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No URLs found to analyze"
+        )
+    
+    job = batch_test_generator.start_job(
+        project_id=request.project_id,
+        requested_by=current_user.get("id") if isinstance(current_user, dict) else getattr(current_user, "id", None),
+        urls=urls,
+        test_count=request.test_count,
+        use_ai=request.use_ai
+    )
+    return URLBatchJobResponse(**job.progress())
+
+@router.get("/generate-from-urls/{job_id}", response_model=URLBatchJobResponse)
+async def get_url_generation_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get the status of a batch URL generation job
+    """
+    job = batch_test_generator.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Generation job with id {job_id} not found"
+        )
+    return URLBatchJobResponse(**job.progress())
+
+@router.get("/test-cases/export/{export_format}")
+async def export_test_cases(
+    export_format: str,
+    project_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Export a project's test cases as CSV, Excel or PDF.
+    
+    CSV is streamed while it is read from the database and Excel is written
+    in a single pass to a temporary file, so memory stays flat for large projects.
+    """
+    from app.services.export_service import ExcelStreamWriter, TestCaseExportService
+    
+    if export_format not in ("csv", "excel", "xlsx", "pdf"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format: {export_format}"
+        )
+    
+    result = await db.execute(
+        select(models.Project).where(models.Project.id == project_id)
+    )
+    db_project = result.scalars().first()
+    if not db_project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Project with id {project_id} not found"
+        )
+    
+    extension = "xlsx" if export_format in ("excel", "xlsx") else export_format
+    filename = TestCaseExportService.get_export_filename(db_project.name, extension)
+    
+    if extension == "csv":
+        async def csv_chunks():
+            yield TestCaseExportService.csv_rows([], header=True).encode("utf-8")
+            async for chunk in iter_test_case_chunks(project_id):
+                yield TestCaseExportService.csv_rows(chunk).encode("utf-8")
+        
+        return StreamingResponse(
+            csv_chunks(),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    if extension == "xlsx":
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        try:
+            writer = ExcelStreamWriter()
+            async for chunk in iter_test_case_chunks(project_id):
+                await asyncio.to_thread(writer.add_rows, chunk)
+            await asyncio.to_thread(writer.save, path)
+        except Exception:
+            os.remove(path)
+            raise
+        return FileResponse(
+            path,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            filename=filename,
+            background=BackgroundTask(os.remove, path)
+        )
+    
+    # PDF layout needs the whole document; large projects should use a background export job
+    test_cases = []
+    async for chunk in iter_test_case_chunks(project_id):
+        test_cases.extend(chunk)
+    output = await asyncio.to_thread(TestCaseExportService.export_to_pdf, test_cases, db_project.name)
+    return StreamingResponse(
+        output,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/test-cases/export-jobs", response_model=ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def start_export_job(
+    request: ExportJobRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Export a project's test cases in the background.
+    
+    The file is rendered in a worker process and kept for the project's
+    current data, so exporting unchanged data again completes immediately.
+    Progress is sent over WebSocket as ``export_job_progress`` messages.
+    """
+    result = await db.execute(
+        select(models.Project).where(models.Project.id == request.project_id)
+    )
+    db_project = result.scalars().first()
+    if not db_project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Project with id {request.project_id} not found"
+        )
+    
+    user_id, _ = event_actor(current_user)
+    job = await export_job_manager.start_export(db, db_project, request.export_format, user_id)
+    return ExportJobResponse(**job.progress())
+
+def _get_export_job(job_id: str, current_user: dict):
+    job = export_job_manager.get_job(job_id)
+    if not job or job.requested_by != event_actor(current_user)[0]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Export job with id {job_id} not found"
+        )
+    return job
+
+@router.get("/test-cases/export-jobs/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get the status of a background export job
+    """
+    return ExportJobResponse(**_get_export_job(job_id, current_user).progress())
+
+@router.get("/test-cases/export-jobs/{job_id}/download")
+async def download_export_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Download the file of a completed export job
+    """
+    job = _get_export_job(job_id, current_user)
+    if job.status != ExportJobStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export job is {job.status.value}"
+        )
+    if not os.path.exists(job.file_path):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Export file was replaced by a newer export; start a new export"
+        )
+    
+    media_types = {
+        "csv": "text/csv",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "pdf": "application/pdf"
+    }
+    return FileResponse(job.file_path, media_type=media_types[job.extension], filename=job.filename)
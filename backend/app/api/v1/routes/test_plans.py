@@ -9,13 +9,19 @@ import uuid
 from app.db import get_db
 from app import models
 from app.auth.security import get_current_user
-from app.schemas.test_plan import TestPlanCreate, TestPlanUpdate, TestPlanResponse
+from app.schemas.test_plan import (
+    TestPlanCreate, TestPlanUpdate, TestPlanResponse, TestPlanRunRequest, TestPlanRunResponse
+)
 from app.models.db_models import Status
+from app.services.event_pipeline import event_actor
+from app.services.plan_runner import plan_runner
+from app.core.tracing import TracedRoute
 
 router = APIRouter(
     prefix="",  # Prefix is handled in main.py
     tags=["test-plans"],
     responses={404: {"description": "Not found"}},
+    route_class=TracedRoute,
 )
 
 @router.post("/", response_model=TestPlanResponse, status_code=status.HTTP_201_CREATED)
@@ -246,4 +252,77 @@ async def delete_test_plan(
     await db.delete(db_test_plan)
     await db.commit()
     
-    return None
\ No newline at end of file
+    return None
+
+@router.post("/{test_plan_id}/runs", response_model=TestPlanRunResponse, status_code=status.HTTP_202_ACCEPTED)
+async def run_test_plan(
+    test_plan_id: str,
+    run_in: TestPlanRunRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Run a test plan as one background job.
+    Every test case gets a TestExecution linked to the plan. Automated cases run
+    stage by stage in plan order, concurrently within a stage. Progress is pushed
+    over WebSocket as plan_run_progress messages.
+    """
+    result = await db.execute(
+        select(models.TestPlan).where(models.TestPlan.id == test_plan_id)
+    )
+    test_plan = result.scalars().first()
+
+    if not test_plan:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Test plan with id {test_plan_id} not found"
+        )
+
+    user_id, user_name = event_actor(current_user)
+    try:
+        run = await plan_runner.start_run(
+            db, test_plan, user_id, user_name,
+            parallelism=run_in.parallelism,
+            stop_on_mandatory_failure=run_in.stop_on_mandatory_failure,
+            environment_id=run_in.environment_id,
+            prioritize=run_in.prioritize,
+            changed_areas=run_in.changed_areas
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return TestPlanRunResponse(**run.progress())
+
+def _get_own_run(test_plan_id: str, run_id: str, current_user: dict):
+    run = plan_runner.get_job(run_id)
+    if not run or run.test_plan_id != test_plan_id or run.requested_by != event_actor(current_user)[0]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Test plan run with id {run_id} not found"
+        )
+    return run
+
+@router.get("/{test_plan_id}/runs/{run_id}", response_model=TestPlanRunResponse)
+async def get_test_plan_run(
+    test_plan_id: str,
+    run_id: str,
+    include_cases: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get the status and counts of a plan run, optionally with the state of every case
+    """
+    run = _get_own_run(test_plan_id, run_id, current_user)
+    return TestPlanRunResponse(**run.progress(include_cases=include_cases))
+
+@router.post("/{test_plan_id}/runs/{run_id}/cancel", response_model=TestPlanRunResponse)
+async def cancel_test_plan_run(
+    test_plan_id: str,
+    run_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Cancel a running plan; executions that did not finish are marked cancelled
+    """
+    run = _get_own_run(test_plan_id, run_id, current_user)
+    await plan_runner.cancel_run(run.id)
+    return TestPlanRunResponse(**run.progress())
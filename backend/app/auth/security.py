@@ -14,10 +14,9 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from app.db import get_db
+from app.core.tracing import span
 from app.models import User
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Security configurations
@@ -138,39 +137,31 @@ async def get_current_user(
     )
     
     try:
-        # Log the request for debugging
-        logger.info(f"\n{'='*80}")
-        logger.info(f"Authenticating request to {request.url}")
-        logger.info(f"Token: {token[:20]}...")
-        
         # Decode the JWT token
         try:
-            logger.info("Decoding JWT token...")
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            logger.info(f"Decoded payload: {payload}")
             
             user_id: str = payload.get("sub")
             if not user_id:
                 logger.warning("No user_id (sub) in token payload")
                 raise credentials_exception
-                
-            logger.info(f"Looking up user with ID: {user_id}")
             
             # Get user from database using async query
-            result = await db.execute(
-                select(models.User).where(models.User.id == user_id)
-            )
-            user = result.scalars().first()
+            with span("auth"):
+                result = await db.execute(
+                    select(models.User).where(models.User.id == user_id)
+                )
+                user = result.scalars().first()
             
             if not user:
                 logger.warning(f"User not found for ID: {user_id}")
                 raise credentials_exception
-                
-            # Log successful authentication
-            logger.info(f"Successfully authenticated user: {user.email} (ID: {user.id})")
+            
+            # Runs on every request: debug level, sampled by LOG_SAMPLING
+            logger.debug(f"Authenticated user {user.id} for {request.url.path}")
             
             # Return user info in the expected format
-            user_info = {
+            return {
                 "id": str(user.id),
                 "email": user.email,
                 "full_name": user.full_name,
@@ -179,18 +170,12 @@ async def get_current_user(
                 "updated_at": user.updated_at.isoformat() if user.updated_at else None
             }
             
-            logger.info(f"Returning user info: {user_info}")
-            return user_info
-            
         except JWTError as je:
-            logger.error(f"JWT validation error: {str(je)}")
-            logger.error(f"Token: {token}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.warning(f"JWT validation error: {str(je)}")
             raise credentials_exception
             
     except HTTPException:
         # Re-raise HTTP exceptions
-        logger.error(f"HTTP Exception during authentication: {traceback.format_exc()}")
         raise
         
     except Exception as e:
@@ -301,7 +286,7 @@ class AuthService:
             HTTPException: If validation fails or user creation fails
         """
         logger.info(f"[AUTH_SERVICE] Starting user creation for email: {user_data.get('email')}")
-        logger.debug(f"[AUTH_SERVICE] User data: {user_data}")
+        logger.debug(f"[AUTH_SERVICE] User fields: {sorted(k for k in user_data if k != 'password')}")
         
         try:
             # Validate email and password
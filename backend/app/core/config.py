@@ -27,6 +27,26 @@ class Settings(BaseSettings):
     SERVER_NAME: str = "localhost"
     SERVER_HOST: str = "http://localhost:8001"
     
+    # Startup settings
+    STARTUP_MODE: str = "background"  # background (serve at once, warm up the database behind /health/ready) or blocking
+    DB_WARMUP_TIMEOUT: float = 30.0  # Seconds per warm-up attempt; background mode retries with backoff
+    DB_WARMUP_CONNECTIONS: int = 2  # Connections opened concurrently during warm-up
+    DB_ECHO: bool = False  # Log every SQL statement
+    SEED_TEST_USER: bool = False  # Create the development login test@example.com / test1234 at startup
+    
+    # Logging settings
+    LOG_QUEUE_MODE: str = "thread"  # thread (bounded in-process queue) or process (multiprocessing queue)
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped instead of blocking
+    LOG_FORMAT: str = "text"  # text or json
+    # Fraction of debug/info records kept per logger prefix, e.g. "app.auth.security=0.01"
+    LOG_SAMPLING: str = "app.auth.security=0.01"
+    
+    # Request tracing
+    TRACE_ENABLED: bool = True
+    TRACE_BUFFER_SIZE: int = 500  # Recent requests kept for /_debug/slow-requests
+    TRACE_SLOW_REQUEST_MS: int = 1000  # Requests slower than this are logged
+    TRACE_OTEL_EXPORT: bool = False  # Export traces as OpenTelemetry spans (needs opentelemetry-api)
+    
     # CORS settings - using a default list of allowed origins
     # This is set directly in code to avoid environment parsing issues
     BACKEND_CORS_ORIGINS: List[str] = [
@@ -65,11 +85,83 @@ class Settings(BaseSettings):
     # AI settings
     OPENAI_API_KEY: Optional[str] = None
     
+    # Website crawling settings
+    CRAWL_CACHE_DIR: str = "cache/pages"
+    CRAWL_CACHE_TTL: int = 60 * 60  # 1 hour
+    CRAWL_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 256 MB
+    CRAWL_CACHE_MAX_AGE: int = 7 * 24 * 60 * 60  # entries not refetched for a week are dropped
+    CRAWL_MAX_CONNECTIONS: int = 20
+    
+    # Batch URL test generation settings
+    URL_BATCH_MAX_URLS: int = 200
+    URL_BATCH_FETCH_CONCURRENCY: int = 8
+    URL_BATCH_LLM_CONCURRENCY: int = 2  # Concurrent LLM calls per provider
+    URL_BATCH_LLM_PAGES_PER_CALL: int = 4
+    URL_BATCH_SIMILARITY_THRESHOLD: float = 0.9
+    
+    # Test case export settings
+    EXPORT_CHUNK_SIZE: int = 500  # Test cases fetched per server-side cursor batch
+    EXPORT_WORKERS: int = 2  # Processes rendering background export jobs
+    
+    # Newman (Postman collection) runs: auto (Docker, else a local newman binary), docker or local
+    NEWMAN_RUNTIME: str = "auto"
+    NEWMAN_MAX_CONCURRENCY: int = 2  # Collections run at the same time per worker
+    NEWMAN_TIMEOUT: int = 300  # Seconds before a run is killed
+    NEWMAN_INSERT_BATCH_SIZE: int = 1000  # Per-request result rows per INSERT
+    NEWMAN_MAX_SHARDS: int = 32
+    NEWMAN_SHARD_CONCURRENCY: Optional[int] = None  # Shards run at the same time per job; defaults to the CPU count
+
+    # Test plan runs
+    PLAN_RUN_CONCURRENCY: int = 8  # Default number of automated cases run at the same time per plan
+    PLAN_RUN_MAX_CONCURRENCY: int = 64
+    PLAN_RUN_JMETER_CONCURRENCY: int = 1  # Load tests running side by side would skew each other's results
+    PLAN_RUN_BATCH_SIZE: int = 1000  # Execution rows per INSERT/UPDATE batch
+    PLAN_RUN_FLUSH_INTERVAL_MS: int = 500  # Status transitions are buffered and written this often
+    PLAN_HTTP_TIMEOUT: float = 30.0  # Seconds per HTTP check
+    PERF_TESTER_URL: str = "http://127.0.0.1:8002"  # ai-perf-tester service that runs JMeter tests
+
+    # History-based test prioritization
+    PRIORITIZE_HISTORY_RUNS: int = 20  # Latest runs per test case taken into account
+    PRIORITIZE_HISTORY_DAYS: int = 90
+    PRIORITIZE_HALF_LIFE_RUNS: float = 5.0  # A failure this many runs ago counts half as much as the latest run
+    PRIORITIZE_DEFAULT_DURATION: int = 60  # Seconds assumed for test cases without a timed run
+
+    # WebSocket settings
+    WS_SEND_QUEUE_SIZE: int = 256  # Outbound messages buffered per connection
+    WS_SLOW_CLIENT_POLICY: str = "disconnect"  # disconnect or drop when the queue is full
+    # Relay broadcasts between workers: auto (redis when REDIS_URL is set), redis, memory or none
+    WS_BACKPLANE: str = "auto"
+    WS_BACKPLANE_CHANNEL: str = "intellitest:websocket"
+    # Execution and dashboard updates are coalesced per room for this long (0 sends immediately)
+    WS_COALESCE_WINDOW_MS: int = 250
+    WS_COALESCE_MAX_BATCH: int = 500  # Flush early once this many events are pending
+    
+    # Domain event pipeline (activity log and real-time updates)
+    EVENT_QUEUE_SIZE: int = 10000  # Events beyond this are dropped instead of blocking requests
+    EVENT_BATCH_SIZE: int = 200
+    EVENT_BATCH_WINDOW_MS: int = 100
+    EVENT_DRAIN_TIMEOUT: float = 10.0  # Seconds shutdown waits for queued events to be written
+    
+    # Redis
+    REDIS_URL: Optional[str] = None
+    
     # File upload settings
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    THUMBNAIL_SIZES: List[int] = [200, 800]  # Longest edge in pixels of cached image previews
     ALLOWED_FILE_TYPES: Union[str, List[str]] = "jpg,jpeg,png,gif,pdf,txt,csv,json"
     
+    # Attachment storage: local (under UPLOAD_DIR) or s3 (any S3-compatible service, e.g. MinIO)
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: Optional[str] = None
+    S3_ENDPOINT_URL: Optional[str] = None  # e.g. http://minio:9000; unset for AWS
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None  # Falls back to the default AWS credential chain
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_PREFIX: str = ""
+    S3_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024
+    S3_PRESIGN_EXPIRES: int = 3600  # Seconds a presigned download URL stays valid
+    
     @field_validator("ALLOWED_FILE_TYPES", mode="before")
     @classmethod
     def parse_allowed_file_types(cls, v: Union[str, List[str]]) -> List[str]:
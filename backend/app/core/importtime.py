@@ -0,0 +1,152 @@
+"""
+Import-time helpers.
+
+``module_available`` checks that an optional dependency is installed without
+importing it. Slow SDKs (boto3, Pillow, redis, the LLM clients) are then
+imported by the code that uses them, so they do not slow down application
+import.
+
+The rest of the module profiles the cold import of a module with
+``python -X importtime`` in a fresh interpreter:
+
+    python -m app.core.importtime app.main --top 25 --budget-ms 2500
+
+It prints the slowest imports by cumulative time and exits with status 1
+when the total exceeds the budget or when application code imported one of
+the ``--forbid`` modules. Deferred modules pulled in by another library
+(e.g. portalocker importing redis for its optional lock) only count towards
+the budget.
+"""
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+# Default budget for `import app.main` on a cold interpreter
+IMPORT_BUDGET_MS = 2500
+# Dependencies that should only be imported when the feature using them runs
+DEFERRED_MODULES = (
+    "pandas", "reportlab", "openpyxl", "openai", "google.generativeai",
+    "boto3", "PIL", "redis", "ijson",
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def module_available(name: str) -> bool:
+    """True if the module can be imported; nothing is executed except parent packages"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+@dataclass
+class ImportProfile:
+    module: str
+    # Cumulative microseconds per imported module, in import order
+    cumulative_us: Dict[str, int] = field(default_factory=dict)
+    self_us: Dict[str, int] = field(default_factory=dict)
+    # Module -> the module whose import triggered it
+    importers: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def total_ms(self) -> float:
+        return self.cumulative_us.get(self.module, 0) / 1000
+
+    def imported(self, name: str) -> bool:
+        """True if the module or one of its submodules was imported"""
+        return any(module == name or module.startswith(f"{name}.") for module in self.cumulative_us)
+
+    def imported_by(self, name: str, package: str = "app") -> bool:
+        """True if code of `package` imported the module or one of its submodules"""
+        for module in self.cumulative_us:
+            if module != name and not module.startswith(f"{name}."):
+                continue
+            importer = self.importers.get(module)
+            # Submodules imported by their own package count as the package
+            while importer is not None and (importer == name or importer.startswith(f"{name}.")):
+                importer = self.importers.get(importer)
+            if importer is not None and (importer == package or importer.startswith(f"{package}.")):
+                return True
+        return False
+
+    def slowest(self, top: int = 20) -> List[tuple]:
+        return sorted(self.cumulative_us.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def parse_importtime(stderr: str, module: str) -> ImportProfile:
+    """Parse the `import time: self [us] | cumulative | name` lines written by -X importtime"""
+    profile = ImportProfile(module)
+    # A module is listed after its own imports, indented two spaces deeper; depth -> finished imports
+    waiting: Dict[int, List[str]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # The header line
+        name = parts[2].strip()
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        for child in waiting.pop(depth + 1, []):
+            profile.importers[child] = name
+        waiting.setdefault(depth, []).append(name)
+        profile.self_us[name] = int(parts[0])
+        profile.cumulative_us[name] = int(parts[1])
+    return profile
+
+
+def profile_imports(module: str = "app.main", python: Optional[str] = None) -> ImportProfile:
+    """
+    Import the module in a fresh interpreter and collect its import times.
+    The interpreter runs in a temporary directory with the backend on its path,
+    so files the import creates (such as the log directory) do not end up in the tree.
+    """
+    path = os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")]))
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [python or sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd, env={**os.environ, "PYTHONPATH": path}, capture_output=True, text=True, timeout=300
+        )
+    profile = parse_importtime(result.stderr, module)
+    if result.returncode != 0:
+        profile.error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed"
+    return profile
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile the cold import time of a module")
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=20, help="Number of slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail when the import takes longer")
+    parser.add_argument("--forbid", nargs="*", default=list(DEFERRED_MODULES),
+                        help="Modules that application code must not import")
+    args = parser.parse_args(argv)
+
+    profile = profile_imports(args.module)
+    if profile.error:
+        print(f"Importing {args.module} failed: {profile.error}")
+        return 2
+
+    print(f"{args.module}: {profile.total_ms:.1f} ms")
+    for name, cumulative in profile.slowest(args.top):
+        print(f"{cumulative / 1000:10.1f} ms  {name}")
+
+    failed = False
+    eager = [name for name in args.forbid if profile.imported_by(name)]
+    if eager:
+        print(f"Imported eagerly: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and profile.total_ms > args.budget_ms:
+        print(f"Over budget: {profile.total_ms:.1f} ms > {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
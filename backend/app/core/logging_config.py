@@ -1,40 +1,173 @@
 """
-Queue-based logging configuration for multiprocess safety.
+Queue-based logging configuration.
 
-This module implements a queue-based logging system that is safe for use with multiple workers.
-Each worker puts log records into a multiprocessing.Queue, and a single log listener process/thread
-writes them to the file, avoiding lock contention entirely.
+Log calls only put records on a queue; a single listener thread formats them
+and writes them to the console and the log file, so file and console I/O never
+run on the event loop.
+
+Two queue modes are supported:
+
+- ``thread`` (default): an in-process ``queue.SimpleQueue`` with a bounded
+  capacity. When the listener falls behind, new records are dropped instead
+  of blocking the caller, and the number of dropped records is reported once
+  the queue has drained.
+- ``process``: a ``multiprocessing.Queue`` shared with child processes, for
+  setups where workers are forked from one parent that owns the listener.
+
+Records can be written as structured JSON lines, and hot-path loggers can be
+sampled so that only one in N of their records below WARNING is kept.
 """
 
 import os
+import json
 import logging
 import logging.handlers
 import multiprocessing
+import queue
 import atexit
 import threading
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Dict, Optional, Union
 from pathlib import Path
 
 # Global variables for the logging queue and listener
-_log_queue: Optional[multiprocessing.Queue] = None
+_log_queue: Optional[Union[queue.SimpleQueue, multiprocessing.Queue]] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
 _queue_listener: Optional[logging.handlers.QueueListener] = None
-_listener_thread: Optional[threading.Thread] = None
 
 # Lock for thread-safe initialization
 _init_lock = threading.Lock()
 
-def _get_log_queue() -> multiprocessing.Queue:
+# Attributes of every LogRecord; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in N records below WARNING for the configured logger prefixes.
+
+    Rates are fractions per logger name prefix, e.g. ``{"app.auth": 0.01}``
+    keeps 1% of the debug/info records of ``app.auth`` and its children.
+    Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first so the most specific rate wins
+        self.intervals = {
+            prefix: max(1, round(1 / rate)) if rate > 0 else 0
+            for prefix, rate in sorted(rates.items(), key=lambda item: -len(item[0]))
+        }
+        self.counters: Dict[str, int] = {}
+        # Records are filtered on the threads that log them
+        self._lock = threading.Lock()
+
+    def _interval(self, name: str) -> Optional[int]:
+        for prefix, interval in self.intervals.items():
+            if name == prefix or name.startswith(prefix + "."):
+                return interval
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        interval = self._interval(record.name)
+        if interval is None:
+            return True
+        if interval == 0:
+            return False
+        with self._lock:
+            count = self.counters.get(record.name, 0)
+            self.counters[record.name] = count + 1
+        return count % interval == 0
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler over a ``SimpleQueue`` that never blocks the caller.
+
+    Records beyond ``capacity`` are dropped and counted; once the queue has
+    drained below half its capacity a single warning with the number of
+    dropped records is queued.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, capacity: int):
+        super().__init__(log_queue)
+        self.capacity = capacity
+        self.dropped = 0
+        self._unreported = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        size = self.queue.qsize()
+        if size >= self.capacity:
+            self.dropped += 1
+            self._unreported += 1
+            return
+        if self._unreported and size < self.capacity // 2:
+            dropped, self._unreported = self._unreported, 0
+            self.queue.put_nowait(logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Log queue full: dropped {dropped} log records",
+                "dropped": dropped,
+            }))
+        self.queue.put_nowait(record)
+
+
+def _get_log_queue(mode: str = "thread") -> Union[queue.SimpleQueue, multiprocessing.Queue]:
     """Get or create the global log queue."""
     global _log_queue
     if _log_queue is None:
         with _init_lock:
             if _log_queue is None:
-                _log_queue = multiprocessing.Queue()
+                _log_queue = multiprocessing.Queue() if mode == "process" else queue.SimpleQueue()
     return _log_queue
 
-def _setup_queue_listener(log_dir: str = "logs") -> None:
+
+def _get_queue_handler(mode: str = "thread", capacity: int = 10000) -> logging.handlers.QueueHandler:
+    """Get or create the single handler that feeds the log queue."""
+    global _queue_handler
+    if _queue_handler is None:
+        log_queue = _get_log_queue(mode)
+        if isinstance(log_queue, queue.SimpleQueue):
+            _queue_handler = BoundedQueueHandler(log_queue, capacity)
+        else:
+            _queue_handler = logging.handlers.QueueHandler(log_queue)
+    return _queue_handler
+
+
+def dropped_log_records() -> int:
+    """Number of records dropped because the log queue was full"""
+    return getattr(_queue_handler, "dropped", 0)
+
+
+def _setup_queue_listener(log_dir: str = "logs", mode: str = "thread", json_format: bool = False) -> None:
     """Set up the queue listener to write logs to files."""
-    global _queue_listener, _listener_thread
+    global _queue_listener
     
     if _queue_listener is not None:
         # Already set up
@@ -70,20 +203,23 @@ def _setup_queue_listener(log_dir: str = "logs") -> None:
         console_handler = logging.StreamHandler()
         
         # Create formatters
-        file_formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(process)d - %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S"
-        )
-        console_formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S"
-        )
+        if json_format:
+            file_formatter = console_formatter = JsonFormatter()
+        else:
+            file_formatter = logging.Formatter(
+                "%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(process)d - %(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S"
+            )
+            console_formatter = logging.Formatter(
+                "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S"
+            )
         
         file_handler.setFormatter(file_formatter)
         console_handler.setFormatter(console_formatter)
         
         # Create and start the queue listener
-        log_queue = _get_log_queue()
+        log_queue = _get_log_queue(mode)
         _queue_listener = logging.handlers.QueueListener(
             log_queue,
             file_handler,
@@ -91,50 +227,49 @@ def _setup_queue_listener(log_dir: str = "logs") -> None:
             respect_handler_level=True
         )
         
-        # Start the listener in a separate thread
-        _listener_thread = threading.Thread(target=_queue_listener.start, daemon=True)
-        _listener_thread.start()
+        # The listener runs its own daemon thread
+        _queue_listener.start()
         
         # Register cleanup function
         atexit.register(stop_queue_listener)
         
-        # Log the setup info
-        setup_logger = logging.getLogger(__name__)
-        queue_handler = logging.handlers.QueueHandler(log_queue)
-        setup_logger.addHandler(queue_handler)
-        setup_logger.setLevel(logging.INFO)
-        setup_logger.info(f"Queue-based logging initialized. {listener_info}")
+        logging.getLogger(__name__).info(f"Queue-based logging initialized ({mode} queue). {listener_info}")
 
 def stop_queue_listener() -> None:
-    """Stop the queue listener gracefully."""
-    global _queue_listener, _listener_thread
+    """Stop the queue listener gracefully, writing the records still queued."""
+    global _queue_listener
     
     if _queue_listener is not None:
         _queue_listener.stop()
         _queue_listener = None
-        
-    if _listener_thread is not None:
-        _listener_thread = None
 
-def setup_queue_logging(log_level: str = "INFO", log_dir: str = "logs") -> logging.Logger:
+def setup_queue_logging(
+    log_level: str = "INFO",
+    log_dir: str = "logs",
+    mode: str = "thread",
+    queue_size: int = 10000,
+    json_format: bool = False,
+    sampling: Optional[Dict[str, float]] = None
+) -> logging.Logger:
     """
     Set up queue-based logging for the application.
     
     Args:
         log_level: The logging level (e.g., "DEBUG", "INFO", "WARNING", "ERROR")
         log_dir: Directory where log files should be stored
+        mode: "thread" for a bounded in-process queue, "process" for a multiprocessing queue
+        queue_size: Records buffered before new records are dropped (thread mode)
+        json_format: Write records as JSON lines instead of plain text
+        sampling: Fraction of records below WARNING kept per logger prefix
         
     Returns:
         Configured logger instance
     """
-    # Set up the queue listener (only once)
-    _setup_queue_listener(log_dir)
-    
-    # Get the log queue
-    log_queue = _get_log_queue()
-    
-    # Create queue handler
-    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Create the queue handler (only once)
+    queue_handler = _get_queue_handler(mode, queue_size)
+    queue_handler.filters.clear()
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))
     
     # Configure root logger
     root_logger = logging.getLogger()
@@ -144,16 +279,25 @@ def setup_queue_logging(log_level: str = "INFO", log_dir: str = "logs") -> loggi
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
     
-    # Add queue handler to root logger
+    # Add queue handler to root logger; every other logger propagates to it
     root_logger.addHandler(queue_handler)
     
-    # Also configure this module's logger
+    # Set up the queue listener (only once)
+    _setup_queue_listener(log_dir, mode, json_format)
+
     logger = logging.getLogger(__name__)
-    logger.addHandler(queue_handler)
     logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
     
     return logger
 
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """Parse a sampling spec like ``"app.auth.security=0.01,sqlalchemy=0.1"``"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
 # Convenience function for getting a logger that uses the queue
 def get_queue_logger(name: str) -> logging.Logger:
     """
@@ -165,15 +309,13 @@ def get_queue_logger(name: str) -> logging.Logger:
     Returns:
         Logger instance configured to use queue-based logging
     """
-    # Get the log queue
-    log_queue = _get_log_queue()
-    
-    # Create queue handler
-    queue_handler = logging.handlers.QueueHandler(log_queue)
-    
     # Create and configure logger
     logger = logging.getLogger(name)
-    logger.addHandler(queue_handler)
+    queue_handler = _get_queue_handler()
+    # Records reach the queue through the root logger once logging is set up;
+    # a second handler would queue every record twice
+    if queue_handler not in logging.getLogger().handlers and queue_handler not in logger.handlers:
+        logger.addHandler(queue_handler)
     logger.setLevel(logging.getLogger().level)  # Inherit level from root logger
     
     return logger
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""
+Runtime metrics in the Prometheus text exposition format.
+
+Counters and histograms are sharded per thread: each thread updates its own
+dict without taking a lock, and a scrape sums the shards. Values that already
+live elsewhere (DB pool, WebSocket connections) are read by callbacks at
+scrape time, so they cost nothing between scrapes.
+"""
+import bisect
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Labels = Tuple[str, ...]
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# LLM calls are much slower than requests
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Sharded:
+    """Per-thread storage; shards are only ever appended, so reads need no lock"""
+
+    def __init__(self, factory: Callable):
+        self._factory = factory
+        self._local = threading.local()
+        self._shards: List = []
+
+    def local(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = self._factory()
+            self._shards.append(shard)  # list.append is atomic
+            return shard
+
+    def shards(self) -> List:
+        return list(self._shards)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = _Sharded(dict)
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        shard = self._values.local()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def totals(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for shard in self._values.shards():
+            for labels, value in list(shard.items()):
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self.totals().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Up/down gauge (e.g. in-flight requests): increments and decrements are summed over shards"""
+    type = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+
+class CallbackGauge(Metric):
+    """Gauge whose values are read from a callback at scrape time"""
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Labels, float]],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.debug(f"Metric callback {self.name} failed: {e}")
+            return
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (+Inf last), sum]
+        self._values = _Sharded(dict)
+
+    def observe(self, value: float, labels: Labels = ()):
+        shard = self._values.local()
+        entry = shard.get(labels)
+        if entry is None:
+            entry = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> Iterable[str]:
+        merged: Dict[Labels, list] = {}
+        for shard in self._values.shards():
+            for labels, (counts, total) in list(shard.items()):
+                entry = merged.setdefault(labels, [[0] * len(counts), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+        for labels, (counts, total) in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+registry = Registry()
+
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status")
+))
+llm_request_duration = registry.register(Histogram(
+    "llm_request_duration_seconds", "LLM completion latency by provider",
+    ("provider", "model", "outcome"), buckets=LLM_LATENCY_BUCKETS
+))
+llm_tokens = registry.register(Counter(
+    "llm_tokens_total", "Tokens used by LLM completions", ("provider", "kind")
+))
+cache_lookups = registry.register(Counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit, miss, shared)", ("cache", "result")
+))
+
+
+def observe_llm_call(provider: str, model: str, seconds: float, outcome: str = "success",
+                     prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+    llm_request_duration.observe(seconds, (provider, model or "", outcome))
+    if prompt_tokens:
+        llm_tokens.inc((provider, "prompt"), prompt_tokens)
+    if completion_tokens:
+        llm_tokens.inc((provider, "completion"), completion_tokens)
+
+
+def _db_pool_stats() -> Dict[Labels, float]:
+    from app.db import session
+
+    engine = session.async_engine
+    if engine is None:
+        return {}
+    pool = engine.pool
+    stats = {}
+    for state, reader in (("size", "size"), ("checked_in", "checkedin"),
+                          ("checked_out", "checkedout"), ("overflow", "overflow")):
+        if hasattr(pool, reader):
+            stats[(state,)] = getattr(pool, reader)()
+    return stats
+
+
+def _websocket_stats() -> Dict[Labels, float]:
+    from app.websocket.manager import websocket_manager
+
+    return {
+        ("connections",): len(websocket_manager.user_sessions),
+        ("users",): len(websocket_manager.active_connections),
+        ("rooms",): len(websocket_manager.room_memberships),
+    }
+
+
+registry.register(CallbackGauge("db_pool_connections", "Async DB connection pool state", _db_pool_stats, ("state",)))
+registry.register(CallbackGauge("websocket_active", "Active WebSocket connections, users and rooms",
+                                _websocket_stats, ("kind",)))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware counting in-flight requests and request latency per route template"""
+
+    def __init__(self, app, exclude_paths: tuple = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # Route templates keep label cardinality bounded; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration.observe(
+                time.perf_counter() - start, (scope["method"], route, str(status_code))
+            )
@@ -0,0 +1,127 @@
+"""
+Liveness and readiness of the application.
+
+The server starts answering requests right after import. Liveness
+(``/health/live``) only reports that the process is up. Database warm-up runs
+in a background task (see ``lifespan`` in ``app.main``) and records each step
+here. Readiness (``/health/ready``) turns 200 once every required step has
+passed, so load balancers and rolling deploys only send traffic to warmed-up
+workers. Steps that are not required (for example seed checks) are reported
+but do not hold readiness back.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+OK = "ok"
+FAILED = "failed"
+
+
+@dataclass
+class Check:
+    name: str
+    required: bool = True
+    status: str = PENDING
+    detail: Optional[str] = None
+    duration_ms: Optional[float] = None
+    attempts: int = 0
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "required": self.required,
+            "detail": self.detail,
+            "duration_ms": self.duration_ms,
+            "attempts": self.attempts,
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+class Readiness:
+    """Startup steps and their outcome; ready once all required steps passed"""
+
+    def __init__(self):
+        self.checks: Dict[str, Check] = {}
+        self.started_at = datetime.utcnow()
+        self.ready_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, required: bool = True) -> Check:
+        check = self.checks.get(name)
+        if check is None:
+            check = self.checks[name] = Check(name, required)
+        return check
+
+    @property
+    def ready(self) -> bool:
+        required = [check for check in self.checks.values() if check.required]
+        return bool(required) and all(check.status == OK for check in required)
+
+    @asynccontextmanager
+    async def step(self, name: str, required: bool = True):
+        """Time a startup step and record its outcome; failures of optional steps are only logged"""
+        check = self.register(name, required)
+        check.attempts += 1
+        started = time.perf_counter()
+        try:
+            yield check
+        except Exception as e:
+            check.status, check.detail = FAILED, str(e) or type(e).__name__
+            check.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            check.updated_at = datetime.utcnow()
+            if required:
+                raise
+            logger.warning(f"Startup step {name} failed: {check.detail}")
+        else:
+            check.status, check.detail = OK, None
+            check.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            check.updated_at = datetime.utcnow()
+            if self.ready and self.ready_at is None:
+                self.ready_at = datetime.utcnow()
+                logger.info(f"Application ready after {(self.ready_at - self.started_at).total_seconds():.1f}s")
+
+    async def run_until_ready(self, warm_up: Callable[[], Awaitable[None]], timeout: float, max_delay: float = 30.0):
+        """Run warm_up, retrying with exponential backoff until every required step passed"""
+        delay = 1.0
+        while True:
+            try:
+                await asyncio.wait_for(warm_up(), timeout)
+                if self.ready:
+                    return
+                raise RuntimeError("required startup steps did not pass")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                reason = f"timed out after {timeout:.0f}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+                logger.warning(f"Startup warm-up failed ({reason}), retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    def start(self, warm_up: Callable[[], Awaitable[None]], timeout: float):
+        """Warm up in the background while the server already answers requests"""
+        self._task = asyncio.create_task(self.run_until_ready(warm_up, timeout))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "started_at": self.started_at.isoformat(),
+            "ready_at": self.ready_at.isoformat() if self.ready_at else None,
+            "checks": {name: check.to_dict() for name, check in self.checks.items()},
+        }
+
+
+readiness = Readiness()
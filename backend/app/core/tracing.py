@@ -0,0 +1,234 @@
+"""
+Request-level tracing.
+
+An ASGI middleware records one trace per HTTP request: route, status,
+duration, time and number of database queries (through SQLAlchemy engine
+events), response serialization time and any named spans (e.g. ``auth``).
+Serialization is the time from the endpoint returning to the start of the
+response; routers opt in with ``APIRouter(route_class=TracedRoute)``.
+Finished traces are kept in an in-process ring buffer served by the
+``/api/v1/_debug/slow-requests`` endpoint, and statements repeated many times
+within one request are flagged as possible N+1 queries.
+
+When TRACE_OTEL_EXPORT is enabled and opentelemetry-api is installed, each
+trace is also exported as an OpenTelemetry span; the exporter itself is
+configured through the OpenTelemetry SDK as usual.
+"""
+import functools
+import inspect
+import logging
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+try:
+    from opentelemetry import trace as otel_trace
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+# Statements run at least this many times in one request are reported as possible N+1 queries
+N_PLUS_ONE_THRESHOLD = 5
+
+
+@dataclass
+class RequestTrace:
+    method: str
+    path: str
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    start: float = field(default_factory=time.perf_counter)
+    route: Optional[str] = None
+    status_code: Optional[int] = None
+    duration_ms: float = 0.0
+    db_time_ms: float = 0.0
+    query_count: int = 0
+    serialization_ms: float = 0.0
+    spans: Dict[str, float] = field(default_factory=dict)
+    statements: Counter = field(default_factory=Counter)
+    endpoint_returned: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status_code": self.status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 2),
+            "db_time_ms": round(self.db_time_ms, 2),
+            "query_count": self.query_count,
+            "serialization_ms": round(self.serialization_ms, 2),
+            "spans": {name: round(ms, 2) for name, ms in self.spans.items()},
+            "repeated_queries": [
+                {"statement": statement[:300], "count": count}
+                for statement, count in self.statements.most_common(5)
+                if count >= N_PLUS_ONE_THRESHOLD
+            ]
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+_recent_traces: Deque[RequestTrace] = deque(maxlen=settings.TRACE_BUFFER_SIZE)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """Add the time spent in the block to the current request trace under name"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans[name] = trace.spans.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def slow_requests(limit: int = 50, min_duration_ms: float = 0.0) -> List[Dict[str, Any]]:
+    """Slowest recent requests, slowest first"""
+    traces = [trace for trace in _recent_traces if trace.duration_ms >= min_duration_ms]
+    traces.sort(key=lambda trace: trace.duration_ms, reverse=True)
+    return [trace.to_dict() for trace in traces[:limit]]
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware, so the trace context reaches endpoints and dependencies"""
+
+    def __init__(self, app, exclude_paths: tuple = ()):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(method=scope["method"], path=scope["path"])
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.status_code = message["status"]
+                if trace.endpoint_returned is not None:
+                    trace.serialization_ms = (time.perf_counter() - trace.endpoint_returned) * 1000
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            trace.status_code = 500
+            raise
+        finally:
+            _current_trace.reset(token)
+            route = scope.get("route")
+            trace.route = getattr(route, "path", None)
+            trace.duration_ms = (time.perf_counter() - trace.start) * 1000
+            _finish(trace)
+
+
+def _finish(trace: RequestTrace):
+    _recent_traces.append(trace)
+    if trace.duration_ms >= settings.TRACE_SLOW_REQUEST_MS:
+        logger.warning(
+            f"Slow request {trace.method} {trace.route or trace.path}: {trace.duration_ms:.0f} ms "
+            f"({trace.query_count} queries, {trace.db_time_ms:.0f} ms in DB)"
+        )
+    if settings.TRACE_OTEL_EXPORT and OTEL_AVAILABLE:
+        _export_otel(trace)
+
+
+def _export_otel(trace: RequestTrace):
+    end_ns = time.time_ns()
+    start_ns = end_ns - int(trace.duration_ms * 1_000_000)
+    tracer = otel_trace.get_tracer(__name__)
+    otel_span = tracer.start_span(
+        f"{trace.method} {trace.route or trace.path}",
+        kind=otel_trace.SpanKind.SERVER,
+        start_time=start_ns,
+        attributes={
+            "http.method": trace.method,
+            "http.route": trace.route or trace.path,
+            "http.status_code": trace.status_code or 0,
+            "db.query_count": trace.query_count,
+            "db.time_ms": trace.db_time_ms,
+            "serialization.time_ms": trace.serialization_ms,
+            **{f"span.{name}.time_ms": ms for name, ms in trace.spans.items()}
+        }
+    )
+    otel_span.end(end_time=end_ns)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_trace.get() is not None:
+        conn.info.setdefault("trace_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current_trace.get()
+    starts = conn.info.get("trace_query_start")
+    if trace is None or not starts:
+        return
+    trace.db_time_ms += (time.perf_counter() - starts.pop()) * 1000
+    trace.query_count += 1
+    trace.statements[statement] += 1
+
+
+def _note_return(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an endpoint so the current trace records when it returns"""
+    if getattr(endpoint, "_traced", False):
+        return endpoint
+
+    def returned():
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.endpoint_returned = time.perf_counter()
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            returned()
+            return result
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            result = endpoint(*args, **kwargs)
+            returned()
+            return result
+    wrapper._traced = True
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    """APIRoute whose endpoint marks the current trace when it returns, for serialization timing"""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs):
+        super().__init__(path, _note_return(endpoint), **kwargs)
+
+
+def install_tracing(app):
+    """Add the tracing middleware and SQLAlchemy hooks; routes added to the app itself are traced too"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        # Engine class events apply to every engine, including AsyncEngine.sync_engine
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    app.router.route_class = TracedRoute
+    app.add_middleware(TracingMiddleware, exclude_paths=(f"{settings.API_V1_STR}/_debug/slow-requests",))
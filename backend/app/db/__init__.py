@@ -3,5 +3,6 @@ from .session import (
     get_db_sync,
     sync_engine,
     initialize_database,
+    get_session_factory,
     force_connection_reset
 )
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+System users the application relies on.
+
+The AI generator user owns AI-generated test cases and is created at startup
+when it is missing. It gets a random password nobody knows, so nobody can log
+in as it. The test user backs the development login (test@example.com with
+password test1234) and is only created when SEED_TEST_USER is enabled.
+"""
+import logging
+import secrets
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from app.models.db_models import User
+
+logger = logging.getLogger(__name__)
+
+TEST_USER_ID = "temp-user-id-for-testing"
+TEST_USER_EMAIL = "test@example.com"
+TEST_USER_NAME = "Test User"
+
+AI_GENERATOR_USER_ID = "ai-generator"
+AI_GENERATOR_EMAIL = "ai-tests@example.com"
+AI_GENERATOR_NAME = "AI Test Generator"
+# Password the AI generator user was once created with; it is replaced where still set
+_RETIRED_AI_GENERATOR_PASSWORD = "ai-system-user"
+
+
+def get_test_user_id() -> str:
+    return TEST_USER_ID
+
+
+def get_ai_generator_user_id() -> str:
+    return AI_GENERATOR_USER_ID
+
+
+async def _ensure_user(
+    engine: Optional[AsyncEngine],
+    user_id: str,
+    email: str,
+    full_name: str,
+    password: Optional[str],
+    role: str,
+    retired_password: Optional[str] = None
+) -> str:
+    """
+    Create the user unless it exists; uses the application's sessions without an engine.
+    Without a password the user gets a random one, and an existing user whose
+    password is still retired_password gets a random one as well.
+    """
+    from app.core.security import get_password_hash, verify_password
+    from app.db.session import get_session_factory
+
+    session_factory = async_sessionmaker(engine, expire_on_commit=False) if engine else get_session_factory()
+    async with session_factory() as db:
+        user = await db.get(User, user_id)
+        now = datetime.utcnow()
+        if user is None:
+            db.add(User(
+                id=user_id,
+                email=email,
+                full_name=full_name,
+                hashed_password=get_password_hash(password or secrets.token_urlsafe(32)),
+                role=role,
+                is_active=True,
+                created_at=now,
+                updated_at=now
+            ))
+            await db.commit()
+            logger.info(f"Created system user {user_id}")
+        elif retired_password and verify_password(retired_password, user.hashed_password):
+            user.hashed_password = get_password_hash(secrets.token_urlsafe(32))
+            user.updated_at = now
+            await db.commit()
+            logger.info(f"Replaced the known password of system user {user_id}")
+    return user_id
+
+
+async def ensure_test_user_exists(engine: Optional[AsyncEngine] = None) -> str:
+    return await _ensure_user(engine, TEST_USER_ID, TEST_USER_EMAIL, TEST_USER_NAME, "test1234", "tester")
+
+
+async def ensure_ai_generator_user_exists(engine: Optional[AsyncEngine] = None) -> str:
+    return await _ensure_user(
+        engine, AI_GENERATOR_USER_ID, AI_GENERATOR_EMAIL, AI_GENERATOR_NAME, None, "system",
+        retired_password=_RETIRED_AI_GENERATOR_PASSWORD
+    )
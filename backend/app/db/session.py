@@ -3,26 +3,38 @@ import sys
 import logging
 import certifi
 import asyncio
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 from contextlib import asynccontextmanager
-from urllib.parse import urlparse, parse_qsl, urlunparse
+from urllib.parse import urlparse, parse_qs
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+from app.core.config import settings
 
 # Set SSL certificate path for all SSL connections
 os.environ['SSL_CERT_FILE'] = certifi.where()
 os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the application (app.core.logging_config)
 logger = logging.getLogger(__name__)
 
 # Global variables for the engines - they will be initialized later
 async_engine = None
 sync_engine = None
+DATABASE_URL = None
+DATABASE_URL_ASYNC = None
+
+def _redact(url: str) -> str:
+    """Database URL without its password, for logging"""
+    parsed = urlparse(url)
+    if parsed.password:
+        parsed = parsed._replace(netloc=parsed.netloc.replace(f":{parsed.password}@", ":***@"))
+    return parsed.geturl()
 
 def load_environment_variables():
     """Load environment variables from the .env file."""
@@ -37,108 +49,90 @@ def load_environment_variables():
         raise ValueError("DATABASE_URL or DATABASE_URL_ASYNC not found in environment variables")
     
     logger.info("Environment variables loaded")
-    logger.info(f"DATABASE_URL: {DATABASE_URL}")
-    logger.info(f"DATABASE_URL_ASYNC: {DATABASE_URL_ASYNC}")
-
-# Load environment variables on module import
-load_environment_variables()
- 
-# In app/db/session.py
-
-# Replace the async engine creation with:
-from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.pool import NullPool
-import os
-from urllib.parse import urlparse, parse_qs
+    logger.info(f"DATABASE_URL: {_redact(DATABASE_URL)}")
+    logger.info(f"DATABASE_URL_ASYNC: {_redact(DATABASE_URL_ASYNC)}")
 
-
- 
- 
-async def initialize_database():
+async def initialize_database(connections: int = 1):
+    """
+    Create the engines and open `connections` connections with them. The engines
+    are published (and get_db stops answering 503) only once the connections
+    work; a failed attempt disposes its engines, so retries do not leak pools.
+    """
     global async_engine, sync_engine
-    
-    # Load environment variables
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    DATABASE_URL_ASYNC = os.getenv("DATABASE_URL_ASYNC")
-    
-    logger.info("Environment variables loaded")
-    logger.info(f"DATABASE_URL: {DATABASE_URL}")
-    logger.info(f"DATABASE_URL_ASYNC: {DATABASE_URL_ASYNC}")
+
+    # The .env file is read here rather than on import, so importing the app stays cheap
+    load_environment_variables()
 
     try:
-        # Sync engine (using psycopg2)
-        sync_engine = create_engine(
-            DATABASE_URL,
-            echo=True,
-            pool_pre_ping=True
-        )
-        
-        # Parse the async URL to handle SSL
-        parsed_url = urlparse(DATABASE_URL_ASYNC)
-        query_params = parse_qs(parsed_url.query)
-        
-        # Prepare connection arguments
-        connect_args = {
-            "statement_cache_size": 0,
-            "prepared_statement_cache_size": 0
-        }
-        
-        # Handle SSL
-        if 'sslmode' in query_params and query_params['sslmode'][0] == 'require':
-            connect_args['ssl'] = 'require'
-        
-        # Rebuild URL without sslmode in query
-        clean_url = DATABASE_URL_ASYNC.replace('postgresql+asyncpg://', 'postgresql://')
-        
-        # Create async engine
-        async_engine = create_async_engine(
-            clean_url,
-            echo=True,
-            poolclass=NullPool,
-            connect_args=connect_args
-        )
-        
-        logger.info("Database engines initialized successfully")
-        return async_engine
-        
+        new_sync_engine, new_async_engine = _create_engines()
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise
-    
-    global async_engine, sync_engine
-    
-    # Load environment variables
-    load_environment_variables()
-    
+    try:
+        await warm_up_connections(connections, new_async_engine, new_sync_engine)
+    except BaseException:
+        await _dispose(new_async_engine, new_sync_engine)
+        raise
+
+    previous = async_engine, sync_engine
+    async_engine, sync_engine = new_async_engine, new_sync_engine
+    await _dispose(*previous)
+    logger.info("Database engines initialized successfully")
+    return async_engine
+
+async def _dispose(async_engine: Optional[AsyncEngine], sync_engine: Optional[Engine]):
+    if async_engine is not None:
+        await async_engine.dispose()
+    if sync_engine is not None:
+        sync_engine.dispose()
+
+def _create_engines():
+    """Create the sync and async engines without connecting"""
     # Sync engine (using psycopg2)
     sync_engine = create_engine(
-        os.getenv("DATABASE_URL"),
-        echo=True,
+        DATABASE_URL,
+        echo=settings.DB_ECHO,
         pool_pre_ping=True
     )
     
-    # Async engine (using asyncpg)
+    # Parse the async URL to handle SSL
+    parsed_url = urlparse(DATABASE_URL_ASYNC)
+    query_params = parse_qs(parsed_url.query)
+    
+    # Prepare connection arguments
+    connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0
+    }
+    
+    # Handle SSL
+    if 'sslmode' in query_params and query_params['sslmode'][0] == 'require':
+        connect_args['ssl'] = 'require'
+    
+    # Rebuild URL without sslmode in query
+    clean_url = DATABASE_URL_ASYNC.replace('postgresql+asyncpg://', 'postgresql://')
+    
+    # Create async engine
     async_engine = create_async_engine(
-        os.getenv("DATABASE_URL_ASYNC").replace('postgresql+asyncpg://', 'postgresql://'),
-        echo=True,
+        clean_url,
+        echo=settings.DB_ECHO,
         poolclass=NullPool,
-        connect_args={
-            "ssl": "require",
-            "statement_cache_size": 0,
-            "prepared_statement_cache_size": 0
-        }
+        connect_args=connect_args
     )
     
-    logger.info("Database engines initialized successfully")
-    return async_engine
+    return sync_engine, async_engine
 
 # NOTE: Dependency for FastAPI. Yields a new session for each request.
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Provides a database session for a single request."""
-    # Ensure the engine is initialized before use
+    # The engine is published once the background warm-up connected; until then ask clients to retry
     if async_engine is None:
-        raise RuntimeError("Database engine not initialized. Please run initialize_database() first.")
-        
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is starting up",
+            headers={"Retry-After": "5"}
+        )
+
     async_session_local = async_sessionmaker(
         async_engine,
         class_=AsyncSession,
@@ -147,6 +141,19 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_local() as session:
         yield session
 
+def get_session_factory() -> async_sessionmaker:
+    """
+    Return an async session factory bound to the initialized engine.
+    Used by background jobs that run outside of a request.
+    """
+    if async_engine is None:
+        raise RuntimeError("Database engine not initialized. Please run initialize_database() first.")
+    return async_sessionmaker(
+        async_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
 # NOTE: Dependency for synchronous database operations
 def get_db_sync():
     """Provides a synchronous database session for a single request."""
@@ -173,3 +180,43 @@ async def force_connection_reset() -> bool:
             logger.error(f"Failed to reset database connections: {e}")
             return False
     return False
+
+async def warm_up_connections(
+    connections: int = 1,
+    engine: Optional[AsyncEngine] = None,
+    sync: Optional[Engine] = None
+):
+    """
+    Open connections concurrently and run a trivial query on each, with the
+    given engines or the published ones.
+    With a QueuePool the connections stay pooled; with NullPool (PgBouncer)
+    this still resolves DNS, completes the TLS handshake and checks credentials.
+    """
+    engine = engine or async_engine
+    sync = sync or sync_engine
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(max(1, connections))))
+
+    def prefill():
+        with sync.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    await asyncio.to_thread(prefill)
+
+async def warm_up_statements():
+    """
+    Configure the ORM mappers and compile the common queries once, so the
+    first requests do not pay for mapper configuration and statement compilation.
+    """
+    from sqlalchemy import select
+    from sqlalchemy.orm import configure_mappers
+    from app.models.db_models import Project, TestCase, TestExecution, TestPlan, User
+
+    configure_mappers()
+    async with get_session_factory()() as session:
+        for model in (User, Project, TestCase, TestPlan, TestExecution):
+            await session.execute(select(model).limit(1))
@@ -1,23 +1,46 @@
 import os
 import json
+import time
+import importlib
 from typing import Dict, List, Optional, Any
 
-# Add imports for other AI providers
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-    openai = None
+from app.core.importtime import module_available
+from app.core.metrics import observe_llm_call
 
-try:
-    import google.generativeai as genai
-    from google.generativeai.types import generation_types
-    GOOGLE_AI_AVAILABLE = True
-except ImportError:
-    GOOGLE_AI_AVAILABLE = False
-    genai = None
-    generation_types = None
+# The provider SDKs take long to import, so only their presence is checked here;
+# they are imported when the first chat session is created (see _load_providers)
+OPENAI_AVAILABLE = module_available("openai")
+GOOGLE_AI_AVAILABLE = module_available("google.generativeai")
+openai = None
+genai = None
+
+
+def _load_providers():
+    """Import the installed provider SDKs once"""
+    global openai, genai, OPENAI_AVAILABLE, GOOGLE_AI_AVAILABLE
+    if OPENAI_AVAILABLE and openai is None:
+        try:
+            openai = importlib.import_module("openai")
+        except ImportError:
+            OPENAI_AVAILABLE = False
+    if GOOGLE_AI_AVAILABLE and genai is None:
+        try:
+            genai = importlib.import_module("google.generativeai")
+        except ImportError:
+            GOOGLE_AI_AVAILABLE = False
+
+
+def _token_usage(response: Any) -> tuple:
+    """(prompt, completion) token counts reported by an OpenAI or Gemini response, if any"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        if isinstance(usage, dict):
+            return usage.get("prompt_tokens"), usage.get("completion_tokens")
+        return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is not None:
+        return getattr(metadata, "prompt_token_count", None), getattr(metadata, "candidates_token_count", None)
+    return None, None
 
 class LlmChat:
     """
@@ -39,6 +62,7 @@ class LlmChat:
         self.current_model = None
         
         # Initialize available providers
+        _load_providers()
         self._initialize_providers()
     
     def _initialize_providers(self):
@@ -151,6 +175,7 @@ class LlmChat:
         last_error = None
         
         for provider in providers_to_try:
+            start = time.perf_counter()
             try:
                 if provider["name"] == "openai" and OPENAI_AVAILABLE and openai is not None:
                     # Ensure we have a valid model name
@@ -189,6 +214,8 @@ class LlmChat:
                         )
                         assistant_content = response.choices[0].message.content
                     
+                    observe_llm_call("openai", model_name, time.perf_counter() - start, "success", *_token_usage(response))
+                    
                     # Add assistant's response to the conversation history
                     self.messages.append({"role": "assistant", "content": assistant_content})
                     
@@ -223,6 +250,7 @@ class LlmChat:
                         
                         response = model.generate_content(gemini_messages)
                         assistant_content = response.text
+                        observe_llm_call("google", model_name, time.perf_counter() - start, "success", *_token_usage(response))
                         
                         # Add assistant's response to the conversation history
                         self.messages.append({"role": "assistant", "content": assistant_content})
@@ -233,6 +261,10 @@ class LlmChat:
                     
             except Exception as e:
                 last_error = e
+                observe_llm_call(
+                    provider["name"], self.current_model or provider["default_model"], time.perf_counter() - start,
+                    "quota_error" if self._is_quota_error(e) else "error"
+                )
                 # If this is a quota error, try the next provider
                 if self._is_quota_error(e):
                     print(f"Quota error with {provider['name']}, trying next provider: {str(e)}")
@@ -13,7 +13,7 @@ from pathlib import Path
 
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -24,11 +24,22 @@ from pydantic import BaseModel, EmailStr
 sys.path.append(str(Path(__file__).parent.parent))
 
 # Import core components and dependencies, including the new async functions
-from app.db.session import get_db, get_db_sync, sync_engine, initialize_database, force_connection_reset
+from app.db.session import (
+    get_db, get_db_sync, sync_engine, initialize_database, warm_up_statements
+)
 from app.core.security import create_access_token, get_password_hash, verify_password, oauth2_scheme
-from app.auth.security import AuthService
-from app.websocket.manager import WebSocketManager
-from app.core.logging_config import setup_queue_logging, get_queue_logger
+from app.auth.security import AuthService, get_current_user
+from app.websocket.manager import websocket_manager
+from app.services.event_pipeline import event_pipeline
+from app.services.export_jobs import export_job_manager
+from app.services.newman_runner import newman_runner
+from app.services.plan_runner import plan_runner
+from app.services.attachment_store import UploadLimitMiddleware
+from app.core.config import settings
+from app.core.tracing import install_tracing, slow_requests
+from app.core.metrics import MetricsMiddleware, registry as metrics_registry
+from app.core.readiness import readiness
+from app.core.logging_config import setup_queue_logging, get_queue_logger, parse_sampling
 
 # Import schemas
 from app.schemas.user import UserCreate, UserLogin
@@ -51,55 +62,89 @@ from app.api.v1.routes import (
 # Configure logging
 logger = setup_queue_logging(
     log_level=os.getenv("LOG_LEVEL", "INFO"),
-    log_dir="logs"
+    log_dir="logs",
+    mode=settings.LOG_QUEUE_MODE,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    json_format=settings.LOG_FORMAT.lower() == "json",
+    sampling=parse_sampling(settings.LOG_SAMPLING)
 )
 logger.info("=" * 80)
 logger.info("Application starting with queue-based logging")
 logger.info("=" * 80)
 
-# Initialize the WebSocket manager
-websocket_manager = WebSocketManager()
-
 # Access token expiration time in minutes
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+async def warm_up_database():
+    """
+    Create the engines, open the first connections, warm up the ORM and check
+    the seed users. Each step is recorded in `readiness`.
+    """
+    async with readiness.step("database"):
+        # The engines are new, so their first connections are fresh (PgBouncer compatibility)
+        async_engine_instance = await initialize_database(settings.DB_WARMUP_CONNECTIONS)
+        logger.info("[SUCCESS] Database connections ready")
+
+    async with readiness.step("statements", required=False):
+        await warm_up_statements()
+
+    async with readiness.step("seed_users", required=False):
+        if settings.SEED_TEST_USER:
+            test_user_id = await ensure_test_user_exists(async_engine_instance)
+            logger.info(f"[SUCCESS] Test user ready: {test_user_id}")
+        ai_user_id = await ensure_ai_generator_user_exists(async_engine_instance)
+        logger.info(f"[SUCCESS] AI Generator user ready: {ai_user_id}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Handles application startup and shutdown events.
-    This function is now responsible for initializing the database asynchronously.
+    By default the database is warmed up in the background and the app serves
+    /health/live at once; /health/ready reports 200 once the warm-up passed.
+    STARTUP_MODE=blocking waits for the warm-up before serving.
     """
-    logger.info("Starting database initialization with a 30-second timeout...")
-    try:
-        # Asynchronously initialize the database engine by calling the new function
-        async_engine_instance = await initialize_database()
-        
-        # Now, force a connection reset to ensure PgBouncer compatibility
-        await asyncio.wait_for(force_connection_reset(), timeout=30.0)
-        
-        logger.info("[SUCCESS] Database connections reset for PgBouncer compatibility")
-
-        logger.info("Ensuring test user and AI generator user exist...")
-        # Use the asynchronously created engine instance for database operations
-        test_user_id = await ensure_test_user_exists(async_engine_instance)
-        ai_user_id = await ensure_ai_generator_user_exists(async_engine_instance)
-        logger.info(f"[SUCCESS] Test user ready: {test_user_id}")
-        logger.info(f"[SUCCESS] AI Generator user ready: {ai_user_id}")
+    readiness.register("database")
+    if settings.STARTUP_MODE.lower() == "blocking":
+        logger.info(f"Initializing the database with a {settings.DB_WARMUP_TIMEOUT:.0f}-second timeout...")
+        try:
+            await asyncio.wait_for(warm_up_database(), timeout=settings.DB_WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"[ERROR] Database initialization timed out after {settings.DB_WARMUP_TIMEOUT:.0f} seconds.")
+            logger.warning("[OFFLINE MODE] Starting application without full database initialization")
+        except Exception as e:
+            logger.error(f"Error initializing database: {str(e)}")
+            logger.error(traceback.format_exc())
+            logger.warning("[OFFLINE MODE] Starting application without full database initialization")
+    else:
+        logger.info("Warming up the database in the background")
+        readiness.start(warm_up_database, timeout=settings.DB_WARMUP_TIMEOUT)
+
+    # Detect the Newman runtime (pulling the Docker image if needed) in the background
+    newman_runner.start()
 
-    except asyncio.TimeoutError:
-        logger.error("[ERROR] Database initialization timed out after 30 seconds.")
-        logger.warning("[OFFLINE MODE] Starting application without full database initialization")
-        logger.warning("[OFFLINE MODE] Some features may not work properly until database is available")
+    # Relay WebSocket broadcasts between workers
+    try:
+        await websocket_manager.start_backplane()
     except Exception as e:
-        logger.error(f"Error initializing database: {str(e)}")
-        logger.error(traceback.format_exc())
-        logger.warning("[OFFLINE MODE] Starting application without full database initialization")
-        logger.warning("[OFFLINE MODE] Some features may not work properly until database is available")
+        logger.error(f"WebSocket backplane unavailable, broadcasts stay within this worker: {e}")
+        websocket_manager.backplane = None
 
-    # Your Docker Newman initialization logic can stay here
-    # ...
+    # Persist and broadcast domain events raised by the write paths
+    event_pipeline.start()
 
     yield
+    
+    await readiness.stop()
+    # Cancelled plan runs still publish their final event
+    await plan_runner.shutdown()
+    await event_pipeline.stop()
+    await export_job_manager.shutdown()
+    await newman_runner.stop()
+    await websocket_manager.flush_updates()
+    await websocket_manager.stop_backplane()
+    # Release pooled HTTP connections used for website analysis
+    from app.mcp.website_test_generator import website_test_generator
+    await website_test_generator.aclose()
     logger.info("Application shutdown")
 
 app = FastAPI(
@@ -131,6 +176,16 @@ app.add_middleware(
     max_age=600
 )
 
+# Per-request timing of routes, DB queries and serialization
+if settings.TRACE_ENABLED:
+    install_tracing(app)
+
+# Request latency and in-flight counts for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Reject oversized attachment uploads before the multipart body is parsed
+app.add_middleware(UploadLimitMiddleware)
+
 # Create API router with /api prefix
 api_router = APIRouter(prefix="/api")
 
@@ -155,6 +210,36 @@ app.include_router(api_router)
 async def read_root():
     return {"message": "Welcome to the IntelliTest API!"}
 
+@app.get("/health", include_in_schema=False)
+@app.get("/health/live", include_in_schema=False)
+async def liveness():
+    """The process is up and serving; says nothing about the database"""
+    return {"status": "ok"}
+
+@app.get("/health/ready", include_in_schema=False)
+async def readiness_check():
+    """200 once the database warm-up passed, 503 with the state of each startup step before"""
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=readiness.snapshot()
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Runtime metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get(f"{settings.API_V1_STR}/_debug/slow-requests")
+async def get_slow_requests(
+    limit: int = 50,
+    min_duration_ms: float = 0.0,
+    current_user: dict = Depends(get_current_user)
+):
+    """Slowest recent requests with their DB, serialization and span timings"""
+    if not settings.TRACE_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Request tracing is disabled")
+    return {"requests": slow_requests(limit, min_duration_ms)}
+
 # WebSocket endpoint
 @app.websocket("/api/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
@@ -165,12 +250,13 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
             try:
                 message = json.loads(data)
                 if message.get("type") == "join_room":
-                    await websocket_manager.join_room(user_id, message.get("room_id"))
+                    await websocket_manager.join_room(user_id, message.get("room_id"), websocket)
                 elif message.get("type") == "leave_room":
-                    await websocket_manager.leave_room(user_id, message.get("room_id"))
+                    await websocket_manager.leave_room(user_id, message.get("room_id"), websocket)
             except Exception as e:
                 logger.error(f"WebSocket message handling error: {e}")
     except WebSocketDisconnect:
         websocket_manager.disconnect(websocket)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
+        websocket_manager.disconnect(websocket)
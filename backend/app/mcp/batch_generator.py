@@ -0,0 +1,426 @@
+"""
+Batch test case generation for whole websites.
+
+A batch job accepts a sitemap or a list of URLs, analyzes the pages
+concurrently, collapses pages that share a template (product pages, blog
+posts, ...) and generates test cases once per distinct template. Progress is
+reported through the WebSocket manager so the UI can follow long jobs.
+"""
+import asyncio
+import json
+import logging
+import re
+import uuid
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from app.mcp.website_test_generator import (
+    WebsiteAnalysis,
+    WebsiteTestCaseGenerator,
+    website_test_generator,
+)
+from app.services.job_registry import BackgroundJob, JobRegistry
+from app.websocket.manager import websocket_manager
+
+logger = logging.getLogger(__name__)
+
+# Path segments that identify an instance of a template rather than the template itself
+# (numbers, hashes, UUIDs and slugs carrying a number such as shirt-123); plain
+# slugs like about-our-team name distinct pages and are kept
+_ID_SEGMENT = re.compile(
+    r"^(\d+|[0-9a-f]{8,}|[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}|(?=.*\d).*-.*)$", re.IGNORECASE
+)
+
+
+class BatchJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class BatchGenerationJob(BackgroundJob):
+    id: str
+    project_id: str
+    requested_by: str
+    urls: List[str]
+    test_count: int = 5
+    use_ai: bool = False
+    status: BatchJobStatus = BatchJobStatus.PENDING
+    stage: str = "queued"
+    processed_urls: int = 0
+    templates: Dict[str, List[str]] = field(default_factory=dict)  # representative url -> member urls
+    errors: Dict[str, str] = field(default_factory=dict)
+    test_cases: List[Dict[str, Any]] = field(default_factory=list)
+    created_test_case_ids: List[str] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
+    def progress(self) -> Dict[str, Any]:
+        duplicates = sum(len(members) - 1 for members in self.templates.values())
+        return {
+            **super().progress(),
+            "project_id": self.project_id,
+            "total_urls": len(self.urls),
+            "processed_urls": self.processed_urls,
+            "unique_templates": len(self.templates),
+            "duplicate_urls": duplicates,
+            "failed_urls": len(self.errors),
+            "generated_test_cases": len(self.test_cases),
+            "created_test_case_ids": list(self.created_test_case_ids),
+            "errors": dict(self.errors),
+        }
+
+
+def structural_signature(analysis: WebsiteAnalysis) -> Set[str]:
+    """
+    Build a set of structural tokens for a page.
+
+    Page-specific content (titles, link texts) is left out so that pages
+    rendered from the same template produce (nearly) the same signature.
+    """
+    tokens = {f"type:{analysis.page_type}", f"path:{path_shape(analysis.url)}"}
+    for form in analysis.forms:
+        fields = ",".join(sorted(f"{inp.get('type')}:{inp.get('name')}" for inp in form.get("inputs", [])))
+        tokens.add(f"form:{form.get('method')}:{fields}")
+    tokens.update(f"button:{text.lower()}" for text in analysis.buttons)
+    tokens.update(f"nav:{text.lower()}" for text in analysis.navigation)
+    tokens.update(f"input:{inp.get('type')}:{inp.get('name')}" for inp in analysis.inputs)
+    tokens.update(f"feature:{feature}" for feature in analysis.features)
+    return tokens
+
+
+def path_shape(url: str) -> str:
+    """Collapse id-like path segments, e.g. /products/123 -> /products/:id"""
+    segments = [s for s in urlparse(url).path.split("/") if s]
+    return "/" + "/".join(":id" if _ID_SEGMENT.match(s) else s.lower() for s in segments)
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def group_by_template(analyses: List[WebsiteAnalysis], threshold: float) -> Dict[str, List[str]]:
+    """
+    Group near-identical pages. Returns representative url -> member urls,
+    where the representative is the first page seen for the template.
+    """
+    representatives: List[tuple] = []  # (url, signature)
+    groups: Dict[str, List[str]] = {}
+    for analysis in analyses:
+        signature = structural_signature(analysis)
+        for rep_url, rep_signature in representatives:
+            if jaccard(signature, rep_signature) >= threshold:
+                groups[rep_url].append(analysis.url)
+                break
+        else:
+            representatives.append((analysis.url, signature))
+            groups[analysis.url] = [analysis.url]
+    return groups
+
+
+class BatchTestCaseGenerator(JobRegistry[BatchGenerationJob]):
+    """Runs multi-URL test generation jobs in the background"""
+
+    progress_type = "url_batch_progress"
+    job_label = "batch job"
+
+    def __init__(self, generator: Optional[WebsiteTestCaseGenerator] = None):
+        super().__init__()
+        self.generator = generator or website_test_generator
+        self._provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def resolve_urls(self, urls: List[str], sitemap_url: Optional[str] = None) -> List[str]:
+        """Combine explicit URLs with URLs from a sitemap, de-duplicated and capped"""
+        resolved = list(urls)
+        if sitemap_url:
+            resolved.extend(await self._read_sitemap(sitemap_url))
+
+        seen = set()
+        unique_urls = []
+        for url in resolved:
+            url = url.strip()
+            if url and url not in seen:
+                seen.add(url)
+                unique_urls.append(url)
+        return unique_urls[:settings.URL_BATCH_MAX_URLS]
+
+    async def _read_sitemap(self, sitemap_url: str, depth: int = 0) -> List[str]:
+        """Read <loc> entries from a sitemap, following one level of sitemap indexes"""
+        try:
+            content = await self.generator.fetch_content(sitemap_url)
+            root = ET.fromstring(content)
+        except Exception as e:
+            raise ValueError(f"Could not read sitemap {sitemap_url}: {str(e)}")
+
+        locations = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+        if not root.tag.endswith("sitemapindex"):
+            return locations
+        if depth > 0:
+            return []
+
+        nested = await asyncio.gather(
+            *(self._read_sitemap(loc, depth + 1) for loc in locations),
+            return_exceptions=True
+        )
+        urls = []
+        for loc, result in zip(locations, nested):
+            if isinstance(result, Exception):
+                logger.warning(f"Skipping nested sitemap {loc}: {result}")
+                continue
+            urls.extend(result)
+        return urls
+
+    def start_job(
+        self,
+        project_id: str,
+        requested_by: str,
+        urls: List[str],
+        test_count: int = 5,
+        use_ai: bool = False,
+        persist: bool = True
+    ) -> BatchGenerationJob:
+        """Register a job and run it in the background"""
+        job = BatchGenerationJob(
+            id=str(uuid.uuid4()),
+            project_id=project_id,
+            requested_by=requested_by,
+            urls=urls,
+            test_count=test_count,
+            use_ai=use_ai
+        )
+        self._add_job(job)
+        self._tasks[job.id] = asyncio.create_task(self.run_job(job, persist=persist))
+        return job
+
+    async def run_job(self, job: BatchGenerationJob, persist: bool = True) -> BatchGenerationJob:
+        """Analyze, de-duplicate, generate and optionally persist test cases for a job"""
+        job.status = BatchJobStatus.RUNNING
+        try:
+            job.stage = "analyzing"
+            await self._report(job)
+            analyses = await self._analyze_pages(job)
+
+            job.stage = "deduplicating"
+            job.templates = group_by_template(analyses, settings.URL_BATCH_SIMILARITY_THRESHOLD)
+            await self._report(job)
+
+            job.stage = "generating"
+            by_url = {analysis.url: analysis for analysis in analyses}
+            representatives = [by_url[url] for url in job.templates]
+            generated = await self._generate(job, representatives)
+            for analysis in representatives:
+                job.test_cases.extend(generated.get(analysis.url, []))
+            await self._report(job)
+
+            if persist and job.test_cases:
+                job.stage = "saving"
+                await self._persist(job, representatives, generated)
+
+            job.stage = "done"
+            job.status = BatchJobStatus.COMPLETED
+        except Exception as e:
+            logger.error(f"Batch generation job {job.id} failed: {str(e)}")
+            job.errors["job"] = str(e)
+            job.stage = "failed"
+            job.status = BatchJobStatus.FAILED
+        finally:
+            job.completed_at = datetime.utcnow()
+            self._tasks.pop(job.id, None)
+            await self._report(job)
+        return job
+
+    async def _analyze_pages(self, job: BatchGenerationJob) -> List[WebsiteAnalysis]:
+        """Fetch and analyze every URL with bounded concurrency, keeping input order"""
+        semaphore = asyncio.Semaphore(settings.URL_BATCH_FETCH_CONCURRENCY)
+
+        async def analyze(url: str) -> Optional[WebsiteAnalysis]:
+            async with semaphore:
+                try:
+                    return await self.generator.analyze_website(url)
+                except Exception as e:
+                    job.errors[url] = str(e)
+                    return None
+                finally:
+                    job.processed_urls += 1
+                    await self._report(job)
+
+        results = await asyncio.gather(*(analyze(url) for url in job.urls))
+        return [analysis for analysis in results if analysis is not None]
+
+    async def _generate(self, job: BatchGenerationJob, analyses: List[WebsiteAnalysis]) -> Dict[str, List[Dict[str, Any]]]:
+        """Generate test cases per template, using the LLM when requested"""
+        generated: Dict[str, List[Dict[str, Any]]] = {}
+        if job.use_ai:
+            generated = await self._generate_with_ai(job, analyses)
+
+        # Rule-based generation covers non-AI jobs and any page the LLM did not answer for
+        for analysis in analyses:
+            if not generated.get(analysis.url):
+                generated[analysis.url] = self.generator.generate_test_cases_from_analysis(
+                    analysis, job.test_count
+                )
+        return generated
+
+    def _provider_semaphore(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self._provider_semaphores:
+            self._provider_semaphores[provider] = asyncio.Semaphore(settings.URL_BATCH_LLM_CONCURRENCY)
+        return self._provider_semaphores[provider]
+
+    async def _generate_with_ai(self, job: BatchGenerationJob, analyses: List[WebsiteAnalysis]) -> Dict[str, List[Dict[str, Any]]]:
+        """Send several pages per LLM call, with a concurrency limit per provider"""
+        from app.llm_chat import LlmChat
+
+        system_message = (
+            "You are an expert QA engineer. For every page described, generate test cases. "
+            "Respond with JSON of the form {\"pages\": [{\"url\": \"...\", \"test_cases\": [{"
+            "\"title\": \"...\", \"description\": \"...\", \"test_type\": \"functional\", "
+            "\"priority\": \"medium\", \"steps\": [{\"step_number\": 1, \"description\": \"...\", "
+            "\"expected_result\": \"...\"}], \"expected_result\": \"...\", \"tags\": [], "
+            "\"preconditions\": \"...\", \"test_data\": {}}]}]}"
+        )
+        per_call = max(1, settings.URL_BATCH_LLM_PAGES_PER_CALL)
+        chunks = [analyses[i:i + per_call] for i in range(0, len(analyses), per_call)]
+
+        async def run_chunk(chunk: List[WebsiteAnalysis]) -> Dict[str, List[Dict[str, Any]]]:
+            # LlmChat keeps conversation history, so every call gets its own session
+            chat = LlmChat(session_id=f"{job.id}-{uuid.uuid4()}", system_message=system_message)
+            if not chat.current_provider:
+                return {}
+            pages = [self._describe_page(analysis) for analysis in chunk]
+            prompt = (
+                f"Generate up to {job.test_count} test cases for each of these pages:\n"
+                f"{json.dumps(pages)}"
+            )
+            async with self._provider_semaphore(chat.current_provider["name"]):
+                response = await chat.complete_json(prompt)
+
+            results = {}
+            for page in response.get("pages", []) if isinstance(response, dict) else []:
+                cases = [c for c in page.get("test_cases", []) if isinstance(c, dict) and c.get("title")]
+                if page.get("url") and cases:
+                    results[page["url"]] = cases[:job.test_count]
+            if isinstance(response, dict) and response.get("error"):
+                logger.warning(f"LLM batch generation failed for job {job.id}: {response.get('message')}")
+            return results
+
+        generated: Dict[str, List[Dict[str, Any]]] = {}
+        for result in await asyncio.gather(*(run_chunk(chunk) for chunk in chunks), return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"LLM batch generation failed for job {job.id}: {result}")
+                continue
+            generated.update(result)
+        return generated
+
+    def _describe_page(self, analysis: WebsiteAnalysis) -> Dict[str, Any]:
+        """Compact page description for the LLM prompt"""
+        return {
+            "url": analysis.url,
+            "title": analysis.title,
+            "page_type": analysis.page_type,
+            "features": analysis.features,
+            "forms": [
+                {
+                    "method": form.get("method"),
+                    "inputs": [f"{inp.get('type')}:{inp.get('name')}" for inp in form.get("inputs", [])]
+                }
+                for form in analysis.forms
+            ],
+            "buttons": analysis.buttons,
+            "navigation": analysis.navigation,
+        }
+
+    async def _persist(
+        self,
+        job: BatchGenerationJob,
+        analyses: List[WebsiteAnalysis],
+        generated: Dict[str, List[Dict[str, Any]]]
+    ):
+        """Store generated test cases in a single transaction"""
+        from app.db.session import get_session_factory
+        from app.models import db_models as models
+
+        session_factory = get_session_factory()
+        async with session_factory() as db:
+            now = datetime.utcnow()
+            for analysis in analyses:
+                module_feature = urlparse(analysis.url).path or "/"
+                for data in generated.get(analysis.url, []):
+                    test_case_id = str(uuid.uuid4())
+                    db.add(models.TestCase(
+                        id=test_case_id,
+                        project_id=job.project_id,
+                        created_by=job.requested_by,
+                        title=data["title"],
+                        description=data.get("description", ""),
+                        test_type=_enum_value(models.TestType, data.get("test_type"), models.TestType.FUNCTIONAL),
+                        priority=_enum_value(models.Priority, data.get("priority"), models.Priority.MEDIUM),
+                        status=models.Status.DRAFT,
+                        module_feature=module_feature,
+                        tags=data.get("tags", []),
+                        expected_result=data.get("expected_result", ""),
+                        preconditions=data.get("preconditions", ""),
+                        test_data=data.get("test_data", {}),
+                        ai_generated=True,
+                        self_healing_enabled=True,
+                        created_at=now,
+                        updated_at=now
+                    ))
+                    for step in normalize_steps(data.get("steps")):
+                        db.add(models.TestStep(
+                            id=str(uuid.uuid4()),
+                            test_case_id=test_case_id,
+                            created_at=now,
+                            updated_at=now,
+                            **step
+                        ))
+                    job.created_test_case_ids.append(test_case_id)
+            await db.commit()
+
+    async def _send_progress(self, job: BatchGenerationJob, message: Dict[str, Any]):
+        """Progress goes to the requesting user and the project room"""
+        await super()._send_progress(job, message)
+        await websocket_manager.broadcast_to_room(
+            f"project_{job.project_id}", message, exclude_user=job.requested_by
+        )
+
+
+def normalize_steps(steps: Any) -> List[Dict[str, Any]]:
+    """
+    Validate generated steps before they are stored. LLM output is not trusted:
+    steps without a description are skipped, and a missing or invalid step number
+    or expected result is defaulted, so one malformed step does not fail the job.
+    """
+    normalized = []
+    for step in steps if isinstance(steps, list) else []:
+        if not isinstance(step, dict) or not str(step.get("description") or "").strip():
+            continue
+        try:
+            step_number = int(step.get("step_number"))
+        except (TypeError, ValueError):
+            step_number = len(normalized) + 1
+        normalized.append({
+            "step_number": step_number,
+            "description": str(step["description"]).strip(),
+            "expected_result": str(step.get("expected_result") or ""),
+        })
+    return normalized
+
+
+def _enum_value(enum_cls, value: Optional[str], default):
+    try:
+        return enum_cls(str(value).lower())
+    except ValueError:
+        return default
+
+
+# Global instance
+batch_test_generator = BatchTestCaseGenerator()
@@ -0,0 +1,219 @@
+"""
+Single-pass extraction of testable elements from an HTML page.
+
+The page is parsed in streaming mode and every element the website test
+generator needs (title, forms with their fields, navigation links, buttons,
+links, inputs and the page text) is collected from the same stream of parser
+events, without building a document tree. lxml is used when available and the
+standard library html.parser otherwise; both feed the same collector.
+"""
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+    etree = None
+
+# Elements that never have content or an end tag
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr"
+}
+NAVIGATION_CONTAINERS = {"nav", "ul", "ol"}
+# Elements implicitly closed by a sibling of the same kind (e.g. <li>A<li>B)
+SELF_CLOSING_SIBLINGS = {"a", "li", "option", "p", "tr", "td", "th"}
+SIBLING_SCOPES = {"ul", "ol", "table", "select", "nav", "div"}
+FORM_FIELDS = {"input", "select", "textarea"}
+
+
+@dataclass
+class PageExtraction:
+    title: str = "Unknown Page"
+    forms: List[Dict[str, Any]] = field(default_factory=list)
+    navigation: List[str] = field(default_factory=list)
+    buttons: List[str] = field(default_factory=list)
+    links: List[Dict[str, str]] = field(default_factory=list)
+    inputs: List[Dict[str, str]] = field(default_factory=list)
+    text: str = ""  # Lower-cased page text
+
+
+class _Capture:
+    """Text collected for an open element whose text content is needed"""
+    __slots__ = ("tag", "attrs", "parts")
+
+    def __init__(self, tag: str, attrs: Dict[str, str]):
+        self.tag = tag
+        self.attrs = attrs
+        self.parts: List[str] = []
+
+    def text(self) -> str:
+        # Same result as BeautifulSoup's get_text(strip=True)
+        return "".join(part.strip() for part in self.parts if part.strip())
+
+
+class _ElementCollector:
+    """Receives start/end/data events and collects everything in one pass"""
+
+    def __init__(self):
+        self.result = PageExtraction()
+        self._stack: List[str] = []
+        self._captures: List[_Capture] = []
+        self._text_parts: List[str] = []
+        self._form: Optional[Dict[str, Any]] = None
+        self._nav_depth = 0
+        self._title_found = False
+
+    def start(self, tag: str, attrs: Dict[str, str]):
+        tag = tag.lower()
+        if tag in VOID_ELEMENTS:
+            self._element(tag, attrs)
+            return
+        if tag in SELF_CLOSING_SIBLINGS and tag in self._stack:
+            open_index = len(self._stack) - 1 - self._stack[::-1].index(tag)
+            if not SIBLING_SCOPES.intersection(self._stack[open_index + 1:]):
+                self.end(tag)
+        self._stack.append(tag)
+        self._element(tag, attrs)
+
+    def end(self, tag: str):
+        tag = tag.lower()
+        if tag in VOID_ELEMENTS or tag not in self._stack:
+            # Stray end tag; void elements were handled at start
+            return
+        # Close any elements left open inside this one
+        while self._stack:
+            open_tag = self._stack.pop()
+            self._close(open_tag)
+            if open_tag == tag:
+                break
+
+    def data(self, text: str):
+        self._text_parts.append(text)
+        for capture in self._captures:
+            capture.parts.append(text)
+
+    def close(self) -> PageExtraction:
+        while self._stack:
+            self._close(self._stack.pop())
+        self.result.text = "".join(self._text_parts).lower()
+        return self.result
+
+    def _element(self, tag: str, attrs: Dict[str, str]):
+        if tag == "form":
+            self._form = {
+                "action": attrs.get("action", ""),
+                "method": str(attrs.get("method", "get") or "get").lower(),
+                "inputs": []
+            }
+        elif tag in NAVIGATION_CONTAINERS:
+            self._nav_depth += 1
+
+        if tag in FORM_FIELDS and self._form is not None:
+            self._form["inputs"].append({
+                "type": attrs.get("type", "text"),
+                "name": attrs.get("name", ""),
+                "placeholder": attrs.get("placeholder", ""),
+                "required": "required" in attrs
+            })
+
+        if tag == "input":
+            self.result.inputs.append({
+                "type": attrs.get("type", "text"),
+                "name": attrs.get("name", ""),
+                "placeholder": attrs.get("placeholder", ""),
+                "id": attrs.get("id", "")
+            })
+            if attrs.get("type") in ["button", "submit"] and attrs.get("value"):
+                self.result.buttons.append(attrs["value"])
+        elif tag in ("a", "button") or (tag == "title" and not self._title_found):
+            self._captures.append(_Capture(tag, attrs))
+
+    def _close(self, tag: str):
+        if tag == "form" and self._form is not None:
+            self.result.forms.append(self._form)
+            self._form = None
+        elif tag in NAVIGATION_CONTAINERS:
+            self._nav_depth = max(0, self._nav_depth - 1)
+
+        if not self._captures or self._captures[-1].tag != tag:
+            return
+        capture = self._captures.pop()
+        text = capture.text()
+        if tag == "title":
+            self._title_found = True
+            self.result.title = text or "Unknown Page"
+        elif tag == "button":
+            text = text or capture.attrs.get("value", "")
+            if text:
+                self.result.buttons.append(text)
+        elif tag == "a":
+            href = capture.attrs.get("href")
+            if href is not None:
+                self.result.links.append({"text": text, "href": href})
+            if self._nav_depth and text and href:
+                self.result.navigation.append(text)
+
+
+class _StdlibParser(HTMLParser):
+    """html.parser driver for the collector"""
+
+    def __init__(self, collector: _ElementCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, {name: value if value is not None else "" for name, value in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+class _LxmlTarget:
+    """lxml parser target driving the collector; no tree is built"""
+
+    def __init__(self, collector: _ElementCollector):
+        self.collector = collector
+
+    def start(self, tag, attrib):
+        self.collector.start(tag, dict(attrib))
+
+    def end(self, tag):
+        self.collector.end(tag)
+
+    def data(self, data):
+        self.collector.data(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self.collector.close()
+
+
+def extract_page(content: str, use_lxml: bool = LXML_AVAILABLE) -> PageExtraction:
+    """Extract testable elements and page text from HTML in a single pass"""
+    collector = _ElementCollector()
+    if use_lxml and LXML_AVAILABLE:
+        try:
+            parser = etree.HTMLParser(target=_LxmlTarget(collector))
+            parser.feed(content)
+            return parser.close()
+        except Exception:
+            # Fall back to the standard library parser for input lxml rejects
+            collector = _ElementCollector()
+
+    parser = _StdlibParser(collector)
+    parser.feed(content)
+    parser.close()
+    return collector.close()
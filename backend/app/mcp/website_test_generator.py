@@ -1,13 +1,19 @@
 import asyncio
+import hashlib
 import json
 import logging
+import os
+import time
 from typing import Dict, List, Any, Optional
 from urllib.parse import urlparse
-import requests
-from bs4 import BeautifulSoup, Tag
+import httpx
 import re
 from dataclasses import dataclass
 
+from app.core.config import settings
+from app.core.metrics import cache_lookups
+from app.mcp.dom_extractor import extract_page
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -22,34 +28,207 @@ class WebsiteAnalysis:
     features: List[str]
     page_type: str
 
+@dataclass
+class CachedPage:
+    url: str
+    content: str
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+class PageCache:
+    """On-disk cache of fetched pages, keyed by URL, with a freshness TTL"""
+    
+    # Prune on the first write and then every this many writes
+    PRUNE_EVERY = 100
+    
+    def __init__(self, cache_dir: str, ttl: int, max_bytes: Optional[int] = None, max_age: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._puts = 0
+    
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+    
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Return the cached page, fresh or stale, or None if not cached"""
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return CachedPage(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+    
+    def is_fresh(self, page: CachedPage) -> bool:
+        return time.time() - page.fetched_at < self.ttl
+    
+    def put(self, page: CachedPage):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(page.url)
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(page.__dict__, f)
+        os.replace(tmp_path, path)
+        
+        if self._puts % self.PRUNE_EVERY == 0:
+            self.prune()
+        self._puts += 1
+    
+    def prune(self):
+        """Drop entries older than max_age, then the least recently written until under max_bytes"""
+        now = time.time()
+        entries = []
+        try:
+            scan = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in scan:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            age = now - stat.st_mtime
+            # Leftovers from writers that died between open and os.replace
+            expired_tmp = entry.name.endswith(".tmp") and age > self.ttl
+            if expired_tmp or (self.max_age is not None and age > self.max_age):
+                self._remove(entry.path)
+            elif entry.name.endswith(".json"):
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        if self.max_bytes is None:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+    
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
 class WebsiteTestCaseGenerator:
     """MCP Server for generating test cases from website URLs"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5'
-        })
+        }
+        self.cache = PageCache(
+            settings.CRAWL_CACHE_DIR,
+            settings.CRAWL_CACHE_TTL,
+            max_bytes=settings.CRAWL_CACHE_MAX_BYTES,
+            max_age=settings.CRAWL_CACHE_MAX_AGE,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        # Concurrent requests for the same URL share a single fetch
+        self._in_flight: Dict[str, asyncio.Future] = {}
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the pooled HTTP client"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=settings.CRAWL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.CRAWL_MAX_CONNECTIONS // 2
+                )
+            )
+        return self._client
     
-    def _get_website_content(self, url: str, retry_attempt: int = 0) -> str:
-        """Get website content with retry logic"""
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _get_website_content(self, url: str, cached: Optional[CachedPage] = None, retry_attempt: int = 0) -> CachedPage:
+        """Get website content with retry logic, revalidating a stale cache entry if there is one"""
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        
         try:
             # Increase timeout on retry
             timeout = 15 if retry_attempt == 0 else 30
             
             logger.info(f"Attempting to access {url} (attempt {retry_attempt + 1}/2)")
-            response = self.session.get(url, timeout=timeout)
+            response = await self._get_client().get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and cached is not None:
+                return CachedPage(
+                    url=url,
+                    content=cached.content,
+                    fetched_at=time.time(),
+                    etag=response.headers.get('ETag', cached.etag),
+                    last_modified=response.headers.get('Last-Modified', cached.last_modified)
+                )
             response.raise_for_status()
-            return response.content.decode('utf-8')
-        except requests.exceptions.RequestException as e:
+            return CachedPage(
+                url=url,
+                content=response.text,
+                fetched_at=time.time(),
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+        except httpx.HTTPError as e:
             if retry_attempt == 0:
                 logger.warning(f"First attempt to access {url} failed. Retrying with increased timeout...")
-                return self._get_website_content(url, retry_attempt=1)
+                return await self._get_website_content(url, cached, retry_attempt=1)
             else:
                 raise e
     
+    async def fetch_content(self, url: str) -> str:
+        """Fetch website content, served from the page cache while fresh"""
+        cached = await asyncio.to_thread(self.cache.get, url)
+        if cached is not None and self.cache.is_fresh(cached):
+            cache_lookups.inc(("page", "hit"))
+            return cached.content
+        
+        if url in self._in_flight:
+            cache_lookups.inc(("page", "shared"))
+            shared = self._in_flight[url]
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                if not shared.cancelled():
+                    raise
+                # The task fetching the page was cancelled, not this one: fetch it again
+                return await self.fetch_content(url)
+        
+        cache_lookups.inc(("page", "miss"))
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[url] = future
+        try:
+            page = await self._get_website_content(url, cached)
+            try:
+                await asyncio.to_thread(self.cache.put, page)
+            except OSError as e:
+                logger.warning(f"Could not write page cache for {url}: {e}")
+            future.set_result(page.content)
+            return page.content
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            # Cancellation is not an Exception; waiters must not hang on an unresolved future
+            if not future.done():
+                future.cancel()
+            del self._in_flight[url]
+    
     async def analyze_website(self, url: str) -> WebsiteAnalysis:
         """Analyze website structure and identify testable elements"""
         try:
@@ -58,120 +237,68 @@ class WebsiteTestCaseGenerator:
                 raise ValueError(f"Invalid URL format: {url}. URL must start with http:// or https://")
             
             # Get website content with retry logic
-            content = self._get_website_content(url)
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Extract basic info
-            title = soup.find('title')
-            title_text = title.text.strip() if title else "Unknown Page"
+            content = await self.fetch_content(url)
+            return self.analyze_content(url, content)
             
-            # Find forms and their inputs
-            forms = []
-            for form in soup.find_all('form'):
-                # Ensure we're working with a Tag object that has the get method
-                if isinstance(form, Tag):
-                    form_data = {
-                        'action': form.get('action', ''),
-                        'method': str(form.get('method', 'get') or 'get').lower(),
-                        'inputs': []
-                    }
-                    
-                    for inp in form.find_all(['input', 'select', 'textarea']):
-                        if isinstance(inp, Tag):
-                            input_data = {
-                                'type': inp.get('type', 'text'),
-                                'name': inp.get('name', ''),
-                                'placeholder': inp.get('placeholder', ''),
-                                'required': inp.has_attr('required')
-                            }
-                            form_data['inputs'].append(input_data)
-                    
-                    forms.append(form_data)
-            
-            # Find navigation elements
-            nav_elements = []
-            for nav in soup.find_all(['nav', 'ul', 'ol']):
-                if isinstance(nav, Tag):
-                    for link in nav.find_all('a'):
-                        if isinstance(link, Tag):
-                            href = link.get('href', '')
-                            text = link.get_text(strip=True)
-                            if text and href:
-                                nav_elements.append(text)
-            
-            # Find buttons
-            buttons = []
-            for button in soup.find_all(['button', 'input']):
-                if isinstance(button, Tag):
-                    if button.name == 'input' and button.get('type') not in ['button', 'submit']:
-                        continue
-                    text = button.get_text(strip=True) or button.get('value', '')
-                    if text:
-                        buttons.append(text)
-            
-            # Find all links
-            links = []
-            for link in soup.find_all('a', href=True):
-                if isinstance(link, Tag):
-                    links.append({
-                        'text': link.get_text(strip=True),
-                        'href': link.get('href', '')
-                    })
-            
-            # Find input fields
-            inputs = []
-            for inp in soup.find_all('input'):
-                if isinstance(inp, Tag):
-                    inputs.append({
-                        'type': inp.get('type', 'text'),
-                        'name': inp.get('name', ''),
-                        'placeholder': inp.get('placeholder', ''),
-                        'id': inp.get('id', '')
-                    })
+        except httpx.HTTPError as e:
+            raise ValueError(self._describe_request_error(url, e))
+        except ValueError:
+            raise
+        except Exception as e:
+            error_msg = f"Error analyzing website {url}: {str(e)}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+    
+    def analyze_content(self, url: str, content: str) -> WebsiteAnalysis:
+        """Analyze already-fetched HTML and identify testable elements"""
+        try:
+            # Collect every element class and the page text in one pass
+            page = extract_page(content)
             
             # Determine page type and features
-            page_type = self._determine_page_type(soup, url, title_text)
-            features = self._identify_features(soup, forms, buttons, links)
+            page_type = self._determine_page_type(page.text, url, page.title, bool(page.forms))
+            features = self._identify_features(page.text, page.forms, page.buttons, page.links)
             
             return WebsiteAnalysis(
                 url=url,
-                title=title_text,
-                forms=forms,
-                links=links[:20],  # Limit links
-                buttons=buttons[:10],  # Limit buttons
-                inputs=inputs[:15],  # Limit inputs
-                navigation=nav_elements[:10],
+                title=page.title,
+                forms=page.forms,
+                links=page.links[:20],  # Limit links
+                buttons=page.buttons[:10],  # Limit buttons
+                inputs=page.inputs[:15],  # Limit inputs
+                navigation=page.navigation[:10],
                 features=features,
                 page_type=page_type
             )
             
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Error accessing website {url}: {str(e)}"
-            logger.error(error_msg)
-            if 'ConnectionError' in str(e.__class__.__name__):
-                error_msg = f"Could not connect to {url}. Please check the URL and try again."
-            elif 'Timeout' in str(e.__class__.__name__):
-                error_msg = f"Connection to {url} timed out. The website might be slow or unavailable."
-            elif 'TooManyRedirects' in str(e.__class__.__name__):
-                error_msg = f"Too many redirects while trying to access {url}."
-            elif hasattr(e, 'response') and e.response is not None:
-                if e.response.status_code == 403:
-                    error_msg = f"Access to {url} was forbidden (403). The website may block automated access."
-                elif e.response.status_code == 404:
-                    error_msg = f"The page at {url} was not found (404)."
-                else:
-                    error_msg = f"HTTP error {e.response.status_code} while accessing {url}."
-            raise ValueError(error_msg)
         except Exception as e:
             error_msg = f"Error analyzing website {url}: {str(e)}"
             logger.error(error_msg)
             raise ValueError(error_msg)
     
-    def _determine_page_type(self, soup: BeautifulSoup, url: str, title: str) -> str:
-        """Determine the type of webpage"""
+    def _describe_request_error(self, url: str, e: Exception) -> str:
+        """Turn a request exception into a user-facing error message"""
+        error_msg = f"Error accessing website {url}: {str(e)}"
+        logger.error(error_msg)
+        if isinstance(e, httpx.ConnectError):
+            error_msg = f"Could not connect to {url}. Please check the URL and try again."
+        elif isinstance(e, httpx.TimeoutException):
+            error_msg = f"Connection to {url} timed out. The website might be slow or unavailable."
+        elif isinstance(e, httpx.TooManyRedirects):
+            error_msg = f"Too many redirects while trying to access {url}."
+        elif isinstance(e, httpx.HTTPStatusError):
+            if e.response.status_code == 403:
+                error_msg = f"Access to {url} was forbidden (403). The website may block automated access."
+            elif e.response.status_code == 404:
+                error_msg = f"The page at {url} was not found (404)."
+            else:
+                error_msg = f"HTTP error {e.response.status_code} while accessing {url}."
+        return error_msg
+    
+    def _determine_page_type(self, text_content: str, url: str, title: str, has_forms: bool) -> str:
+        """Determine the type of webpage from its lower-cased text"""
         url_lower = url.lower()
         title_lower = title.lower()
-        text_content = soup.get_text().lower()
         
         # Check for specific page types
         if any(keyword in url_lower or keyword in title_lower for keyword in ['login', 'signin', 'auth']):
@@ -182,15 +309,14 @@ class WebsiteTestCaseGenerator:
             return 'ecommerce'
         elif any(keyword in text_content for keyword in ['dashboard', 'admin', 'profile']):
             return 'dashboard'
-        elif soup.find_all('form'):
+        elif has_forms:
             return 'form'
         else:
             return 'general'
     
-    def _identify_features(self, soup: BeautifulSoup, forms: List, buttons: List, links: List) -> List[str]:
-        """Identify testable features on the page"""
+    def _identify_features(self, text_content: str, forms: List, buttons: List, links: List) -> List[str]:
+        """Identify testable features on the page from its lower-cased text"""
         features = []
-        text_content = soup.get_text().lower()
         
         # Authentication features
         if any('password' in str(form).lower() for form in forms):
@@ -218,37 +344,7 @@ class WebsiteTestCaseGenerator:
         """Generate test cases based on website analysis"""
         try:
             analysis = await self.analyze_website(url)
-            
-            # Generate test cases based on analysis
-            test_cases = []
-            
-            # Login test cases
-            if analysis.page_type == 'login' or 'user_authentication' in analysis.features:
-                test_cases.extend(self._generate_login_tests(analysis))
-            
-            # E-commerce test cases
-            if analysis.page_type == 'ecommerce' or 'shopping_cart' in analysis.features:
-                test_cases.extend(self._generate_ecommerce_tests(analysis))
-            
-            # Form validation tests
-            if analysis.forms:
-                test_cases.extend(self._generate_form_tests(analysis))
-            
-            # Navigation tests
-            if 'navigation' in analysis.features:
-                test_cases.extend(self._generate_navigation_tests(analysis))
-            
-            # Generate specialized test cases for different test types
-            test_cases.extend(self._generate_api_tests(analysis))
-            test_cases.extend(self._generate_visual_tests(analysis))
-            test_cases.extend(self._generate_security_tests(analysis))
-            test_cases.extend(self._generate_performance_tests(analysis))
-            
-            # General functionality tests
-            test_cases.extend(self._generate_general_tests(analysis))
-            
-            # Limit to requested count
-            return test_cases[:test_count]
+            return self.generate_test_cases_from_analysis(analysis, test_count)
         except ValueError as e:
             # Propagate more specific error messages from analyze_website
             logger.error(f"Error generating test cases from URL: {str(e)}")
@@ -261,6 +357,39 @@ class WebsiteTestCaseGenerator:
             logger.error(traceback.format_exc())
             raise ValueError(error_msg)
     
+    def generate_test_cases_from_analysis(self, analysis: WebsiteAnalysis, test_count: int = 5) -> List[Dict[str, Any]]:
+        """Generate test cases from an existing website analysis"""
+        # Generate test cases based on analysis
+        test_cases = []
+            
+        # Login test cases
+        if analysis.page_type == 'login' or 'user_authentication' in analysis.features:
+            test_cases.extend(self._generate_login_tests(analysis))
+        
+        # E-commerce test cases
+        if analysis.page_type == 'ecommerce' or 'shopping_cart' in analysis.features:
+            test_cases.extend(self._generate_ecommerce_tests(analysis))
+        
+        # Form validation tests
+        if analysis.forms:
+            test_cases.extend(self._generate_form_tests(analysis))
+        
+        # Navigation tests
+        if 'navigation' in analysis.features:
+            test_cases.extend(self._generate_navigation_tests(analysis))
+        
+        # Generate specialized test cases for different test types
+        test_cases.extend(self._generate_api_tests(analysis))
+        test_cases.extend(self._generate_visual_tests(analysis))
+        test_cases.extend(self._generate_security_tests(analysis))
+        test_cases.extend(self._generate_performance_tests(analysis))
+        
+        # General functionality tests
+        test_cases.extend(self._generate_general_tests(analysis))
+        
+        # Limit to requested count
+        return test_cases[:test_count]
+    
     def _generate_login_tests(self, analysis: WebsiteAnalysis) -> List[Dict[str, Any]]:
         """Generate login-specific test cases"""
         return [
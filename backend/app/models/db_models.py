@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, JSON, Enum as SQLEnum, Text, Table, UniqueConstraint
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, JSON, Enum as SQLEnum, Text, Table, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -228,6 +228,44 @@ class TestExecution(Base):
     test_plan = relationship("TestPlan", back_populates="test_executions")
     executor = relationship("User", back_populates="test_executions")
     environment = relationship("Environment", back_populates="test_executions")
+    request_results = relationship(
+        "TestExecutionRequest", back_populates="execution", cascade="all, delete-orphan", passive_deletes=True
+    )
+    
+    # Recent runs of a test case, read by the history-based prioritization
+    __table_args__ = (
+        Index("ix_test_executions_case_completed", "test_case_id", "completed_at"),
+    )
+
+
+# Per-request results of automated API runs (Newman collections)
+class TestExecutionRequest(Base):
+    __tablename__ = "test_execution_requests"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    execution_id = Column(String, ForeignKey("test_executions.id", ondelete="CASCADE"), nullable=False, index=True)
+    test_case_id = Column(String, ForeignKey("test_cases.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Order of the request within the run
+    iteration = Column(Integer, default=0)
+    name = Column(String, nullable=False)
+    method = Column(String(16), nullable=True)
+    url = Column(Text, nullable=True)
+    status_code = Column(Integer, nullable=True)
+    response_time = Column(Integer, nullable=True)  # in milliseconds
+    response_size = Column(Integer, nullable=True)  # in bytes
+    assertions_total = Column(Integer, default=0)
+    assertions_failed = Column(Integer, default=0)
+    failures = Column(JSON, nullable=True)  # [{"assertion": ..., "message": ...}]
+    error = Column(Text, nullable=True)  # Request-level error, e.g. connection refused
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    execution = relationship("TestExecution", back_populates="request_results")
+    
+    # History of one request across runs of a test case
+    __table_args__ = (
+        Index("ix_test_execution_requests_case_name", "test_case_id", "name"),
+    )
 
 # Comment Model
 class Comment(Base):
@@ -310,6 +348,7 @@ class Attachment(Base):
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)  # in bytes
     file_type = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the stored blob
     entity_type = Column(String, nullable=False)  # 'test_case', 'test_execution', etc.
     entity_id = Column(String, nullable=False)    # ID of the related entity
     uploaded_by = Column(String, ForeignKey("users.id"), nullable=False)
@@ -320,6 +359,16 @@ class Attachment(Base):
     uploader = relationship("User", back_populates="uploaded_attachments")
 
 
+# Reference count of a content-addressed attachment blob. Saving and releasing a
+# blob lock its row, so an upload reusing a blob and a delete freeing it are serialized
+class AttachmentBlob(Base):
+    __tablename__ = "attachment_blobs"
+    
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 of the stored blob
+    ref_count = Column(Integer, nullable=False, default=0)  # Attachment rows referencing the blob
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 # Test Plan Test Case Association Model
 class TestPlanTestCase(Base):
     """Association table for many-to-many relationship between TestPlan and TestCase with additional attributes"""
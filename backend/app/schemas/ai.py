@@ -80,10 +80,12 @@ class AIDebugRequest(BaseModel):
     model: AIModelType = AIModelType.GPT4
 
 class AIPrioritizationRequest(BaseModel):
-    """Request schema for AI test case prioritization"""
-    test_case_ids: List[str] = Field(..., min_length=2, max_length=100)
-    context: str = Field(..., min_length=10, max_length=1000, description="Context for prioritization")
+    """Request schema for test case prioritization"""
+    test_case_ids: List[str] = Field(..., min_length=2, max_length=5000)
+    context: Optional[str] = Field(None, max_length=1000, description="Context for prioritization (not used for the ordering)")
     criteria: Optional[List[str]] = Field(None, description="Prioritization criteria")
+    changed_areas: List[str] = Field(default=[], description="Changed modules or tags; covering cases move up")
+    parallelism: int = Field(1, ge=1, le=256, description="Workers the cases will run on")
     model: AIModelType = AIModelType.GPT4
 
 class AIAnalysisResult(BaseModel):
@@ -106,10 +108,23 @@ class AITestCaseGeneration(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
+class PrioritizedTestCase(BaseModel):
+    """Position, risk score and reasons of one test case in a prioritization"""
+    test_case_id: str
+    rank: int
+    risk: float
+    tier: int
+    estimated_duration: float
+    runs: int = 0  # Recent runs the score is based on
+    reasons: List[str] = []
+
 class AIPrioritizationResult(BaseModel):
-    """Result schema for AI test case prioritization"""
+    """Result schema for test case prioritization"""
     prioritized_test_case_ids: List[str]
     prioritization_reasoning: str
+    # Share of the cases with recent runs; the ordering of the others rests on priority and changes only
     confidence_score: float = Field(..., ge=0.0, le=1.0)
+    ranking: List[PrioritizedTestCase] = []
+    estimated_duration: Optional[float] = Field(None, description="Estimated wall time in seconds on the given workers")
     
     model_config = ConfigDict(from_attributes=True)
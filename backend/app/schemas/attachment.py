@@ -9,6 +9,7 @@ class AttachmentBase(BaseModel):
     file_path: str
     file_size: int
     file_type: str
+    content_hash: Optional[str] = None
     entity_type: str
     entity_id: str
     description: Optional[str] = None
@@ -87,6 +87,27 @@ class TestExecutionInDB(TestExecutionInDBBase):
     """Schema for test execution data stored in database"""
     pass
 
+class TestExecutionRequestResult(BaseModel):
+    """Result of one request of an automated API run"""
+    id: str
+    execution_id: str
+    test_case_id: str
+    position: int
+    iteration: int = 0
+    name: str
+    method: Optional[str] = None
+    url: Optional[str] = None
+    status_code: Optional[int] = None
+    response_time: Optional[int] = None  # Milliseconds
+    response_size: Optional[int] = None  # Bytes
+    assertions_total: int = 0
+    assertions_failed: int = 0
+    failures: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    
+    model_config = ConfigDict(from_attributes=True)
+
 class TestExecutionSummary(BaseModel):
     """Summary schema for test execution statistics"""
     total_executions: int
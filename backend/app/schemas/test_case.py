@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, ConfigDict, HttpUrl
+from pydantic import BaseModel, Field, ConfigDict, HttpUrl, model_validator
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from enum import Enum
@@ -138,4 +138,54 @@ class URLGenerationRequest(BaseModel):
 class URLGenerationResponse(BaseModel):
     generated_test_cases: List[TestCaseResponse]
     analysis_summary: str
-    url_analyzed: str
\ No newline at end of file
+    url_analyzed: str
+
+# Batch URL Generation Schemas
+class URLBatchGenerationRequest(BaseModel):
+    project_id: str = Field(..., description="Project ID where test cases will be created")
+    urls: List[str] = Field(default_factory=list, description="Website URLs to analyze")
+    sitemap_url: Optional[str] = Field(default=None, description="Sitemap to read additional URLs from")
+    test_count: int = Field(default=5, ge=1, le=10, description="Number of test cases per distinct page template (1-10)")
+    use_ai: bool = Field(default=False, description="Generate test cases with the LLM instead of the built-in rules")
+    
+    @model_validator(mode="after")
+    def check_source(self):
+        if not self.urls and not self.sitemap_url:
+            raise ValueError("Either urls or sitemap_url must be provided")
+        return self
+
+class URLBatchJobResponse(BaseModel):
+    job_id: str
+    project_id: str
+    status: str
+    stage: str
+    total_urls: int
+    processed_urls: int
+    unique_templates: int
+    duplicate_urls: int
+    failed_urls: int
+    generated_test_cases: int
+    created_test_case_ids: List[str] = []
+    errors: Dict[str, str] = {}
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+class ExportJobRequest(BaseModel):
+    project_id: str
+    export_format: str = Field("pdf", pattern="^(csv|excel|xlsx|pdf)$")
+
+
+class ExportJobResponse(BaseModel):
+    job_id: str
+    project_id: str
+    export_format: str
+    status: str
+    stage: str
+    cached: bool = False
+    data_version: str
+    processed_rows: int = 0
+    file_size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
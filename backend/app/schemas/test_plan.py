@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from enum import Enum
 
 # Import the Status enum from the database models instead of test_case
@@ -32,4 +32,40 @@ class TestPlanResponse(TestPlanBase):
     updated_at: datetime
     test_case_ids: List[str] = []
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+# Plan runs
+class TestPlanRunRequest(BaseModel):
+    # Automated cases run at the same time; defaults to PLAN_RUN_CONCURRENCY
+    parallelism: Optional[int] = Field(None, ge=1)
+    # Cancel the later stages (higher order) once a mandatory case failed
+    stop_on_mandatory_failure: bool = True
+    environment_id: Optional[str] = None
+    # Start likely failures first within each stage, from the execution history
+    prioritize: bool = True
+    changed_areas: List[str] = []  # Changed modules or tags; covering cases move up
+
+class TestPlanRunCase(BaseModel):
+    test_case_id: str
+    execution_id: str
+    title: str
+    order: int
+    is_mandatory: bool
+    runner: Optional[str] = None
+    status: str
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+class TestPlanRunResponse(BaseModel):
+    run_id: str
+    test_plan_id: str
+    status: str
+    stage: str
+    current_order: Optional[int] = None
+    parallelism: int
+    prioritized: bool = False
+    counts: Dict[str, int]
+    error: Optional[str] = None
+    duration: Optional[float] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    cases: Optional[List[TestPlanRunCase]] = None
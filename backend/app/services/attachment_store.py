@@ -0,0 +1,249 @@
+"""
+Content-addressed attachment storage.
+
+Uploads are streamed in chunks to the configured storage backend (local
+disk or S3, see ``object_storage``) and hashed while they are written. Each
+blob is stored once under its SHA-256 at the key ``blobs/ab/cd/<sha256>``,
+so a screenshot uploaded again by automated runs costs no extra storage.
+Attachment rows reference blobs through ``Attachment.content_hash``, and
+``AttachmentBlob`` counts the references. Taking or dropping a reference
+locks the blob's row until the transaction ends, so an upload that reuses a
+blob and a delete that frees it are serialized across workers. A blob is
+removed once its count is zero.
+
+``MAX_UPLOAD_SIZE`` is enforced twice. ``UploadLimitMiddleware`` rejects
+oversized upload requests before the multipart body is parsed. The store
+stops writing once a single file exceeds the limit.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.db_models import AttachmentBlob
+from app.services.object_storage import StorageBackend, get_storage
+from app.services.thumbnails import thumbnail_cache
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries and the other form fields of an upload request
+MULTIPART_OVERHEAD = 64 * 1024
+
+# INSERT ... ON CONFLICT DO UPDATE per dialect
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_SIZE"""
+
+
+@dataclass
+class StoredBlob:
+    content_hash: str
+    key: str
+    size: int
+    deduplicated: bool
+
+
+class AttachmentStore:
+    """Stores attachment blobs by SHA-256 in a storage backend"""
+
+    def __init__(self, storage: Optional[StorageBackend] = None):
+        self._storage = storage
+
+    @property
+    def storage(self) -> StorageBackend:
+        return self._storage or get_storage()
+
+    @staticmethod
+    def blob_key(content_hash: str) -> str:
+        return f"blobs/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+
+    def local_path(self, content_hash: str) -> Optional[str]:
+        return self.storage.local_path(self.blob_key(content_hash))
+
+    def presigned_url(self, content_hash: str, filename: str, content_type: str) -> Optional[str]:
+        return self.storage.presigned_url(self.blob_key(content_hash), filename, content_type)
+
+    @asynccontextmanager
+    async def local_file(self, content_hash: str):
+        """Path of a local copy of the blob, downloading it to a temporary file if needed"""
+        path = self.local_path(content_hash)
+        if path is not None:
+            yield path
+            return
+        fd, tmp_path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            await self.storage.download_to(self.blob_key(content_hash), tmp_path)
+            yield tmp_path
+        finally:
+            await _remove(tmp_path)
+
+    async def _reference(self, db: AsyncSession, content_hash: str, delta: int) -> int:
+        """
+        Add `delta` to the reference count of a blob and return the new count.
+        The row stays locked until the transaction of `db` ends.
+        """
+        upsert = _UPSERTS[db.get_bind().dialect.name]
+        statement = upsert(AttachmentBlob).values(
+            content_hash=content_hash, ref_count=max(delta, 0), created_at=datetime.utcnow()
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[AttachmentBlob.content_hash],
+            set_={"ref_count": AttachmentBlob.ref_count + delta}
+        ).returning(AttachmentBlob.ref_count)
+        return (await db.execute(statement)).scalar_one()
+
+    async def save(self, db: AsyncSession, upload: UploadFile, max_size: Optional[int] = None) -> StoredBlob:
+        """
+        Stream an upload into the store and take a reference to its blob in the
+        transaction of `db`. Commit it together with the attachment row; after a
+        rollback call remove_unreferenced().
+        """
+        max_size = settings.MAX_UPLOAD_SIZE if max_size is None else max_size
+        storage = self.storage
+        tmp_key = f"blobs/tmp/{uuid.uuid4().hex}"
+
+        digest = hashlib.sha256()
+        size = 0
+        writer = await storage.open_writer(tmp_key)
+        try:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(_too_large(max_size))
+                digest.update(chunk)
+                await writer.write(chunk)
+            await writer.commit()
+        except BaseException:
+            await writer.abort()
+            raise
+
+        content_hash = digest.hexdigest()
+        key = self.blob_key(content_hash)
+        try:
+            # Locks the blob's row first, so a concurrent delete cannot remove the blob once it was found
+            await self._reference(db, content_hash, 1)
+            if await storage.exists(key):
+                await storage.delete(tmp_key)
+                return StoredBlob(content_hash, key, size, deduplicated=True)
+            await storage.move(tmp_key, key)
+        except BaseException:
+            await storage.delete(tmp_key)
+            raise
+        return StoredBlob(content_hash, key, size, deduplicated=False)
+
+    async def release(self, db: AsyncSession, content_hash: str):
+        """
+        Drop a reference to a blob in the transaction deleting the attachment row.
+        Call remove_unreferenced() after the commit.
+        """
+        await self._reference(db, content_hash, -1)
+
+    async def remove_unreferenced(self, db: AsyncSession, content_hash: str):
+        """Remove a blob, in a transaction of its own, if no attachment references it"""
+        try:
+            if await self._reference(db, content_hash, 0) <= 0:
+                await self.storage.delete(self.blob_key(content_hash))
+                await asyncio.to_thread(thumbnail_cache.remove, content_hash)
+                await db.execute(delete(AttachmentBlob).where(AttachmentBlob.content_hash == content_hash))
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+
+    async def render_thumbnails(self, content_hash: str):
+        """Pre-render the gallery previews of an image blob"""
+        async with self.local_file(content_hash) as path:
+            await asyncio.to_thread(thumbnail_cache.generate, content_hash, path)
+
+    async def thumbnail(self, content_hash: str, size: int) -> Optional[Path]:
+        cached = thumbnail_cache.path(content_hash, size)
+        if cached.exists():
+            return cached
+        async with self.local_file(content_hash) as path:
+            return await asyncio.to_thread(thumbnail_cache.get, content_hash, path, size)
+
+
+async def _remove(path):
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove {path}: {e}")
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects upload requests larger than MAX_UPLOAD_SIZE with 413 before the
+    body is read, using Content-Length, and cuts off bodies that stream past
+    the limit without one.
+    """
+
+    def __init__(self, app, path_suffix: str = "/attachments/upload"):
+        self.app = app
+        self.path_suffix = path_suffix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].endswith(self.path_suffix):
+            await self.app(scope, receive, send)
+            return
+
+        limit = settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await _reject(send, settings.MAX_UPLOAD_SIZE)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI passes HTTPExceptions raised while parsing the body through
+                    raise HTTPException(
+                        status_code=413,
+                        detail=_too_large(settings.MAX_UPLOAD_SIZE)
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _too_large(max_size: int) -> str:
+    return f"File exceeds the maximum upload size of {max_size} bytes"
+
+
+async def _reject(send, max_size: int):
+    body = json.dumps({"detail": _too_large(max_size)}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+attachment_store = AttachmentStore()
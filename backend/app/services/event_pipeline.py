@@ -0,0 +1,211 @@
+"""
+Asynchronous domain event pipeline.
+
+Write paths (test case and execution routes) publish domain events to an
+in-process queue without awaiting anything. A background consumer collects
+events into batches, inserts them as ActivityLog rows in one statement and
+fans them out to WebSocket clients, so auditing and real-time updates add no
+latency to the request path. A failed insert does not hold back the
+broadcast, and a batch rejected because of one bad row is retried row by row.
+"""
+import asyncio
+import logging
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DomainEvent:
+    action: str  # e.g. 'create', 'update', 'delete', 'status_change'
+    target_type: str  # e.g. 'test_case', 'test_execution'
+    target_id: str
+    user_id: str
+    user_name: str
+    target_name: Optional[str] = None
+    project_id: Optional[str] = None
+    details: Dict[str, Any] = field(default_factory=dict)
+    ip_address: Optional[str] = None
+    user_agent: Optional[str] = None
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+    def to_message(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["created_at"] = self.created_at.isoformat()
+        return data
+
+
+def event_actor(current_user: Any) -> Tuple[Optional[str], str]:
+    """User id and display name of the authenticated user (dict or model)"""
+    if isinstance(current_user, dict):
+        user_id = current_user.get("id")
+        name = current_user.get("full_name") or current_user.get("email")
+    else:
+        user_id = getattr(current_user, "id", None)
+        name = getattr(current_user, "full_name", None) or getattr(current_user, "email", None)
+    return (str(user_id) if user_id else None), (name or "Unknown user")
+
+
+class EventPipeline:
+    """Queues domain events and persists/broadcasts them in batches in the background"""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._in_flight = 0
+        self.dropped = 0
+        # Events not written to the activity log because they have no user
+        self.unattributed = 0
+        # Events whose activity log row the database rejected
+        self.unlogged = 0
+
+    @property
+    def running(self) -> bool:
+        return self._consumer is not None and not self._consumer.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.EVENT_QUEUE_SIZE)
+        self._consumer = asyncio.create_task(self._consume())
+        logger.info("Event pipeline started")
+
+    async def stop(self, timeout: Optional[float] = None):
+        """Process the events still queued for up to `timeout` seconds, then stop the consumer"""
+        if not self.running:
+            return
+        timeout = settings.EVENT_DRAIN_TIMEOUT if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            lost = self._queue.qsize() + self._in_flight
+            self.dropped += lost
+            logger.warning(f"Event pipeline did not drain within {timeout}s, dropped {lost} events")
+        self._consumer.cancel()
+        self._consumer = None
+        logger.info("Event pipeline stopped")
+
+    def publish(self, event: DomainEvent):
+        """Enqueue an event without blocking; events are dropped when the queue is full"""
+        if not self.running:
+            logger.debug(f"Event pipeline not running, dropping {event.target_type} {event.action} event")
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Event queue full, dropped {event.target_type} {event.action} event ({self.dropped} total)")
+
+    async def _next_batch(self) -> List[DomainEvent]:
+        """Wait for an event, then collect more until the batch is full or the window ends"""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.EVENT_BATCH_WINDOW_MS / 1000
+        while len(batch) < settings.EVENT_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _consume(self):
+        while True:
+            batch = await self._next_batch()
+            self._in_flight = len(batch)
+            try:
+                try:
+                    await self.persist(batch)
+                except Exception as e:
+                    logger.error(f"Could not log {len(batch)} domain events: {str(e)}")
+                try:
+                    await self.broadcast(batch)
+                except Exception as e:
+                    logger.error(f"Could not broadcast {len(batch)} domain events: {str(e)}")
+            finally:
+                self._in_flight = 0
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def persist(self, batch: List[DomainEvent]):
+        """
+        Insert the batch as ActivityLog rows with a single executemany statement.
+        When the database rejects the batch over a row's data (e.g. an unknown
+        user), the rows are inserted one by one and only the bad ones are dropped.
+        """
+        from sqlalchemy import insert
+        from sqlalchemy.exc import DataError, IntegrityError
+
+        from app.db.session import get_session_factory
+        from app.models.db_models import ActivityLog
+
+        rows = [{
+            "id": event.id,
+            "user_id": event.user_id,
+            "user_name": event.user_name,
+            "action": event.action,
+            "target_type": event.target_type,
+            "target_id": event.target_id,
+            "target_name": event.target_name,
+            "details": {**event.details, "project_id": event.project_id} if event.project_id else event.details,
+            "ip_address": event.ip_address,
+            "user_agent": event.user_agent,
+            "created_at": event.created_at,
+        } for event in batch if event.user_id]
+        if len(rows) < len(batch):
+            # ActivityLog rows need a user; the events are still broadcast
+            skipped = len(batch) - len(rows)
+            self.unattributed += skipped
+            logger.warning(f"Not logging {skipped} events without a user ({self.unattributed} total)")
+        if not rows:
+            return
+
+        try:
+            session_factory = get_session_factory()
+        except RuntimeError as e:
+            logger.warning(f"Skipping activity log for {len(rows)} events: {e}")
+            return
+        async with session_factory() as db:
+            try:
+                await db.execute(insert(ActivityLog), rows)
+                await db.commit()
+                return
+            except (IntegrityError, DataError) as e:
+                await db.rollback()
+                logger.warning(f"Activity log batch of {len(rows)} rows rejected, inserting them one by one: {e}")
+            for row in rows:
+                try:
+                    await db.execute(insert(ActivityLog), [row])
+                    await db.commit()
+                except (IntegrityError, DataError) as e:
+                    await db.rollback()
+                    self.unlogged += 1
+                    logger.error(
+                        f"Dropped activity log row of {row['target_type']} {row['target_id']} {row['action']} "
+                        f"by user {row['user_id']} ({self.unlogged} total): {e}"
+                    )
+
+    async def broadcast(self, batch: List[DomainEvent]):
+        from app.websocket.manager import websocket_manager
+
+        for event in batch:
+            if event.target_type == "test_execution":
+                await websocket_manager.broadcast_test_execution_update({
+                    "id": event.target_id,
+                    "project_id": event.project_id,
+                    "action": event.action,
+                    **event.details
+                })
+            await websocket_manager.broadcast_activity(event.to_message())
+
+
+# Global event pipeline instance
+event_pipeline = EventPipeline()
@@ -0,0 +1,277 @@
+"""
+Background test case export jobs.
+
+Rendering a large project can take minutes, above all the PDF, which has one
+reportlab table per test case. So exports run as jobs. The rows are read in
+chunks on the event loop and spooled to a temporary file, which a process
+pool renders away from the request threads, so the whole project is never
+held in the server process. Artifacts are stored under
+``UPLOAD_DIR/exports/<project id>/`` and keyed by format and a hash of the
+project's data version. Exporting unchanged data again returns the cached
+file immediately. Every requester gets their own job; jobs for the same
+artifact wait on one shared render. Progress is pushed to each requester
+over WebSocket.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.models.db_models import Project, TestCase, TestStep
+from app.services.export_service import TestCaseExportService, render_export, spool_rows
+from app.services.job_registry import BackgroundJob, JobRegistry
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rendered output changes, so artifacts of older layouts are not served
+ARTIFACT_REVISION = 1
+
+EXPORT_EXTENSIONS = {"csv": "csv", "excel": "xlsx", "xlsx": "xlsx", "pdf": "pdf"}
+
+
+class ExportJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class ExportJob(BackgroundJob):
+    id: str
+    project_id: str
+    project_name: str
+    requested_by: str
+    extension: str
+    data_version: str
+    file_path: str
+    status: ExportJobStatus = ExportJobStatus.PENDING
+    stage: str = "queued"
+    cached: bool = False
+    processed_rows: int = 0
+    file_size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
+    @property
+    def filename(self) -> str:
+        return TestCaseExportService.get_export_filename(self.project_name, self.extension)
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            **super().progress(),
+            "project_id": self.project_id,
+            "export_format": self.extension,
+            "cached": self.cached,
+            "data_version": self.data_version,
+            "processed_rows": self.processed_rows,
+            "file_size": self.file_size,
+            "error": self.error,
+        }
+
+
+async def iter_test_case_chunks(project_id: str):
+    """Yield the export data of a project's test cases in chunks read through a server-side cursor"""
+    from app.db.session import get_session_factory
+
+    async with get_session_factory()() as db:
+        result = await db.stream_scalars(
+            select(TestCase)
+            .options(selectinload(TestCase.steps))
+            .where(TestCase.project_id == project_id)
+            .order_by(TestCase.created_at, TestCase.id)
+            .execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+        )
+        async for chunk in result.partitions():
+            yield [TestCaseExportService.to_export_data(tc) for tc in chunk]
+            # Exported rows are not needed again; keep the identity map from growing
+            for tc in chunk:
+                db.expunge(tc)
+
+
+async def data_version(db: AsyncSession, project: Project) -> str:
+    """
+    Hash identifying the current contents of a project's export.
+
+    Built from counts and latest timestamps of the project's test cases and
+    steps, so it is two aggregate queries instead of a read of every row.
+    """
+    cases = (await db.execute(
+        select(func.count(TestCase.id), func.max(TestCase.created_at), func.max(TestCase.updated_at))
+        .where(TestCase.project_id == project.id)
+    )).one()
+    steps = (await db.execute(
+        select(func.count(TestStep.id), func.max(TestStep.created_at), func.max(TestStep.updated_at))
+        .join(TestCase, TestStep.test_case_id == TestCase.id)
+        .where(TestCase.project_id == project.id)
+    )).one()
+    fingerprint = json.dumps([ARTIFACT_REVISION, project.name, *cases, *steps], default=str)
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+
+def artifact_path(project_id: str, extension: str, version: str) -> Path:
+    return Path(settings.UPLOAD_DIR) / "exports" / project_id / f"{extension}-{version}.{extension}"
+
+
+class ExportJobManager(JobRegistry[ExportJob]):
+    """Runs export jobs in the background and keeps their artifacts"""
+
+    progress_type = "export_job_progress"
+    job_label = "export job"
+
+    def __init__(self):
+        super().__init__()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Renders in progress and the jobs waiting on them, by artifact path
+        self._renders: Dict[str, asyncio.Task] = {}
+        self._waiting: Dict[str, List[ExportJob]] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Worker processes are only started once the first export is rendered
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=settings.EXPORT_WORKERS)
+        return self._executor
+
+    async def start_export(
+        self,
+        db: AsyncSession,
+        project: Project,
+        export_format: str,
+        requested_by: str
+    ) -> ExportJob:
+        """Return a finished job for a cached artifact, or start a job that waits for the artifact"""
+        extension = EXPORT_EXTENSIONS[export_format]
+        version = await data_version(db, project)
+        path = artifact_path(project.id, extension, version)
+        job = ExportJob(
+            id=str(uuid.uuid4()),
+            project_id=project.id,
+            project_name=project.name,
+            requested_by=requested_by,
+            extension=extension,
+            data_version=version,
+            file_path=str(path)
+        )
+
+        if path.exists():
+            job.status = ExportJobStatus.COMPLETED
+            job.stage = "done"
+            job.cached = True
+            job.file_size = path.stat().st_size
+            job.completed_at = datetime.utcnow()
+        else:
+            self._tasks[job.id] = asyncio.create_task(self.run_job(job))
+
+        return self._add_job(job)
+
+    async def run_job(self, job: ExportJob) -> ExportJob:
+        """Wait for the artifact, rendering it unless a job for the same data already does"""
+        job.status = ExportJobStatus.RUNNING
+        render = self._renders.get(job.file_path)
+        if render is None:
+            render = self._renders[job.file_path] = asyncio.create_task(
+                self._render(job.file_path, job.project_id, job.project_name, job.extension)
+            )
+        else:
+            job.stage = "waiting"
+            await self._report(job)
+        waiting = self._waiting.setdefault(job.file_path, [])
+        waiting.append(job)
+        try:
+            # Shielded: cancelling one job leaves the render to the others
+            job.file_size = await asyncio.shield(render)
+            job.stage = "done"
+            job.status = ExportJobStatus.COMPLETED
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.stage = "failed"
+            job.status = ExportJobStatus.FAILED
+        finally:
+            waiting.remove(job)
+            job.completed_at = datetime.utcnow()
+            self._tasks.pop(job.id, None)
+            await self._report(job)
+        return job
+
+    async def _update_waiting(self, file_path: str, **values):
+        for job in list(self._waiting.get(file_path, [])):
+            for key, value in values.items():
+                setattr(job, key, value)
+            await self._report(job)
+
+    async def _render(self, file_path: str, project_id: str, project_name: str, extension: str) -> int:
+        """Spool the rows, render the file in the process pool and store it as the cached artifact"""
+        path = Path(file_path)
+        token = uuid.uuid4().hex
+        tmp_path = path.with_name(f".{path.name}.{token}.tmp")
+        rows_path = path.with_name(f".{path.name}.{token}.rows")
+        try:
+            await self._update_waiting(file_path, stage="collecting")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            processed = 0
+            with open(rows_path, "wb") as spool:
+                async for chunk in iter_test_case_chunks(project_id):
+                    await asyncio.to_thread(spool_rows, spool, chunk)
+                    processed += len(chunk)
+                    await self._update_waiting(file_path, processed_rows=processed)
+
+            await self._update_waiting(file_path, stage="rendering")
+            loop = asyncio.get_running_loop()
+            try:
+                file_size = await loop.run_in_executor(
+                    self._get_executor(), render_export, str(rows_path), project_name, extension, str(tmp_path)
+                )
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool for the next job
+                self._executor = None
+                raise
+            os.replace(tmp_path, path)
+            self._remove_stale_artifacts(path)
+            return file_size
+        except Exception as e:
+            logger.error(f"Export of {extension} for project {project_id} failed: {str(e)}")
+            raise
+        finally:
+            self._renders.pop(file_path, None)
+            for leftover in (tmp_path, rows_path):
+                if leftover.exists():
+                    leftover.unlink()
+
+    @staticmethod
+    def _remove_stale_artifacts(current: Path):
+        """Older versions of the same export can no longer be served from the cache"""
+        extension = current.suffix.lstrip(".")
+        for stale in current.parent.glob(f"{extension}-*.{extension}"):
+            if stale != current:
+                try:
+                    stale.unlink()
+                except OSError as e:
+                    logger.warning(f"Could not remove stale export {stale}: {e}")
+
+    async def shutdown(self):
+        """Cancel running jobs and renders and stop the worker processes"""
+        await super().shutdown()
+        for render in list(self._renders.values()):
+            render.cancel()
+        await asyncio.gather(*self._renders.values(), return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+export_job_manager = ExportJobManager()
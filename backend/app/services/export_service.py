@@ -1,22 +1,68 @@
 """
 Test Case Export Service
 Handles exporting test cases to various formats (PDF, Excel, CSV)
+
+reportlab and openpyxl are imported by the code paths that render PDF and
+Excel files, so importing this module (and the routers using it) stays cheap.
 """
 import io
+import os
 import csv
+import pickle
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-import pandas as pd
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 import json
 
+CSV_HEADERS = [
+    "Title", "Description", "Test Type", "Priority", "Status",
+    "Expected Result", "Tags", "Prerequisites", "Steps", "Created By"
+]
+EXCEL_HEADERS = [
+    "ID", "Title", "Description", "Test Type", "Priority", "Status",
+    "Expected Result", "Tags", "Prerequisites", "Steps", "Created By", "Created At"
+]
+MAX_EXCEL_COLUMN_WIDTH = 50
+
+
+def _steps_text(tc: Dict[str, Any], separator: str) -> str:
+    """Format steps as a numbered list"""
+    return separator.join(
+        f"{i}. {step.get('description', '')} -> {step.get('expected_result', '')}"
+        for i, step in enumerate(tc.get("test_steps") or [], 1)
+    )
+
+
+def _csv_row(tc: Dict[str, Any]) -> List[Any]:
+    return [
+        tc.get("title", ""),
+        tc.get("description", ""),
+        tc.get("test_type", ""),
+        tc.get("priority", ""),
+        tc.get("status", ""),
+        tc.get("expected_result", ""),
+        ", ".join(tc.get("tags") or []),
+        tc.get("preconditions", ""),
+        _steps_text(tc, " | "),
+        tc.get("created_by", "")
+    ]
+
+
+def _excel_row(tc: Dict[str, Any]) -> List[Any]:
+    return [
+        tc.get("id", ""),
+        tc.get("title", ""),
+        tc.get("description", ""),
+        tc.get("test_type", ""),
+        tc.get("priority", ""),
+        tc.get("status", ""),
+        tc.get("expected_result", ""),
+        ", ".join(tc.get("tags") or []),
+        tc.get("preconditions", ""),
+        _steps_text(tc, "\n"),
+        tc.get("created_by", ""),
+        tc.get("created_at", "")
+    ]
+
 
 class TestCaseExportService:
     """Service for exporting test cases to various formats"""
@@ -32,37 +78,9 @@ class TestCaseExportService:
             output.seek(0)
             return output
         
-        # Define CSV headers
-        headers = [
-            "Title", "Description", "Test Type", "Priority", "Status", 
-            "Expected Result", "Tags", "Prerequisites", "Steps", "Created By"
-        ]
-        
         writer = csv.writer(output)
-        writer.writerow(headers)
-        
-        for tc in test_cases:
-            # Format steps as numbered list
-            steps_text = ""
-            if tc.get("test_steps"):
-                steps = []
-                for i, step in enumerate(tc.get("test_steps", []), 1):
-                    steps.append(f"{i}. {step.get('description', '')} -> {step.get('expected_result', '')}")
-                steps_text = " | ".join(steps)
-            
-            # Write test case row
-            writer.writerow([
-                tc.get("title", ""),
-                tc.get("description", ""),
-                tc.get("test_type", ""),
-                tc.get("priority", ""),
-                tc.get("status", ""),
-                tc.get("expected_result", ""),
-                ", ".join(tc.get("tags", [])),
-                tc.get("preconditions", ""),
-                steps_text,
-                tc.get("created_by", "")
-            ])
+        writer.writerow(CSV_HEADERS)
+        writer.writerows(_csv_row(tc) for tc in test_cases)
         
         output.seek(0)
         return output
@@ -71,85 +89,55 @@ class TestCaseExportService:
     def export_to_excel(test_cases: List[Dict[str, Any]], project_name: str = "Test Cases") -> io.BytesIO:
         """Export test cases to Excel format"""
         output = io.BytesIO()
-        
-        # Create workbook and worksheet
-        wb = Workbook()
-        ws = wb.active
-        if ws is not None:
-            ws.title = "Test Cases"
-        
-        # Define headers
-        headers = [
-            "ID", "Title", "Description", "Test Type", "Priority", "Status",
-            "Expected Result", "Tags", "Prerequisites", "Steps", "Created By", "Created At"
-        ]
-        
-        # Style for headers
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Add headers
-        if ws is not None:
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col, value=header)
-                if cell is not None:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = header_alignment
-        
-        # Add test case data
-        if ws is not None:
-            for row, tc in enumerate(test_cases, 2):
-                # Format steps as numbered list
-                steps_text = ""
-                if tc.get("test_steps"):
-                    steps = []
-                    for i, step in enumerate(tc.get("test_steps", []), 1):
-                        steps.append(f"{i}. {step.get('description', '')} -> {step.get('expected_result', '')}")
-                    steps_text = "\n".join(steps)
-                
-                # Add data to cells
-                ws.cell(row=row, column=1, value=tc.get("id", ""))
-                ws.cell(row=row, column=2, value=tc.get("title", ""))
-                ws.cell(row=row, column=3, value=tc.get("description", ""))
-                ws.cell(row=row, column=4, value=tc.get("test_type", ""))
-                ws.cell(row=row, column=5, value=tc.get("priority", ""))
-                ws.cell(row=row, column=6, value=tc.get("status", ""))
-                ws.cell(row=row, column=7, value=tc.get("expected_result", ""))
-                ws.cell(row=row, column=8, value=", ".join(tc.get("tags", [])))
-                ws.cell(row=row, column=9, value=tc.get("preconditions", ""))
-                ws.cell(row=row, column=10, value=steps_text)
-                ws.cell(row=row, column=11, value=tc.get("created_by", ""))
-                ws.cell(row=row, column=12, value=tc.get("created_at", ""))
-        
-        # Auto-adjust column widths
-        if ws is not None:
-            for col in range(1, len(headers) + 1):
-                max_length = 0
-                column = get_column_letter(col)
-                column_cells = ws[column] if ws is not None else []
-                for cell in column_cells:
-                    try:
-                        if cell.value is not None and len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-                if ws.column_dimensions is not None:
-                    ws.column_dimensions[column].width = adjusted_width
-        
-        # Save to BytesIO
-        try:
-            wb.save(output)
-        except Exception:
-            pass  # Handle case where wb might be None
+        writer = ExcelStreamWriter()
+        writer.add_rows(test_cases)
+        writer.save(output)
         output.seek(0)
         return output
     
+    @staticmethod
+    def to_export_data(test_case: Any) -> Dict[str, Any]:
+        """Export dict of a TestCase model with its steps loaded"""
+        def value(enum_value):
+            return getattr(enum_value, "value", enum_value) or ""
+        
+        return {
+            "id": test_case.id,
+            "title": test_case.title,
+            "description": test_case.description or "",
+            "test_type": value(test_case.test_type),
+            "priority": value(test_case.priority),
+            "status": value(test_case.status),
+            "expected_result": test_case.expected_result or "",
+            "tags": test_case.tags or [],
+            "preconditions": test_case.preconditions or "",
+            "created_by": test_case.created_by,
+            "created_at": test_case.created_at,
+            "test_steps": [
+                {"description": step.description, "expected_result": step.expected_result}
+                for step in sorted(test_case.steps, key=lambda step: step.step_number)
+            ]
+        }
+    
+    @staticmethod
+    def csv_rows(test_cases: Iterable[Dict[str, Any]], header: bool = False) -> str:
+        """CSV text of a chunk of test cases"""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        if header:
+            writer.writerow(CSV_HEADERS)
+        writer.writerows(_csv_row(tc) for tc in test_cases)
+        return output.getvalue()
+    
     @staticmethod
     def export_to_pdf(test_cases: List[Dict[str, Any]], project_name: str = "Test Cases") -> io.BytesIO:
         """Export test cases to PDF format"""
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+
         output = io.BytesIO()
         
         # Create PDF document
@@ -236,4 +224,116 @@ class TestCaseExportService:
         safe_name = safe_name.replace(' ', '_')
         
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        return f"test_cases_{safe_name}_{timestamp}.{export_format}"
\ No newline at end of file
+        return f"test_cases_{safe_name}_{timestamp}.{export_format}"
+
+
+class ExcelStreamWriter:
+    """
+    Writes test cases to an .xlsx workbook in openpyxl write-only mode.
+
+    Rows are written once and spooled to disk by openpyxl, so memory stays
+    flat however many test cases are exported. Write-only sheets need their
+    column widths before the first row, so the widths are computed from the
+    first ``width_sample`` rows, which are held back until then.
+    """
+
+    def __init__(self, width_sample: int = 1000):
+        from openpyxl import Workbook
+
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Test Cases")
+        self.width_sample = width_sample
+        self.widths = [len(header) for header in EXCEL_HEADERS]
+        self.rows_written = 0
+        self._pending: Optional[List[List[Any]]] = []
+
+    def add_rows(self, test_cases: Iterable[Dict[str, Any]]):
+        for tc in test_cases:
+            row = _excel_row(tc)
+            if self._pending is None:
+                self._append(row)
+                continue
+            for col, value in enumerate(row):
+                if value is not None:
+                    self.widths[col] = max(self.widths[col], len(str(value)))
+            self._pending.append(row)
+            if len(self._pending) >= self.width_sample:
+                self._start_rows()
+
+    def _start_rows(self):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.utils import get_column_letter
+
+        for col, width in enumerate(self.widths, 1):
+            self.sheet.column_dimensions[get_column_letter(col)].width = min(width + 2, MAX_EXCEL_COLUMN_WIDTH)
+
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header_alignment = Alignment(horizontal="center", vertical="center")
+        header_cells = []
+        for header in EXCEL_HEADERS:
+            cell = WriteOnlyCell(self.sheet, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            header_cells.append(cell)
+        self.sheet.append(header_cells)
+
+        pending, self._pending = self._pending, None
+        for row in pending:
+            self._append(row)
+
+    def _append(self, row: List[Any]):
+        self.sheet.append(row)
+        self.rows_written += 1
+
+    def save(self, target):
+        """Save to a path or binary file object; the writer cannot be used afterwards"""
+        if self._pending is not None:
+            self._start_rows()
+        self.workbook.save(target)
+
+
+def spool_rows(f, test_cases: List[Dict[str, Any]]):
+    """Append a chunk of export rows to a spool file opened for binary writing"""
+    pickle.dump(test_cases, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_spooled_rows(path: str) -> Iterator[List[Dict[str, Any]]]:
+    """The chunks written by spool_rows, one at a time"""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def render_export(rows_path: str, project_name: str, extension: str, path: str) -> int:
+    """
+    Write an export file for the given format ("csv", "xlsx" or "pdf") to path
+    from the rows spooled to rows_path.
+
+    Module-level so it can run in a worker process. CSV and Excel are written
+    chunk by chunk; only the PDF layout needs every row at once. Returns the
+    file size.
+    """
+    if extension == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(TestCaseExportService.csv_rows([], header=True))
+            for chunk in read_spooled_rows(rows_path):
+                f.write(TestCaseExportService.csv_rows(chunk))
+    elif extension == "xlsx":
+        writer = ExcelStreamWriter()
+        for chunk in read_spooled_rows(rows_path):
+            writer.add_rows(chunk)
+        writer.save(path)
+    elif extension == "pdf":
+        test_cases = [tc for chunk in read_spooled_rows(rows_path) for tc in chunk]
+        output = TestCaseExportService.export_to_pdf(test_cases, project_name)
+        with open(path, "wb") as f:
+            f.write(output.getbuffer())
+    else:
+        raise ValueError(f"Unsupported export format: {extension}")
+    return os.path.getsize(path)
@@ -0,0 +1,85 @@
+"""
+Shared bookkeeping of in-memory background jobs.
+
+Exports, batch generation, Newman runs and test plan runs are all jobs kept in
+memory for status polling. ``BackgroundJob`` gives their dataclasses the
+common progress fields, and ``JobRegistry`` keeps a bounded number of finished
+jobs, tracks the running tasks and pushes progress to the requesting user over
+WebSocket.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Generic, Optional, TypeVar
+
+from app.websocket.manager import websocket_manager
+
+logger = logging.getLogger(__name__)
+
+# Keep a bounded number of finished jobs around for status polling
+_MAX_RETAINED_JOBS = 100
+
+
+class BackgroundJob:
+    """
+    Mixin for job dataclasses with ``id``, ``requested_by``, ``status``,
+    ``stage``, ``created_at`` and ``completed_at`` fields. A job is finished
+    once ``completed_at`` is set.
+    """
+
+    # Key of the job id in progress messages
+    id_key = "job_id"
+
+    def progress(self) -> Dict[str, Any]:
+        """Summary of the job suitable for API responses and WebSocket messages"""
+        return {
+            self.id_key: self.id,
+            "status": self.status.value,
+            "stage": self.stage,
+            "created_at": self.created_at.isoformat(),
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+        }
+
+
+J = TypeVar("J", bound=BackgroundJob)
+
+
+class JobRegistry(Generic[J]):
+    """Keeps jobs for polling, drops the oldest finished ones and reports progress"""
+
+    # Type of the WebSocket progress messages, and how jobs are named in log messages
+    progress_type = "job_progress"
+    job_label = "job"
+
+    def __init__(self, max_retained: int = _MAX_RETAINED_JOBS):
+        self.jobs: Dict[str, J] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._max_retained = max_retained
+
+    def get_job(self, job_id: str) -> Optional[J]:
+        return self.jobs.get(job_id)
+
+    def _add_job(self, job: J) -> J:
+        self.jobs[job.id] = job
+        self._trim_jobs()
+        return job
+
+    def _trim_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.completed_at is not None]
+        for job_id in finished[:max(0, len(self.jobs) - self._max_retained)]:
+            del self.jobs[job_id]
+
+    async def _report(self, job: J):
+        """Push job progress to the requesting user"""
+        try:
+            await self._send_progress(job, {"type": self.progress_type, "data": job.progress()})
+        except Exception as e:
+            logger.warning(f"Failed to report progress for {self.job_label} {job.id}: {e}")
+
+    async def _send_progress(self, job: J, message: Dict[str, Any]):
+        await websocket_manager.send_personal_message(job.requested_by, message)
+
+    async def shutdown(self):
+        """Cancel the running jobs"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
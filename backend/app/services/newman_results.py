@@ -0,0 +1,241 @@
+"""
+Ingestion of Newman JSON reports.
+
+Runs write Newman's JSON reporter output to a file. The report is read
+incrementally with ijson when it is installed. This matters because the
+report embeds every response body, and a collection with thousands of
+requests produces a large file. Each request becomes a
+``TestExecutionRequest`` row with its timing, status code and assertion
+results. Parsing only adds up the run totals; the rows are read again while
+saving and written in batches with executemany inserts, linked to a
+``TestExecution`` of the run's test case, so a report is never held in memory.
+"""
+import asyncio
+import json
+import logging
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.importtime import module_available
+from app.services.event_pipeline import DomainEvent, event_pipeline
+
+IJSON_AVAILABLE = module_available("ijson")
+
+logger = logging.getLogger(__name__)
+
+_MAX_LOG_CHARS = 10000
+
+_API_KEY = re.compile(r"(apikey=)[^&\s]+", re.IGNORECASE)
+
+
+def mask_secrets(text: str) -> str:
+    return _API_KEY.sub(r"\1***", text)
+
+
+@dataclass
+class NewmanReport:
+    paths: List[str] = field(default_factory=list)
+    requests: int = 0
+    failed_requests: int = 0
+    assertions: int = 0
+    failed_assertions: int = 0
+    total_response_time: int = 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "assertions": self.assertions,
+            "failed_assertions": self.failed_assertions,
+            "average_response_time": round(self.total_response_time / self.requests, 1) if self.requests else None,
+        }
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Read the request rows back from the report files; positions continue across files"""
+        executions = (execution for path in self.paths for execution in iter_executions(path))
+        for position, execution in enumerate(executions):
+            yield request_row(execution, position)
+
+    def iter_batches(self, size: int) -> Iterator[List[Dict[str, Any]]]:
+        rows = self.iter_rows()
+        while batch := list(islice(rows, size)):
+            yield batch
+
+
+def iter_executions(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the entries of run.executions one at a time"""
+    with open(path, "rb") as f:
+        if IJSON_AVAILABLE:
+            import ijson
+
+            # use_float keeps numbers as int/float instead of Decimal
+            yield from ijson.items(f, "run.executions.item", use_float=True)
+        else:
+            yield from json.load(f).get("run", {}).get("executions", [])
+
+
+def _url(url: Any) -> Optional[str]:
+    """Flatten a Postman URL object (protocol, host and path lists, query) into a string"""
+    if url is None or isinstance(url, str):
+        return url
+    host = url.get("host") or []
+    text = f"{url.get('protocol', 'http')}://{'.'.join(host) if isinstance(host, list) else host}"
+    if url.get("port"):
+        text += f":{url['port']}"
+    path = url.get("path") or []
+    if path:
+        text += "/" + "/".join(path) if isinstance(path, list) else "/" + str(path).lstrip("/")
+    query = [q for q in url.get("query") or [] if not q.get("disabled")]
+    if query:
+        text += "?" + "&".join(f"{q.get('key')}={q.get('value') or ''}" for q in query)
+    return text
+
+
+def request_row(execution: Dict[str, Any], position: int) -> Dict[str, Any]:
+    """Map one Newman execution to the columns of TestExecutionRequest"""
+    request = execution.get("request") or {}
+    response = execution.get("response") or {}
+    assertions = [a for a in execution.get("assertions") or [] if not a.get("skipped")]
+    failures = [
+        {"assertion": a.get("assertion"), "message": (a.get("error") or {}).get("message")}
+        for a in assertions if a.get("error")
+    ]
+    request_error = execution.get("requestError")
+    url = _url(request.get("url"))
+    return {
+        "position": position,
+        "iteration": (execution.get("cursor") or {}).get("iteration", 0),
+        "name": (execution.get("item") or {}).get("name") or "Unnamed request",
+        "method": request.get("method"),
+        "url": mask_secrets(url) if url else None,
+        "status_code": response.get("code"),
+        "response_time": response.get("responseTime"),
+        "response_size": response.get("responseSize"),
+        "assertions_total": len(assertions),
+        "assertions_failed": len(failures),
+        "failures": failures or None,
+        "error": request_error.get("message") if isinstance(request_error, dict) else None,
+    }
+
+
+def parse_report(path: str) -> NewmanReport:
+    """Add up the run totals of a Newman JSON report"""
+    report = NewmanReport(paths=[path])
+    for row in report.iter_rows():
+        report.requests += 1
+        report.assertions += row["assertions_total"]
+        report.failed_assertions += row["assertions_failed"]
+        report.total_response_time += row["response_time"] or 0
+        if row["error"] or row["assertions_failed"]:
+            report.failed_requests += 1
+    return report
+
+
+def merge_reports(reports: List[NewmanReport]) -> NewmanReport:
+    """Combine the reports of a sharded run; positions continue across shards in shard order"""
+    merged = NewmanReport()
+    for report in reports:
+        merged.paths.extend(report.paths)
+        merged.requests += report.requests
+        merged.failed_requests += report.failed_requests
+        merged.assertions += report.assertions
+        merged.failed_assertions += report.failed_assertions
+        merged.total_response_time += report.total_response_time
+    return merged
+
+
+async def save_run(
+    test_case_id: str,
+    executed_by: str,
+    executed_by_name: str,
+    report: NewmanReport,
+    return_code: Optional[int],
+    started_at: datetime,
+    completed_at: datetime,
+    logs: str = "",
+    error: Optional[str] = None,
+    execution_id: Optional[str] = None
+) -> Optional[str]:
+    """
+    Record the run as a TestExecution with one row per request; returns the execution id.
+    An existing execution (e.g. one created by a plan run) is updated instead of adding one.
+    The run passed when newman exited with 0, which it does only if no request or
+    assertion failed and no script errored.
+    """
+    from sqlalchemy import insert, select
+
+    from app.db.session import get_session_factory
+    from app.models.db_models import ExecutionStatus, TestExecution, TestExecutionRequest
+    from app.models.db_models import TestCase as DBTestCase
+
+    async with get_session_factory()() as db:
+        test_case = (await db.execute(
+            select(DBTestCase.id, DBTestCase.title, DBTestCase.project_id).where(DBTestCase.id == test_case_id)
+        )).first()
+        if not test_case:
+            logger.warning(f"Not saving Newman results: test case {test_case_id} not found")
+            return None
+
+        passed = error is None and return_code == 0
+        outcome = dict(
+            status=ExecutionStatus.COMPLETED if error is None else ExecutionStatus.FAILED,
+            result="pass" if passed else "fail",
+            started_at=started_at,
+            completed_at=completed_at,
+            duration=int((completed_at - started_at).total_seconds()),
+            logs=logs[-_MAX_LOG_CHARS:] or None,
+            error_message=error,
+            updated_at=completed_at
+        )
+        if execution_id:
+            execution = await db.get(TestExecution, execution_id)
+            if execution is None:
+                logger.warning(f"Not saving Newman results: execution {execution_id} not found")
+                return None
+            for key, value in outcome.items():
+                setattr(execution, key, value)
+        else:
+            execution = TestExecution(
+                id=str(uuid.uuid4()),
+                test_case_id=test_case_id,
+                executed_by=executed_by,
+                created_at=completed_at,
+                **outcome
+            )
+            db.add(execution)
+        await db.flush()
+
+        # Reading the report blocks, so each batch is read in a thread
+        batches = report.iter_batches(settings.NEWMAN_INSERT_BATCH_SIZE)
+        while batch := await asyncio.to_thread(next, batches, None):
+            await db.execute(insert(TestExecutionRequest), [
+                {**row, "id": str(uuid.uuid4()), "execution_id": execution.id, "test_case_id": test_case_id,
+                 "created_at": completed_at}
+                for row in batch
+            ])
+        await db.commit()
+
+    event_pipeline.publish(DomainEvent(
+        action="update" if execution_id else "create",
+        target_type="test_execution",
+        target_id=execution.id,
+        target_name=test_case.title,
+        user_id=executed_by,
+        user_name=executed_by_name,
+        project_id=test_case.project_id,
+        details={
+            "test_case_id": test_case_id,
+            "status": execution.status.value,
+            "started_at": started_at.isoformat(),
+            "completed_at": completed_at.isoformat(),
+            "duration": execution.duration,
+            **report.summary()
+        }
+    ))
+    logger.info(f"Saved Newman run of test case {test_case_id}: {report.requests} requests as execution {execution.id}")
+    return execution.id
@@ -0,0 +1,501 @@
+"""
+Newman (Postman collection) runs as background jobs.
+
+The runtime is detected once, in the background at startup. It is either
+Docker with the ``postman/newman`` image, pulled if it is missing, or a
+local ``newman`` binary. In Docker mode one long-lived container is started
+and every run is a ``docker exec`` into it, so runs do not pay for creating
+and removing a container. Killing a ``docker exec`` client leaves its
+process running in the container, so every run records its container PID
+and a timeout or cancellation kills that PID as well. Jobs are queued and
+run by a bounded pool of workers with ``asyncio.create_subprocess_exec``. The CLI output is read as it
+is produced, and progress is pushed to the requesting user over WebSocket.
+Newman also writes a JSON report. When the run belongs to a test case, the
+report is stored as a TestExecution with per-request results (see
+``newman_results``). Large collections can be split into shards (see
+``newman_sharding``). The shards run as concurrent Newman processes, bounded
+by the CPU count, and their reports are merged into one result.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.newman_results import mask_secrets, merge_reports, parse_report, save_run
+from app.services.job_registry import BackgroundJob, JobRegistry
+from app.services.newman_sharding import count_requests, load_collection, split_collection
+
+logger = logging.getLogger(__name__)
+
+NEWMAN_IMAGE = "postman/newman"
+# Where the shared container sees the report directory
+CONTAINER_REPORT_DIR = "/reports"
+
+# Output lines kept per job for status responses
+_OUTPUT_TAIL_LINES = 200
+# Progress messages are sent at most this often per job
+_REPORT_INTERVAL_SECONDS = 0.5
+
+
+class NewmanJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class NewmanJob(BackgroundJob):
+    id: str
+    requested_by: str
+    collection_url: str
+    requested_by_name: str = "Unknown user"
+    environment: Dict[str, Any] = field(default_factory=dict)
+    test_case_id: Optional[str] = None
+    shards: int = 1
+    shard_by: str = "folder"
+    status: NewmanJobStatus = NewmanJobStatus.PENDING
+    stage: str = "queued"
+    runtime: Optional[str] = None
+    processed_requests: int = 0
+    failed_assertions: int = 0
+    return_code: Optional[int] = None
+    error: Optional[str] = None
+    execution_id: Optional[str] = None
+    summary: Optional[Dict[str, Any]] = None
+    output: Deque[str] = field(default_factory=lambda: deque(maxlen=_OUTPUT_TAIL_LINES))
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    # Set once the job completed or failed, for callers awaiting the run (e.g. plan runs)
+    finished: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def duration(self) -> Optional[float]:
+        if not self.started_at:
+            return None
+        return ((self.completed_at or datetime.utcnow()) - self.started_at).total_seconds()
+
+    @property
+    def sharded(self) -> bool:
+        return self.shards > 1
+
+    def progress(self, include_output: bool = False) -> Dict[str, Any]:
+        summary = {
+            **super().progress(),
+            "test_case_id": self.test_case_id,
+            "runtime": self.runtime,
+            "success": self.status == NewmanJobStatus.COMPLETED and self.return_code == 0,
+            "processed_requests": self.processed_requests,
+            "failed_assertions": self.failed_assertions,
+            "return_code": self.return_code,
+            "error": self.error,
+            "execution_id": self.execution_id,
+            "summary": self.summary,
+            "duration": self.duration,
+        }
+        if include_output:
+            summary["output"] = list(self.output)
+        return summary
+
+
+async def _run_command(*cmd: str, timeout: float) -> Tuple[int, str]:
+    """Run a short command, returning its exit code and combined output"""
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+    )
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    return process.returncode, output.decode(errors="replace")
+
+
+@dataclass
+class NewmanShard:
+    index: int
+    source: str  # Collection URL or path as the newman process sees it
+    report_path: Path
+    requests: Optional[int] = None
+    return_code: Optional[int] = None
+    wall_time: Optional[float] = None
+
+    @property
+    def pid_path(self) -> Path:
+        """Where a run in Docker writes the PID of its newman process"""
+        return self.report_path.with_suffix(".pid")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shard": self.index + 1,
+            "requests": self.requests,
+            "return_code": self.return_code,
+            "wall_time": self.wall_time,
+        }
+
+
+class NewmanRunner(JobRegistry[NewmanJob]):
+    """Queues Newman runs and executes them in Docker or with a local binary"""
+
+    progress_type = "newman_job_progress"
+    job_label = "Newman job"
+
+    def __init__(self, binary: str = "newman", docker: str = "docker"):
+        super().__init__()
+        self.binary = binary
+        self.docker = docker
+        self.runtime: Optional[str] = None  # "docker", "local" or None when unavailable
+        self.runtime_message = "Newman runtime has not been checked yet"
+        self.container: Optional[str] = None
+        self._ready = asyncio.Event()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._prepare_task: Optional[asyncio.Task] = None
+        self._container_lock = asyncio.Lock()
+
+    @property
+    def report_dir(self) -> Path:
+        return Path(settings.UPLOAD_DIR).resolve() / "newman"
+
+    @property
+    def unavailable(self) -> bool:
+        """True once detection has finished without finding Docker or a newman binary"""
+        return self._ready.is_set() and self.runtime is None
+
+    def start(self):
+        """Start the workers and detect the runtime in the background"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(max(1, settings.NEWMAN_MAX_CONCURRENCY))
+        ]
+        self._prepare_task = asyncio.create_task(self.prepare())
+
+    async def stop(self):
+        tasks = self._workers + ([self._prepare_task] if self._prepare_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        if self.container:
+            try:
+                await _run_command(self.docker, "rm", "-f", self.container, timeout=30)
+            except Exception as e:
+                logger.warning(f"Could not remove Newman container {self.container}: {e}")
+            self.container = None
+
+    async def prepare(self):
+        """Pick the runtime once: Docker (pulling the image if needed) or a local newman binary"""
+        try:
+            mode = settings.NEWMAN_RUNTIME.lower()
+            if mode in ("auto", "docker"):
+                ok, message = await self._prepare_docker()
+                if ok:
+                    self.runtime, self.runtime_message = "docker", message
+                    return
+                logger.warning(f"Docker Newman not available: {message}")
+                self.runtime_message = message
+            if mode in ("auto", "local"):
+                if shutil.which(self.binary):
+                    self.runtime, self.runtime_message = "local", f"Using local newman binary {self.binary}"
+                    return
+                self.runtime_message = f"{self.runtime_message}; newman binary not found".lstrip("; ")
+        finally:
+            logger.info(f"Newman runtime: {self.runtime or 'unavailable'} ({self.runtime_message})")
+            self._ready.set()
+
+    async def _prepare_docker(self) -> Tuple[bool, str]:
+        try:
+            code, output = await _run_command(self.docker, "version", "--format", "{{.Server.Version}}", timeout=10)
+            if code != 0:
+                return False, f"Docker is not available: {output.strip()}"
+            code, _ = await _run_command(self.docker, "image", "inspect", NEWMAN_IMAGE, timeout=10)
+            if code != 0:
+                logger.info("Newman Docker image not found, pulling...")
+                code, output = await _run_command(self.docker, "pull", NEWMAN_IMAGE, timeout=300)
+                if code != 0:
+                    return False, f"Failed to pull Newman Docker image: {output.strip()}"
+            await self._ensure_container()
+            return True, "Docker Newman is ready"
+        except FileNotFoundError:
+            return False, "Docker is not installed"
+        except asyncio.TimeoutError:
+            return False, "Docker command timed out"
+        except RuntimeError as e:
+            return False, str(e)
+
+    async def _ensure_container(self) -> str:
+        """Start the shared Newman container unless it is already running"""
+        async with self._container_lock:
+            if self.container:
+                code, output = await _run_command(
+                    self.docker, "inspect", "-f", "{{.State.Running}}", self.container, timeout=10
+                )
+                if code == 0 and output.strip() == "true":
+                    return self.container
+                await _run_command(self.docker, "rm", "-f", self.container, timeout=30)
+            name = f"intellitest-newman-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self.report_dir.mkdir(parents=True, exist_ok=True)
+            code, output = await _run_command(
+                self.docker, "run", "-d", "--rm", "--name", name,
+                "-v", f"{self.report_dir}:{CONTAINER_REPORT_DIR}",
+                "--entrypoint", "tail", NEWMAN_IMAGE, "-f", "/dev/null",
+                timeout=60
+            )
+            if code != 0:
+                raise RuntimeError(f"Could not start Newman container: {output.strip()}")
+            self.container = name
+            return name
+
+    async def enqueue(
+        self,
+        requested_by: str,
+        collection_url: str,
+        environment: Optional[Dict[str, Any]] = None,
+        test_case_id: Optional[str] = None,
+        requested_by_name: str = "Unknown user",
+        shards: int = 1,
+        shard_by: str = "folder",
+        execution_id: Optional[str] = None
+    ) -> NewmanJob:
+        """
+        Register a run; it starts as soon as a worker is free.
+        With an execution_id the results are stored on that existing execution
+        instead of a new one.
+        """
+        if self._queue is None:
+            self.start()
+        job = NewmanJob(
+            id=str(uuid.uuid4()),
+            requested_by=requested_by,
+            requested_by_name=requested_by_name,
+            collection_url=collection_url,
+            environment=environment or {},
+            test_case_id=test_case_id,
+            shards=max(1, shards),
+            shard_by=shard_by,
+            execution_id=execution_id
+        )
+        self._add_job(job)
+        self._queue.put_nowait(job)
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; its processes are killed and no results are stored"""
+        job = self.jobs.get(job_id)
+        if job is None or job.completed_at is not None:
+            return False
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return True
+        # Still queued: the worker skips it
+        job.status = NewmanJobStatus.CANCELLED
+        job.stage = "cancelled"
+        job.completed_at = datetime.utcnow()
+        job.finished.set()
+        await self._report(job)
+        return True
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == NewmanJobStatus.CANCELLED:
+                    continue
+                # Each run is its own task so that cancel() stops the run but not the worker
+                task = self._tasks[job.id] = asyncio.create_task(self.run_job(job))
+                outcome, = await asyncio.gather(task, return_exceptions=True)
+                if isinstance(outcome, Exception):
+                    logger.error(f"Newman worker failed on job {job.id}: {outcome}")
+            finally:
+                self._tasks.pop(job.id, None)
+                self._queue.task_done()
+
+    def _visible_path(self, path: Path) -> str:
+        """Path of a file in the report directory as the newman process sees it"""
+        if self.runtime == "docker":
+            return f"{CONTAINER_REPORT_DIR}/{path.name}"
+        return str(path)
+
+    def build_command(self, job: NewmanJob, shard: NewmanShard) -> List[str]:
+        args = ["run", shard.source, "--color", "off", "--reporters", "cli,json"]
+        for key, value in job.environment.items():
+            args.extend(["--env-var", f"{key}={value}"])
+        args.extend(["--reporter-json-export", self._visible_path(shard.report_path)])
+        if self.runtime == "docker":
+            # The shell records its PID and becomes newman, so the run can be killed inside the container
+            return [
+                self.docker, "exec", self.container, "sh", "-c", 'echo $$ > "$0" && exec "$@"',
+                self._visible_path(shard.pid_path), "newman", *args
+            ]
+        return [self.binary, *args]
+
+    async def _plan_shards(self, job: NewmanJob) -> List[NewmanShard]:
+        """Write the shard collections of a sharded job; an unsharded job runs the collection as is"""
+        if not job.sharded:
+            return [NewmanShard(0, job.collection_url, self.report_dir / f"{job.id}.json")]
+        job.stage = "sharding"
+        await self._report(job)
+        collection = await load_collection(job.collection_url)
+        shards = []
+        for index, part in enumerate(split_collection(collection, job.shards, job.shard_by)):
+            collection_path = self.report_dir / f"{job.id}-shard{index}.collection.json"
+            await asyncio.to_thread(collection_path.write_text, json.dumps(part), "utf-8")
+            shards.append(NewmanShard(
+                index, self._visible_path(collection_path), self.report_dir / f"{job.id}-shard{index}.json",
+                requests=sum(count_requests(item) for item in part["item"])
+            ))
+        logger.info(f"Newman job {job.id}: split collection into {len(shards)} shards by {job.shard_by}")
+        return shards
+
+    async def run_job(self, job: NewmanJob) -> NewmanJob:
+        """Run one collection (or its shards), streaming the CLI output into the job"""
+        job.stage = "waiting_for_runtime"
+        try:
+            await self._ready.wait()
+            job.status = NewmanJobStatus.RUNNING
+            job.started_at = datetime.utcnow()
+            if self.runtime is None:
+                raise RuntimeError(f"Newman is not available: {self.runtime_message}")
+            if self.runtime == "docker":
+                await self._ensure_container()
+            job.runtime = self.runtime
+            self.report_dir.mkdir(parents=True, exist_ok=True)
+            shards = await self._plan_shards(job)
+            job.stage = "running"
+            await self._report(job)
+
+            await self._run_shards(job, shards)
+            job.return_code = next((shard.return_code for shard in shards if shard.return_code), 0)
+            await self._ingest(job, shards)
+            job.stage = "done"
+            job.status = NewmanJobStatus.COMPLETED
+        except asyncio.CancelledError:
+            job.stage = "cancelled"
+            job.status = NewmanJobStatus.CANCELLED
+            raise
+        except Exception as e:
+            logger.error(f"Newman job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.stage = "failed"
+            job.status = NewmanJobStatus.FAILED
+        finally:
+            job.completed_at = datetime.utcnow()
+            self._remove_job_files(job)
+            job.finished.set()
+            await self._report(job)
+        return job
+
+    async def _run_shards(self, job: NewmanJob, shards: List[NewmanShard]):
+        """Run the shards concurrently, at most one per CPU, killing all of them on timeout or cancellation"""
+        loop = asyncio.get_running_loop()
+        concurrency = settings.NEWMAN_SHARD_CONCURRENCY or os.cpu_count() or 1
+        limit = asyncio.Semaphore(max(1, min(len(shards), concurrency)))
+        processes: List[Tuple[asyncio.subprocess.Process, NewmanShard]] = []
+
+        async def run_shard(shard: NewmanShard):
+            async with limit:
+                cmd = self.build_command(job, shard)
+                logger.info(f"Executing Newman command: {mask_secrets(' '.join(cmd))}")
+                started = loop.time()
+                process = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+                )
+                processes.append((process, shard))
+                prefix = f"[shard {shard.index + 1}] " if job.sharded else ""
+                await self._follow_output(job, process, prefix)
+                shard.return_code = process.returncode
+                shard.wall_time = round(loop.time() - started, 3)
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*(run_shard(shard) for shard in shards)), settings.NEWMAN_TIMEOUT)
+        except asyncio.TimeoutError:
+            await asyncio.gather(*(self._kill(process, shard) for process, shard in processes))
+            raise RuntimeError(f"Newman run timed out after {settings.NEWMAN_TIMEOUT} seconds")
+        except asyncio.CancelledError:
+            await asyncio.gather(*(self._kill(process, shard) for process, shard in processes))
+            raise
+
+    async def _kill(self, process: asyncio.subprocess.Process, shard: NewmanShard):
+        """Kill a running shard; in Docker newman runs in the container, apart from the exec client"""
+        if process.returncode is not None:
+            return
+        if self.runtime == "docker" and self.container:
+            try:
+                pid = (await asyncio.to_thread(shard.pid_path.read_text)).strip()
+                if pid.isdigit():
+                    await _run_command(self.docker, "exec", self.container, "kill", "-KILL", pid, timeout=10)
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.warning(f"Could not kill Newman shard {shard.index + 1} in container {self.container}: {e}")
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+    def _remove_job_files(self, job: NewmanJob):
+        for path in self.report_dir.glob(f"{job.id}*"):
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning(f"Could not remove Newman file {path}: {e}")
+
+    async def _ingest(self, job: NewmanJob, shards: List[NewmanShard]):
+        """Parse (and merge) the JSON reports and, for runs of a test case, store them as an execution"""
+        paths = [shard.report_path for shard in shards if shard.report_path.exists()]
+        if len(paths) < len(shards):
+            logger.warning(f"Newman job {job.id}: {len(shards) - len(paths)} of {len(shards)} runs produced no JSON report")
+        if not paths:
+            return
+        job.stage = "ingesting"
+        await self._report(job)
+        report = merge_reports([await asyncio.to_thread(parse_report, str(path)) for path in paths])
+        job.summary = {**report.summary(), "wall_time": job.duration}
+        if job.sharded:
+            job.summary["shards"] = [shard.stats() for shard in shards]
+        job.processed_requests = report.requests
+        job.failed_assertions = report.failed_assertions
+        if not job.test_case_id:
+            return
+        try:
+            job.execution_id = await save_run(
+                job.test_case_id, job.requested_by, job.requested_by_name, report, job.return_code,
+                job.started_at, datetime.utcnow(), logs="\n".join(job.output), execution_id=job.execution_id
+            )
+        except Exception as e:
+            logger.error(f"Could not save results of Newman job {job.id}: {e}")
+            job.error = f"Results could not be saved: {e}"
+
+    async def _follow_output(self, job: NewmanJob, process: asyncio.subprocess.Process, prefix: str = ""):
+        loop = asyncio.get_running_loop()
+        last_report = loop.time()
+        while line := await process.stdout.readline():
+            text = mask_secrets(line.decode(errors="replace").rstrip())
+            job.output.append(prefix + text)
+            stripped = text.lstrip()
+            # The CLI reporter starts every request with an arrow and numbers failed assertions
+            if stripped.startswith("→"):
+                job.processed_requests += 1
+            elif re.match(r"^\d+\. ", stripped):
+                job.failed_assertions += 1
+            if loop.time() - last_report >= _REPORT_INTERVAL_SECONDS:
+                last_report = loop.time()
+                await self._report(job)
+        await process.wait()
+
+
+newman_runner = NewmanRunner()
@@ -0,0 +1,253 @@
+"""
+Object storage backends for uploaded files.
+
+``LocalStorage`` keeps objects under ``UPLOAD_DIR`` on the node's disk.
+``S3Storage`` works with any S3-compatible service (AWS S3, MinIO, ...). It
+streams uploads as multipart uploads and hands out presigned URLs, so
+downloads go straight to the object store instead of through the API servers.
+The backend is selected by STORAGE_BACKEND.
+"""
+import asyncio
+import logging
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import aiofiles
+import aiofiles.os
+
+from app.core.config import settings
+from app.core.importtime import module_available
+
+# boto3 is imported when an S3 backend is created
+BOTO3_AVAILABLE = module_available("boto3")
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart parts smaller than this, except the last one
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class StorageWriter:
+    """Streams one object into storage; it becomes visible on commit"""
+
+    async def write(self, chunk: bytes):
+        raise NotImplementedError
+
+    async def commit(self):
+        raise NotImplementedError
+
+    async def abort(self):
+        raise NotImplementedError
+
+
+class StorageBackend:
+    """Interface of an object storage backend; keys are '/'-separated paths"""
+
+    async def open_writer(self, key: str) -> StorageWriter:
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def move(self, source_key: str, target_key: str):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def download_to(self, key: str, path: str):
+        """Copy an object to a local file"""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path of the object on this node's disk, if the backend stores it there"""
+        return None
+
+    def presigned_url(self, key: str, filename: Optional[str] = None,
+                      content_type: Optional[str] = None) -> Optional[str]:
+        """Time-limited URL the client can download the object from directly, if supported"""
+        return None
+
+
+class _LocalWriter(StorageWriter):
+    def __init__(self, path: Path, file):
+        self.path = path
+        self.file = file
+
+    async def write(self, chunk: bytes):
+        await self.file.write(chunk)
+
+    async def commit(self):
+        await self.file.close()
+
+    async def abort(self):
+        await self.file.close()
+        try:
+            await aiofiles.os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    async def open_writer(self, key: str) -> StorageWriter:
+        path = self._path(key)
+        await aiofiles.os.makedirs(path.parent, exist_ok=True)
+        return _LocalWriter(path, await aiofiles.open(path, "wb"))
+
+    async def exists(self, key: str) -> bool:
+        return await aiofiles.os.path.exists(self._path(key))
+
+    async def move(self, source_key: str, target_key: str):
+        target = self._path(target_key)
+        await aiofiles.os.makedirs(target.parent, exist_ok=True)
+        await aiofiles.os.replace(self._path(source_key), target)
+
+    async def delete(self, key: str):
+        try:
+            await aiofiles.os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def download_to(self, key: str, path: str):
+        await asyncio.to_thread(shutil.copyfile, self._path(key), path)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return str(self._path(key))
+
+
+class _S3MultipartWriter(StorageWriter):
+    """Buffers one part at a time; objects smaller than a part are sent with a single PUT"""
+
+    def __init__(self, storage: "S3Storage", key: str):
+        self.storage = storage
+        self.key = key
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts = []
+
+    async def write(self, chunk: bytes):
+        self.buffer.extend(chunk)
+        while len(self.buffer) >= self.storage.part_size:
+            part = bytes(self.buffer[:self.storage.part_size])
+            del self.buffer[:self.storage.part_size]
+            await self._upload_part(part)
+
+    async def _upload_part(self, data: bytes):
+        client, bucket = self.storage.client, self.storage.bucket
+        if self.upload_id is None:
+            response = await asyncio.to_thread(client.create_multipart_upload, Bucket=bucket, Key=self.key)
+            self.upload_id = response["UploadId"]
+        number = len(self.parts) + 1
+        response = await asyncio.to_thread(
+            client.upload_part, Bucket=bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=data
+        )
+        self.parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    async def commit(self):
+        client, bucket = self.storage.client, self.storage.bucket
+        if self.upload_id is None:
+            await asyncio.to_thread(client.put_object, Bucket=bucket, Key=self.key, Body=bytes(self.buffer))
+            return
+        if self.buffer:
+            await self._upload_part(bytes(self.buffer))
+        await asyncio.to_thread(
+            client.complete_multipart_upload, Bucket=bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts}
+        )
+
+    async def abort(self):
+        self.buffer.clear()
+        if self.upload_id is not None:
+            await asyncio.to_thread(
+                self.storage.client.abort_multipart_upload,
+                Bucket=self.storage.bucket, Key=self.key, UploadId=self.upload_id
+            )
+
+
+class S3Storage(StorageBackend):
+    def __init__(self, bucket: str, client=None, prefix: str = "", part_size: Optional[int] = None,
+                 presign_expires: Optional[int] = None):
+        self.bucket = bucket
+        if client is None:
+            import boto3
+
+            client = boto3.client(
+                "s3",
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                region_name=settings.S3_REGION,
+                aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            )
+        self.client = client
+        self.prefix = prefix.strip("/")
+        self.part_size = max(part_size or settings.S3_MULTIPART_PART_SIZE, S3_MIN_PART_SIZE)
+        self.presign_expires = presign_expires or settings.S3_PRESIGN_EXPIRES
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    async def open_writer(self, key: str) -> StorageWriter:
+        return _S3MultipartWriter(self, self._key(key))
+
+    async def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def move(self, source_key: str, target_key: str):
+        await asyncio.to_thread(
+            self.client.copy_object, Bucket=self.bucket, Key=self._key(target_key),
+            CopySource={"Bucket": self.bucket, "Key": self._key(source_key)}
+        )
+        await self.delete(source_key)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._key(key))
+
+    async def download_to(self, key: str, path: str):
+        await asyncio.to_thread(self.client.download_file, self.bucket, self._key(key), path)
+
+    def presigned_url(self, key: str, filename: Optional[str] = None,
+                      content_type: Optional[str] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if filename:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        if content_type:
+            params["ResponseContentType"] = content_type
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=self.presign_expires)
+
+
+def create_storage() -> StorageBackend:
+    """Storage backend selected by STORAGE_BACKEND (local or s3)"""
+    kind = settings.STORAGE_BACKEND.lower()
+    if kind == "s3":
+        if not BOTO3_AVAILABLE:
+            logger.warning("STORAGE_BACKEND=s3 but boto3 is not installed; storing files locally")
+        elif not settings.S3_BUCKET:
+            logger.warning("STORAGE_BACKEND=s3 but S3_BUCKET is not set; storing files locally")
+        else:
+            return S3Storage(settings.S3_BUCKET, prefix=settings.S3_PREFIX)
+    return LocalStorage(settings.UPLOAD_DIR)
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
@@ -0,0 +1,566 @@
+"""
+Test plan runs.
+
+A plan run expands a TestPlan into one TestExecution per test case. The
+executions are inserted in batches at the start, and the automated cases run
+as one background job. Cases are grouped into stages by
+``TestPlanTestCase.order``. Stages run one after another, and the cases of a
+stage run concurrently on a bounded pool of workers. When a mandatory case
+fails, the remaining stages are cancelled, unless the run was started with
+``stop_on_mandatory_failure=False``. Status transitions are buffered and
+written as batched executemany UPDATEs, so a plan with thousands of cases
+costs a few statements per second instead of two round trips per case.
+Progress is pushed to the requesting user over WebSocket. Unless disabled,
+the cases of each stage start in history-based priority order (see
+``prioritization``): likely failures first, then long tests first.
+
+What a case runs is described by ``test_data["automation"]`` of the test case:
+
+    {"runner": "http", "url": "...", "method": "GET", "expected_status": 200}
+    {"runner": "newman", "collection_url": "...", "environment": {...}}
+    {"runner": "jmeter", "url": "...", "test_type": "load", "concurrent_users": 10,
+     "duration": 60, "thresholds": {"response_time": 1000, "error_rate": 1}}
+
+JMeter tests run on the ai-perf-tester service (``PERF_TESTER_URL``). Cases
+without an automation entry keep a pending execution for testers to record.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from itertools import groupby
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.db_models import ExecutionStatus, TestCase, TestExecution, TestPlan, TestPlanTestCase
+from app.services.event_pipeline import DomainEvent, event_pipeline
+from app.services.job_registry import BackgroundJob, JobRegistry
+from app.services.newman_results import mask_secrets
+from app.services.newman_runner import NewmanJobStatus, newman_runner
+from app.services.prioritization import prioritize as prioritize_cases
+
+logger = logging.getLogger(__name__)
+
+RUNNERS = ("http", "newman", "jmeter")
+
+# Progress messages are sent at most this often per run
+_REPORT_INTERVAL_SECONDS = 0.5
+_MAX_LOG_CHARS = 10000
+
+
+class PlanRunStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class PlanCase:
+    test_case_id: str
+    title: str
+    order: int = 0
+    is_mandatory: bool = True
+    automation: Optional[Dict[str, Any]] = None
+    execution_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: ExecutionStatus = ExecutionStatus.PENDING
+    result: Optional[str] = None
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    @property
+    def runner(self) -> Optional[str]:
+        return (self.automation or {}).get("runner")
+
+    @property
+    def automated(self) -> bool:
+        return self.runner is not None
+
+
+@dataclass
+class PlanRun(BackgroundJob):
+    id: str
+    test_plan_id: str
+    plan_name: str
+    project_id: str
+    requested_by: str
+    requested_by_name: str = "Unknown user"
+    environment_id: Optional[str] = None
+    parallelism: int = 8
+    stop_on_mandatory_failure: bool = True
+    prioritized: bool = False
+    cases: List[PlanCase] = field(default_factory=list)
+    status: PlanRunStatus = PlanRunStatus.PENDING
+    stage: str = "queued"
+    current_order: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    def stages(self) -> List[Tuple[int, List[PlanCase]]]:
+        """Automated cases grouped by their order in the plan"""
+        automated = sorted((case for case in self.cases if case.automated), key=lambda case: case.order)
+        return [(order, list(cases)) for order, cases in groupby(automated, key=lambda case: case.order)]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"total": len(self.cases), "manual": 0, "pending": 0, "running": 0,
+                  "passed": 0, "failed": 0, "cancelled": 0}
+        for case in self.cases:
+            if not case.automated:
+                counts["manual"] += 1
+            elif case.status == ExecutionStatus.PENDING:
+                counts["pending"] += 1
+            elif case.status == ExecutionStatus.RUNNING:
+                counts["running"] += 1
+            elif case.status == ExecutionStatus.CANCELLED:
+                counts["cancelled"] += 1
+            elif case.result == "pass":
+                counts["passed"] += 1
+            else:
+                counts["failed"] += 1
+        return counts
+
+    @property
+    def duration(self) -> Optional[float]:
+        if not self.started_at:
+            return None
+        return ((self.completed_at or datetime.utcnow()) - self.started_at).total_seconds()
+
+    id_key = "run_id"
+
+    def progress(self, include_cases: bool = False) -> Dict[str, Any]:
+        summary = {
+            **super().progress(),
+            "test_plan_id": self.test_plan_id,
+            "current_order": self.current_order,
+            "parallelism": self.parallelism,
+            "prioritized": self.prioritized,
+            "counts": self.counts(),
+            "error": self.error,
+            "duration": self.duration,
+        }
+        if include_cases:
+            summary["cases"] = [
+                {
+                    "test_case_id": case.test_case_id,
+                    "execution_id": case.execution_id,
+                    "title": case.title,
+                    "order": case.order,
+                    "is_mandatory": case.is_mandatory,
+                    "runner": case.runner,
+                    "status": case.status.value,
+                    "result": case.result,
+                    "error": case.error,
+                }
+                for case in self.cases
+            ]
+        return summary
+
+
+class ExecutionWriter:
+    """
+    Buffers execution status transitions and writes them as batched UPDATEs.
+    Updates of one execution made before a flush are merged into a single row.
+    """
+
+    def __init__(self, write: Callable[[List[Dict[str, Any]]], Awaitable[None]]):
+        self._write = write
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def update(self, execution_id: str, **values):
+        self._pending.setdefault(execution_id, {"id": execution_id}).update(values, updated_at=datetime.utcnow())
+
+    def start(self):
+        self._task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(settings.PLAN_RUN_FLUSH_INTERVAL_MS / 1000)
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            rows, self._pending = list(self._pending.values()), {}
+            batch_size = settings.PLAN_RUN_BATCH_SIZE
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    logger.error(f"Could not write {len(batch)} execution updates, retrying with the next flush: {e}")
+                    # Newer values queued meanwhile win over the failed ones
+                    for row in batch:
+                        self._pending[row["id"]] = {**row, **self._pending.get(row["id"], {})}
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+
+async def expand_plan(db: AsyncSession, test_plan_id: str) -> List[PlanCase]:
+    """The cases of a plan in run order, read in one query"""
+    result = await db.execute(
+        select(
+            TestPlanTestCase.test_case_id, TestPlanTestCase.order, TestPlanTestCase.is_mandatory,
+            TestCase.title, TestCase.test_data
+        )
+        .join(TestCase, TestCase.id == TestPlanTestCase.test_case_id)
+        .where(TestPlanTestCase.test_plan_id == test_plan_id)
+        .order_by(TestPlanTestCase.order, TestPlanTestCase.created_at, TestPlanTestCase.id)
+    )
+    cases = []
+    for row in result.all():
+        automation = (row.test_data or {}).get("automation") if isinstance(row.test_data, dict) else None
+        cases.append(PlanCase(
+            test_case_id=row.test_case_id,
+            title=row.title,
+            order=row.order or 0,
+            is_mandatory=row.is_mandatory if row.is_mandatory is not None else True,
+            automation=automation if isinstance(automation, dict) and automation.get("runner") else None
+        ))
+    return cases
+
+
+async def insert_executions(run: PlanRun):
+    """Create the pending executions of all cases with batched executemany INSERTs"""
+    from app.db.session import get_session_factory
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": case.execution_id,
+            "test_case_id": case.test_case_id,
+            "test_plan_id": run.test_plan_id,
+            "executed_by": run.requested_by,
+            "environment_id": run.environment_id,
+            "status": ExecutionStatus.PENDING,
+            "screenshots": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for case in run.cases
+    ]
+    batch_size = settings.PLAN_RUN_BATCH_SIZE
+    async with get_session_factory()() as db:
+        for start in range(0, len(rows), batch_size):
+            await db.execute(insert(TestExecution), rows[start:start + batch_size])
+        await db.commit()
+
+
+async def write_execution_updates(rows: List[Dict[str, Any]]):
+    """ORM bulk UPDATE by primary key; rows with the same keys share one executemany"""
+    from app.db.session import get_session_factory
+
+    async with get_session_factory()() as db:
+        await db.execute(update(TestExecution), rows)
+        await db.commit()
+
+
+def _jmeter_violations(metrics: Dict[str, Any], thresholds: Dict[str, Any]) -> List[str]:
+    """Thresholds of the ai-perf-tester request that the summary metrics exceed"""
+    violations = []
+    checks = (
+        ("response_time", "avg_response_time", "Average response time", "ms", False),
+        ("error_rate", "error_rate", "Error rate", "%", False),
+        ("throughput", "throughput", "Throughput", "req/s", True),
+    )
+    for key, metric, label, unit, minimum in checks:
+        limit, value = thresholds.get(key), metrics.get(metric)
+        if limit is None or value is None:
+            continue
+        if (value < limit) if minimum else (value > limit):
+            violations.append(f"{label} {value} {unit} {'below' if minimum else 'above'} {limit} {unit}")
+    return violations
+
+
+class PlanRunner(JobRegistry[PlanRun]):
+    """Runs test plans in the background and keeps their progress for polling"""
+
+    progress_type = "plan_run_progress"
+    job_label = "plan run"
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__()
+        self._transport = transport
+        self._last_report: Dict[str, float] = {}
+        self._jmeter_limit: Optional[asyncio.Semaphore] = None
+
+    async def start_run(
+        self,
+        db: AsyncSession,
+        plan: TestPlan,
+        requested_by: str,
+        requested_by_name: str = "Unknown user",
+        parallelism: Optional[int] = None,
+        stop_on_mandatory_failure: bool = True,
+        environment_id: Optional[str] = None,
+        prioritize: bool = True,
+        changed_areas: Sequence[str] = ()
+    ) -> PlanRun:
+        """Expand the plan and start running it; raises ValueError for a plan without test cases"""
+        cases = await expand_plan(db, plan.id)
+        if not cases:
+            raise ValueError("The test plan has no test cases")
+        parallelism = max(1, min(parallelism or settings.PLAN_RUN_CONCURRENCY, settings.PLAN_RUN_MAX_CONCURRENCY))
+        prioritized = False
+        if prioritize:
+            try:
+                ranking = await prioritize_cases(
+                    db, [case.test_case_id for case in cases if case.automated], changed_areas, parallelism
+                )
+                position = {item.test_case_id: item.rank for item in ranking}
+                # Stable: PlanRun.stages() keeps this order within each stage
+                cases.sort(key=lambda case: position.get(case.test_case_id, len(position) + 1))
+                prioritized = True
+            except Exception as e:
+                logger.warning(f"Could not prioritize test plan {plan.id}, keeping the plan order: {e}")
+        run = PlanRun(
+            id=str(uuid.uuid4()),
+            test_plan_id=plan.id,
+            plan_name=plan.name,
+            project_id=plan.project_id,
+            requested_by=requested_by,
+            requested_by_name=requested_by_name,
+            environment_id=environment_id,
+            parallelism=parallelism,
+            stop_on_mandatory_failure=stop_on_mandatory_failure,
+            prioritized=prioritized,
+            cases=cases
+        )
+        self._add_job(run)
+        self._tasks[run.id] = asyncio.create_task(self.run_plan(run))
+        return run
+
+    async def cancel_run(self, run_id: str) -> bool:
+        task = self._tasks.get(run_id)
+        if task is None:
+            return False
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return True
+
+    async def run_plan(self, run: PlanRun) -> PlanRun:
+        """Create the executions, then run the automated cases stage by stage"""
+        run.status = PlanRunStatus.RUNNING
+        run.started_at = datetime.utcnow()
+        writer = ExecutionWriter(write_execution_updates)
+        if self._jmeter_limit is None:
+            self._jmeter_limit = asyncio.Semaphore(max(1, settings.PLAN_RUN_JMETER_CONCURRENCY))
+        client = httpx.AsyncClient(
+            transport=self._transport,
+            timeout=settings.PLAN_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=run.parallelism)
+        )
+        try:
+            run.stage = "creating_executions"
+            await self._report(run, force=True)
+            await insert_executions(run)
+            writer.start()
+
+            run.stage = "running"
+            stages = run.stages()
+            for index, (order, cases) in enumerate(stages):
+                run.current_order = order
+                await self._run_stage(run, cases, writer, client)
+                failed = [case for case in cases if case.is_mandatory and case.result == "fail"]
+                if failed and run.stop_on_mandatory_failure and index < len(stages) - 1:
+                    run.error = f"Mandatory test case '{failed[0].title}' failed; remaining stages were cancelled"
+                    break
+            self._cancel_remaining(run, writer)
+            run.stage = "done"
+            run.status = PlanRunStatus.COMPLETED
+        except asyncio.CancelledError:
+            self._cancel_remaining(run, writer)
+            run.stage = "cancelled"
+            run.status = PlanRunStatus.CANCELLED
+        except Exception as e:
+            logger.error(f"Plan run {run.id} of test plan {run.test_plan_id} failed: {str(e)}")
+            self._cancel_remaining(run, writer)
+            run.error = str(e) or type(e).__name__
+            run.stage = "failed"
+            run.status = PlanRunStatus.FAILED
+        finally:
+            run.completed_at = datetime.utcnow()
+            await writer.close()
+            await client.aclose()
+            self._tasks.pop(run.id, None)
+            self._last_report.pop(run.id, None)
+            self._publish(run)
+            await self._report(run, force=True)
+        return run
+
+    async def _run_stage(self, run: PlanRun, cases: List[PlanCase], writer: ExecutionWriter, client: httpx.AsyncClient):
+        """Run the cases of one stage on at most `parallelism` workers"""
+        pending = iter(cases)
+
+        async def worker():
+            # The workers share the iterator, so every case is taken exactly once
+            for case in pending:
+                await self._run_case(run, case, writer, client)
+
+        await asyncio.gather(*(worker() for _ in range(min(run.parallelism, len(cases)))))
+
+    async def _run_case(self, run: PlanRun, case: PlanCase, writer: ExecutionWriter, client: httpx.AsyncClient):
+        case.status = ExecutionStatus.RUNNING
+        case.started_at = datetime.utcnow()
+        writer.update(case.execution_id, status=ExecutionStatus.RUNNING, started_at=case.started_at)
+        await self._report(run)
+
+        logs = ""
+        try:
+            if case.runner == "http":
+                passed, logs = await self._run_http(case, client)
+            elif case.runner == "newman":
+                passed, logs = await self._run_newman(run, case)
+            elif case.runner == "jmeter":
+                passed, logs = await self._run_jmeter(run, case, client)
+            else:
+                raise ValueError(f"Unknown runner {case.runner}; expected one of {', '.join(RUNNERS)}")
+            case.status = ExecutionStatus.COMPLETED
+            case.result = "pass" if passed else "fail"
+        except Exception as e:
+            case.status = ExecutionStatus.FAILED
+            case.result = "fail"
+            case.error = str(e) or type(e).__name__
+
+        case.completed_at = datetime.utcnow()
+        writer.update(
+            case.execution_id,
+            status=case.status,
+            result=case.result,
+            completed_at=case.completed_at,
+            duration=int((case.completed_at - case.started_at).total_seconds()),
+            logs=logs[-_MAX_LOG_CHARS:] or None,
+            error_message=case.error
+        )
+        await self._report(run)
+
+    async def _run_http(self, case: PlanCase, client: httpx.AsyncClient) -> Tuple[bool, str]:
+        spec = case.automation
+        method = spec.get("method", "GET").upper()
+        started = asyncio.get_running_loop().time()
+        response = await client.request(
+            method, spec["url"],
+            headers=spec.get("headers"),
+            json=spec.get("json"),
+            content=spec.get("body"),
+            timeout=spec.get("timeout", settings.PLAN_HTTP_TIMEOUT)
+        )
+        expected = spec.get("expected_status", 200)
+        expected = expected if isinstance(expected, list) else [expected]
+        passed = response.status_code in expected
+        logs = (f"{method} {mask_secrets(spec['url'])} -> {response.status_code} "
+                f"in {(asyncio.get_running_loop().time() - started) * 1000:.0f} ms")
+        if response.status_code not in expected:
+            logs += f"\nExpected status {' or '.join(str(code) for code in expected)}"
+        if spec.get("expected_text") and spec["expected_text"] not in response.text:
+            passed = False
+            logs += f"\nResponse does not contain {spec['expected_text']!r}"
+        return passed, logs
+
+    async def _run_newman(self, run: PlanRun, case: PlanCase) -> Tuple[bool, str]:
+        """Queue the collection on the Newman runner; its results are stored on the plan's execution"""
+        spec = case.automation
+        shards = spec.get("shards", 1)
+        if not isinstance(shards, int) or not 1 <= shards <= settings.NEWMAN_MAX_SHARDS:
+            raise ValueError(f"shards must be a whole number from 1 to {settings.NEWMAN_MAX_SHARDS}")
+        if spec.get("shard_by", "folder") not in ("folder", "requests"):
+            raise ValueError("shard_by must be folder or requests")
+        job = await newman_runner.enqueue(
+            run.requested_by,
+            spec["collection_url"],
+            environment=spec.get("environment"),
+            test_case_id=case.test_case_id,
+            requested_by_name=run.requested_by_name,
+            shards=shards,
+            shard_by=spec.get("shard_by", "folder"),
+            execution_id=case.execution_id
+        )
+        try:
+            await job.finished.wait()
+        except asyncio.CancelledError:
+            # Otherwise the job would still store its results on the cancelled execution
+            await newman_runner.cancel(job.id)
+            raise
+        if job.status == NewmanJobStatus.CANCELLED:
+            raise RuntimeError("Newman run was cancelled")
+        if job.status == NewmanJobStatus.FAILED:
+            raise RuntimeError(job.error or "Newman run failed")
+        failed_requests = (job.summary or {}).get("failed_requests", 0)
+        return job.return_code == 0 and not failed_requests, "\n".join(job.output)
+
+    async def _run_jmeter(self, run: PlanRun, case: PlanCase, client: httpx.AsyncClient) -> Tuple[bool, str]:
+        """Run a load test on the ai-perf-tester service and check its thresholds"""
+        spec = case.automation
+        payload = {
+            "test_name": f"{run.plan_name}: {case.title}",
+            "test_type": spec.get("test_type", "load"),
+            "url": spec["url"],
+            "concurrent_users": spec.get("concurrent_users", 10),
+            "duration": spec.get("duration", 60),
+            "ramp_up_time": spec.get("ramp_up_time", 10),
+            "thresholds": spec.get("thresholds"),
+            "custom_parameters": spec.get("custom_parameters"),
+        }
+        # The service answers once the test finished
+        timeout = payload["duration"] + payload["ramp_up_time"] + 300
+        async with self._jmeter_limit:
+            response = await client.post(f"{settings.PERF_TESTER_URL}/run-performance-test", json=payload, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        metrics = data.get("summary_metrics") or {}
+        violations = _jmeter_violations(metrics, spec.get("thresholds") or {})
+        logs = f"JMeter run {data.get('run_id')}: {json.dumps(metrics)}"
+        if violations:
+            logs += "\n" + "\n".join(violations)
+        return not violations, logs
+
+    @staticmethod
+    def _cancel_remaining(run: PlanRun, writer: ExecutionWriter):
+        """Automated cases that did not finish will not run in this plan run"""
+        now = datetime.utcnow()
+        for case in run.cases:
+            if case.automated and case.status in (ExecutionStatus.PENDING, ExecutionStatus.RUNNING):
+                case.status = ExecutionStatus.CANCELLED
+                case.completed_at = now
+                writer.update(case.execution_id, status=ExecutionStatus.CANCELLED, completed_at=now)
+
+    def _publish(self, run: PlanRun):
+        event_pipeline.publish(DomainEvent(
+            action="execute",
+            target_type="test_plan",
+            target_id=run.test_plan_id,
+            target_name=run.plan_name,
+            user_id=run.requested_by,
+            user_name=run.requested_by_name,
+            project_id=run.project_id,
+            details={"run_id": run.id, "status": run.status.value, "duration": run.duration, **run.counts()}
+        ))
+
+    async def _report(self, run: PlanRun, force: bool = False):
+        """Push run progress to the requesting user, at most every _REPORT_INTERVAL_SECONDS"""
+        now = asyncio.get_running_loop().time()
+        if not force and now - self._last_report.get(run.id, 0.0) < _REPORT_INTERVAL_SECONDS:
+            return
+        self._last_report[run.id] = now
+        await super()._report(run)
+
+
+plan_runner = PlanRunner()
@@ -0,0 +1,298 @@
+"""
+History-based test prioritization.
+
+Orders test cases so that likely failures run first. Each case gets a risk
+score from its recent ``test_executions``:
+- its failure rate, with exponential decay so recent runs count more;
+- whether the latest run failed;
+- how often the result flipped between pass and fail (flakiness);
+- whether its module or tags are among the changed areas;
+- its priority.
+
+Cases that never ran get a prior failure rate, so new tests are not pushed to
+the end. Cases are split into risk tiers. Within a tier, parallel runs start
+the longest tests first (LPT), so the slowest cases do not end up alone at the
+end of the run. A sequential run orders by risk per second instead.
+
+The per-case statistics are computed once per project with one windowed
+query and cached. They are recomputed only when the project's executions
+change, so ordering a plan is a cheap aggregate check plus in-memory sorting,
+with no LLM round trip. The result is deterministic: ties are broken by test
+case id.
+"""
+import heapq
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.db_models import ExecutionStatus, TestCase, TestExecution
+
+logger = logging.getLogger(__name__)
+
+# Share of the risk score per signal; they add up to 1
+WEIGHT_FAILURE_RATE = 0.45
+WEIGHT_LAST_FAILED = 0.2
+WEIGHT_FLAKINESS = 0.15
+WEIGHT_CHANGED = 0.15
+WEIGHT_PRIORITY = 0.05
+# Failure rate assumed for cases without runs
+NEW_CASE_FAILURE_RATE = 0.3
+# Lower bounds of the risk tiers; tier 0 runs first
+TIER_THRESHOLDS = (0.5, 0.1)
+PRIORITY_WEIGHTS = {"critical": 1.0, "high": 0.66, "medium": 0.33, "low": 0.0}
+
+_FAILED_RESULTS = ("fail", "failed", "error")
+# Projects whose statistics are kept in memory
+_MAX_CACHED_PROJECTS = 256
+
+
+@dataclass
+class CaseStats:
+    test_case_id: str
+    runs: int = 0
+    failures: int = 0
+    failure_rate: float = 0.0  # Decay-weighted, in [0, 1]
+    last_failed: bool = False
+    flips: int = 0
+    average_duration: Optional[float] = None
+    last_run_at: Optional[datetime] = None
+
+    @property
+    def flakiness(self) -> float:
+        return self.flips / (self.runs - 1) if self.runs > 1 else 0.0
+
+
+@dataclass
+class CaseInfo:
+    test_case_id: str
+    priority: Optional[str] = None
+    module: Optional[str] = None
+    tags: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RankedCase:
+    test_case_id: str
+    rank: int
+    risk: float
+    tier: int
+    estimated_duration: float
+    runs: int = 0
+    reasons: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "test_case_id": self.test_case_id,
+            "rank": self.rank,
+            "risk": self.risk,
+            "tier": self.tier,
+            "estimated_duration": self.estimated_duration,
+            "runs": self.runs,
+            "reasons": self.reasons,
+        }
+
+
+def _failed(status: Any, result: Any) -> bool:
+    if status == ExecutionStatus.FAILED:
+        return True
+    # Runs store "pass"/"fail"; older executions may hold an object with a status
+    if isinstance(result, dict):
+        result = result.get("status") or result.get("result")
+    return isinstance(result, str) and result.lower() in _FAILED_RESULTS
+
+
+def build_stats(rows: Iterable[Any], half_life: Optional[float] = None) -> Dict[str, CaseStats]:
+    """
+    Aggregate execution rows (test_case_id, status, result, duration, completed_at)
+    into per-case statistics. The rows of a case must come newest first.
+    """
+    half_life = half_life or settings.PRIORITIZE_HALF_LIFE_RUNS
+    stats: Dict[str, CaseStats] = {}
+    weights: Dict[str, float] = {}
+    weighted_failures: Dict[str, float] = {}
+    durations: Dict[str, List[int]] = {}
+    previous: Dict[str, bool] = {}
+    for test_case_id, status, result, duration, completed_at in rows:
+        case = stats.get(test_case_id)
+        if case is None:
+            case = stats[test_case_id] = CaseStats(test_case_id, last_run_at=completed_at)
+        failed = _failed(status, result)
+        weight = 0.5 ** (case.runs / half_life)
+        weights[test_case_id] = weights.get(test_case_id, 0.0) + weight
+        if failed:
+            weighted_failures[test_case_id] = weighted_failures.get(test_case_id, 0.0) + weight
+            case.failures += 1
+        if case.runs == 0:
+            case.last_failed = failed
+        elif previous[test_case_id] != failed:
+            case.flips += 1
+        previous[test_case_id] = failed
+        if duration is not None:
+            durations.setdefault(test_case_id, []).append(duration)
+        case.runs += 1
+    for test_case_id, case in stats.items():
+        case.failure_rate = weighted_failures.get(test_case_id, 0.0) / weights[test_case_id]
+        if durations.get(test_case_id):
+            case.average_duration = sum(durations[test_case_id]) / len(durations[test_case_id])
+    return stats
+
+
+def _score(case: CaseInfo, stats: Optional[CaseStats], changed: set) -> Tuple[float, List[str]]:
+    reasons = []
+    if stats is None or stats.runs == 0:
+        failure_rate, last_failed, flakiness = NEW_CASE_FAILURE_RATE, False, 0.0
+        reasons.append("no recent runs")
+    else:
+        failure_rate, last_failed, flakiness = stats.failure_rate, stats.last_failed, stats.flakiness
+        if last_failed:
+            reasons.append("failed in the latest run")
+        if stats.failures:
+            reasons.append(f"failed {stats.failures} of the last {stats.runs} runs")
+        if stats.flips:
+            reasons.append(f"result changed {stats.flips} times in {stats.runs} runs")
+
+    areas = {area.lower() for area in [case.module, *case.tags] if area}
+    touched = sorted(areas & changed)
+    if touched:
+        reasons.append(f"covers changed {', '.join(touched)}")
+    priority = PRIORITY_WEIGHTS.get((case.priority or "").lower(), 0.0)
+    if priority >= PRIORITY_WEIGHTS["high"]:
+        reasons.append(f"{case.priority.lower()} priority")
+
+    risk = (
+        WEIGHT_FAILURE_RATE * failure_rate
+        + WEIGHT_LAST_FAILED * last_failed
+        + WEIGHT_FLAKINESS * flakiness
+        + WEIGHT_CHANGED * bool(touched)
+        + WEIGHT_PRIORITY * priority
+    )
+    return round(risk, 4), reasons
+
+
+def _tier(risk: float) -> int:
+    return next((tier for tier, threshold in enumerate(TIER_THRESHOLDS) if risk >= threshold), len(TIER_THRESHOLDS))
+
+
+def rank(
+    cases: Sequence[CaseInfo],
+    stats: Dict[str, CaseStats],
+    changed: Iterable[str] = (),
+    parallelism: int = 1
+) -> List[RankedCase]:
+    """Order cases failure-first; longest first within a risk tier when they run in parallel"""
+    changed = {area.lower() for area in changed if area}
+    ranked = []
+    for case in cases:
+        risk, reasons = _score(case, stats.get(case.test_case_id), changed)
+        case_stats = stats.get(case.test_case_id)
+        duration = (case_stats.average_duration if case_stats and case_stats.average_duration is not None
+                    else float(settings.PRIORITIZE_DEFAULT_DURATION))
+        ranked.append(RankedCase(
+            case.test_case_id, 0, risk, _tier(risk), round(duration, 1),
+            runs=case_stats.runs if case_stats else 0, reasons=reasons
+        ))
+
+    if parallelism > 1:
+        key = lambda item: (item.tier, -item.estimated_duration, -item.risk, item.test_case_id)
+    else:
+        key = lambda item: (item.tier, -item.risk / max(item.estimated_duration, 1.0), item.test_case_id)
+    ranked.sort(key=key)
+    for position, item in enumerate(ranked, start=1):
+        item.rank = position
+    return ranked
+
+
+def estimated_makespan(ranking: Sequence[RankedCase], parallelism: int = 1) -> float:
+    """Wall time of running the cases in this order on `parallelism` workers"""
+    workers = [0.0] * max(1, parallelism)
+    for item in ranking:
+        heapq.heappush(workers, heapq.heappop(workers) + item.estimated_duration)
+    return max(workers)
+
+
+class HistoryStats:
+    """Per-case statistics of each project's recent runs, recomputed only when its executions change"""
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[tuple, Dict[str, CaseStats]]] = {}
+
+    async def for_project(self, db: AsyncSession, project_id: str) -> Dict[str, CaseStats]:
+        # Whole days, so the window (part of the cache version) only moves once a day
+        since = (datetime.utcnow() - timedelta(days=settings.PRIORITIZE_HISTORY_DAYS)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        count, last_update = (await db.execute(
+            select(func.count(TestExecution.id), func.max(TestExecution.updated_at))
+            .join(TestCase, TestCase.id == TestExecution.test_case_id)
+            .where(TestCase.project_id == project_id)
+        )).one()
+        version = (count, last_update, since, settings.PRIORITIZE_HISTORY_RUNS)
+        cached = self._cache.get(project_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        latest = (
+            select(
+                TestExecution.test_case_id, TestExecution.status, TestExecution.result,
+                TestExecution.duration, TestExecution.completed_at,
+                func.row_number().over(
+                    partition_by=TestExecution.test_case_id,
+                    order_by=(TestExecution.completed_at.desc(), TestExecution.id)
+                ).label("position")
+            )
+            .join(TestCase, TestCase.id == TestExecution.test_case_id)
+            .where(
+                (TestCase.project_id == project_id)
+                & (TestExecution.completed_at >= since)
+                & TestExecution.status.in_([ExecutionStatus.COMPLETED, ExecutionStatus.FAILED])
+            )
+            .subquery()
+        )
+        result = await db.execute(
+            select(latest.c.test_case_id, latest.c.status, latest.c.result, latest.c.duration, latest.c.completed_at)
+            .where(latest.c.position <= settings.PRIORITIZE_HISTORY_RUNS)
+            .order_by(latest.c.test_case_id, latest.c.position)
+        )
+        stats = build_stats(result.all())
+
+        self._cache.pop(project_id, None)
+        self._cache[project_id] = (version, stats)
+        while len(self._cache) > _MAX_CACHED_PROJECTS:
+            self._cache.pop(next(iter(self._cache)))
+        logger.debug(f"Computed run statistics of {len(stats)} test cases of project {project_id}")
+        return stats
+
+
+history_stats = HistoryStats()
+
+
+async def prioritize(
+    db: AsyncSession,
+    test_case_ids: Sequence[str],
+    changed: Iterable[str] = (),
+    parallelism: int = 1
+) -> List[RankedCase]:
+    """Rank the given test cases from their execution history; unknown ids are left out"""
+    ids = list(dict.fromkeys(test_case_ids))
+    if not ids:
+        return []
+    result = await db.execute(
+        select(TestCase.id, TestCase.project_id, TestCase.priority, TestCase.module_feature, TestCase.tags)
+        .where(TestCase.id.in_(ids))
+    )
+    cases, projects = [], set()
+    for row in result.all():
+        priority = row.priority.value if hasattr(row.priority, "value") else row.priority
+        tags = [str(tag) for tag in row.tags] if isinstance(row.tags, list) else []
+        cases.append(CaseInfo(row.id, priority, row.module_feature, tags))
+        projects.add(row.project_id)
+
+    stats: Dict[str, CaseStats] = {}
+    for project_id in sorted(projects):
+        stats.update(await history_stats.for_project(db, project_id))
+    return rank(cases, stats, changed, parallelism)
@@ -0,0 +1,257 @@
+"""
+Prompt Budget
+Token counting and prompt compaction for LLM analysis requests.
+
+Large analysis prompts (multi-scenario performance results, raw test logs)
+are turned into compact tables, logs are sampled by relevance, and the final
+prompt is fitted into a per-provider token budget.
+
+This module only depends on the standard library (tiktoken is used when
+installed) so that standalone tools outside the app package can load it.
+"""
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+    tiktoken = None
+
+# Default prompt budgets (tokens) per provider, leaving room for the response
+DEFAULT_PROMPT_BUDGETS = {
+    "openai": 6000,
+    "google": 12000,
+    "default": 4000,
+}
+
+# Approximate characters per token when no tokenizer is available
+CHARS_PER_TOKEN = {
+    "openai": 4.0,
+    "google": 4.0,
+    "default": 3.5,
+}
+
+# Log line patterns and their relevance weight
+LOG_RELEVANCE_PATTERNS = [
+    (re.compile(r"\b(fatal|panic|traceback|exception)\b", re.IGNORECASE), 5),
+    (re.compile(r"\b(error|err)\b", re.IGNORECASE), 4),
+    (re.compile(r"\b(timed? ?out|refused|reset|unreachable|deadlock)\b", re.IGNORECASE), 4),
+    (re.compile(r"\b(5\d\d|4\d\d)\b"), 3),
+    (re.compile(r"\b(fail(ed|ure)?|assert(ion)?)\b", re.IGNORECASE), 3),
+    (re.compile(r"\b(warn(ing)?|retry|slow)\b", re.IGNORECASE), 2),
+]
+
+_VARIABLE_PARTS = re.compile(r"0x[0-9a-f]+|\d+", re.IGNORECASE)
+
+
+def prompt_budget(provider: str = "openai") -> int:
+    """Token budget for a provider; AI_PROMPT_TOKEN_BUDGET overrides the default"""
+    override = os.environ.get("AI_PROMPT_TOKEN_BUDGET")
+    if override and override.isdigit():
+        return int(override)
+    return DEFAULT_PROMPT_BUDGETS.get(provider, DEFAULT_PROMPT_BUDGETS["default"])
+
+
+@lru_cache(maxsize=16)
+def _openai_encoding(model: Optional[str]):
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, provider: str = "openai", model: Optional[str] = None) -> int:
+    """Count tokens with the provider's tokenizer, estimating when it is unavailable"""
+    if not text:
+        return 0
+    if provider == "openai" and TIKTOKEN_AVAILABLE:
+        return len(_openai_encoding(model).encode(text, disallowed_special=()))
+    chars_per_token = CHARS_PER_TOKEN.get(provider, CHARS_PER_TOKEN["default"])
+    return math.ceil(len(text) / chars_per_token)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, provider: str = "openai", model: Optional[str] = None) -> str:
+    """Cut text to at most max_tokens, marking the cut"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, provider, model) <= max_tokens:
+        return text
+
+    marker = "\n[... truncated ...]"
+    limit = max_tokens - count_tokens(marker, provider, model)
+    if limit <= 0:
+        return ""
+    if provider == "openai" and TIKTOKEN_AVAILABLE:
+        encoding = _openai_encoding(model)
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:limit]) + marker
+
+    chars_per_token = CHARS_PER_TOKEN.get(provider, CHARS_PER_TOKEN["default"])
+    return text[:int(limit * chars_per_token)] + marker
+
+
+def format_value(value: Any, digits: int = 1) -> str:
+    if isinstance(value, float):
+        return f"{value:.{digits}f}"
+    if value is None:
+        return "-"
+    return str(value)
+
+
+def format_table(rows: Sequence[Dict[str, Any]], columns: Sequence[str], digits: int = 1) -> str:
+    """Render rows as a compact pipe-separated table"""
+    lines = [" | ".join(columns)]
+    for row in rows:
+        lines.append(" | ".join(format_value(row.get(column), digits) for column in columns))
+    return "\n".join(lines)
+
+
+def summarize_series(values: Sequence[float]) -> Dict[str, Any]:
+    """Reduce a time series to a handful of statistics and a trend"""
+    if not values:
+        return {"n": 0}
+    ordered = sorted(values)
+    n = len(values)
+    p95 = ordered[min(n - 1, int(math.ceil(0.95 * n)) - 1)]
+
+    # Compare the averages of the first and last thirds of the series
+    third = max(1, n // 3)
+    head = sum(values[:third]) / third
+    tail = sum(values[-third:]) / third
+    spread = (ordered[-1] - ordered[0]) or 1.0
+    if (tail - head) / spread > 0.2:
+        trend = "rising"
+    elif (head - tail) / spread > 0.2:
+        trend = "falling"
+    else:
+        trend = "flat"
+
+    return {
+        "n": n,
+        "min": ordered[0],
+        "avg": sum(values) / n,
+        "p95": p95,
+        "max": ordered[-1],
+        "last": values[-1],
+        "trend": trend,
+    }
+
+
+def score_log_line(line: str) -> int:
+    return sum(weight for pattern, weight in LOG_RELEVANCE_PATTERNS if pattern.search(line))
+
+
+def select_log_lines(
+    logs: Union[str, Iterable[str]],
+    max_tokens: int,
+    provider: str = "openai",
+    model: Optional[str] = None
+) -> str:
+    """
+    Keep the most relevant log lines within a token budget.
+
+    Repeated lines that only differ in numbers (ids, timestamps, ports) are
+    collapsed into one line with a repeat count. Lines are chosen by relevance
+    and returned in their original order with omission markers.
+    """
+    lines = logs.splitlines() if isinstance(logs, str) else list(logs)
+    lines = [line.rstrip() for line in lines if line and line.strip()]
+    if not lines:
+        return ""
+
+    # Collapse near-duplicate lines, keeping the first occurrence
+    first_index: Dict[str, int] = {}
+    counts: Dict[str, int] = {}
+    for index, line in enumerate(lines):
+        key = _VARIABLE_PARTS.sub("#", line)
+        if key not in first_index:
+            first_index[key] = index
+        counts[key] = counts.get(key, 0) + 1
+
+    candidates = []
+    for key, index in first_index.items():
+        text = lines[index]
+        if counts[key] > 1:
+            text = f"{text} [x{counts[key]}]"
+        candidates.append((score_log_line(text), index, text))
+
+    full_text = "\n".join(text for _, _, text in sorted(candidates, key=lambda c: c[1]))
+    if count_tokens(full_text, provider, model) <= max_tokens:
+        return full_text
+
+    # Highest score first; among equals prefer the latest lines, closest to the failure
+    selected = []
+    used = 0
+    for score, index, text in sorted(candidates, key=lambda c: (-c[0], -c[1])):
+        cost = count_tokens(text, provider, model) + 1
+        if used + cost > max_tokens:
+            continue
+        selected.append((index, text))
+        used += cost
+
+    output = []
+    previous = -1
+    for index, text in sorted(selected):
+        if index > previous + 1:
+            output.append(f"[... {index - previous - 1} lines omitted ...]")
+        output.append(text)
+        previous = index
+    if previous < len(lines) - 1 and len(output) > 0:
+        output.append("[... more lines omitted ...]")
+    return "\n".join(output)
+
+
+class PromptBuilder:
+    """
+    Assemble a prompt from titled sections and fit it into a token budget.
+
+    Sections with a lower priority are truncated first and dropped when
+    nothing of them fits.
+    """
+
+    def __init__(self, provider: str = "openai", model: Optional[str] = None, max_tokens: Optional[int] = None):
+        self.provider = provider
+        self.model = model
+        self.max_tokens = max_tokens if max_tokens is not None else prompt_budget(provider)
+        self.sections: List[Dict[str, Any]] = []
+        self.used_tokens = 0
+        self.truncated: List[str] = []
+
+    def add(self, title: Optional[str], content: str, priority: int = 0) -> "PromptBuilder":
+        """Add a section; higher priority sections keep their content longest"""
+        text = f"{title}:\n{content}" if title else content
+        self.sections.append({
+            "title": title or "",
+            "text": text,
+            "priority": priority,
+            "tokens": count_tokens(text, self.provider, self.model),
+        })
+        return self
+
+    def build(self) -> str:
+        """Fit the sections into the budget; the sections themselves are left untouched"""
+        separator_tokens = 2
+        sections = [dict(section) for section in self.sections]
+        total = sum(section["tokens"] + separator_tokens for section in sections)
+        overflow = total - self.max_tokens
+        self.truncated = []
+
+        # Shrink the least important sections first, latest added first among equals
+        for section in sorted(reversed(sections), key=lambda s: s["priority"]):
+            if overflow <= 0:
+                break
+            keep = max(0, section["tokens"] - overflow)
+            section["text"] = truncate_to_tokens(section["text"], keep, self.provider, self.model)
+            new_tokens = count_tokens(section["text"], self.provider, self.model)
+            overflow -= section["tokens"] - new_tokens
+            section["tokens"] = new_tokens
+            self.truncated.append(section["title"])
+
+        parts = [section["text"] for section in sections if section["text"]]
+        prompt = "\n\n".join(parts)
+        self.used_tokens = count_tokens(prompt, self.provider, self.model)
+        return prompt
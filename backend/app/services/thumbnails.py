@@ -0,0 +1,104 @@
+"""
+Thumbnail cache for image attachments.
+
+Previews are rendered once per blob and size with Pillow and stored on local
+disk at ``UPLOAD_DIR/thumbnails/ab/<sha256>-<size>.webp``. They are keyed by
+content hash like the blobs, so a screenshot uploaded many times has one set
+of thumbnails. When blobs live in object storage this is a per-node cache,
+filled on demand. Rendering is blocking and runs in a worker thread.
+"""
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.core.importtime import module_available
+
+# Pillow is imported by the rendering code, not when the app starts
+PIL_AVAILABLE = module_available("PIL")
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp", "image/bmp"}
+
+
+class ThumbnailCache:
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or os.path.join(settings.UPLOAD_DIR, "thumbnails"))
+
+    @staticmethod
+    def supports(file_type: Optional[str]) -> bool:
+        return PIL_AVAILABLE and file_type in THUMBNAIL_TYPES
+
+    @staticmethod
+    def fit_size(requested: Optional[int]) -> int:
+        """Smallest configured size covering the requested one (the largest if none does)"""
+        sizes = sorted(settings.THUMBNAIL_SIZES)
+        if requested is None:
+            return sizes[0]
+        return next((size for size in sizes if size >= requested), sizes[-1])
+
+    def path(self, content_hash: str, size: int) -> Path:
+        return self.root / content_hash[:2] / f"{content_hash}-{size}.webp"
+
+    def get(self, content_hash: str, source_path: str, size: int) -> Optional[Path]:
+        """Path of the thumbnail, rendering it first if needed; None if the image cannot be read"""
+        path = self.path(content_hash, size)
+        if path.exists():
+            return path
+        from PIL import Image
+
+        try:
+            with Image.open(source_path) as image:
+                self._render(image, path, size)
+        except Exception as e:
+            logger.warning(f"Could not render thumbnail for {content_hash}: {e}")
+            return None
+        return path
+
+    def generate(self, content_hash: str, source_path: str):
+        """Pre-render every configured size, decoding the image once"""
+        missing = [size for size in sorted(settings.THUMBNAIL_SIZES, reverse=True)
+                   if not self.path(content_hash, size).exists()]
+        if not missing:
+            return
+        from PIL import Image
+
+        try:
+            with Image.open(source_path) as image:
+                for size in missing:
+                    self._render(image, self.path(content_hash, size), size)
+        except Exception as e:
+            logger.warning(f"Could not render thumbnails for {content_hash}: {e}")
+
+    @staticmethod
+    def _render(image, path: Path, size: int):
+        from PIL import ImageOps
+
+        preview = ImageOps.exif_transpose(image)
+        preview.thumbnail((size, size))
+        if preview.mode not in ("RGB", "RGBA"):
+            preview = preview.convert("RGBA")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary name so readers never see a partial file
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            preview.save(tmp_path, "WEBP", quality=80)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def remove(self, content_hash: str):
+        for size in settings.THUMBNAIL_SIZES:
+            try:
+                self.path(content_hash, size).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove thumbnail of {content_hash}: {e}")
+
+
+thumbnail_cache = ThumbnailCache()
@@ -0,0 +1,146 @@
+"""
+Pub/sub backplane that relays WebSocket broadcasts between backend workers.
+
+Each worker publishes the broadcasts raised locally and delivers the ones
+published by other workers to its own connections. Redis pub/sub is used in
+deployments (REDIS_URL from docker-compose.yml); the in-memory backplane
+connects managers living in the same process and is meant for tests and
+single-worker development.
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from ..core.config import settings
+from ..core.importtime import module_available
+
+# redis is imported when a Redis backplane starts
+REDIS_AVAILABLE = module_available("redis")
+
+logger = logging.getLogger(__name__)
+
+EnvelopeHandler = Callable[[dict], Awaitable[None]]
+
+
+class Backplane:
+    """Interface of a broadcast backplane"""
+
+    async def start(self, handler: EnvelopeHandler):
+        """Start delivering envelopes published by any worker to handler"""
+        raise NotImplementedError
+
+    async def publish(self, envelope: dict):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class InMemoryHub:
+    """Shared channel for in-memory backplanes"""
+
+    def __init__(self):
+        self.subscribers: List[asyncio.Queue] = []
+
+
+class InMemoryBackplane(Backplane):
+    """Backplane between managers in one process, connected through a hub"""
+
+    def __init__(self, hub: Optional[InMemoryHub] = None):
+        self.hub = hub or InMemoryHub()
+        self._queue: Optional[asyncio.Queue] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EnvelopeHandler):
+        self._queue = asyncio.Queue()
+        self.hub.subscribers.append(self._queue)
+        self._listener = asyncio.create_task(self._listen(handler))
+
+    async def publish(self, envelope: dict):
+        # Round-trip through JSON like the network transports do
+        payload = json.dumps(envelope)
+        for queue in self.hub.subscribers:
+            queue.put_nowait(payload)
+
+    async def _listen(self, handler: EnvelopeHandler):
+        while True:
+            payload = await self._queue.get()
+            try:
+                await handler(json.loads(payload))
+            except Exception as e:
+                logger.error(f"Error delivering backplane message: {e}")
+
+    async def stop(self):
+        if self._queue in self.hub.subscribers:
+            self.hub.subscribers.remove(self._queue)
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+
+
+class RedisBackplane(Backplane):
+    """Backplane over a Redis pub/sub channel"""
+
+    def __init__(self, url: str, channel: Optional[str] = None):
+        self.url = url
+        self.channel = channel or settings.WS_BACKPLANE_CHANNEL
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EnvelopeHandler):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(self.url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen(handler))
+        logger.info(f"WebSocket backplane subscribed to Redis channel {self.channel}")
+
+    async def publish(self, envelope: dict):
+        await self._redis.publish(self.channel, json.dumps(envelope))
+
+    async def _listen(self, handler: EnvelopeHandler):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    try:
+                        await handler(json.loads(message["data"]))
+                    except Exception as e:
+                        logger.error(f"Error delivering backplane message: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Connection lost: redis-py reconnects on the next read
+                logger.warning(f"Redis backplane connection error, retrying: {e}")
+            await asyncio.sleep(1)
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.aclose()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+
+def create_backplane() -> Optional[Backplane]:
+    """Backplane selected by WS_BACKPLANE (auto, redis, memory or none)"""
+    kind = settings.WS_BACKPLANE.lower()
+    if kind == "auto":
+        kind = "redis" if settings.REDIS_URL and REDIS_AVAILABLE else "none"
+
+    if kind == "redis":
+        if not REDIS_AVAILABLE:
+            logger.warning("WS_BACKPLANE=redis but the redis package is not installed; broadcasts stay local")
+            return None
+        if not settings.REDIS_URL:
+            logger.warning("WS_BACKPLANE=redis but REDIS_URL is not set; broadcasts stay local")
+            return None
+        return RedisBackplane(settings.REDIS_URL)
+    if kind == "memory":
+        return InMemoryBackplane()
+    return None
@@ -0,0 +1,131 @@
+"""
+Server-side coalescing of high-frequency WebSocket updates.
+
+Updates are buffered per destination (a room or all connections) for a short
+window and then flushed as one frame:
+
+- state updates (dashboard counters) are merged and only the keys whose value
+  changed since the last flush are sent, so clients apply each frame as a
+  patch. The merged state is kept as a snapshot for clients that connect later;
+- event updates (test executions) are keyed by entity id so only the latest
+  update per entity is sent;
+- when several messages are pending for a destination they are sent together
+  as a single ``batch`` frame.
+
+This bounds the number of frames per client to one per window and destination,
+regardless of how many updates are raised.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Destination = Tuple[str, Optional[str]]  # (scope, target), e.g. ("room", "project_1") or ("all", None)
+FlushCallback = Callable[[str, Optional[str], dict, Dict[str, dict]], Awaitable[None]]
+
+
+class _PendingUpdates:
+    __slots__ = ("states", "events", "order", "event_count")
+
+    def __init__(self):
+        self.states: Dict[str, dict] = {}
+        self.events: Dict[str, Dict[Any, dict]] = {}
+        self.order: List[str] = []
+        self.event_count = 0
+
+    def touch(self, message_type: str):
+        if message_type not in self.order:
+            self.order.append(message_type)
+
+
+class UpdateCoalescer:
+    """Debounces updates per destination and flushes them as delta or batch frames"""
+
+    def __init__(self, flush: FlushCallback, window: float, max_batch: int):
+        self._flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Destination, _PendingUpdates] = {}
+        self._timers: Dict[Destination, asyncio.Task] = {}
+        # Last flushed state per destination and message type
+        self.snapshots: Dict[Destination, Dict[str, dict]] = {}
+
+    async def submit_state(self, scope: str, target: Optional[str], message_type: str, data: dict):
+        """Merge a state update; later values for the same key win"""
+        pending = self._pending.setdefault((scope, target), _PendingUpdates())
+        pending.states.setdefault(message_type, {}).update(data)
+        pending.touch(message_type)
+        await self._schedule((scope, target))
+
+    async def submit_event(self, scope: str, target: Optional[str], message_type: str, data: dict, key: Any = None):
+        """Queue an event; events with the same key replace each other"""
+        pending = self._pending.setdefault((scope, target), _PendingUpdates())
+        events = pending.events.setdefault(message_type, {})
+        pending.event_count += 1
+        events[key if key is not None else ("#", pending.event_count)] = data
+        pending.touch(message_type)
+        if sum(len(e) for e in pending.events.values()) >= self.max_batch:
+            await self.flush((scope, target))
+        else:
+            await self._schedule((scope, target))
+
+    def merge_snapshot(self, scope: str, target: Optional[str], states: Dict[str, dict]):
+        """Apply state deltas flushed by another worker"""
+        snapshot = self.snapshots.setdefault((scope, target), {})
+        for message_type, delta in states.items():
+            snapshot.setdefault(message_type, {}).update(delta)
+
+    def snapshot_messages(self, scope: str, target: Optional[str]) -> List[dict]:
+        return [
+            {"type": message_type, "data": dict(state)}
+            for message_type, state in self.snapshots.get((scope, target), {}).items()
+        ]
+
+    async def _schedule(self, destination: Destination):
+        if self.window <= 0:
+            await self.flush(destination)
+        elif destination not in self._timers:
+            self._timers[destination] = asyncio.create_task(self._flush_later(destination))
+
+    async def _flush_later(self, destination: Destination):
+        await asyncio.sleep(self.window)
+        self._timers.pop(destination, None)
+        try:
+            await self.flush(destination)
+        except Exception as e:
+            logger.error(f"Error flushing coalesced WebSocket updates for {destination}: {e}")
+
+    async def flush(self, destination: Destination):
+        timer = self._timers.pop(destination, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        pending = self._pending.pop(destination, None)
+        if pending is None:
+            return
+
+        snapshot = self.snapshots.setdefault(destination, {})
+        messages = []
+        deltas: Dict[str, dict] = {}
+        for message_type in pending.order:
+            if message_type in pending.states:
+                previous = snapshot.setdefault(message_type, {})
+                delta = {
+                    key: value for key, value in pending.states[message_type].items()
+                    if key not in previous or previous[key] != value
+                }
+                if delta:
+                    previous.update(delta)
+                    deltas[message_type] = delta
+                    messages.append({"type": message_type, "data": delta})
+            for data in pending.events.get(message_type, {}).values():
+                messages.append({"type": message_type, "data": data})
+
+        if not messages:
+            return
+        frame = messages[0] if len(messages) == 1 else {"type": "batch", "data": {"messages": messages}}
+        await self._flush(destination[0], destination[1], frame, deltas)
+
+    async def flush_all(self):
+        for destination in list(self._pending):
+            await self.flush(destination)
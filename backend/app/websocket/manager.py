@@ -1,21 +1,124 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
+import asyncio
 import json
 import logging
+import uuid
 from datetime import datetime
+from ..core.config import settings
 from ..schemas.websocket import WebSocketMessage, NotificationMessage
+from .backplane import Backplane, create_backplane
+from .coalescer import UpdateCoalescer
 
 
 logger = logging.getLogger(__name__)
 
+# Close code sent to clients that cannot keep up with their outbound queue
+SLOW_CLIENT_CLOSE_CODE = 1013  # Try again later
+
+# The event loop only keeps weak references to tasks; fire-and-forget tasks are kept here until done
+_background_tasks: Set[asyncio.Task] = set()
+
+
+class OutboundConnection:
+    """
+    A WebSocket with a bounded outbound queue drained by its own writer task.
+
+    Messages are queued without awaiting the socket, so a slow client only
+    delays itself. When the queue is full the client is either disconnected
+    or the message is dropped, depending on WS_SLOW_CLIENT_POLICY.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str, on_close, queue_size: Optional[int] = None):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.WS_SEND_QUEUE_SIZE)
+        self.dropped = 0
+        self.closed = False
+        self._on_close = on_close
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, text: str) -> bool:
+        """Queue a serialized message; returns False when the queue overflowed"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if settings.WS_SLOW_CLIENT_POLICY == "drop":
+                return False
+            logger.warning(f"Disconnecting slow WebSocket client of user {self.user_id}: outbound queue full")
+            self._on_close(self.websocket)
+            task = asyncio.create_task(self._close_socket(SLOW_CLIENT_CLOSE_CODE))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+            return False
+
+    def close(self):
+        self.closed = True
+        if self._writer and not self._writer.done() and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception as e:
+            # The client is usually gone already
+            logger.debug(f"Closing WebSocket of user {self.user_id} failed: {e}")
+
+    async def _write_loop(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"WebSocket send to user {self.user_id} failed: {e}")
+            self._on_close(self.websocket)
+
+
 class WebSocketManager:
     def __init__(self):
         # Store active connections by user_id
         self.active_connections: Dict[str, List[WebSocket]] = {}
         # Store user sessions
         self.user_sessions: Dict[WebSocket, str] = {}
-        # Store room memberships (for project-based updates)
-        self.room_memberships: Dict[str, Set[str]] = {}
+        # Outbound queue and writer task per connection
+        self.outbound: Dict[WebSocket, OutboundConnection] = {}
+        # Store room memberships (for project-based updates) by connection,
+        # with the reverse index of rooms joined by each connection
+        self.room_memberships: Dict[str, Set[WebSocket]] = {}
+        self.connection_rooms: Dict[WebSocket, Set[str]] = {}
+        # Relays broadcasts to the connections held by other workers
+        self.backplane: Optional[Backplane] = None
+        self.worker_id = uuid.uuid4().hex
+        # Debounces high-frequency execution and dashboard updates
+        self.coalescer = UpdateCoalescer(
+            self._publish_coalesced,
+            window=settings.WS_COALESCE_WINDOW_MS / 1000,
+            max_batch=settings.WS_COALESCE_MAX_BATCH
+        )
+    
+    async def start_backplane(self, backplane: Optional[Backplane] = None):
+        """Start relaying broadcasts through the configured (or given) backplane"""
+        self.backplane = backplane or create_backplane()
+        if self.backplane is not None:
+            await self.backplane.start(self._on_backplane_message)
+    
+    async def flush_updates(self):
+        """Send all coalesced updates that are still pending"""
+        await self.coalescer.flush_all()
+    
+    async def stop_backplane(self):
+        if self.backplane is not None:
+            await self.backplane.stop()
+            self.backplane = None
     
     async def connect(self, websocket: WebSocket, user_id: str):
         """Connect a user to WebSocket"""
@@ -26,14 +129,20 @@ class WebSocketManager:
         
         self.active_connections[user_id].append(websocket)
         self.user_sessions[websocket] = user_id
+        connection = OutboundConnection(websocket, user_id, self.disconnect)
+        self.outbound[websocket] = connection
+        connection.start()
         
         logger.info(f"User {user_id} connected to WebSocket")
         
         # Send connection confirmation
-        await self.send_personal_message(user_id, {
+        self._send_serialized([websocket], self._serialize({
             "type": "connection_confirmed",
             "data": {"message": "Connected to real-time updates"}
-        })
+        }))
+        # Current dashboard state; later dashboard updates only carry changes
+        for message in self.coalescer.snapshot_messages("all", None):
+            self._send_serialized([websocket], self._serialize(message))
     
     def disconnect(self, websocket: WebSocket):
         """Disconnect a user from WebSocket"""
@@ -48,96 +157,140 @@ class WebSocketManager:
             
             # Remove from user sessions
             del self.user_sessions[websocket]
+            connection = self.outbound.pop(websocket, None)
+            if connection:
+                connection.close()
             
-            # Remove from all rooms
-            for room_id, members in self.room_memberships.items():
-                members.discard(user_id)
+            # Remove from the rooms this connection joined
+            for room_id in self.connection_rooms.pop(websocket, ()):
+                self._discard_member(room_id, websocket)
             
             logger.info(f"User {user_id} disconnected from WebSocket")
     
+    @staticmethod
+    def _serialize(message: dict) -> str:
+        return WebSocketMessage(type=message["type"], data=message["data"]).model_dump_json()
+
+    def _send_serialized(self, websockets: List[WebSocket], text: str):
+        """Queue an already serialized message on each connection without waiting for the sockets"""
+        for websocket in websockets:
+            connection = self.outbound.get(websocket)
+            if connection:
+                connection.enqueue(text)
+
+    async def _publish(
+        self, scope: str, target: Optional[str], text: str,
+        exclude_user: str = None, state: Optional[Dict[str, dict]] = None
+    ):
+        """Deliver to local connections and relay to the other workers"""
+        envelope = {
+            "origin": self.worker_id,
+            "scope": scope,
+            "target": target,
+            "exclude_user": exclude_user,
+            "text": text,
+            "state": state
+        }
+        self._deliver(envelope)
+        if self.backplane is not None:
+            try:
+                await self.backplane.publish(envelope)
+            except Exception as e:
+                logger.error(f"Failed to publish WebSocket message to backplane: {e}")
+
+    async def _on_backplane_message(self, envelope: dict):
+        # Local connections already received our own messages
+        if envelope.get("origin") != self.worker_id:
+            if envelope.get("state"):
+                self.coalescer.merge_snapshot(envelope["scope"], envelope.get("target"), envelope["state"])
+            self._deliver(envelope)
+
+    async def _publish_coalesced(self, scope: str, target: Optional[str], message: dict, state: Dict[str, dict]):
+        await self._publish(scope, target, self._serialize(message), state=state or None)
+
+    def _deliver(self, envelope: dict):
+        scope, target, text = envelope["scope"], envelope.get("target"), envelope["text"]
+        if scope == "user":
+            self._send_serialized(list(self.active_connections.get(target, [])), text)
+        elif scope == "room":
+            exclude_user = envelope.get("exclude_user")
+            websockets = [
+                websocket for websocket in self.room_memberships.get(target, ())
+                if not (exclude_user and self.user_sessions.get(websocket) == exclude_user)
+            ]
+            self._send_serialized(websockets, text)
+        elif scope == "all":
+            self._send_serialized(list(self.user_sessions), text)
+
     async def send_personal_message(self, user_id: str, message: dict):
-        """Send message to specific user"""
-        if user_id in self.active_connections:
-            websocket_message = WebSocketMessage(
-                type=message["type"],
-                data=message["data"]
-            )
-            
-            # Send to all connections for this user
-            disconnected_connections = []
-            for websocket in self.active_connections[user_id]:
-                try:
-                    await websocket.send_text(websocket_message.json())
-                except:
-                    disconnected_connections.append(websocket)
-            
-            # Clean up disconnected connections
-            for websocket in disconnected_connections:
-                self.disconnect(websocket)
+        """Send message to all connections of a user, on any worker"""
+        await self._publish("user", user_id, self._serialize(message))
     
     async def broadcast_to_room(self, room_id: str, message: dict, exclude_user: str = None):
-        """Broadcast message to all users in a room"""
-        if room_id in self.room_memberships:
-            websocket_message = WebSocketMessage(
-                type=message["type"],
-                data=message["data"]
-            )
-            
-            for user_id in self.room_memberships[room_id]:
-                if exclude_user and user_id == exclude_user:
-                    continue
-                
-                if user_id in self.active_connections:
-                    disconnected_connections = []
-                    for websocket in self.active_connections[user_id]:
-                        try:
-                            await websocket.send_text(websocket_message.json())
-                        except:
-                            disconnected_connections.append(websocket)
-                    
-                    # Clean up disconnected connections
-                    for websocket in disconnected_connections:
-                        self.disconnect(websocket)
-    
-    async def join_room(self, user_id: str, room_id: str):
-        """Add user to a room"""
-        if room_id not in self.room_memberships:
-            self.room_memberships[room_id] = set()
-        
-        self.room_memberships[room_id].add(user_id)
+        """Broadcast message to all connections in a room, on any worker"""
+        # Serialize once for every recipient
+        await self._publish("room", room_id, self._serialize(message), exclude_user)
+    
+    def _discard_member(self, room_id: str, websocket: WebSocket):
+        members = self.room_memberships.get(room_id)
+        if members is not None:
+            members.discard(websocket)
+            # Clean up empty rooms
+            if not members:
+                del self.room_memberships[room_id]
+
+    def _user_connections(self, user_id: str, websocket: Optional[WebSocket]) -> List[WebSocket]:
+        if websocket is not None:
+            return [websocket] if websocket in self.user_sessions else []
+        return list(self.active_connections.get(user_id, []))
+
+    async def join_room(self, user_id: str, room_id: str, websocket: Optional[WebSocket] = None):
+        """Add a connection (or all connections of the user) to a room"""
+        connections = self._user_connections(user_id, websocket)
+        for connection in connections:
+            self.room_memberships.setdefault(room_id, set()).add(connection)
+            self.connection_rooms.setdefault(connection, set()).add(room_id)
         
-        # Notify user they joined the room
-        await self.send_personal_message(user_id, {
+        # Notify the joined connections and send the room's current state
+        self._send_serialized(connections, self._serialize({
             "type": "room_joined",
             "data": {"room_id": room_id}
-        })
+        }))
+        for message in self.coalescer.snapshot_messages("room", room_id):
+            self._send_serialized(connections, self._serialize(message))
     
-    async def leave_room(self, user_id: str, room_id: str):
-        """Remove user from a room"""
-        if room_id in self.room_memberships:
-            self.room_memberships[room_id].discard(user_id)
-            
-            # Clean up empty rooms
-            if not self.room_memberships[room_id]:
-                del self.room_memberships[room_id]
+    async def leave_room(self, user_id: str, room_id: str, websocket: Optional[WebSocket] = None):
+        """Remove a connection (or all connections of the user) from a room"""
+        connections = self._user_connections(user_id, websocket)
+        for connection in connections:
+            self._discard_member(room_id, connection)
+            rooms = self.connection_rooms.get(connection)
+            if rooms is not None:
+                rooms.discard(room_id)
         
-        # Notify user they left the room
-        await self.send_personal_message(user_id, {
+        # Notify the connections that left
+        self._send_serialized(connections, self._serialize({
             "type": "room_left",
             "data": {"room_id": room_id}
-        })
+        }))
     
     async def broadcast_test_execution_update(self, execution_data: dict):
-        """Broadcast test execution updates"""
-        message = {
-            "type": "test_execution_update",
-            "data": execution_data
-        }
-        
-        # Broadcast to project room
+        """Broadcast test execution updates, coalesced per execution"""
+        # Broadcast to project room; only the latest update per execution is sent each window
         project_id = execution_data.get("project_id")
         if project_id:
-            await self.broadcast_to_room(f"project_{project_id}", message)
+            await self.coalescer.submit_event(
+                "room", f"project_{project_id}", "test_execution_update",
+                execution_data, key=execution_data.get("id")
+            )
+    
+    async def broadcast_activity(self, activity: dict):
+        """Broadcast an activity log entry to its project room, batched with other updates"""
+        project_id = activity.get("project_id")
+        if project_id:
+            await self.coalescer.submit_event(
+                "room", f"project_{project_id}", "activity", activity, key=activity.get("id")
+            )
     
     async def broadcast_comment_update(self, comment_data: dict):
         """Broadcast new comment updates"""
@@ -152,15 +305,13 @@ class WebSocketManager:
             await self.broadcast_to_room(f"testcase_{test_case_id}", message)
     
     async def broadcast_dashboard_update(self, dashboard_data: dict):
-        """Broadcast dashboard updates"""
-        message = {
-            "type": "dashboard_update",
-            "data": dashboard_data
-        }
-        
-        # Broadcast to all connected users
-        for user_id in self.active_connections:
-            await self.send_personal_message(user_id, message)
+        """
+        Broadcast dashboard updates to all connected users.
+
+        Updates are merged over the coalescing window and only changed keys
+        are sent; clients merge each dashboard_update into their state.
+        """
+        await self.coalescer.submit_state("all", None, "dashboard_update", dashboard_data)
     
     async def send_notification(self, user_id: str, notification: NotificationMessage):
         """Send notification to specific user"""
@@ -177,7 +328,7 @@ class WebSocketManager:
     
     def get_room_members(self, room_id: str) -> List[str]:
         """Get list of users in a specific room"""
-        return list(self.room_memberships.get(room_id, set()))
+        return list({self.user_sessions[websocket] for websocket in self.room_memberships.get(room_id, ())})
 
 # Global WebSocket manager instance
 websocket_manager = WebSocketManager()
\ No newline at end of file
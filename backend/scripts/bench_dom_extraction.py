@@ -0,0 +1,107 @@
+"""
+Benchmark website page analysis: single-pass extraction vs. the previous
+BeautifulSoup multi-pass approach.
+
+Usage:
+    python scripts/bench_dom_extraction.py [CORPUS_DIR] [--runs N]
+
+CORPUS_DIR should contain saved pages (*.html, *.htm). Without it a corpus of
+large synthetic pages is generated. For each page the script reports the mean
+parse time and the peak memory allocated during one parse (tracemalloc).
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bs4 import BeautifulSoup, Tag  # noqa: E402
+
+from app.mcp.dom_extractor import extract_page  # noqa: E402
+
+
+def legacy_extract(content: str) -> dict:
+    """The multi-pass analysis previously done in analyze_website"""
+    soup = BeautifulSoup(content, "html.parser")
+    title = soup.find("title")
+    forms = []
+    for form in soup.find_all("form"):
+        if isinstance(form, Tag):
+            forms.append([inp.get("name", "") for inp in form.find_all(["input", "select", "textarea"])])
+    navigation = []
+    for nav in soup.find_all(["nav", "ul", "ol"]):
+        for link in nav.find_all("a"):
+            if link.get("href") and link.get_text(strip=True):
+                navigation.append(link.get_text(strip=True))
+    buttons = [b.get_text(strip=True) or b.get("value", "") for b in soup.find_all(["button", "input"])]
+    links = [{"text": a.get_text(strip=True), "href": a.get("href", "")} for a in soup.find_all("a", href=True)]
+    inputs = [inp.get("name", "") for inp in soup.find_all("input")]
+    # _determine_page_type and _identify_features each extracted the text again
+    soup.get_text().lower()
+    soup.get_text().lower()
+    return {
+        "title": title.text.strip() if title else "Unknown Page",
+        "forms": forms, "navigation": navigation, "buttons": buttons, "links": links, "inputs": inputs
+    }
+
+
+def synthetic_page(sections: int) -> str:
+    parts = ["<html><head><title>Synthetic catalogue</title><style>body{}</style></head><body>"]
+    parts.append("<nav><ul>" + "".join(f'<li><a href="/c/{i}">Category {i}</a></li>' for i in range(50)) + "</ul></nav>")
+    for i in range(sections):
+        parts.append(
+            f'<section><h2>Product {i}</h2><p>Description of product {i}. Add to cart to buy.</p>'
+            f'<form action="/cart" method="post"><input type="hidden" name="id" value="{i}">'
+            f'<input type="number" name="qty" required><select name="size"><option>M</option></select>'
+            f'<button type="submit">Add to cart</button></form>'
+            f'<a href="/p/{i}">Details</a><img src="/img/{i}.png"></section>'
+        )
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def load_corpus(corpus_dir):
+    if corpus_dir:
+        paths = sorted(p for p in Path(corpus_dir).iterdir() if p.suffix in (".html", ".htm"))
+        return [(p.name, p.read_text(encoding="utf-8", errors="replace")) for p in paths]
+    return [(f"synthetic-{n}", synthetic_page(n)) for n in (200, 1000, 5000)]
+
+
+def measure(func, content: str, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(content)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.mean(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir", nargs="?", help="Directory of saved HTML pages")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per page and parser")
+    args = parser.parse_args()
+
+    candidates = [
+        ("bs4 multi-pass", legacy_extract),
+        ("single-pass lxml", lambda c: extract_page(c, use_lxml=True)),
+        ("single-pass html.parser", lambda c: extract_page(c, use_lxml=False)),
+    ]
+
+    print(f"{'page':<24}{'size KB':>10}  {'parser':<26}{'mean ms':>10}{'peak MB':>10}")
+    for name, content in load_corpus(args.corpus_dir):
+        size_kb = len(content.encode("utf-8")) / 1024
+        for label, func in candidates:
+            mean, peak = measure(func, content, args.runs)
+            print(f"{name:<24}{size_kb:>10.0f}  {label:<26}{mean * 1000:>10.1f}{peak / 1024 / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
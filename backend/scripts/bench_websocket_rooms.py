@@ -0,0 +1,93 @@
+"""
+Benchmark WebSocketManager room bookkeeping under load.
+
+Usage:
+    python scripts/bench_websocket_rooms.py [--connections N] [--rooms N] [--rooms-per-connection N]
+
+Connects fake (no-op) WebSockets, joins each to random rooms, broadcasts one
+message to every room and disconnects all connections, reporting the time
+per phase. For comparison the disconnect phase is also timed with a scan over
+every room, which is what disconnect used to do.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.websocket.manager import WebSocketManager  # noqa: E402
+
+
+class NullWebSocket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+
+def timed(label: str, start: float, count: int):
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed * 1000:>10.1f} ms{elapsed / count * 1e6:>12.2f} us/op")
+
+
+async def run(connections: int, rooms: int, rooms_per_connection: int):
+    manager = WebSocketManager()
+    rng = random.Random(42)
+    sockets = [NullWebSocket() for _ in range(connections)]
+    room_ids = [f"project_{i}" for i in range(rooms)]
+
+    start = time.perf_counter()
+    for i, websocket in enumerate(sockets):
+        # Two connections per user, like a user with two tabs
+        await manager.connect(websocket, f"user-{i // 2}")
+    timed("connect", start, connections)
+
+    start = time.perf_counter()
+    for i, websocket in enumerate(sockets):
+        for room_id in rng.sample(room_ids, rooms_per_connection):
+            await manager.join_room(f"user-{i // 2}", room_id, websocket)
+    timed("join_room", start, connections * rooms_per_connection)
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    for room_id in room_ids:
+        await manager.broadcast_to_room(room_id, {"type": "test_execution_update", "data": {"status": "passed"}})
+    timed("broadcast_to_room", start, rooms)
+    await asyncio.sleep(0)
+
+    # Previous behaviour: every disconnect scanned all rooms (run on a copy)
+    snapshot = {room_id: set(members) for room_id, members in manager.room_memberships.items()}
+    start = time.perf_counter()
+    for websocket in sockets:
+        for members in snapshot.values():
+            members.discard(websocket)
+    timed("disconnect (room scan)", start, connections)
+
+    start = time.perf_counter()
+    for websocket in sockets:
+        manager.disconnect(websocket)
+    timed("disconnect (reverse index)", start, connections)
+
+    assert not manager.room_memberships and not manager.connection_rooms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10_000)
+    parser.add_argument("--rooms", type=int, default=1_000)
+    parser.add_argument("--rooms-per-connection", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.connections} connections, {args.rooms} rooms, {args.rooms_per_connection} rooms per connection")
+    asyncio.run(run(args.connections, args.rooms, args.rooms_per_connection))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.models.db_models import Attachment, AttachmentBlob
+
+
+@pytest.fixture
+def blob_sessions(tmp_path_factory):
+    """Session factory of a SQLite database holding attachments and their blob reference counts"""
+    path = tmp_path_factory.mktemp("db") / "blobs.db"
+    # Every session opens its own connection, so sessions lock like separate workers
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Attachment.__table__.create)
+            await conn.run_sync(AttachmentBlob.__table__.create)
+
+    asyncio.run(create_tables())
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
@@ -0,0 +1,98 @@
+import asyncio
+import io
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI, UploadFile
+from fastapi.testclient import TestClient
+
+from app.api.v1.routes import attachments
+from app.auth.security import get_current_user
+from app.db.session import get_db
+from app.models.db_models import Attachment
+from app.services.attachment_store import AttachmentStore
+from app.services.object_storage import LocalStorage
+
+LOG = b"".join(f"line {i}\n".encode() for i in range(1000))
+
+
+class PresigningStorage(LocalStorage):
+    """Local storage that hands out download URLs like object storage does"""
+
+    def presigned_url(self, key, filename=None, content_type=None):
+        return f"https://storage.test/{key}?filename={filename}"
+
+
+def _client(monkeypatch, store, blob_sessions):
+    monkeypatch.setattr(attachments, "attachment_store", store)
+    app = FastAPI()
+    app.include_router(attachments.router, prefix="/api/v1")
+
+    async def override_get_db():
+        async with blob_sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: {"id": "u1"}
+    return TestClient(app)
+
+
+@pytest.fixture
+def stored_log(tmp_path, blob_sessions):
+    """A log attachment in local storage; returns (store, attachment id, content hash)"""
+    store = AttachmentStore(LocalStorage(str(tmp_path)))
+
+    async def upload():
+        async with blob_sessions() as db:
+            blob = await store.save(db, UploadFile(io.BytesIO(LOG), filename="run.log"))
+            db.add(Attachment(
+                id="a1", file_name="run.log", file_path=blob.key, file_size=blob.size, file_type="text/plain",
+                content_hash=blob.content_hash, entity_type="test_execution", entity_id="e1",
+                uploaded_by="u1", created_at=datetime.utcnow()
+            ))
+            await db.commit()
+            return blob.content_hash
+
+    return store, "a1", asyncio.run(upload())
+
+
+def test_download_answers_304_when_the_etag_matches(monkeypatch, blob_sessions, stored_log):
+    store, attachment_id, content_hash = stored_log
+    client = _client(monkeypatch, store, blob_sessions)
+
+    response = client.get(f"/api/v1/attachments/download/{attachment_id}")
+    assert response.status_code == 200 and response.content == LOG
+    assert response.headers["etag"] == f'"{content_hash}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    cached = client.get(f"/api/v1/attachments/download/{attachment_id}",
+                        headers={"If-None-Match": f'W/"other", "{content_hash}"'})
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["etag"] == f'"{content_hash}"'
+
+
+def test_range_request_returns_partial_content(monkeypatch, blob_sessions, stored_log):
+    store, attachment_id, content_hash = stored_log
+    client = _client(monkeypatch, store, blob_sessions)
+
+    response = client.get(f"/api/v1/attachments/download/{attachment_id}", headers={"Range": "bytes=0-99"})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 0-99/{len(LOG)}"
+    assert response.content == LOG[:100]
+
+    # A stale If-Range validator gets the whole file
+    stale = client.get(f"/api/v1/attachments/download/{attachment_id}",
+                       headers={"Range": "bytes=0-99", "If-Range": '"outdated"'})
+    assert stale.status_code == 200 and stale.content == LOG
+
+
+def test_object_storage_download_redirects_to_a_presigned_url(monkeypatch, tmp_path, blob_sessions, stored_log):
+    _, attachment_id, content_hash = stored_log
+    store = AttachmentStore(PresigningStorage(str(tmp_path)))
+    client = _client(monkeypatch, store, blob_sessions)
+
+    response = client.get(f"/api/v1/attachments/download/{attachment_id}", follow_redirects=False)
+
+    assert response.status_code == 307
+    assert response.headers["location"] == f"https://storage.test/{store.blob_key(content_hash)}?filename=run.log"
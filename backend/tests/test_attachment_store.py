@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from app.models.db_models import AttachmentBlob
+from app.services.attachment_store import AttachmentStore, UploadTooLarge
+from app.services.object_storage import LocalStorage
+
+
+def _upload(data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename="screenshot.png")
+
+
+async def _save(store, sessions, data):
+    async with sessions() as db:
+        blob = await store.save(db, _upload(data))
+        await db.commit()
+        return blob
+
+
+async def _ref_count(sessions, content_hash):
+    async with sessions() as db:
+        blob = await db.get(AttachmentBlob, content_hash)
+        return blob.ref_count if blob else None
+
+
+def test_identical_uploads_share_one_blob(tmp_path, blob_sessions):
+    store = AttachmentStore(LocalStorage(str(tmp_path)))
+    data = b"\x89PNG" + b"x" * 3_000_000
+
+    async def scenario():
+        return await asyncio.gather(_save(store, blob_sessions, data), _save(store, blob_sessions, data))
+
+    first, second = asyncio.run(scenario())
+
+    assert first.content_hash == second.content_hash == hashlib.sha256(data).hexdigest()
+    assert first.key == second.key and first.size == len(data)
+    assert sorted([first.deduplicated, second.deduplicated]) == [False, True]
+    blobs = [p for p in tmp_path.rglob("*") if p.is_file()]
+    assert [p.name for p in blobs] == [first.content_hash]
+    assert asyncio.run(_ref_count(blob_sessions, first.content_hash)) == 2
+
+
+def test_oversized_upload_is_rejected_without_leaving_files(tmp_path, blob_sessions):
+    store = AttachmentStore(LocalStorage(str(tmp_path)))
+
+    async def upload():
+        async with blob_sessions() as db:
+            await store.save(db, _upload(b"x" * 2048), max_size=1024)
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(upload())
+
+    assert not [p for p in tmp_path.rglob("*") if p.is_file()]
+
+
+def test_upload_reusing_a_blob_and_delete_of_its_last_reference_are_serialized(tmp_path, blob_sessions):
+    store = AttachmentStore(LocalStorage(str(tmp_path)))
+    data = b"shared screenshot"
+    stored = asyncio.run(_save(store, blob_sessions, data))
+    blob_path = tmp_path / stored.key
+
+    async def delete_last_reference():
+        async with blob_sessions() as db:
+            await store.release(db, stored.content_hash)
+            await db.commit()
+            await store.remove_unreferenced(db, stored.content_hash)
+
+    async def upload_during_delete():
+        async with blob_sessions() as db:
+            blob = await store.save(db, _upload(data))
+            assert blob.deduplicated
+            # The delete waits for the upload's transaction instead of removing the blob it found
+            deleting = asyncio.create_task(delete_last_reference())
+            await asyncio.sleep(0.2)
+            assert not deleting.done() and blob_path.exists()
+            await db.commit()
+        await deleting
+
+    async def delete_during_upload():
+        async with blob_sessions() as db:
+            await store.release(db, stored.content_hash)
+            # The upload waits for the delete to commit, then stores the blob again
+            uploading = asyncio.create_task(_save(store, blob_sessions, data))
+            await asyncio.sleep(0.2)
+            assert not uploading.done()
+            await db.commit()
+            await store.remove_unreferenced(db, stored.content_hash)
+        return await uploading
+
+    asyncio.run(upload_during_delete())
+    assert blob_path.exists()
+    assert asyncio.run(_ref_count(blob_sessions, stored.content_hash)) == 1
+
+    again = asyncio.run(delete_during_upload())
+    assert blob_path.exists() and again.content_hash == stored.content_hash
+    assert asyncio.run(_ref_count(blob_sessions, stored.content_hash)) == 1
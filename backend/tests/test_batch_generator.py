@@ -0,0 +1,60 @@
+from app.mcp.batch_generator import group_by_template, normalize_steps, path_shape
+from app.mcp.website_test_generator import WebsiteAnalysis
+
+
+def make_analysis(url, title="Page", buttons=None, page_type="ecommerce"):
+    return WebsiteAnalysis(
+        url=url,
+        title=title,
+        forms=[{"action": "/cart", "method": "post", "inputs": [{"type": "number", "name": "qty"}]}],
+        links=[],
+        buttons=buttons if buttons is not None else ["Add to cart"],
+        inputs=[{"type": "number", "name": "qty", "placeholder": "", "id": ""}],
+        navigation=["Home", "Shop"],
+        features=["shopping_cart", "form_submission"],
+        page_type=page_type
+    )
+
+
+def test_path_shape_collapses_ids():
+    assert path_shape("https://shop.test/products/123") == "/products/:id"
+    assert path_shape("https://shop.test/products/red-shirt-42") == "/products/:id"
+    assert path_shape("https://shop.test/orders/3f2b8c1e-9d4a-4e6b-8f0a-1c2d3e4f5a6b") == "/orders/:id"
+    assert path_shape("https://shop.test/about") == "/about"
+
+
+def test_path_shape_keeps_plain_slugs():
+    assert path_shape("https://shop.test/about-our-team") == "/about-our-team"
+    assert path_shape("https://shop.test/help/returns-and-refunds") == "/help/returns-and-refunds"
+
+
+def test_malformed_generated_steps_are_skipped_or_defaulted():
+    steps = [
+        {"step_number": 1, "description": "Open the page", "expected_result": "Page loads"},
+        {"description": "Click buy"},
+        {"step_number": "x", "description": "Pay", "expected_result": None},
+        {"step_number": 4, "expected_result": "No description"},
+        "not a step",
+    ]
+
+    assert normalize_steps(steps) == [
+        {"step_number": 1, "description": "Open the page", "expected_result": "Page loads"},
+        {"step_number": 2, "description": "Click buy", "expected_result": ""},
+        {"step_number": 3, "description": "Pay", "expected_result": ""},
+    ]
+    assert normalize_steps(None) == []
+
+
+def test_pages_sharing_a_template_are_grouped():
+    analyses = [
+        make_analysis("https://shop.test/products/1", title="Shirt"),
+        make_analysis("https://shop.test/products/2", title="Shoes"),
+        make_analysis("https://shop.test/login", buttons=["Sign in"], page_type="login"),
+    ]
+
+    groups = group_by_template(analyses, threshold=0.9)
+
+    assert groups == {
+        "https://shop.test/products/1": ["https://shop.test/products/1", "https://shop.test/products/2"],
+        "https://shop.test/login": ["https://shop.test/login"],
+    }
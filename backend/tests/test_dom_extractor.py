@@ -0,0 +1,54 @@
+import pytest
+
+from app.mcp.dom_extractor import extract_page
+
+PAGE = """
+<html>
+  <head><title> Sign in - Shop </title><script>var cart = [];</script></head>
+  <body>
+    <nav><ul>
+      <li><a href="/">Home</a></li>
+      <li><a href="/products">Products</a></li>
+      <li><a href="#"></a></li>
+    </ul></nav>
+    <form action="/login" method="POST">
+      <input type="email" name="email" placeholder="Email" required>
+      <input type="password" name="password">
+      <select name="remember"><option>yes</option></select>
+      <input type="submit" value="Sign in">
+    </form>
+    <button><span>Add</span> to cart</button>
+    <p>Go to your <a href="/dashboard">Dashboard</a> &amp; profile.</p>
+  </body>
+</html>
+"""
+
+
+@pytest.mark.parametrize("use_lxml", [True, False])
+def test_extract_page_collects_all_elements(use_lxml):
+    page = extract_page(PAGE, use_lxml=use_lxml)
+
+    assert page.title == "Sign in - Shop"
+    assert page.forms == [{
+        "action": "/login",
+        "method": "post",
+        "inputs": [
+            {"type": "email", "name": "email", "placeholder": "Email", "required": True},
+            {"type": "password", "name": "password", "placeholder": "", "required": False},
+            {"type": "text", "name": "remember", "placeholder": "", "required": False},
+            {"type": "submit", "name": "", "placeholder": "", "required": False},
+        ],
+    }]
+    assert page.navigation == ["Home", "Products"]
+    assert page.buttons == ["Sign in", "Addto cart"]
+    assert [link["href"] for link in page.links] == ["/", "/products", "#", "/dashboard"]
+    assert [inp["name"] for inp in page.inputs] == ["email", "password", ""]
+    assert "dashboard & profile" in page.text
+    assert "var cart" in page.text
+
+
+def test_unclosed_elements_are_closed_by_parent():
+    page = extract_page("<ul><li><a href='/a'>A<li><a href='/b'>B</ul><a href='/c'>C</a>", use_lxml=False)
+
+    assert page.navigation == ["A", "B"]
+    assert [link["text"] for link in page.links] == ["A", "B", "C"]
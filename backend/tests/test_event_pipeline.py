@@ -0,0 +1,149 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.db import session
+from app.models.db_models import ActivityLog
+from app.services.event_pipeline import DomainEvent, EventPipeline, event_actor
+from app.websocket import manager as manager_module
+from app.websocket.manager import WebSocketManager
+
+
+def _event(action: str, target_id: str) -> DomainEvent:
+    return DomainEvent(
+        action=action,
+        target_type="test_execution",
+        target_id=target_id,
+        user_id="user-1",
+        user_name="Tester",
+        project_id="p1",
+        details={"status": "running"}
+    )
+
+
+def test_events_are_persisted_in_batches_and_broadcast(monkeypatch):
+    monkeypatch.setattr(settings, "EVENT_BATCH_SIZE", 3)
+    monkeypatch.setattr(settings, "EVENT_BATCH_WINDOW_MS", 50)
+    websocket_manager = WebSocketManager()
+    monkeypatch.setattr(manager_module, "websocket_manager", websocket_manager)
+
+    async def scenario():
+        pipeline = EventPipeline()
+        batches = []
+
+        async def persist(batch):
+            batches.append([event.target_id for event in batch])
+
+        pipeline.persist = persist
+        pipeline.start()
+        for i in range(5):
+            pipeline.publish(_event("status_change", f"exec-{i}"))
+        await pipeline.stop()
+        pending = websocket_manager.coalescer._pending[("room", "project_p1")]
+        return batches, pending
+
+    batches, pending = asyncio.run(scenario())
+
+    assert batches == [["exec-0", "exec-1", "exec-2"], ["exec-3", "exec-4"]]
+    assert len(pending.events["test_execution_update"]) == 5
+    assert len(pending.events["activity"]) == 5
+
+
+def test_publish_never_blocks_when_queue_is_full(monkeypatch):
+    monkeypatch.setattr(settings, "EVENT_QUEUE_SIZE", 2)
+
+    async def scenario():
+        pipeline = EventPipeline()
+        pipeline.start()
+        # The consumer has not run yet, so the queue fills up
+        for i in range(4):
+            pipeline.publish(_event("create", f"exec-{i}"))
+        pipeline._consumer.cancel()
+        return pipeline
+
+    pipeline = asyncio.run(scenario())
+
+    assert pipeline.dropped == 2
+    assert event_actor({"id": "u1", "full_name": "Ada"}) == ("u1", "Ada")
+
+
+def test_stop_gives_up_on_a_stalled_database_and_counts_lost_events(monkeypatch):
+    monkeypatch.setattr(settings, "EVENT_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "EVENT_BATCH_WINDOW_MS", 10)
+
+    async def scenario():
+        pipeline = EventPipeline()
+
+        async def persist(batch):
+            await asyncio.sleep(60)
+
+        pipeline.persist = persist
+        pipeline.start()
+        for i in range(5):
+            pipeline.publish(_event("create", f"exec-{i}"))
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(pipeline.stop(timeout=0.05), timeout=5)
+        return pipeline
+
+    pipeline = asyncio.run(scenario())
+
+    assert not pipeline.running
+    assert pipeline.dropped == 5
+
+
+def test_events_without_a_user_are_counted_not_logged():
+    async def scenario():
+        pipeline = EventPipeline()
+        await pipeline.persist([DomainEvent("create", "test_case", "tc-1", user_id=None, user_name="system")])
+        return pipeline
+
+    assert asyncio.run(scenario()).unattributed == 1
+
+
+def test_failed_persist_still_broadcasts(monkeypatch):
+    monkeypatch.setattr(settings, "EVENT_BATCH_WINDOW_MS", 10)
+    websocket_manager = WebSocketManager()
+    monkeypatch.setattr(manager_module, "websocket_manager", websocket_manager)
+
+    async def scenario():
+        pipeline = EventPipeline()
+
+        async def persist(batch):
+            raise ConnectionError("database unavailable")
+
+        pipeline.persist = persist
+        pipeline.start()
+        for i in range(2):
+            pipeline.publish(_event("status_change", f"exec-{i}"))
+        await pipeline.stop()
+        return websocket_manager.coalescer._pending[("room", "project_p1")]
+
+    pending = asyncio.run(scenario())
+
+    assert len(pending.events["activity"]) == 2
+
+
+def test_rejected_batch_is_retried_row_by_row(monkeypatch, tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'events.db'}", poolclass=NullPool)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(session, "get_session_factory", lambda: factory)
+    bad = _event("create", "exec-bad")
+    bad.user_name = None  # Violates NOT NULL
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(ActivityLog.__table__.create)
+        pipeline = EventPipeline()
+        await pipeline.persist([_event("create", "exec-0"), bad, _event("create", "exec-2")])
+        async with factory() as db:
+            logged = (await db.execute(select(ActivityLog.target_id).order_by(ActivityLog.target_id))).scalars().all()
+        await engine.dispose()
+        return pipeline, logged
+
+    pipeline, logged = asyncio.run(scenario())
+
+    assert logged == ["exec-0", "exec-2"]
+    assert pipeline.unlogged == 1
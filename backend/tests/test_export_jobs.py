@@ -0,0 +1,102 @@
+import asyncio
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services import export_jobs
+from app.services.export_jobs import ExportJobManager, ExportJobStatus
+
+
+@pytest.fixture
+def manager(monkeypatch, tmp_path):
+    """Export manager storing artifacts in tmp_path, rendering in a thread and not reporting progress"""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(export_jobs, "data_version", lambda db, project: asyncio.sleep(0, result="v1"))
+
+    async def no_report(job):
+        pass
+
+    manager = ExportJobManager()
+    manager._executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(manager, "_report", no_report)
+    yield manager
+    manager._executor.shutdown()
+
+
+class Rows(list):
+    reads = 0
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    """Rows the export reads from the database, as one chunk per read; reads are counted in rows.reads"""
+    rows = Rows()
+
+    async def fake_chunks(project_id):
+        rows.reads += 1
+        yield rows
+
+    monkeypatch.setattr(export_jobs, "iter_test_case_chunks", fake_chunks)
+    return rows
+
+
+def test_export_is_rendered_once_and_then_served_from_cache(manager, rows):
+    rows.extend({"title": f"Test case {i}", "test_steps": []} for i in range(3))
+    project = SimpleNamespace(id="p1", name="Shop")
+
+    async def scenario():
+        first = await manager.start_export(None, project, "csv", "u1")
+        await manager._tasks[first.id]
+        second = await manager.start_export(None, project, "csv", "u1")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first.status == ExportJobStatus.COMPLETED and not first.cached
+    assert first.processed_rows == 3
+    assert second.status == ExportJobStatus.COMPLETED and second.cached
+    assert second.file_path == first.file_path
+    with open(second.file_path, newline="", encoding="utf-8") as f:
+        assert [row[0] for row in csv.reader(f)][1:] == ["Test case 0", "Test case 1", "Test case 2"]
+
+
+def test_new_data_version_replaces_the_stale_artifact(monkeypatch, tmp_path, manager, rows):
+    project = SimpleNamespace(id="p1", name="Shop")
+
+    async def export():
+        job = await manager.start_export(None, project, "excel", "u1")
+        task = manager._tasks.get(job.id)
+        if task:
+            await task
+        return job
+
+    old = asyncio.run(export())
+    monkeypatch.setattr(export_jobs, "data_version", lambda db, project: asyncio.sleep(0, result="v2"))
+    new = asyncio.run(export())
+
+    assert not new.cached and new.file_path != old.file_path
+    assert sorted(p.name for p in (tmp_path / "exports" / "p1").iterdir()) == ["xlsx-v2.xlsx"]
+
+
+def test_each_requester_gets_a_job_sharing_one_render(manager, rows):
+    rows.extend({"title": f"Test case {i}", "test_steps": []} for i in range(3))
+    project = SimpleNamespace(id="p1", name="Shop")
+
+    async def scenario():
+        alice = await manager.start_export(None, project, "csv", "alice")
+        bob = await manager.start_export(None, project, "csv", "bob")
+        await asyncio.gather(manager._tasks[alice.id], manager._tasks[bob.id])
+        return alice, bob
+
+    alice, bob = asyncio.run(scenario())
+
+    assert alice.id != bob.id
+    assert manager.get_job(bob.id).requested_by == "bob"
+    assert rows.reads == 1
+    for job in (alice, bob):
+        assert job.status == ExportJobStatus.COMPLETED and job.file_path == alice.file_path
+        assert job.file_size == alice.file_size > 0
+    assert alice.processed_rows == 3
@@ -0,0 +1,47 @@
+import csv
+import io
+
+from openpyxl import load_workbook
+
+from app.services.export_service import ExcelStreamWriter, TestCaseExportService
+
+
+def _test_case(i: int) -> dict:
+    return {
+        "id": f"tc-{i}",
+        "title": f"Test case {i}" + (" with a much longer title" if i == 7 else ""),
+        "test_type": "functional",
+        "priority": "high",
+        "status": "draft",
+        "tags": ["smoke"],
+        "test_steps": [{"description": "Open page", "expected_result": "Page loads"}],
+    }
+
+
+def test_csv_chunks_concatenate_to_one_document():
+    text = TestCaseExportService.csv_rows([], header=True)
+    for start in (0, 3):
+        text += TestCaseExportService.csv_rows(_test_case(i) for i in range(start, start + 3))
+
+    rows = list(csv.reader(io.StringIO(text)))
+
+    assert rows[0][0] == "Title"
+    assert [row[0] for row in rows[1:]] == [f"Test case {i}" for i in range(6)]
+    assert rows[1][8] == "1. Open page -> Page loads"
+
+
+def test_excel_stream_writer_writes_rows_once_with_sampled_widths():
+    writer = ExcelStreamWriter(width_sample=10)
+    for start in range(0, 30, 5):
+        writer.add_rows(_test_case(i) for i in range(start, start + 5))
+    output = io.BytesIO()
+    writer.save(output)
+
+    sheet = load_workbook(output).active
+    rows = list(sheet.iter_rows(values_only=True))
+
+    assert writer.rows_written == 30
+    assert rows[0][:2] == ("ID", "Title")
+    assert [row[0] for row in rows[1:]] == [f"tc-{i}" for i in range(30)]
+    assert sheet["A1"].font.bold
+    assert sheet.column_dimensions["B"].width == len("Test case 7 with a much longer title") + 2
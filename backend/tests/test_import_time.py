@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from app.core.importtime import DEFERRED_MODULES, IMPORT_BUDGET_MS, parse_importtime, profile_imports
+
+# Machines differ; CI can tighten or relax the budget without code changes
+BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", IMPORT_BUDGET_MS))
+
+
+def test_parse_importtime_reads_self_and_cumulative_times():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   json.decoder\n"
+        "import time:       300 |        420 | json\n"
+        "import time:       500 |       1500 | app.main\n"
+    )
+
+    profile = parse_importtime(stderr, "app.main")
+
+    assert profile.total_ms == 1.5
+    assert profile.self_us["json"] == 300
+    assert profile.imported("json") and not profile.imported("js")
+    assert profile.slowest(1) == [("app.main", 1500)]
+
+
+def test_deferred_modules_count_only_when_application_code_imports_them():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:        80 |         80 |         redis.backoff\n"
+        "import time:       130 |        210 |       redis\n"
+        "import time:       900 |       1110 |     portalocker\n"
+        "import time:        50 |         50 |       boto3.session\n"
+        "import time:       400 |        450 |     boto3\n"
+        "import time:       200 |        650 |   app.services.storage\n"
+        "import time:       500 |       2260 | app.main\n"
+    )
+
+    profile = parse_importtime(stderr, "app.main")
+
+    assert profile.importers["redis"] == "portalocker" and profile.importers["portalocker"] == "app.services.storage"
+    assert profile.imported("redis") and not profile.imported_by("redis")
+    assert profile.imported_by("boto3")
+
+
+@pytest.mark.parametrize("module", [
+    "app.services.export_jobs",
+    "app.services.attachment_store",
+    "app.services.newman_runner",
+    "app.websocket.manager",
+    "app.ai_service",
+])
+def test_heavy_dependencies_are_not_imported_eagerly(module):
+    profile = profile_imports(module)
+
+    assert profile.error is None, profile.error
+    assert [name for name in DEFERRED_MODULES if profile.imported_by(name)] == []
+
+
+def test_application_import_stays_within_budget():
+    profile = profile_imports("app.main")
+
+    assert profile.error is None, profile.error
+    assert [name for name in DEFERRED_MODULES if profile.imported_by(name)] == []
+    slowest = ", ".join(f"{name} {us / 1000:.0f} ms" for name, us in profile.slowest(10))
+    assert profile.total_ms <= BUDGET_MS, f"import app.main took {profile.total_ms:.0f} ms: {slowest}"
@@ -0,0 +1,51 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from app.services import job_registry
+from app.services.job_registry import BackgroundJob, JobRegistry
+
+
+class Status(str, Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+
+@dataclass
+class Job(BackgroundJob):
+    id: str
+    requested_by: str = "u1"
+    status: Status = Status.RUNNING
+    stage: str = "running"
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
+
+def test_only_the_oldest_finished_jobs_are_dropped():
+    registry = JobRegistry(max_retained=2)
+    registry._add_job(Job("running"))
+    registry._add_job(Job("old", status=Status.COMPLETED, completed_at=datetime.utcnow()))
+    registry._add_job(Job("new", status=Status.COMPLETED, completed_at=datetime.utcnow()))
+
+    assert list(registry.jobs) == ["running", "new"]
+    assert registry.get_job("old") is None
+
+
+def test_progress_is_sent_to_the_requesting_user(monkeypatch):
+    sent = []
+
+    async def send_personal_message(user_id, message):
+        sent.append((user_id, message))
+
+    monkeypatch.setattr(job_registry.websocket_manager, "send_personal_message", send_personal_message)
+
+    class Registry(JobRegistry):
+        progress_type = "test_progress"
+
+    job = Job("j1")
+    asyncio.run(Registry()._report(job))
+
+    assert sent == [("u1", {"type": "test_progress", "data": job.progress()})]
+    assert sent[0][1]["data"]["job_id"] == "j1" and sent[0][1]["data"]["completed_at"] is None
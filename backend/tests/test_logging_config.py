@@ -0,0 +1,48 @@
+import json
+import logging
+import queue
+
+from app.core.logging_config import BoundedQueueHandler, JsonFormatter, SamplingFilter, parse_sampling
+
+
+def _record(name: str, level: int = logging.INFO, msg: str = "message") -> logging.LogRecord:
+    return logging.makeLogRecord({"name": name, "levelno": level, "levelname": logging.getLevelName(level), "msg": msg})
+
+
+def test_bounded_queue_drops_on_overflow_and_reports_after_draining():
+    log_queue = queue.SimpleQueue()
+    handler = BoundedQueueHandler(log_queue, capacity=4)
+
+    for i in range(10):
+        handler.handle(_record("app", msg=f"record {i}"))
+    assert log_queue.qsize() == 4
+    assert handler.dropped == 6
+
+    while not log_queue.empty():
+        log_queue.get_nowait()
+    handler.handle(_record("app", msg="after"))
+
+    report, record = log_queue.get_nowait(), log_queue.get_nowait()
+    assert report.levelno == logging.WARNING and report.dropped == 6
+    assert record.getMessage() == "after"
+
+
+def test_sampling_keeps_one_in_n_below_warning():
+    sampler = SamplingFilter(parse_sampling("app.auth=0.25, app.auth.security=0"))
+
+    kept = [sampler.filter(_record("app.auth.routes")) for _ in range(8)]
+    assert kept.count(True) == 2
+    assert not sampler.filter(_record("app.auth.security", logging.DEBUG))
+    assert sampler.filter(_record("app.auth.security", logging.WARNING))
+    assert sampler.filter(_record("app.websocket"))
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord("app.api", logging.INFO, "routes.py", 12, "Created %s", ("case",), None)
+    record.test_case_id = "tc-1"
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Created case"
+    assert entry["logger"] == "app.api"
+    assert entry["test_case_id"] == "tc-1"
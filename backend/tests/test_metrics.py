@@ -0,0 +1,58 @@
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Counter, Histogram, MetricsMiddleware, http_request_duration, registry
+
+
+def test_counter_sums_thread_shards():
+    counter = Counter("jobs_total", "Jobs", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc(("export",))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.totals() == {("export",): 4000}
+    assert 'jobs_total{kind="export"} 4000' in counter.render()
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+
+    lines = list(histogram.samples())
+
+    assert lines == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 4.25",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+
+    @app.get("/projects/{project_id}")
+    async def read_project(project_id: str):
+        return {"id": project_id}
+
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    client.get("/projects/1")
+    client.get("/projects/2")
+    client.get("/missing")
+
+    rendered = "\n".join(http_request_duration.samples())
+    assert 'http_request_duration_seconds_count{method="GET",route="/projects/{project_id}",status="200"} 2' in rendered
+    assert 'route="unmatched",status="404"' in rendered
+    assert "# TYPE http_requests_in_flight gauge" in registry.render()
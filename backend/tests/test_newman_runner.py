@@ -0,0 +1,323 @@
+import asyncio
+import json
+import os
+import stat
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.db import session
+from app.models.db_models import (
+    ExecutionStatus, Priority, Status, TestCase, TestExecution, TestExecutionRequest, TestType
+)
+from app.services.newman_results import merge_reports, parse_report, save_run
+from app.services import newman_runner
+from app.services.newman_runner import NewmanJob, NewmanJobStatus, NewmanRunner
+from app.services.newman_sharding import split_collection
+
+REPORT = {"run": {"executions": [
+    {
+        "cursor": {"iteration": 0},
+        "item": {"name": "Get users"},
+        "request": {"method": "GET", "url": {
+            "protocol": "https", "host": ["api", "example", "com"], "path": ["users"],
+            "query": [{"key": "apikey", "value": "secret"}]
+        }},
+        "response": {"code": 200, "responseTime": 120, "responseSize": 512},
+        "assertions": [{"assertion": "Status code is 200"}],
+    },
+    {
+        "cursor": {"iteration": 0},
+        "item": {"name": "Create user"},
+        "request": {"method": "POST", "url": "https://api.example.com/users"},
+        "response": {"code": 500, "responseTime": 80, "responseSize": 64},
+        "assertions": [
+            {"assertion": "Status code is 201", "error": {"name": "AssertionError", "message": "expected 500 to be 201"}},
+            {"assertion": "Skipped check", "skipped": True},
+        ],
+    },
+    {
+        "cursor": {"iteration": 1},
+        "item": {"name": "Health"},
+        "request": {"method": "GET", "url": "http://localhost:1/health"},
+        "requestError": {"message": "connect ECONNREFUSED 127.0.0.1:1"},
+    },
+]}}
+
+
+def _script(path, body):
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(f"#!{sys.executable}\nimport sys, time\n{body}\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+
+@pytest.fixture
+def newman(tmp_path):
+    """Writes the fake newman binary the runner starts"""
+    path = tmp_path / "bin" / "newman"
+    return lambda body: _script(path, body)
+
+
+@pytest.fixture
+def runner(monkeypatch, tmp_path):
+    """Runner using the local newman from the newman fixture and keeping reports in tmp_path"""
+    monkeypatch.setattr(settings, "NEWMAN_RUNTIME", "local")
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return NewmanRunner(binary=str(tmp_path / "bin" / "newman"))
+
+
+@pytest.fixture
+def reports(monkeypatch, runner):
+    """Progress messages the runner sends"""
+    reports = []
+
+    async def record(job, message):
+        reports.append(message["data"])
+
+    monkeypatch.setattr(runner, "_send_progress", record)
+    return reports
+
+
+def test_local_run_streams_progress_and_masks_api_key(runner, newman, reports):
+    newman((
+        "print('args', ' '.join(sys.argv[1:]), flush=True)\n"
+        "print('→ Get users', flush=True)\n"
+        "print('→ Create user', flush=True)\n"
+        "print('  1. AssertionError  status is 201', flush=True)\n"
+        f"open(sys.argv[sys.argv.index('--reporter-json-export') + 1], 'w').write({json.dumps(json.dumps(REPORT))})\n"
+        "sys.exit(1)"
+    ))
+
+    async def scenario():
+        runner.start()
+        job = await runner.enqueue("u1", "https://api.getpostman.com/collections/c1?apikey=secret", {"host": "x"})
+        await runner._queue.join()
+        await runner.stop()
+        return job
+
+    job = asyncio.run(scenario())
+
+    assert runner.runtime == "local"
+    assert job.status == NewmanJobStatus.COMPLETED and job.return_code == 1
+    # Counters come from the JSON report once the run has finished
+    assert job.processed_requests == 3 and job.failed_assertions == 1
+    assert job.summary["failed_requests"] == 2 and job.summary["average_response_time"] == 66.7
+    assert not list(runner.report_dir.iterdir())
+    assert "secret" not in job.output[0] and "--env-var host=x" in job.output[0]
+    assert reports[-1]["success"] is False and reports[-1]["stage"] == "done"
+
+
+def test_report_is_parsed_into_request_rows(tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps(REPORT))
+
+    report = parse_report(str(path))
+
+    first, second, third = report.iter_rows()
+    assert first["url"] == "https://api.example.com/users?apikey=***"
+    assert (first["status_code"], first["response_time"], first["assertions_failed"]) == (200, 120, 0)
+    assert second["assertions_total"] == 1
+    assert second["failures"] == [{"assertion": "Status code is 201", "message": "expected 500 to be 201"}]
+    assert third["iteration"] == 1 and third["error"].startswith("connect ECONNREFUSED")
+    assert report.summary() == {
+        "requests": 3, "failed_requests": 2, "assertions": 2, "failed_assertions": 1, "average_response_time": 66.7
+    }
+
+
+
+@pytest.fixture
+def sessions(monkeypatch, tmp_path):
+    """Session factory of a SQLite database holding a test case and its executions"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'runs.db'}", poolclass=NullPool)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            for table in (TestCase, TestExecution, TestExecutionRequest):
+                await conn.run_sync(table.__table__.create)
+            await conn.execute(insert(TestCase), [{
+                "id": "tc1", "title": "Users API", "project_id": "p1", "test_type": TestType.API,
+                "priority": Priority.HIGH, "status": Status.DRAFT, "created_by": "u1"
+            }])
+
+    asyncio.run(create_tables())
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(session, "get_session_factory", lambda: factory)
+    yield factory
+    asyncio.run(engine.dispose())
+
+
+def test_sharded_report_is_saved_in_batches_with_the_newman_outcome(monkeypatch, sessions, tmp_path):
+    monkeypatch.setattr(settings, "NEWMAN_INSERT_BATCH_SIZE", 2)
+    paths = []
+    for index in range(2):
+        paths.append(tmp_path / f"shard{index}.json")
+        paths[-1].write_text(json.dumps(REPORT))
+    report = merge_reports([parse_report(str(path)) for path in paths])
+    now = datetime.utcnow()
+
+    async def scenario():
+        execution_id = await save_run("tc1", "u1", "Tester", report, 1, now, now)
+        async with sessions() as db:
+            execution = await db.get(TestExecution, execution_id)
+            positions = (await db.execute(
+                select(TestExecutionRequest.position).order_by(TestExecutionRequest.position)
+            )).scalars().all()
+        return execution, positions
+
+    execution, positions = asyncio.run(scenario())
+
+    assert report.requests == 6 and report.failed_requests == 4
+    assert positions == list(range(6))
+    assert execution.status == ExecutionStatus.COMPLETED and execution.result == "fail"
+
+
+def _collection():
+    def request(name):
+        return {"name": name, "request": {"method": "GET", "url": f"https://api.example.com/{name}"}}
+
+    return {
+        "info": {"name": "Shop"},
+        "variable": [{"key": "base", "value": "https://api.example.com"}],
+        "item": [
+            {"name": "Users", "auth": {"type": "bearer"}, "item": [request(f"user-{i}") for i in range(4)]},
+            {"name": "Orders", "item": [request("order-0"), {"name": "Refunds", "item": [request("refund-0")]}]},
+            request("health"),
+        ],
+    }
+
+
+def _names(items):
+    return [name for item in items for name in (_names(item["item"]) if "item" in item else [item["name"]])]
+
+
+def test_collection_is_split_by_folder_or_request_chunks():
+    by_folder = split_collection(_collection(), 2, "folder")
+    assert [_names(part["item"]) for part in by_folder] == [
+        ["user-0", "user-1", "user-2", "user-3"], ["order-0", "refund-0", "health"]
+    ]
+    assert by_folder[0]["variable"] == _collection()["variable"]
+    assert by_folder[1]["info"]["name"] == "Shop [shard 2/2]"
+
+    by_requests = split_collection(_collection(), 3, "requests")
+    assert [_names(part["item"]) for part in by_requests] == [
+        ["user-0", "user-1", "user-2"], ["user-3", "order-0", "refund-0"], ["health"]
+    ]
+    # Folders (with their auth) are recreated around the requests of each chunk
+    assert by_requests[1]["item"][0]["name"] == "Users" and by_requests[1]["item"][0]["auth"] == {"type": "bearer"}
+    assert [item["name"] for item in by_requests[1]["item"][1]["item"]] == ["order-0", "Refunds"]
+
+
+def test_sharded_run_merges_shard_reports(runner, newman, reports, tmp_path):
+    source = tmp_path / "collection.json"
+    source.write_text(json.dumps(_collection()))
+    newman((
+        "import json\n"
+        "def leaves(items):\n"
+        "    return [l for i in items for l in (leaves(i['item']) if 'item' in i else [i])]\n"
+        "collection = json.load(open(sys.argv[2]))\n"
+        "executions = [{'item': {'name': leaf['name']}, 'request': leaf['request'],\n"
+        "               'response': {'code': 200, 'responseTime': 10}} for leaf in leaves(collection['item'])]\n"
+        "for e in executions:\n"
+        "    print('→', e['item']['name'], flush=True)\n"
+        "out = sys.argv[sys.argv.index('--reporter-json-export') + 1]\n"
+        "json.dump({'run': {'executions': executions}}, open(out, 'w'))"
+    ))
+
+    async def scenario():
+        runner.start()
+        job = await runner.enqueue("u1", str(source), shards=2, shard_by="requests")
+        await runner._queue.join()
+        await runner.stop()
+        return job
+
+    job = asyncio.run(scenario())
+
+    assert job.status == NewmanJobStatus.COMPLETED and job.return_code == 0
+    assert job.summary["requests"] == 7 and job.processed_requests == 7
+    assert [shard["requests"] for shard in job.summary["shards"]] == [4, 3]
+    assert all(shard["wall_time"] > 0 for shard in job.summary["shards"]) and job.summary["wall_time"] > 0
+    assert any(line.startswith("[shard 2] → ") for line in job.output)
+    assert not list(runner.report_dir.iterdir())
+
+
+def test_runs_are_bounded_by_the_worker_pool_and_time_out(monkeypatch, runner, newman, reports):
+    monkeypatch.setattr(settings, "NEWMAN_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "NEWMAN_TIMEOUT", 1)
+    newman("time.sleep(5)")
+    running = []
+
+    async def scenario():
+        runner.start()
+        jobs = [await runner.enqueue("u1", f"collection-{i}") for i in range(3)]
+        await asyncio.sleep(0.5)
+        running.append(sum(job.status == NewmanJobStatus.RUNNING for job in jobs))
+        await runner._queue.join()
+        await runner.stop()
+        return jobs
+
+    jobs = asyncio.run(scenario())
+
+    assert running == [2]
+    assert all(job.status == NewmanJobStatus.FAILED and "timed out" in job.error for job in jobs)
+
+
+def test_timed_out_docker_run_is_killed_inside_the_container(monkeypatch, runner, newman, reports, tmp_path):
+    # The fake docker runs "exec" commands in their own session, like a container,
+    # so killing the exec client leaves them running
+    _script(tmp_path / "bin" / "docker", (
+        "import subprocess\n"
+        "if sys.argv[1] == 'inspect':\n"
+        "    sys.exit(print('true'))\n"
+        "sys.exit(subprocess.Popen(sys.argv[3:], start_new_session=True).wait())"
+    ))
+    finished = tmp_path / "finished"
+    newman(f"time.sleep(2)\nopen({str(finished)!r}, 'w').close()")
+    monkeypatch.setenv("PATH", f"{tmp_path / 'bin'}:{os.environ['PATH']}")
+    monkeypatch.setattr(newman_runner, "CONTAINER_REPORT_DIR", str(runner.report_dir))
+    monkeypatch.setattr(settings, "NEWMAN_TIMEOUT", 0.5)
+    runner.docker = str(tmp_path / "bin" / "docker")
+    runner.runtime, runner.container = "docker", "newman"
+    runner._ready.set()
+
+    async def scenario():
+        job = await runner.run_job(NewmanJob(id="j1", requested_by="u1", collection_url="collection.json"))
+        await asyncio.sleep(2.5)
+        return job
+
+    job = asyncio.run(scenario())
+
+    assert job.status == NewmanJobStatus.FAILED and "timed out" in job.error
+    assert not finished.exists()
+
+
+def test_cancelled_job_is_killed_and_stores_no_results(monkeypatch, runner, newman, reports, tmp_path):
+    finished = tmp_path / "finished"
+    newman(f"print('→ Get users', flush=True)\ntime.sleep(2)\nopen({str(finished)!r}, 'w').close()")
+    saved = []
+
+    async def save_run(*args, **kwargs):
+        saved.append(args)
+
+    monkeypatch.setattr(newman_runner, "save_run", save_run)
+
+    async def scenario():
+        runner.start()
+        job = await runner.enqueue("u1", "collection.json", test_case_id="tc1", execution_id="e1")
+        while not job.output:
+            await asyncio.sleep(0.01)
+        assert await runner.cancel(job.id)
+        await runner._queue.join()
+        await runner.stop()
+        await asyncio.sleep(2.5)
+        return job
+
+    job = asyncio.run(scenario())
+
+    assert job.status == NewmanJobStatus.CANCELLED and job.finished.is_set()
+    assert not saved and not finished.exists()
+    assert reports[-1]["status"] == "cancelled"
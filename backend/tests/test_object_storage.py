@@ -0,0 +1,89 @@
+import asyncio
+import io
+
+from botocore.exceptions import ClientError
+from fastapi import UploadFile
+
+from app.services.attachment_store import AttachmentStore
+from app.services.object_storage import S3_MIN_PART_SIZE, S3Storage
+
+
+class FakeS3Client:
+    """In-memory stand-in for the subset of the S3 API used by S3Storage"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+
+    def put_object(self, Bucket, Key, Body):
+        self.calls.append("put_object")
+        self.objects[Key] = bytes(Body)
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.uploads[Key] = {}
+        return {"UploadId": f"upload-{Key}"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append(f"upload_part:{len(Body)}")
+        self.uploads[Key][PartNumber] = Body
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(Key)
+        self.objects[Key] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(Key, None)
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[Key])}
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.objects[Key] = self.objects[CopySource["Key"]]
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.test/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+def test_attachments_stream_to_s3_in_parts_and_deduplicate(blob_sessions):
+    client = FakeS3Client()
+    store = AttachmentStore(S3Storage(
+        "attachments", client=client, prefix="intellitest", part_size=S3_MIN_PART_SIZE, presign_expires=60
+    ))
+    data = b"z" * (S3_MIN_PART_SIZE * 2 + 1000)
+
+    async def scenario():
+        async with blob_sessions() as db:
+            first = await store.save(db, UploadFile(io.BytesIO(data), filename="trace.log"), max_size=len(data))
+            second = await store.save(db, UploadFile(io.BytesIO(data), filename="trace.log"), max_size=len(data))
+            await db.commit()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    key = f"intellitest/{first.key}"
+    assert list(client.objects) == [key] and client.objects[key] == data
+    assert client.calls == [f"upload_part:{S3_MIN_PART_SIZE}", f"upload_part:{S3_MIN_PART_SIZE}", "upload_part:1000"] * 2
+    assert second.deduplicated
+    assert store.local_path(first.content_hash) is None
+    assert store.presigned_url(first.content_hash, "trace.log", "text/plain") == f"https://s3.test/attachments/{key}?expires=60"
+
+
+def test_small_upload_is_a_single_put(blob_sessions):
+    client = FakeS3Client()
+    store = AttachmentStore(S3Storage("attachments", client=client))
+
+    async def upload():
+        async with blob_sessions() as db:
+            return await store.save(db, UploadFile(io.BytesIO(b"small"), filename="a.txt"))
+
+    blob = asyncio.run(upload())
+
+    assert client.calls == ["put_object"]
+    assert client.objects == {blob.key: b"small"}
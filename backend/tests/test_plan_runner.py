@@ -0,0 +1,202 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.models.db_models import ExecutionStatus
+from app.services import plan_runner as plan_runner_module
+from app.services.newman_runner import NewmanJobStatus, NewmanRunner
+from app.services.plan_runner import ExecutionWriter, PlanCase, PlanRun, PlanRunner, PlanRunStatus
+
+
+def _http_case(name: str, order: int, status: int = 200, mandatory: bool = True) -> PlanCase:
+    return PlanCase(
+        test_case_id=name,
+        title=name,
+        order=order,
+        is_mandatory=mandatory,
+        automation={"runner": "http", "url": f"http://service.test/{name}?status={status}"}
+    )
+
+
+def _run(cases, parallelism=2, stop_on_mandatory_failure=True) -> PlanRun:
+    return PlanRun(
+        id="run-1",
+        test_plan_id="plan-1",
+        plan_name="Release",
+        project_id="p1",
+        requested_by="user-1",
+        parallelism=parallelism,
+        stop_on_mandatory_failure=stop_on_mandatory_failure,
+        cases=cases
+    )
+
+
+@pytest.fixture
+def executions(monkeypatch):
+    """Execution ids the runner inserts and the batches of updates it writes"""
+    executions = SimpleNamespace(inserted=[], writes=[])
+
+    async def insert_executions(run):
+        executions.inserted.extend(case.execution_id for case in run.cases)
+
+    async def write_execution_updates(rows):
+        executions.writes.append(rows)
+
+    monkeypatch.setattr(plan_runner_module, "insert_executions", insert_executions)
+    monkeypatch.setattr(plan_runner_module, "write_execution_updates", write_execution_updates)
+    return executions
+
+
+@pytest.fixture
+def service():
+    """The service the http cases call; tests set its handler"""
+    return SimpleNamespace(handler=None)
+
+
+@pytest.fixture
+def runner(executions, service):
+    """Plan runner calling the service fixture"""
+    async def handle(request):
+        return await service.handler(request)
+
+    return PlanRunner(transport=httpx.MockTransport(handle))
+
+
+@pytest.fixture
+def reports(monkeypatch, runner):
+    """Progress messages the runner sends"""
+    reports = []
+
+    async def record(run, message):
+        reports.append(message["data"])
+
+    monkeypatch.setattr(runner, "_send_progress", record)
+    return reports
+
+
+def test_stages_run_in_order_with_bounded_parallelism(runner, executions, service, reports):
+    active, peak, calls = 0, 0, []
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        calls.append(request.url.path.strip("/"))
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(int(request.url.params["status"]))
+
+    service.handler = handler
+    cases = [_http_case(f"a{i}", order=1) for i in range(5)] + [_http_case("b", order=2)]
+    manual = PlanCase(test_case_id="manual", title="Manual check", order=1)
+    run = _run(cases + [manual], parallelism=2)
+
+    asyncio.run(runner.run_plan(run))
+
+    assert run.status == PlanRunStatus.COMPLETED
+    assert peak == 2
+    assert calls[-1] == "b"
+    assert len(executions.inserted) == 7
+    assert run.counts() == {"total": 7, "manual": 1, "pending": 0, "running": 0,
+                            "passed": 6, "failed": 0, "cancelled": 0}
+    final = {}
+    for batch in executions.writes:
+        for row in batch:
+            final.setdefault(row["id"], {}).update(row)
+    assert manual.execution_id not in final
+    assert {row["status"] for row in final.values()} == {ExecutionStatus.COMPLETED}
+    assert all(row["result"] == "pass" for row in final.values())
+    assert reports[-1]["run_id"] == run.id and reports[-1]["status"] == "completed"
+
+
+def test_failed_mandatory_case_cancels_later_stages(runner, service, reports):
+    async def handler(request):
+        return httpx.Response(int(request.url.params["status"]))
+
+    service.handler = handler
+    optional = _http_case("optional", order=1, status=500, mandatory=False)
+    mandatory = _http_case("mandatory", order=2, status=503)
+    later = _http_case("later", order=3)
+    run = _run([optional, mandatory, later])
+
+    asyncio.run(runner.run_plan(run))
+
+    assert optional.result == "fail" and mandatory.result == "fail"
+    assert later.status == ExecutionStatus.CANCELLED
+    assert "mandatory" in run.error
+
+    later.status, later.result = ExecutionStatus.PENDING, None
+    run = _run([optional, mandatory, later], stop_on_mandatory_failure=False)
+    asyncio.run(runner.run_plan(run))
+    assert later.result == "pass"
+
+
+def test_writer_merges_transitions_and_retries_failed_batches(monkeypatch):
+    monkeypatch.setattr(settings, "PLAN_RUN_BATCH_SIZE", 2)
+    batches, fail = [], [True]
+
+    async def write(rows):
+        if fail[0]:
+            fail[0] = False
+            raise ConnectionError("database unavailable")
+        batches.append(rows)
+
+    async def scenario():
+        writer = ExecutionWriter(write)
+        for execution_id in ("e1", "e2", "e3"):
+            writer.update(execution_id, status=ExecutionStatus.RUNNING)
+        writer.update("e1", status=ExecutionStatus.COMPLETED, result="pass")
+        await writer.flush()
+        await writer.flush()
+
+    asyncio.run(scenario())
+
+    rows = {row["id"]: row for batch in batches for row in batch}
+    assert [len(batch) for batch in batches] == [1, 2]
+    assert rows["e1"]["status"] == ExecutionStatus.COMPLETED and rows["e1"]["result"] == "pass"
+    assert rows["e3"]["status"] == ExecutionStatus.RUNNING
+
+
+def _newman_case(name: str, **spec) -> PlanCase:
+    return PlanCase(
+        test_case_id=name,
+        title=name,
+        automation={"runner": "newman", "collection_url": f"https://collections.test/{name}", **spec}
+    )
+
+
+def test_cancelling_a_run_cancels_its_newman_jobs(monkeypatch, runner, reports):
+    newman = NewmanRunner()
+    monkeypatch.setattr(plan_runner_module, "newman_runner", newman)
+    case = _newman_case("collection")
+    run = _run([case])
+
+    async def scenario():
+        # No workers: the job stays queued until it is cancelled
+        newman._queue = asyncio.Queue()
+        runner._tasks[run.id] = asyncio.create_task(runner.run_plan(run))
+        while not newman.jobs:
+            await asyncio.sleep(0.01)
+        await runner.cancel_run(run.id)
+
+    asyncio.run(scenario())
+
+    job, = newman.jobs.values()
+    assert job.status == NewmanJobStatus.CANCELLED and job.finished.is_set()
+    assert job.execution_id == case.execution_id
+    assert run.status == PlanRunStatus.CANCELLED and case.status == ExecutionStatus.CANCELLED
+
+
+def test_newman_shards_are_validated(monkeypatch, runner, reports):
+    monkeypatch.setattr(settings, "NEWMAN_MAX_SHARDS", 4)
+    too_many = _newman_case("too-many", shards=5)
+    unknown = _newman_case("unknown", shards=2, shard_by="size")
+    run = _run([too_many, unknown])
+
+    asyncio.run(runner.run_plan(run))
+
+    assert too_many.status == ExecutionStatus.FAILED and "from 1 to 4" in too_many.error
+    assert unknown.status == ExecutionStatus.FAILED and "shard_by" in unknown.error
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+from app.models.db_models import ExecutionStatus
+from app.services.prioritization import CaseInfo, build_stats, estimated_makespan, rank
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def _history(test_case_id, results, duration=10):
+    """Execution rows newest first, as read by HistoryStats"""
+    rows = []
+    for age, result in enumerate(results):
+        status = ExecutionStatus.FAILED if result == "error" else ExecutionStatus.COMPLETED
+        rows.append((test_case_id, status, None if result == "error" else result, duration, NOW - timedelta(days=age)))
+    return rows
+
+
+def test_stats_weight_recent_failures_and_count_flips():
+    stats = build_stats(
+        _history("recent", ["fail", "pass", "pass", "pass"])
+        + _history("old", ["pass", "pass", "pass", "fail"])
+        + _history("flaky", ["pass", "fail", "pass", "error"], duration=None),
+        half_life=2
+    )
+
+    assert stats["recent"].last_failed and not stats["old"].last_failed
+    assert stats["recent"].failures == stats["old"].failures == 1
+    assert stats["recent"].failure_rate > stats["old"].failure_rate
+    assert stats["recent"].average_duration == 10
+    assert stats["flaky"].flips == 3 and stats["flaky"].flakiness == 1.0
+    assert stats["flaky"].failures == 2 and stats["flaky"].average_duration is None
+
+
+def test_failures_come_first_and_long_tests_lead_each_tier_in_parallel_runs():
+    stats = build_stats(
+        _history("failing", ["fail", "fail", "pass"])
+        + _history("stable-short", ["pass"] * 5, duration=5)
+        + _history("stable-long", ["pass"] * 5, duration=300)
+        + _history("flaky", ["pass", "fail", "pass", "fail"])
+    )
+    cases = [CaseInfo(test_case_id) for test_case_id in ("stable-short", "stable-long", "flaky", "failing", "new")]
+
+    sequential = rank(cases, stats)
+    parallel = rank(cases, stats, parallelism=4)
+
+    assert [item.test_case_id for item in sequential][:2] == ["failing", "flaky"]
+    assert sequential[0].tier == 0 and "failed in the latest run" in sequential[0].reasons
+    assert [item.test_case_id for item in parallel][-2:] == ["stable-long", "stable-short"]
+    assert [item.rank for item in parallel] == [1, 2, 3, 4, 5]
+    new = next(item for item in parallel if item.test_case_id == "new")
+    assert new.runs == 0 and new.tier == 1 and "no recent runs" in new.reasons
+    # Deterministic for the same input
+    assert [item.test_case_id for item in rank(cases[::-1], stats, parallelism=4)] == \
+        [item.test_case_id for item in parallel]
+
+
+def test_changed_areas_and_priority_move_stable_cases_up():
+    stats = build_stats(_history("checkout", ["pass"] * 5) + _history("profile", ["pass"] * 5))
+    cases = [
+        CaseInfo("profile", priority="critical", module="Profile"),
+        CaseInfo("checkout", priority="low", module="Checkout", tags=["payments"]),
+    ]
+
+    ranking = rank(cases, stats, changed=["payments"])
+
+    assert [item.test_case_id for item in ranking] == ["checkout", "profile"]
+    assert "covers changed payments" in ranking[0].reasons
+    assert "critical priority" in ranking[1].reasons
+
+
+def test_makespan_uses_the_least_loaded_worker():
+    stats = build_stats(
+        _history("a", ["pass"], duration=30) + _history("b", ["pass"], duration=20)
+        + _history("c", ["pass"], duration=10) + _history("d", ["pass"], duration=10)
+    )
+    ranking = rank([CaseInfo(test_case_id) for test_case_id in "abcd"], stats, parallelism=2)
+
+    assert estimated_makespan(ranking, 2) == 40
+    assert estimated_makespan(ranking, 1) == 70
@@ -0,0 +1,42 @@
+from app.services.prompt_budget import PromptBuilder, count_tokens, select_log_lines, summarize_series
+
+
+def test_select_log_lines_keeps_errors_and_collapses_repeats():
+    logs = "\n".join(
+        [f"INFO request {i} served in {i}ms" for i in range(400)]
+        + [f"INFO cache key {'ab'[i % 2] * (i + 1)} hit" for i in range(50)]
+        + ["WARN retry 1 for /orders", "WARN retry 2 for /orders"]
+        + ["ERROR connection refused to db:5432"]
+    )
+
+    selected = select_log_lines(logs, max_tokens=40)
+
+    assert "ERROR connection refused to db:5432" in selected
+    assert "WARN retry 1 for /orders [x2]" in selected
+    assert "INFO request 0 served in 0ms [x400]" not in selected
+    assert "lines omitted" in selected
+    assert count_tokens(selected) <= 60
+
+
+def test_prompt_builder_shrinks_low_priority_sections_first():
+    builder = PromptBuilder(max_tokens=100)
+    builder.add("Question", "What failed?", priority=3)
+    builder.add("History", "x" * 4000, priority=1)
+
+    prompt = builder.build()
+
+    assert prompt.startswith("Question:\nWhat failed?")
+    assert builder.truncated == ["History"]
+    assert builder.used_tokens <= 100
+    # Building again gives the same prompt from the original sections
+    assert builder.build() == prompt
+    assert builder.truncated == ["History"]
+    assert len(builder.sections[1]["text"]) > 4000
+
+
+def test_summarize_series_reports_trend():
+    summary = summarize_series([10.0, 20.0, 30.0, 60.0, 80.0, 95.0])
+
+    assert summary["max"] == 95.0
+    assert summary["last"] == 95.0
+    assert summary["trend"] == "rising"
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.readiness import FAILED, OK, Readiness
+from app.db import session
+
+
+def test_optional_step_failures_do_not_block_readiness():
+    async def scenario():
+        readiness = Readiness()
+        async with readiness.step("database"):
+            pass
+        async with readiness.step("seed_users", required=False):
+            raise RuntimeError("users table missing")
+        return readiness
+
+    readiness = asyncio.run(scenario())
+
+    assert readiness.ready
+    snapshot = readiness.snapshot()
+    assert snapshot["status"] == "ready"
+    assert snapshot["checks"]["database"]["status"] == OK
+    assert snapshot["checks"]["seed_users"]["status"] == FAILED
+    assert snapshot["checks"]["seed_users"]["detail"] == "users table missing"
+
+
+def test_registered_steps_keep_the_app_unready_until_they_pass():
+    readiness = Readiness()
+    assert not readiness.ready
+    readiness.register("database")
+    assert readiness.snapshot()["status"] == "starting"
+
+
+def test_warm_up_is_retried_in_the_background_until_ready(monkeypatch):
+    sleeps = []
+
+    async def fast_sleep(delay):
+        sleeps.append(delay)
+
+    async def scenario():
+        readiness = Readiness()
+        attempts = []
+
+        async def warm_up():
+            attempts.append(1)
+            async with readiness.step("database"):
+                if len(attempts) < 3:
+                    raise ConnectionError("connection refused")
+
+        monkeypatch.setattr(asyncio, "sleep", fast_sleep)
+        readiness.start(warm_up, timeout=5)
+        assert not readiness.ready  # The caller continues before the warm-up ran
+        await readiness._task
+        return readiness, attempts
+
+    readiness, attempts = asyncio.run(scenario())
+
+    assert readiness.ready and readiness.ready_at is not None
+    assert len(attempts) == 3
+    assert sleeps == [1.0, 2.0]
+    assert readiness.checks["database"].attempts == 3
+
+
+def test_stop_cancels_a_pending_warm_up():
+    async def scenario():
+        readiness = Readiness()
+
+        async def warm_up():
+            async with readiness.step("database"):
+                await asyncio.Event().wait()
+
+        readiness.start(warm_up, timeout=60)
+        await asyncio.sleep(0)
+        await readiness.stop()
+        return readiness
+
+    readiness = asyncio.run(scenario())
+
+    assert not readiness.ready
+
+
+def test_engines_are_published_after_they_connect_and_failed_ones_disposed(monkeypatch, tmp_path):
+    database = tmp_path / "app.db"
+    urls = iter([tmp_path / "missing" / "app.db", database])
+    disposed = []
+    dispose = session._dispose
+
+    def create_engines():
+        path = next(urls)
+        return create_engine(f"sqlite:///{path}"), create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    async def record_dispose(async_engine, sync_engine):
+        disposed.append(async_engine)
+        await dispose(async_engine, sync_engine)
+
+    monkeypatch.setattr(session, "load_environment_variables", lambda: None)
+    monkeypatch.setattr(session, "_create_engines", create_engines)
+    monkeypatch.setattr(session, "_dispose", record_dispose)
+    monkeypatch.setattr(session, "async_engine", None)
+    monkeypatch.setattr(session, "sync_engine", None)
+
+    async def scenario():
+        with pytest.raises(OperationalError):
+            await session.initialize_database()
+        with pytest.raises(HTTPException) as unavailable:
+            await anext(session.get_db())
+        engine = await session.initialize_database()
+        await engine.dispose()
+        return unavailable.value, engine
+
+    unavailable, engine = asyncio.run(scenario())
+
+    assert unavailable.status_code == 503
+    assert session.async_engine is engine and str(engine.url).endswith(str(database))
+    # The engines of the failed attempt were disposed, then nothing was published before
+    assert len(disposed) == 2 and disposed[0] is not engine and disposed[1] is None
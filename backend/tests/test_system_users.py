@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from passlib.context import CryptContext
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core import security
+from app.core.security import get_password_hash, verify_password
+from app.db import crud
+from app.models.db_models import User
+
+
+@pytest.fixture(autouse=True)
+def fast_hashing(monkeypatch):
+    """Password hashing that is cheap enough for tests"""
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["sha256_crypt"]))
+
+
+def test_ai_generator_user_cannot_log_in_with_a_known_password(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}", poolclass=NullPool)
+
+    async def password_hash():
+        async with engine.connect() as conn:
+            return await conn.scalar(select(User.hashed_password).where(User.id == crud.AI_GENERATOR_USER_ID))
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(User.__table__.create)
+        await crud.ensure_ai_generator_user_exists(engine)
+        created = await password_hash()
+        # A user created with the former fixed password gets a random one
+        async with engine.begin() as conn:
+            await conn.execute(
+                update(User).where(User.id == crud.AI_GENERATOR_USER_ID)
+                .values(hashed_password=get_password_hash("ai-system-user"))
+            )
+        await crud.ensure_ai_generator_user_exists(engine)
+        replaced = await password_hash()
+        await engine.dispose()
+        return created, replaced
+
+    created, replaced = asyncio.run(scenario())
+
+    assert not verify_password("ai-system-user", created)
+    assert not verify_password("ai-system-user", replaced)
@@ -0,0 +1,27 @@
+from PIL import Image
+
+from app.core.config import settings
+from app.services.thumbnails import ThumbnailCache
+
+
+def test_generate_renders_every_size_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "THUMBNAIL_SIZES", [100, 400])
+    source = tmp_path / "screenshot.png"
+    Image.new("RGB", (1600, 900), "red").save(source)
+    cache = ThumbnailCache(root=str(tmp_path / "thumbnails"))
+
+    cache.generate("ab" * 32, str(source))
+
+    with Image.open(cache.path("ab" * 32, 100)) as small, Image.open(cache.path("ab" * 32, 400)) as large:
+        assert small.size == (100, 56) and large.size == (400, 225)
+    assert cache.get("ab" * 32, "/missing.png", 400) == cache.path("ab" * 32, 400)
+    assert (cache.fit_size(None), cache.fit_size(150), cache.fit_size(5000)) == (100, 400, 400)
+
+
+def test_unreadable_image_has_no_thumbnail(tmp_path):
+    source = tmp_path / "broken.png"
+    source.write_bytes(b"not an image")
+    cache = ThumbnailCache(root=str(tmp_path / "thumbnails"))
+
+    assert cache.get("cd" * 32, str(source), 200) is None
+    assert not list((tmp_path / "thumbnails").rglob("*.webp"))
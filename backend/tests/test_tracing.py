@@ -0,0 +1,47 @@
+from typing import List
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core import tracing
+from app.core.tracing import TracedRoute, install_tracing, slow_requests, span
+
+
+def test_trace_records_route_queries_and_repeated_statements():
+    engine = create_engine("sqlite://")
+    app = FastAPI()
+    router = APIRouter(route_class=TracedRoute)
+
+    @router.get("/items/{item_id}", response_model=List[int])
+    def read_items(item_id: int):
+        with span("auth"):
+            pass
+        values = []
+        with engine.connect() as conn:
+            for i in range(6):
+                values.append(conn.execute(text("SELECT :i"), {"i": i}).scalar())
+        return values
+
+    install_tracing(app)
+    app.include_router(router)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    tracing._recent_traces.clear()
+
+    client = TestClient(app)
+    response = client.get("/items/7")
+    assert client.get("/ping").json() == {"ok": True}
+
+    assert response.json() == [0, 1, 2, 3, 4, 5]
+    trace, ping = sorted(slow_requests(), key=lambda trace: trace["path"])
+    assert trace["route"] == "/items/{item_id}"
+    assert trace["status_code"] == 200
+    assert trace["query_count"] == 6
+    assert trace["repeated_queries"][0]["count"] == 6
+    assert "auth" in trace["spans"]
+    assert trace["serialization_ms"] > 0
+    assert ping["route"] == "/ping" and ping["serialization_ms"] > 0
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+from app.mcp.website_test_generator import CachedPage, PageCache, WebsiteTestCaseGenerator
+
+
+def make_generator(tmp_path, handler, ttl=3600):
+    generator = WebsiteTestCaseGenerator()
+    generator.cache = PageCache(str(tmp_path), ttl)
+    generator._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return generator
+
+
+def test_fresh_cache_entry_skips_network(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, text="<html><title>Home</title></html>", headers={"ETag": '"v1"'})
+
+    generator = make_generator(tmp_path, handler)
+
+    async def fetch_twice():
+        first = await generator.fetch_content("https://example.test/")
+        second = await generator.fetch_content("https://example.test/")
+        await generator.aclose()
+        return first, second
+
+    first, second = asyncio.run(fetch_twice())
+
+    assert first == second == "<html><title>Home</title></html>"
+    assert len(calls) == 1
+
+
+def test_stale_entry_is_revalidated_with_etag(tmp_path):
+    seen_headers = []
+
+    def handler(request):
+        seen_headers.append(request.headers.get("If-None-Match"))
+        return httpx.Response(304)
+
+    generator = make_generator(tmp_path, handler, ttl=0)
+    generator.cache.put(CachedPage(
+        url="https://example.test/",
+        content="cached body",
+        fetched_at=time.time() - 10,
+        etag='"v1"'
+    ))
+
+    async def fetch():
+        content = await generator.fetch_content("https://example.test/")
+        await generator.aclose()
+        return content
+
+    assert asyncio.run(fetch()) == "cached body"
+    assert seen_headers == ['"v1"']
+
+
+def test_waiters_refetch_when_the_shared_fetch_is_cancelled(tmp_path):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+        return httpx.Response(200, text="fresh body")
+
+    generator = make_generator(tmp_path, handler)
+
+    async def scenario():
+        leader = asyncio.create_task(generator.fetch_content("https://example.test/"))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(generator.fetch_content("https://example.test/"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        content = await asyncio.wait_for(waiter, timeout=5)
+        await generator.aclose()
+        return leader, content
+
+    leader, content = asyncio.run(scenario())
+
+    assert leader.cancelled()
+    assert content == "fresh body"
+    assert len(calls) == 2
+    assert generator._in_flight == {}
+
+
+def test_prune_drops_old_entries_then_oldest_over_size(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=3600, max_bytes=None, max_age=None)
+    now = time.time()
+    for i, url in enumerate(["https://example.test/a", "https://example.test/b", "https://example.test/c"]):
+        cache.put(CachedPage(url=url, content="x" * 1000, fetched_at=now))
+        # a is the oldest, c the newest
+        os.utime(cache._path(url), (now - 300 + i * 100, now - 300 + i * 100))
+    abandoned = tmp_path / "abandoned.json.123.tmp"
+    abandoned.write_text("{")
+    os.utime(abandoned, (now - 7200, now - 7200))
+
+    cache.max_age = 250
+    cache.prune()
+    assert cache.get("https://example.test/a") is None
+    assert not abandoned.exists()
+
+    cache.max_bytes = os.path.getsize(cache._path("https://example.test/c"))
+    cache.prune()
+    assert cache.get("https://example.test/b") is None
+    assert cache.get("https://example.test/c") is not None
+
+
+def test_put_prunes_the_cache(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=3600, max_bytes=0)
+    cache.put(CachedPage(url="https://example.test/", content="page", fetched_at=time.time()))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+from app.core.config import settings
+from app.websocket.backplane import InMemoryBackplane, InMemoryHub
+from app.websocket import manager as manager_module
+from app.websocket.manager import WebSocketManager
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def test_slow_client_does_not_stall_room_and_is_disconnected_on_overflow(monkeypatch):
+    monkeypatch.setattr(settings, "WS_SEND_QUEUE_SIZE", 3)
+
+    async def scenario():
+        manager = WebSocketManager()
+        fast, slow = FakeWebSocket(), FakeWebSocket(delay=60)
+        await manager.connect(fast, "fast")
+        await manager.connect(slow, "slow")
+        await manager.join_room("fast", "project_1")
+        await manager.join_room("slow", "project_1")
+
+        for i in range(5):
+            await manager.broadcast_to_room("project_1", {"type": "test_execution_update", "data": {"n": i}})
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.05)
+        return manager, fast, slow
+
+    manager, fast, slow = asyncio.run(scenario())
+
+    updates = [m["data"]["n"] for m in fast.sent if m["type"] == "test_execution_update"]
+    assert updates == [0, 1, 2, 3, 4]
+    assert slow.close_code == 1013
+    assert "slow" not in manager.get_connected_users()
+    # The close task was referenced while it ran and released afterwards
+    assert not manager_module._background_tasks
+
+
+def test_closing_one_tab_keeps_other_connections_in_room():
+    async def scenario():
+        manager = WebSocketManager()
+        tab_a, tab_b = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(tab_a, "user-1")
+        await manager.connect(tab_b, "user-1")
+        await manager.join_room("user-1", "project_1", tab_a)
+        await manager.join_room("user-1", "project_1", tab_b)
+        await manager.join_room("user-1", "testcase_7", tab_a)
+
+        manager.disconnect(tab_a)
+        await manager.broadcast_to_room("project_1", {"type": "test_execution_update", "data": {}})
+        await asyncio.sleep(0.01)
+        return manager, tab_b
+
+    manager, tab_b = asyncio.run(scenario())
+
+    assert manager.get_room_members("project_1") == ["user-1"]
+    assert "testcase_7" not in manager.room_memberships
+    assert tab_b.sent[-1]["type"] == "test_execution_update"
+
+
+def test_backplane_relays_broadcasts_between_workers():
+    async def scenario():
+        hub = InMemoryHub()
+        worker_a, worker_b = WebSocketManager(), WebSocketManager()
+        await worker_a.start_backplane(InMemoryBackplane(hub))
+        await worker_b.start_backplane(InMemoryBackplane(hub))
+        client_a, client_b = FakeWebSocket(), FakeWebSocket()
+        await worker_a.connect(client_a, "user-a")
+        await worker_b.connect(client_b, "user-b")
+        await worker_a.join_room("user-a", "project_1", client_a)
+        await worker_b.join_room("user-b", "project_1", client_b)
+
+        await worker_a.broadcast_test_execution_update({"project_id": "1", "status": "passed"})
+        await worker_a.flush_updates()
+        await asyncio.sleep(0.01)
+        await worker_a.stop_backplane()
+        await worker_b.stop_backplane()
+        return client_a, client_b
+
+    client_a, client_b = asyncio.run(scenario())
+
+    for client in (client_a, client_b):
+        updates = [m for m in client.sent if m["type"] == "test_execution_update"]
+        assert [m["data"]["status"] for m in updates] == ["passed"]
+
+
+def test_execution_and_dashboard_updates_are_coalesced(monkeypatch):
+    monkeypatch.setattr(settings, "WS_COALESCE_WINDOW_MS", 20)
+
+    async def scenario():
+        manager = WebSocketManager()
+        client = FakeWebSocket()
+        await manager.connect(client, "user-1")
+        await manager.join_room("user-1", "project_1", client)
+
+        for i in range(5000):
+            await manager.broadcast_test_execution_update(
+                {"id": f"exec-{i % 3}", "project_id": "1", "status": "running" if i < 4997 else "passed"}
+            )
+            await manager.broadcast_dashboard_update({"total_executions": i + 1, "pass_rate": 100.0})
+        await asyncio.sleep(0.1)
+
+        late_client = FakeWebSocket()
+        await manager.connect(late_client, "user-2")
+        await asyncio.sleep(0.01)
+        return client, late_client
+
+    client, late_client = asyncio.run(scenario())
+
+    frames = [m for m in client.sent if m["type"] not in ("connection_confirmed", "room_joined")]
+    assert len(frames) <= 2
+    messages = [inner for frame in frames for inner in (frame["data"]["messages"] if frame["type"] == "batch" else [frame])]
+    executions = {m["data"]["id"]: m["data"]["status"] for m in messages if m["type"] == "test_execution_update"}
+    assert executions == {"exec-0": "passed", "exec-1": "passed", "exec-2": "passed"}
+    assert [m["data"] for m in messages if m["type"] == "dashboard_update"] == [
+        {"total_executions": 5000, "pass_rate": 100.0}
+    ]
+    snapshot = late_client.sent[-1]
+    assert snapshot["type"] == "dashboard_update"
+    assert snapshot["data"] == {"total_executions": 5000, "pass_rate": 100.0}
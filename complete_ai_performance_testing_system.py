@@ -23,6 +23,9 @@ from enum import Enum
 import platform
 import shutil
 
+# Shared prompt compaction helpers (stdlib only; importing them does not load the backend app)
+from backend.app.services import prompt_budget
+
 # ===== INPUT MODELS =====
 
 class TestType(Enum):
@@ -404,49 +407,7 @@ class ComprehensiveAIPerformanceTester:
             results = state['execution_results'] if state['execution_results'] is not None else []
             test_input: TestInput = state['preprocessed_input'] if state['preprocessed_input'] is not None else state['test_input']
             
-            analysis_prompt = f"""
-            Perform comprehensive analysis of these performance test results:
-            
-            Test Configuration: {json.dumps(asdict(test_input), default=str, indent=2)}
-            Results: {json.dumps([asdict(r) for r in results], default=str, indent=2)}
-            
-            Provide detailed analysis including:
-            
-            1. EXECUTIVE SUMMARY
-            - Overall performance assessment
-            - Key business impact
-            - Go/No-go recommendation
-            
-            2. TECHNICAL ANALYSIS
-            - Bottleneck identification with root causes
-            - Performance patterns and trends
-            - Scalability assessment
-            - Infrastructure utilization analysis
-            
-            3. RISK ASSESSMENT
-            - Production readiness
-            - Potential failure points
-            - Capacity limits
-            
-            4. OPTIMIZATION ROADMAP
-            - Immediate fixes (0-2 weeks)
-            - Short-term improvements (1-3 months)
-            - Long-term optimizations (3+ months)
-            - ROI estimates for each
-            
-            5. CAPACITY PLANNING
-            - Current capacity limits
-            - Scaling recommendations
-            - Infrastructure requirements
-            - Cost projections
-            
-            6. COMPARATIVE ANALYSIS
-            - Industry benchmarks
-            - Previous test comparisons
-            - Performance trends
-            
-            Provide specific, actionable recommendations with technical details.
-            """
+            analysis_prompt = self._build_analysis_prompt(test_input, results)
             
             response = self.llm.invoke([HumanMessage(content=analysis_prompt)])
             
@@ -1031,6 +992,107 @@ class ComprehensiveAIPerformanceTester:
         
         return result
     
+    def _build_analysis_prompt(self, test_input: TestInput, results: List[TestResult]) -> str:
+        """Compact analysis prompt: configuration summary, result tables and sampled errors within the token budget"""
+        builder = prompt_budget.PromptBuilder(provider="openai", model=self.llm.model_name)
+
+        thresholds = test_input.thresholds
+        builder.add(None, "Perform comprehensive analysis of these performance test results.", priority=5)
+        builder.add("Test Configuration", "\n".join([
+            f"name: {test_input.test_name}; type: {test_input.test_type.value}; environment: {test_input.environment.name}",
+            f"description: {test_input.description}",
+            "endpoints: " + ", ".join(f"{e.name} {e.method} {e.url}" for e in test_input.endpoints),
+            "load patterns: " + ", ".join(
+                f"{lp.name} ({lp.pattern_type}, {lp.concurrent_users} users, ramp {lp.ramp_up_time}s, {lp.duration}s)"
+                for lp in test_input.load_patterns
+            ),
+            f"thresholds: avg<={thresholds.max_avg_response_time}ms p95<={thresholds.max_95th_percentile}ms "
+            f"p99<={thresholds.max_99th_percentile}ms throughput>={thresholds.min_throughput}rps "
+            f"errors<={thresholds.max_error_rate}% cpu<={thresholds.max_cpu_usage}% mem<={thresholds.max_memory_usage}%",
+        ]), priority=4)
+
+        builder.add("Results (times in ms, throughput in rps, error rate in %)", prompt_budget.format_table(
+            [{
+                "endpoint": r.endpoint_name, "pattern": r.load_pattern, "status": r.pass_fail_status,
+                "requests": r.metrics.total_requests, "avg": r.metrics.avg_response_time,
+                "p50": r.metrics.percentile_50, "p90": r.metrics.percentile_90, "p95": r.metrics.percentile_95,
+                "p99": r.metrics.percentile_99, "max": r.metrics.max_response_time, "rps": r.metrics.throughput,
+                "err%": r.metrics.error_rate, "ttfb": r.metrics.first_byte_time_avg
+            } for r in results],
+            ["endpoint", "pattern", "status", "requests", "avg", "p50", "p90", "p95", "p99", "max", "rps", "err%", "ttfb"]
+        ), priority=4)
+
+        # Time series are reduced to summary statistics per run, metric and server
+        series_rows = []
+        for r in results:
+            infra = r.infrastructure_metrics
+            for metric, per_server in (("cpu%", infra.cpu_usage), ("mem%", infra.memory_usage),
+                                       ("disk", infra.disk_io), ("net", infra.network_io),
+                                       ("custom", infra.custom_metrics)):
+                for server, values in (per_server or {}).items():
+                    series_rows.append({"run": f"{r.endpoint_name}/{r.load_pattern}", "metric": metric,
+                                        "server": server, **prompt_budget.summarize_series(values)})
+        if series_rows:
+            builder.add("Infrastructure", prompt_budget.format_table(
+                series_rows, ["run", "metric", "server", "min", "avg", "p95", "max", "last", "trend"]
+            ), priority=2)
+
+        bottlenecks = [
+            f"[{b.severity}] {b.component}: {b.description} (root cause: {b.root_cause})"
+            for r in results for b in r.bottlenecks
+        ]
+        if bottlenecks:
+            builder.add("Detected Bottlenecks", "\n".join(dict.fromkeys(bottlenecks)), priority=3)
+
+        error_lines = [
+            f"{r.endpoint_name}/{r.load_pattern}: {error.get('message', error)}"
+            for r in results for error in r.errors
+        ] + [f"{r.endpoint_name}/{r.load_pattern}: warning: {w}" for r in results for w in r.warnings]
+        if error_lines:
+            builder.add("Errors and Warnings", prompt_budget.select_log_lines(
+                error_lines, builder.max_tokens // 4, builder.provider, builder.model
+            ), priority=1)
+
+        builder.add(None, (
+            "Provide detailed analysis including:\n"
+            "\n"
+            "1. EXECUTIVE SUMMARY\n"
+            "- Overall performance assessment\n"
+            "- Key business impact\n"
+            "- Go/No-go recommendation\n"
+            "\n"
+            "2. TECHNICAL ANALYSIS\n"
+            "- Bottleneck identification with root causes\n"
+            "- Performance patterns and trends\n"
+            "- Scalability assessment\n"
+            "- Infrastructure utilization analysis\n"
+            "\n"
+            "3. RISK ASSESSMENT\n"
+            "- Production readiness\n"
+            "- Potential failure points\n"
+            "- Capacity limits\n"
+            "\n"
+            "4. OPTIMIZATION ROADMAP\n"
+            "- Immediate fixes (0-2 weeks)\n"
+            "- Short-term improvements (1-3 months)\n"
+            "- Long-term optimizations (3+ months)\n"
+            "- ROI estimates for each\n"
+            "\n"
+            "5. CAPACITY PLANNING\n"
+            "- Current capacity limits\n"
+            "- Scaling recommendations\n"
+            "- Infrastructure requirements\n"
+            "- Cost projections\n"
+            "\n"
+            "6. COMPARATIVE ANALYSIS\n"
+            "- Industry benchmarks\n"
+            "- Previous test comparisons\n"
+            "- Performance trends\n"
+            "\n"
+            "Provide specific, actionable recommendations with technical details.\n"
+        ), priority=5)
+        return builder.build()
+
     def _parse_ai_insights(self, analysis_content: str) -> AIInsights:
         """Parse AI analysis into structured insights"""
         
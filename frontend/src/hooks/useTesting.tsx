@@ -321,7 +321,7 @@ export const useTesting = () => {
 
       toast({
         title: "Performance Test Completed",
-        description: `Avg Response Time: ${metricsData.metrics.page_load_time}ms with ${metricsData.metrics.network_requests} req/min throughput`,
+        description: `Avg Response Time: ${metricsData.metrics.page_load_time}ms with ${metricsData.metrics.network_requests} req/s throughput`,
       })
 
       return metricsData
@@ -504,9 +504,20 @@ export const useTesting = () => {
         })
       });
 
-      const data = await response.json();
+      let data = await response.json();
       if (!response.ok) throw new Error(data.detail || 'Newman test failed');
 
+      // The run is queued as a background job; poll until it has finished
+      while (data.status === 'pending' || data.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        const statusResponse = await fetch(getApiUrl(`${API_ENDPOINTS.NEWMAN}/run/${data.job_id}`), {
+          headers: token ? { 'Authorization': `Bearer ${token}` } : {}
+        });
+        data = await statusResponse.json();
+        if (!statusResponse.ok) throw new Error(data.detail || 'Newman test failed');
+      }
+      if (data.status === 'failed') throw new Error(data.error || 'Newman test failed');
+
       toast({
         title: "Newman Test Completed",
         description: `Test run successfully in ${data.duration.toFixed(2)} seconds`,
@@ -11,6 +11,7 @@ import { useAI } from '@/hooks/useAI'
 import { useProjects } from '@/hooks/useProjects'
 import { useTestCases } from '@/hooks/useTestCases'
 import { useToast } from '@/hooks/use-toast'
+import { API_ENDPOINTS, getApiUrl } from '@/config/api'
 
 const AIGenerator = () => {
   const [prompt, setPrompt] = useState('')
@@ -115,25 +116,38 @@ const AIGenerator = () => {
     }
 
     try {
-      const apiUrl = `http://localhost:8001/api/test-cases/export/${format}?project_id=${selectedProject}`
-      
-      // Create a temporary link to trigger download
+      const token = localStorage.getItem('access_token')
+      const response = await fetch(
+        getApiUrl(`${API_ENDPOINTS.TEST_CASES}/export/${format}?project_id=${encodeURIComponent(selectedProject)}`),
+        { headers: token ? { 'Authorization': `Bearer ${token}` } : {} }
+      )
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}))
+        throw new Error(errorData.detail || 'Failed to export test cases')
+      }
+
+      // The export needs the bearer token, so download the file and save it through an object URL
+      const disposition = response.headers.get('Content-Disposition') || ''
+      const filename = disposition.match(/filename="?([^"]+)"?/)?.[1]
+        || `test-cases-${selectedProject}-${Date.now()}.${format === 'excel' ? 'xlsx' : format}`
+      const objectUrl = URL.createObjectURL(await response.blob())
       const link = document.createElement('a')
-      link.href = apiUrl
-      link.download = `test-cases-${selectedProject}-${Date.now()}.${format === 'excel' ? 'xlsx' : format}`
+      link.href = objectUrl
+      link.download = filename
       document.body.appendChild(link)
       link.click()
       document.body.removeChild(link)
+      URL.revokeObjectURL(objectUrl)
 
       toast({
-        title: "Export Started",
-        description: `Downloading test cases as ${format.toUpperCase()}`,
+        title: "Export Complete",
+        description: `Downloaded test cases as ${format.toUpperCase()}`,
       })
     } catch (error) {
       console.error('Error exporting test cases:', error)
       toast({
         title: "Export Failed",
-        description: "Failed to export test cases. Please try again.",
+        description: error instanceof Error ? error.message : "Failed to export test cases. Please try again.",
         variant: "destructive",
       })
     }
@@ -571,7 +571,7 @@ const Performance = () => {
                 <Card>
                   <CardContent className="pt-6">
                     <div className="text-2xl font-bold">{testResult.metrics?.network_requests || 0}</div>
-                    <p className="text-xs text-muted-foreground">Throughput (req/min)</p>
+                    <p className="text-xs text-muted-foreground">Throughput (req/s)</p>
                   </CardContent>
                 </Card>
               </div>